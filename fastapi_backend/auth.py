@@ -11,6 +11,7 @@ import logging
 import models
 from database import get_db
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth_cache import get_cached_user, get_cached_permission_set, record_last_login
 
 # 定义Token模型
 class Token(BaseModel):
@@ -146,14 +147,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         logger.error(f"获取当前用户失败: {e}")
         raise credentials_exception
         
-    user = get_user(db, username=token_data.username)
-    if user is None:
+    user = get_cached_user(db, token_data.user_id)
+    # 用户名已修改的旧令牌视为无效
+    if user is None or user.username != token_data.username:
         raise credentials_exception
     
     try:
-        # 更新最后登录时间
-        user.last_login = datetime.now()
-        db.commit()
+        # 最后登录时间在后台按间隔批量写入
+        record_last_login(user)
     except Exception as e:
         logger.error(f"更新用户登录时间失败: {e}")
         # 不影响主流程，只记录错误
@@ -176,11 +177,7 @@ async def check_admin_permission(current_user = Depends(get_current_user)):
 # 检查用户是否有特定权限
 def has_permission(user_id: str, resource: str, action: str, db: Session):
     try:
-        permissions = get_user_permissions(db, user_id)
-        for permission in permissions:
-            if permission.resource == resource and permission.action == action:
-                return True
-        return False
+        return (resource, action) in get_cached_permission_set(db, user_id)
     except Exception as e:
         logger.error(f"检查权限失败: {e}")
         return False
@@ -0,0 +1,166 @@
+"""
+认证缓存
+
+缓存用户记录和展开后的权限集合（按user_id），避免每个认证请求都访问数据库。
+roles.py/users.py中修改用户、角色或角色权限的接口负责调用失效函数。
+last_login只在内存中记录，按 LAST_LOGIN_FLUSH_INTERVAL 间隔在后台线程中批量写入。
+"""
+
+import logging
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import models
+from config import AUTH_CACHE_TTL, LAST_LOGIN_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """线程安全的简单TTL缓存"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0,
+            }
+
+# user_id -> 已从会话中分离的User对象
+_user_cache = TTLCache(AUTH_CACHE_TTL)
+# user_id -> frozenset((resource, action), ...)
+_permission_cache = TTLCache(AUTH_CACHE_TTL)
+
+def get_cached_user(db, user_id):
+    """按user_id获取用户，命中缓存时不访问数据库"""
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+    user = db.query(models.User).filter(models.User.user_id == user_id).first()
+    if user is not None:
+        # 从会话中分离，已加载的列属性在会话关闭后仍可访问
+        db.expunge(user)
+        _user_cache.set(user_id, user)
+    return user
+
+def get_cached_permission_set(db, user_id):
+    """
+    获取用户展开后的权限集合，一次联表查询代替用户角色、角色权限、权限三次查询
+    Returns:
+        frozenset: {(resource, action), ...}
+    """
+    permission_set = _permission_cache.get(user_id)
+    if permission_set is not None:
+        return permission_set
+    rows = db.query(models.Permission.resource, models.Permission.action).join(
+        models.RolePermission, models.RolePermission.permission_id == models.Permission.permission_id
+    ).join(
+        models.UserRole, models.UserRole.role_id == models.RolePermission.role_id
+    ).filter(models.UserRole.user_id == user_id).all()
+    permission_set = frozenset((resource, action) for resource, action in rows)
+    _permission_cache.set(user_id, permission_set)
+    return permission_set
+
+def invalidate_user(user_id):
+    """用户信息或用户角色变更后调用"""
+    _user_cache.invalidate(user_id)
+    _permission_cache.invalidate(user_id)
+    with _last_login_lock:
+        _pending_last_login.pop(user_id, None)
+
+def invalidate_permissions():
+    """角色或角色权限变更后调用，影响该角色下所有用户，直接清空权限缓存"""
+    _permission_cache.clear()
+
+def get_auth_cache_stats():
+    """缓存命中统计"""
+    return {"users": _user_cache.stats(), "permissions": _permission_cache.stats()}
+
+# 待写入的最后登录时间：user_id -> datetime
+_pending_last_login = {}
+_last_login_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flushing = False
+
+def record_last_login(user):
+    """记录用户访问时间，到达写入间隔时在后台线程批量写入数据库"""
+    global _flushing
+    now = datetime.now()
+    user.last_login = now
+    with _last_login_lock:
+        _pending_last_login[user.user_id] = now
+        if _flushing or time.monotonic() - _last_flush < LAST_LOGIN_FLUSH_INTERVAL:
+            return
+        _flushing = True
+    threading.Thread(target=flush_last_login, name="last-login-flush", daemon=True).start()
+
+def flush_last_login():
+    """将内存中的最后登录时间批量写入数据库"""
+    global _flushing, _last_flush
+    from database import SessionLocal
+
+    with _last_login_lock:
+        pending = dict(_pending_last_login)
+        _pending_last_login.clear()
+        _last_flush = time.monotonic()
+
+    try:
+        if not pending:
+            return
+        db = SessionLocal()
+        try:
+            db.bulk_update_mappings(models.User, [
+                {"user_id": user_id, "last_login": last_login}
+                for user_id, last_login in pending.items()
+            ])
+            db.commit()
+            logger.info(f"批量更新{len(pending)}个用户的最后登录时间")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"批量更新用户登录时间失败: {e}")
+            logger.error(traceback.format_exc())
+            # 写入失败的记录放回队列，等待下次写入（不覆盖更新的时间）
+            with _last_login_lock:
+                for user_id, last_login in pending.items():
+                    _pending_last_login.setdefault(user_id, last_login)
+        finally:
+            db.close()
+    finally:
+        with _last_login_lock:
+            _flushing = False
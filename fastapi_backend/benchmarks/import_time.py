@@ -0,0 +1,168 @@
+"""
+API进程冷启动基准测试
+
+在独立子进程中使用 python -X importtime 导入目标模块（默认 main），统计：
+1. 导入总耗时（多次运行取中位数）
+2. 累计导入耗时最高的模块
+3. 是否加载了TensorFlow、MNE、matplotlib等重量级依赖
+4. 导入完成后的常驻内存（RSS），并与空解释器的基线内存对比
+
+用法:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --target main --repeat 5 --top 30
+    python benchmarks/import_time.py --fail-on-heavy   # 加载了重量级依赖时返回非0退出码
+
+结果以JSON格式写入 benchmarks/results/ 目录，便于跨提交对比。
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+# fastapi_backend 目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+# API进程不应在启动时加载的重量级依赖
+HEAVY_MODULES = ['tensorflow', 'keras', 'mne', 'matplotlib', 'seaborn', 'statsmodels', 'pywt', 'sklearn']
+
+# 子进程中执行的探测代码：导入目标模块并输出耗时和内存
+PROBE_CODE = r'''
+import json, sys, time, importlib
+target = sys.argv[1]
+start = time.perf_counter()
+if target:
+    importlib.import_module(target)
+elapsed = time.perf_counter() - start
+
+def read_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss // 1024 if sys.platform == 'darwin' else rss
+    except ImportError:
+        return 0
+
+print('__IMPORT_BENCH__' + json.dumps({
+    'elapsed_s': elapsed,
+    'rss_kb': read_rss_kb(),
+    'modules': sorted(sys.modules.keys()),
+}))
+'''
+
+# -X importtime 输出格式: "import time:       123 |        456 |   package.module"
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_probe(target):
+    """在子进程中导入目标模块，返回探测结果和importtime明细"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE_CODE, target],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+    )
+    probe = None
+    for line in proc.stdout.splitlines():
+        if line.startswith('__IMPORT_BENCH__'):
+            probe = json.loads(line[len('__IMPORT_BENCH__'):])
+    if proc.returncode != 0 or probe is None:
+        raise RuntimeError(f"导入 {target or '(空)'} 失败:\n{proc.stderr[-4000:]}")
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append({
+                'module': module,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': len(indent) // 2,
+            })
+    return probe, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API进程导入耗时与内存基准测试')
+    parser.add_argument('--target', default='main', help='要导入的模块，默认 main')
+    parser.add_argument('--repeat', type=int, default=3, help='重复运行次数，取中位数')
+    parser.add_argument('--top', type=int, default=20, help='输出累计耗时最高的模块数量')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径，默认写入 benchmarks/results/')
+    parser.add_argument('--fail-on-heavy', action='store_true', help='检测到重量级依赖时以非0状态退出')
+    args = parser.parse_args()
+
+    baseline_probe, _ = run_probe('')
+
+    runs = []
+    imports = []
+    modules = []
+    for i in range(max(1, args.repeat)):
+        probe, imports = run_probe(args.target)
+        modules = probe['modules']
+        runs.append({'elapsed_s': probe['elapsed_s'], 'rss_kb': probe['rss_kb']})
+        print(f"第{i + 1}次: 导入耗时 {probe['elapsed_s']:.3f}s, RSS {probe['rss_kb'] / 1024:.1f}MB")
+
+    # 只统计顶层包，避免子模块重复出现
+    top_level = {}
+    for item in imports:
+        name = item['module'].split('.')[0]
+        if item['module'] == name:
+            top_level[name] = item
+    top_modules = sorted(top_level.values(), key=lambda x: x['cumulative_ms'], reverse=True)[:args.top]
+
+    heavy_loaded = [name for name in HEAVY_MODULES if name in modules]
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'target': args.target,
+        'repeat': len(runs),
+        'median_import_s': statistics.median(r['elapsed_s'] for r in runs),
+        'median_rss_mb': statistics.median(r['rss_kb'] for r in runs) / 1024,
+        'baseline_rss_mb': baseline_probe['rss_kb'] / 1024,
+        'loaded_module_count': len(modules),
+        'heavy_modules_loaded': heavy_loaded,
+        'top_modules': [
+            {'module': m['module'], 'cumulative_ms': m['cumulative_ms'], 'self_ms': m['self_ms']}
+            for m in top_modules
+        ],
+        'runs': runs,
+    }
+
+    print(f"\n导入 {args.target} 中位耗时: {report['median_import_s']:.3f}s")
+    print(f"导入后RSS: {report['median_rss_mb']:.1f}MB (空解释器基线 {report['baseline_rss_mb']:.1f}MB)")
+    print(f"已加载模块数: {report['loaded_module_count']}")
+    print(f"重量级依赖: {', '.join(heavy_loaded) if heavy_loaded else '无'}")
+    print(f"\n累计耗时最高的 {len(top_modules)} 个顶层模块:")
+    for m in top_modules:
+        print(f"  {m['cumulative_ms']:>10.1f} ms  {m['module']}")
+
+    output_path = args.output
+    if not output_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"import_time_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output_path}")
+
+    if args.fail_on_heavy and heavy_loaded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
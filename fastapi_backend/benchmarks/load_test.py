@@ -0,0 +1,445 @@
+"""
+API压测工具
+
+在本机离线运行，不依赖生产数据库和外部服务：
+1. 在本地数据库（默认临时SQLite，也可用 --database-url 指向本地Postgres）中写入指定数量的用户、Data、Result记录，
+   并生成对应的MD5映射文件和日志文件
+2. 以独立的 DATABASE_URL / MD5_DIR / LOG_DIR 启动 uvicorn 子进程（或用 --base-url 压测已启动的服务）
+3. 按权重混合请求 /api/data、/api/results、/api/health/evaluate、/api/health/batch-evaluate、/api/logs，
+   用 httpx + asyncio 保持固定并发，统计每个接口的延迟分位数、吞吐量和错误率
+
+用法:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --data 20000 --results 15000 --concurrency 64 --duration 60
+    python benchmarks/load_test.py --mix data_list=1,evaluate=3 --workers 4
+    python benchmarks/load_test.py --database-url postgresql://postgres:pw@127.0.0.1:5432/loadtest
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --no-seed
+
+--database-url 会先删除之前压测写入的记录（用户ID以 loadtest_ 开头）再重新写入，不要指向生产库。
+结果以JSON格式写入 benchmarks/results/ 目录，便于跨提交对比。
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# fastapi_backend 目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+sys.path.insert(0, ROOT_DIR)
+
+# 压测写入的用户ID前缀，重新写入前按前缀清理
+USER_PREFIX = 'loadtest_'
+
+# 默认请求权重：读多写少
+DEFAULT_MIX = 'data_list=4,data_get=2,results_list=4,results_stats=1,evaluate=2,batch_evaluate=1,logs=1'
+
+LOG_LEVELS = ['INFO', 'INFO', 'INFO', 'WARNING', 'ERROR']
+
+
+class Workload:
+    """根据写入的记录构造各类请求"""
+
+    def __init__(self, data_ids, batch_size, rng):
+        self.data_ids = data_ids
+        self.batch_size = batch_size
+        self.rng = rng
+
+    def data_list(self):
+        return 'GET', '/api/data/', {'params': {'skip': self.rng.randrange(0, max(1, len(self.data_ids) - 100)), 'limit': 100}}
+
+    def data_get(self):
+        return 'GET', f'/api/data/{self.rng.choice(self.data_ids)}', {}
+
+    def results_list(self):
+        return 'GET', '/api/results/', {'params': {'skip': self.rng.randrange(0, 500), 'limit': 100}}
+
+    def results_stats(self):
+        return 'GET', '/api/results/summary/statistics', {}
+
+    def evaluate(self):
+        return 'POST', '/api/health/evaluate', {'json': {'data_id': self.rng.choice(self.data_ids)}}
+
+    def batch_evaluate(self):
+        size = min(self.batch_size, len(self.data_ids))
+        return 'POST', '/api/health/batch-evaluate', {'json': {'data_ids': self.rng.sample(self.data_ids, size)}}
+
+    def logs(self):
+        return 'GET', '/api/logs/', {'params': {'limit': 200}}
+
+
+ENDPOINTS = [name for name in vars(Workload) if not name.startswith('_')]
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"未知的接口: {name}，可选: {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def seed_database(args, work_dir):
+    """写入压测数据，返回Data的ID列表"""
+    import database
+    import models as db_models
+
+    rng = random.Random(args.seed)
+    database.init_db()
+    session = database.SessionLocal()
+    start = time.perf_counter()
+    try:
+        # 清理上一次压测写入的记录（按外键顺序）
+        user_ids = [u for (u,) in session.query(db_models.User.user_id).filter(
+            db_models.User.user_id.like(f'{USER_PREFIX}%'))]
+        if user_ids:
+            session.query(db_models.Result).filter(db_models.Result.user_id.in_(user_ids)).delete(synchronize_session=False)
+            session.query(db_models.Result).filter(db_models.Result.data_id.in_(
+                session.query(db_models.Data.id).filter(db_models.Data.user_id.in_(user_ids))
+            )).delete(synchronize_session=False)
+            session.query(db_models.Data).filter(db_models.Data.user_id.in_(user_ids)).delete(synchronize_session=False)
+            session.query(db_models.User).filter(db_models.User.user_id.in_(user_ids)).delete(synchronize_session=False)
+            session.commit()
+
+        now = datetime.now()
+        users = [{
+            'user_id': f'{USER_PREFIX}{i:04d}',
+            'username': f'{USER_PREFIX}{i:04d}',
+            'password': hashlib.sha256(f'loadtest{i}'.encode()).hexdigest(),
+            'user_type': 'admin' if i == 0 else 'user',
+            'created_at': now,
+        } for i in range(args.users)]
+        session.bulk_insert_mappings(db_models.User, users)
+        session.commit()
+
+        data_root = os.path.join(work_dir, 'data')
+        md5_values = []
+        rows = []
+        for i in range(args.data):
+            md5_value = hashlib.md5(f'loadtest-{args.seed}-{i}'.encode()).hexdigest()
+            md5_values.append(md5_value)
+            data_path = os.path.join(data_root, f'{i:06d}')
+            os.makedirs(data_path, exist_ok=True)
+            user = users[i % len(users)]
+            rows.append({
+                'personnel_id': f'LT{i:06d}',
+                'personnel_name': f'压测人员{i}',
+                'data_path': data_path,
+                'upload_user': 1 if user['user_type'] == 'admin' else 0,
+                'user_id': user['user_id'],
+                'upload_time': now - timedelta(seconds=i),
+                'processing_status': 'completed',
+                'feature_status': 'completed',
+                'md5': md5_value,
+                'has_result': i < args.results,
+                'active_learned': False,
+            })
+            if len(rows) >= args.chunk_size:
+                session.bulk_insert_mappings(db_models.Data, rows)
+                rows = []
+        if rows:
+            session.bulk_insert_mappings(db_models.Data, rows)
+        session.commit()
+
+        data_ids = [i for (i,) in session.query(db_models.Data.id).filter(
+            db_models.Data.user_id.like(f'{USER_PREFIX}%')).order_by(db_models.Data.id)]
+
+        rows = []
+        for i, data_id in enumerate(data_ids[:args.results]):
+            scores = [round(rng.uniform(10, 90), 1) for _ in range(3)]
+            rows.append({
+                'result_time': now - timedelta(minutes=i),
+                'stress_score': scores[0],
+                'depression_score': scores[1],
+                'anxiety_score': scores[2],
+                'user_id': users[i % len(users)]['user_id'],
+                'data_id': data_id,
+                'personnel_id': f'LT{i:06d}',
+                'personnel_name': f'压测人员{i}',
+                'overall_risk_level': '高风险' if max(scores) > 50 else '低风险',
+                'md5': md5_values[i],
+            })
+            if len(rows) >= args.chunk_size:
+                session.bulk_insert_mappings(db_models.Result, rows)
+                rows = []
+        if rows:
+            session.bulk_insert_mappings(db_models.Result, rows)
+        session.commit()
+    finally:
+        session.close()
+
+    # MD5映射：前 md5_entries 条数据命中映射，其余在首次评估时追加（产生写入）
+    os.makedirs(args.md5_dir, exist_ok=True)
+    with open(os.path.join(args.md5_dir, 'data.txt'), 'w', encoding='utf-8') as f:
+        for i, md5_value in enumerate(md5_values[:args.md5_entries]):
+            scores = [round(rng.uniform(10, 90), 1) for _ in range(3)]
+            f.write(f"{md5_value},LT{i:06d},{scores[0]},{scores[1]},{scores[2]}\n")
+
+    # 与config.setup_logging相同格式的日志，供 /api/logs 解析
+    os.makedirs(args.log_dir, exist_ok=True)
+    with open(os.path.join(args.log_dir, 'app.log'), 'w', encoding='utf-8') as f:
+        for i in range(args.log_lines):
+            log_time = (now - timedelta(seconds=args.log_lines - i)).strftime('%Y-%m-%d %H:%M:%S')
+            f.write(f"{log_time} - loadtest - {rng.choice(LOG_LEVELS)} - {users[i % len(users)]['username']} - 压测日志 {i}\n")
+
+    print(f"写入 {len(users)} 个用户、{len(data_ids)} 条数据、{min(args.results, len(data_ids))} 条结果、"
+          f"{min(args.md5_entries, args.data)} 条MD5映射、{args.log_lines} 行日志，耗时 {time.perf_counter() - start:.1f}s")
+    return data_ids
+
+
+def load_data_ids(limit=100000):
+    """不写入数据时从库中读取已有的Data ID"""
+    import database
+    import models as db_models
+
+    with database.SessionLocal() as session:
+        return [i for (i,) in session.query(db_models.Data.id).order_by(db_models.Data.id.desc()).limit(limit)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, work_dir):
+    """以压测专用的环境变量启动uvicorn子进程，返回 (进程, base_url)"""
+    port = args.port or free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url,
+        MD5_DIR=args.md5_dir,
+        LOG_DIR=args.log_dir,
+        MODEL_WARMUP='false',
+    )
+    log_file = open(os.path.join(work_dir, 'server.log'), 'w', encoding='utf-8')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(args.workers), '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    proc.log_file = log_file
+    return proc, f'http://127.0.0.1:{port}'
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    proc.log_file.close()
+
+
+async def wait_ready(base_url, timeout, proc=None):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"服务进程已退出，退出码 {proc.returncode}")
+            try:
+                if (await client.get('/health')).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"等待服务启动超时: {base_url}")
+
+
+async def run_load(base_url, workload, mix, args):
+    """
+    固定并发压测：每个协程循环按权重选择接口发送请求，直到时间结束
+    预热阶段的请求不计入统计
+    返回 (记录列表 [(接口, 状态码, 延迟秒)], 统计时长秒)
+    """
+    import httpx
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    records = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    start = time.monotonic()
+    measure_start = start + args.warmup
+    deadline = measure_start + args.duration
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def worker(worker_id):
+            rng = random.Random(args.seed * 1000 + worker_id)
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+                name = rng.choices(names, weights)[0]
+                method, url, kwargs = getattr(workload, name)()
+                request_start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    status_code = response.status_code
+                except httpx.HTTPError as e:
+                    status_code = type(e).__name__
+                latency = time.perf_counter() - request_start
+                if now >= measure_start:
+                    records.append((name, status_code, latency))
+
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return records, args.duration
+
+
+def percentile(sorted_values, q):
+    """最近秩法分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records, elapsed):
+    """按接口汇总请求数、吞吐量、错误率和延迟分位数（毫秒）"""
+    groups = {}
+    for name, status_code, latency in records:
+        groups.setdefault(name, []).append((status_code, latency))
+    groups['ALL'] = [(status_code, latency) for _, status_code, latency in records]
+
+    summary = {}
+    for name, items in groups.items():
+        latencies = sorted(latency * 1000 for _, latency in items)
+        errors = {}
+        for status_code, _ in items:
+            if not isinstance(status_code, int) or status_code >= 400:
+                errors[str(status_code)] = errors.get(str(status_code), 0) + 1
+        error_count = sum(errors.values())
+        summary[name] = {
+            'requests': len(items),
+            'throughput_rps': round(len(items) / elapsed, 2) if elapsed else None,
+            'error_rate': round(error_count / len(items), 4) if items else 0.0,
+            'errors': errors,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'p50': round(percentile(latencies, 50), 2) if latencies else None,
+                'p90': round(percentile(latencies, 90), 2) if latencies else None,
+                'p95': round(percentile(latencies, 95), 2) if latencies else None,
+                'p99': round(percentile(latencies, 99), 2) if latencies else None,
+                'max': round(latencies[-1], 2) if latencies else None,
+            },
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n{'接口':<16}{'请求数':>8}{'吞吐/s':>10}{'错误率':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (毫秒)")
+    for name, stats in summary.items():
+        latency = stats['latency_ms']
+        if not stats['requests']:
+            continue
+        print(f"{name:<16}{stats['requests']:>8}{stats['throughput_rps']:>10.1f}{stats['error_rate']:>9.2%}"
+              f"{latency['p50']:>9.1f}{latency['p90']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}")
+        if stats['errors'] and name != 'ALL':
+            print(f"{'':<16}错误: {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API压测工具（本地数据库 + 混合并发负载）')
+    parser.add_argument('--database-url', default=None, help='压测数据库，默认在工作目录中创建SQLite')
+    parser.add_argument('--base-url', default=None, help='压测已启动的服务，不再启动uvicorn子进程')
+    parser.add_argument('--no-seed', action='store_true', help='不写入数据，使用库中已有记录')
+    parser.add_argument('--users', type=int, default=20, help='写入的用户数')
+    parser.add_argument('--data', type=int, default=5000, help='写入的Data记录数')
+    parser.add_argument('--results', type=int, default=4000, help='写入的Result记录数（对应前N条数据）')
+    parser.add_argument('--md5-entries', type=int, default=4000, help='写入MD5映射的条数，其余数据评估时追加')
+    parser.add_argument('--log-lines', type=int, default=20000, help='写入日志文件的行数')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='批量插入每批行数')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发请求数')
+    parser.add_argument('--duration', type=float, default=30.0, help='统计时长（秒）')
+    parser.add_argument('--warmup', type=float, default=3.0, help='预热时长（秒），不计入统计')
+    parser.add_argument('--timeout', type=float, default=30.0, help='单个请求超时（秒）')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'接口权重，默认 {DEFAULT_MIX}')
+    parser.add_argument('--batch-size', type=int, default=10, help='batch-evaluate每次提交的数据条数')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn工作进程数')
+    parser.add_argument('--port', type=int, default=None, help='uvicorn端口，默认随机空闲端口')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', default=None, help='SQLite、MD5映射和日志的目录，默认使用临时目录并在结束后删除')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径，默认写入 benchmarks/results/')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='eeg_loadtest_')
+    os.makedirs(work_dir, exist_ok=True)
+    args.database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'loadtest.db')}"
+    args.md5_dir = os.path.join(work_dir, 'md5')
+    args.log_dir = os.path.join(work_dir, 'log')
+
+    # 先设置环境变量再导入database，本进程写入数据与服务进程使用同一个库
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['MD5_DIR'] = args.md5_dir
+    os.environ['LOG_DIR'] = args.log_dir
+    # 导入config时会配置根日志，压测请求本身不逐条记录
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    proc = None
+    try:
+        data_ids = load_data_ids() if args.no_seed else seed_database(args, work_dir)
+        if not data_ids:
+            raise SystemExit("数据库中没有Data记录，无法压测")
+
+        base_url = args.base_url
+        if not base_url:
+            proc, base_url = start_server(args, work_dir)
+        asyncio.run(wait_ready(base_url, 60, proc))
+
+        print(f"压测 {base_url}: 并发 {args.concurrency}，预热 {args.warmup:g}s，统计 {args.duration:g}s，权重 {mix}")
+        workload = Workload(data_ids, args.batch_size, random.Random(args.seed))
+        records, elapsed = asyncio.run(run_load(base_url, workload, mix, args))
+    finally:
+        if proc is not None:
+            stop_server(proc)
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = summarize(records, elapsed)
+    print_summary(summary)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'database': args.database_url.split('://')[0],
+        'seed': {
+            'users': args.users, 'data': len(data_ids), 'results': args.results,
+            'md5_entries': args.md5_entries, 'log_lines': args.log_lines,
+        } if not args.no_seed else None,
+        'load': {
+            'concurrency': args.concurrency, 'duration_s': args.duration, 'warmup_s': args.warmup,
+            'workers': args.workers if not args.base_url else None, 'mix': mix, 'batch_size': args.batch_size,
+        },
+        'endpoints': summary,
+    }
+    output_path = args.output
+    if not output_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
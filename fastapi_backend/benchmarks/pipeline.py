@@ -0,0 +1,526 @@
+"""
+脑电处理流水线端到端基准测试
+
+生成可配置时长的59通道合成记录，依次测量各阶段的耗时、CPU时间和峰值内存：
+1. treat：预处理总耗时，以及清单中记录的各子阶段耗时（load/interpolate/resample_filter/ica/reference/epochs/save）
+2. analyze：analyze_eeg_data 的读取、特征提取（features）与绘图（plots）分开计时
+3. get_data：load_subject_epochs 分别从 epochs.npy（内存映射）和 fif.fif 读取
+4. scaler：standardize_epochs 逐通道标准化
+5. keras / tflite：模型加载与推理（未安装TensorFlow或找不到模型文件时跳过）
+
+输入格式：
+- edf（默认）：生成原始EDF记录，从预处理开始完整运行
+- fif：直接生成已切分好的 fif.fif（500Hz、2秒epoch），跳过预处理，只测后续阶段
+
+用法:
+    python benchmarks/pipeline.py
+    python benchmarks/pipeline.py --duration 600 --sfreq 1000 --repeat 5
+    python benchmarks/pipeline.py --format fif --skip analyze
+    python benchmarks/pipeline.py --compare benchmarks/results/pipeline_xxx.json --threshold 0.2
+
+--compare 指定基线结果时，任一阶段耗时超过基线的 (1 + threshold) 倍则返回非0退出码。
+结果以JSON格式写入 benchmarks/results/ 目录，便于跨提交对比。
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# fastapi_backend 目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+sys.path.insert(0, ROOT_DIR)
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+
+from config import MODEL_DIR  # noqa: E402
+from data_preprocess import CHANNELS_TO_KEEP, OUTPUT_NAME, PIPELINE_PARAMS  # noqa: E402
+
+STAGES = ['treat', 'analyze', 'get_data', 'scaler', 'keras', 'tflite']
+
+# 内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def read_rss_mb():
+    """当前进程常驻内存（MB），无/proc时退回进程生命周期内的峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+    except ImportError:
+        return 0.0
+
+
+class RssSampler:
+    """在后台线程中采样RSS，记录一个阶段内的峰值"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = read_rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, read_rss_mb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, read_rss_mb())
+        return False
+
+
+def measure(func):
+    """返回 (结果, {wall_s, cpu_s, rss_before_mb, peak_rss_mb})"""
+    rss_before = read_rss_mb()
+    with RssSampler() as sampler:
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        result = func()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+    return result, {
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'rss_before_mb': round(rss_before, 1),
+        'peak_rss_mb': round(sampler.peak, 1),
+    }
+
+
+def measure_repeated(func, repeat):
+    """重复运行，耗时取中位数，峰值内存取最大值"""
+    result = None
+    runs = []
+    for _ in range(max(1, repeat)):
+        result, stats = measure(func)
+        runs.append(stats)
+    return result, {
+        'wall_s': statistics.median(r['wall_s'] for r in runs),
+        'cpu_s': statistics.median(r['cpu_s'] for r in runs),
+        'rss_before_mb': runs[0]['rss_before_mb'],
+        'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+        'runs': [r['wall_s'] for r in runs],
+    }
+
+
+def synthetic_data(n_channels, sfreq, duration, seed):
+    """1/f背景 + 10Hz alpha节律 + 白噪声，幅值在几十微伏内，不会被reject阈值整段拒绝"""
+    rng = np.random.default_rng(seed)
+    n_times = int(sfreq * duration)
+    t = np.arange(n_times) / sfreq
+    data = np.cumsum(rng.standard_normal((n_channels, n_times)), axis=1)
+    data -= np.linspace(data[:, :1], data[:, -1:], n_times, axis=1)[:, :, 0]  # 去掉随机游走的漂移
+    data *= 2e-6 / max(np.std(data), 1e-12)
+    phases = rng.uniform(0, 2 * np.pi, (n_channels, 1))
+    data += 1e-5 * np.sin(2 * np.pi * 10 * t + phases)
+    data += rng.standard_normal(data.shape) * 3e-6
+    return data
+
+
+def _edf_field(value, width):
+    text = str(value)[:width]
+    return text.ljust(width).encode('ascii')
+
+
+def write_edf(path, data, sfreq, ch_names):
+    """
+    写出16位EDF文件（不依赖额外的导出库）
+    数据单位为伏特，以0.1微伏分辨率量化，每个数据记录1秒
+    """
+    n_channels, n_times = data.shape
+    samples_per_record = int(round(sfreq))
+    n_records = n_times // samples_per_record
+    phys_min, phys_max = -3276.8, 3276.7  # 微伏
+    dig_min, dig_max = -32768, 32767
+    now = datetime.now()
+
+    header = b''.join([
+        _edf_field('0', 8),
+        _edf_field('X X X benchmark', 80),
+        _edf_field(f"Startdate {now.strftime('%d-%b-%Y').upper()} X X X", 80),
+        _edf_field(now.strftime('%d.%m.%y'), 8),
+        _edf_field(now.strftime('%H.%M.%S'), 8),
+        _edf_field(256 * (n_channels + 1), 8),
+        _edf_field('', 44),
+        _edf_field(n_records, 8),
+        _edf_field(1, 8),
+        _edf_field(n_channels, 4),
+    ])
+    header += b''.join(_edf_field(name, 16) for name in ch_names)
+    header += b''.join(_edf_field('AgAgCl electrode', 80) for _ in ch_names)
+    header += b''.join(_edf_field('uV', 8) for _ in ch_names)
+    header += b''.join(_edf_field(phys_min, 8) for _ in ch_names)
+    header += b''.join(_edf_field(phys_max, 8) for _ in ch_names)
+    header += b''.join(_edf_field(dig_min, 8) for _ in ch_names)
+    header += b''.join(_edf_field(dig_max, 8) for _ in ch_names)
+    header += b''.join(_edf_field('', 80) for _ in ch_names)
+    header += b''.join(_edf_field(samples_per_record, 8) for _ in ch_names)
+    header += b''.join(_edf_field('', 32) for _ in ch_names)
+
+    digital = np.clip(np.round(data[:, :n_records * samples_per_record] * 1e7), dig_min, dig_max).astype('<i2')
+    # (通道, 记录, 采样点) -> (记录, 通道, 采样点)，每个数据记录依次存放各通道的样本
+    records = digital.reshape(n_channels, n_records, samples_per_record).transpose(1, 0, 2)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(np.ascontiguousarray(records).tobytes())
+    return path
+
+
+def write_epochs_fif(path, data, sfreq, ch_names):
+    """把连续数据切分为与预处理输出相同形状的epoch（2秒）并保存为FIF"""
+    import mne
+
+    info = mne.create_info(ch_names, sfreq, 'eeg')
+    n_samples = int(2 * sfreq)
+    n_epochs = data.shape[1] // n_samples
+    epoch_data = data[:, :n_epochs * n_samples].reshape(len(ch_names), n_epochs, n_samples).transpose(1, 0, 2)
+    epochs = mne.EpochsArray(epoch_data, info, tmin=PIPELINE_PARAMS['tmin'], verbose=False)
+    epochs.save(path, overwrite=True, verbose=False)
+    return path
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_model(pattern, explicit):
+    if explicit:
+        return explicit if os.path.exists(explicit) else None
+    matches = sorted(glob.glob(os.path.join(MODEL_DIR, '**', pattern), recursive=True))
+    return matches[0] if matches else None
+
+
+def skipped(reason):
+    print(f"  跳过: {reason}")
+    return {'skipped': reason}
+
+
+def bench_treat(data_dir):
+    import data_preprocess
+    import preprocess_cache
+
+    ok, stats = measure(lambda: data_preprocess.treat(data_dir))
+    if not ok:
+        raise RuntimeError("预处理失败，详见上方输出")
+    entries = preprocess_cache.load_manifest(data_dir)['stages'].get('preprocess', {})
+    entry = max(entries.values(), key=lambda e: e['created_at']) if entries else {}
+    stats['substages_s'] = entry.get('timings', {})
+    stats['n_epochs'] = entry.get('n_epochs')
+    return stats
+
+
+def bench_analyze(data_dir):
+    """按 analyze_eeg_data 的步骤分别计时；绘图输出到数据目录"""
+    try:
+        import data_feature_calculation as dfc
+    except ImportError as e:
+        return skipped(f"特征计算依赖未安装: {e}")
+
+    dfc.folder_path = data_dir
+    fif_path = os.path.join(data_dir, OUTPUT_NAME)
+
+    def load():
+        data1, eeg_data = dfc.load_preprocess_data(fif_path)
+        if len(eeg_data.shape) == 3:
+            eeg_data = np.mean(eeg_data, axis=0)
+        return data1.info['sfreq'], eeg_data
+
+    (sfreq, eeg_data), load_stats = measure(load)
+
+    def features():
+        time_domain = [dfc.extract_time_domain_features(channel) for channel in eeg_data]
+        frequency_domain = [dfc.extract_frequency_domain_features(channel, sfreq) for channel in eeg_data]
+        time_frequency = [dfc.extract_time_frequency_features(channel) for channel in eeg_data]
+        band_powers = [dfc.extract_theta_alpha_beta_gamma_powers(channel, sfreq) for channel in eeg_data]
+        dfc.create_feature_dataframe(time_domain, frequency_domain, time_frequency, band_powers)
+        return time_domain, frequency_domain, time_frequency, band_powers
+
+    (time_domain, frequency_domain, time_frequency, band_powers), feature_stats = measure(features)
+
+    def plots():
+        dfc.plot_time_domain_features(time_domain)
+        dfc.plot_frequency_domain_features(frequency_domain)
+        dfc.plot_time_frequency_features(time_frequency)
+        dfc.plot_differential_entropy(frequency_domain)
+        dfc.plot_theta_alpha_beta_gamma_powers(band_powers)
+
+    _, plot_stats = measure(plots)
+    return {'load': load_stats, 'features': feature_stats, 'plots': plot_stats}
+
+
+def bench_get_data(data_dir, repeat):
+    import epoch_store
+    import model_inference
+
+    report = {}
+    if epoch_store.has_epochs(data_dir):
+        data, report['npy'] = measure_repeated(lambda: np.array(model_inference.load_subject_epochs(data_dir)), repeat)
+    else:
+        report['npy'] = skipped("没有 epochs.npy")
+
+    # 只含fif.fif的目录，且不补写npy，测量FIF解码路径
+    fif_dir = os.path.join(data_dir, 'fif_only')
+    os.makedirs(fif_dir, exist_ok=True)
+    shutil.copy2(os.path.join(data_dir, OUTPUT_NAME), os.path.join(fif_dir, OUTPUT_NAME))
+    export_npy = model_inference.EPOCH_STORE_NPY
+    model_inference.EPOCH_STORE_NPY = False
+    try:
+        data, report['fif'] = measure_repeated(lambda: model_inference.load_subject_epochs(fif_dir), repeat)
+    finally:
+        model_inference.EPOCH_STORE_NPY = export_npy
+    report['shape'] = list(data.shape)
+    return data, report
+
+
+def prepare_scaler_model(data, work_dir, model_path):
+    """
+    返回标准化器所在模型路径：模型目录下有standarder时直接使用，
+    否则在临时目录中按合成数据拟合每个通道的StandardScaler
+    """
+    import model_inference
+
+    if model_path and os.path.isdir(model_inference.get_standarder_dir(model_path)):
+        return model_path, 'model'
+    import pickle as pkl
+    from sklearn.preprocessing import StandardScaler
+
+    fake_model = os.path.join(work_dir, 'scaler_model', 'model.bin')
+    std_dir = model_inference.get_standarder_dir(fake_model)
+    os.makedirs(std_dir, exist_ok=True)
+    for j in range(data.shape[2]):
+        with open(os.path.join(std_dir, f'std_{j}.pkl'), 'wb') as f:
+            pkl.dump(StandardScaler().fit(data[:, 0, j, :]), f)
+    return fake_model, 'fitted'
+
+
+def bench_scaler(data, work_dir, model_path, repeat):
+    import model_inference
+
+    try:
+        scaler_model, source = prepare_scaler_model(data, work_dir, model_path)
+    except ImportError as e:
+        return None, skipped(f"scikit-learn未安装: {e}")
+    # 第一次调用包含读取pkl，之后命中进程内缓存
+    _, load_stats = measure(lambda: model_inference.load_scalers(
+        model_inference.get_standarder_dir(scaler_model), data.shape[2]))
+    X, transform_stats = measure_repeated(lambda: model_inference.standardize_epochs(data, scaler_model), repeat)
+    return X, {'source': source, 'load': load_stats, 'transform': transform_stats}
+
+
+def bench_keras(X, model_path, repeat):
+    import model_inference
+
+    if not model_path:
+        return skipped("找不到 .keras 模型文件")
+    try:
+        model, load_stats = measure(lambda: model_inference.load_keras_model(model_path))
+    except ImportError as e:
+        return skipped(f"TensorFlow未安装: {e}")
+    model_inference.EegModel._models['benchmark_keras'] = model
+    # 第一次推理包含图构建，单独记录
+    ratio, first_stats = measure(lambda: model_inference.predict_epochs('benchmark_keras', model_path, X))
+    _, predict_stats = measure_repeated(lambda: model_inference.predict_epochs('benchmark_keras', model_path, X), repeat)
+    return {'model': model_path, 'load': load_stats, 'first_predict': first_stats,
+            'predict': predict_stats, 'ratio': ratio}
+
+
+def bench_tflite(X, model_path, repeat):
+    import model_inference
+
+    if not model_path:
+        return skipped("找不到 .tflite 模型文件")
+    try:
+        _, load_stats = measure(lambda: model_inference.get_tflite_interpreter(model_path))
+    except ImportError as e:
+        return skipped(f"TensorFlow未安装: {e}")
+    ratio, predict_stats = measure_repeated(lambda: model_inference.predict_epochs('benchmark_tflite', model_path, X), repeat)
+    return {'model': model_path, 'load': load_stats, 'predict': predict_stats, 'ratio': ratio}
+
+
+def flatten_timings(report, prefix=''):
+    """把嵌套结果展开为 {阶段路径: 耗时秒}，用于与基线对比"""
+    timings = {}
+    for key, value in report.items():
+        if not isinstance(value, dict):
+            continue
+        path = f"{prefix}{key}"
+        if 'wall_s' in value:
+            timings[path] = value['wall_s']
+        timings.update(flatten_timings(value, f"{path}."))
+    return timings
+
+
+def compare(report, baseline_path, threshold):
+    """与基线结果对比，返回变慢超过阈值的阶段列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    current = flatten_timings(report['stages'])
+    previous = flatten_timings(baseline.get('stages', {}))
+    regressions = []
+    print(f"\n与基线对比 ({baseline.get('git_revision') or baseline_path}):")
+    for stage, seconds in current.items():
+        if stage not in previous:
+            continue
+        before = previous[stage]
+        ratio = seconds / before if before else None
+        # 基线低于10毫秒的阶段波动太大，只显示不判定
+        regressed = ratio is not None and before >= 0.01 and ratio > 1 + threshold
+        if regressed:
+            regressions.append({'stage': stage, 'baseline_s': before, 'current_s': seconds, 'ratio': ratio})
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else '-'
+        print(f"  {'!!' if regressed else '  '} {stage:<32} {before:>9.3f}s -> {seconds:>9.3f}s  {ratio_text}")
+    return regressions
+
+
+def print_stage(name, stats):
+    if 'wall_s' in stats:
+        print(f"  {name:<22} 耗时 {stats['wall_s']:>8.3f}s  CPU {stats['cpu_s']:>8.3f}s  峰值RSS {stats['peak_rss_mb']:>7.1f}MB")
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            print_stage(f"{name}.{key}", value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='脑电处理流水线端到端基准测试')
+    parser.add_argument('--format', choices=['edf', 'fif'], default='edf',
+                        help='合成输入格式：edf从预处理开始，fif直接生成预处理结果')
+    parser.add_argument('--duration', type=float, default=300.0, help='合成记录时长（秒）')
+    parser.add_argument('--sfreq', type=float, default=1000.0, help='EDF采样率（fif固定为500Hz）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='读取/标准化/推理阶段重复次数，取中位数')
+    parser.add_argument('--skip', nargs='*', default=[], choices=STAGES, help='跳过的阶段')
+    parser.add_argument('--keras-model', default=None, help='Keras模型路径，默认在model目录中查找')
+    parser.add_argument('--tflite-model', default=None, help='TFLite模型路径，默认在model目录中查找')
+    parser.add_argument('--work-dir', default=None, help='合成数据目录，默认使用临时目录并在结束后删除')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径，默认写入 benchmarks/results/')
+    parser.add_argument('--compare', default=None, help='基线结果JSON，用于检测性能回退')
+    parser.add_argument('--threshold', type=float, default=0.2, help='相对基线变慢超过该比例视为回退')
+    args = parser.parse_args()
+
+    if args.format == 'fif' and 'treat' not in args.skip:
+        args.skip.append('treat')
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='eeg_bench_')
+    data_dir = os.path.join(work_dir, 'subject')
+    os.makedirs(data_dir, exist_ok=True)
+
+    keras_model = find_model('*.keras', args.keras_model)
+    tflite_model = find_model('*.tflite', args.tflite_model)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': git_revision(),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'input': {
+            'format': args.format,
+            'channels': len(CHANNELS_TO_KEEP),
+            'duration_s': args.duration,
+            'sfreq': args.sfreq if args.format == 'edf' else float(PIPELINE_PARAMS['target_sfreq']),
+            'seed': args.seed,
+        },
+        'params': {
+            'resample_method': PIPELINE_PARAMS['resample_method'],
+            'ica': PIPELINE_PARAMS['ica'],
+            'repeat': args.repeat,
+        },
+        'stages': {},
+    }
+    stages = report['stages']
+
+    try:
+        print(f"生成合成数据: {len(CHANNELS_TO_KEEP)}通道, {args.duration:g}秒, 格式 {args.format}")
+        if args.format == 'edf':
+            data = synthetic_data(len(CHANNELS_TO_KEEP), args.sfreq, args.duration, args.seed)
+            input_path = write_edf(os.path.join(data_dir, 'benchmark.edf'), data, args.sfreq, CHANNELS_TO_KEEP)
+        else:
+            sfreq = PIPELINE_PARAMS['target_sfreq']
+            data = synthetic_data(len(CHANNELS_TO_KEEP), sfreq, args.duration, args.seed)
+            input_path = write_epochs_fif(os.path.join(data_dir, OUTPUT_NAME), data, sfreq, CHANNELS_TO_KEEP)
+        del data
+        report['input']['size_mb'] = round(os.path.getsize(input_path) / 1024 / 1024, 2)
+
+        if 'treat' not in args.skip:
+            print("预处理 treat ...")
+            stages['treat'] = bench_treat(data_dir)
+
+        if 'analyze' not in args.skip:
+            print("特征计算 analyze_eeg_data ...")
+            stages['analyze'] = bench_analyze(data_dir)
+
+        epochs, stages['get_data'] = bench_get_data(data_dir, args.repeat)
+
+        X = None
+        if 'scaler' not in args.skip:
+            X, stages['scaler'] = bench_scaler(epochs, work_dir, keras_model or tflite_model, args.repeat)
+        if X is None:
+            X = np.array(epochs)
+
+        if 'keras' not in args.skip:
+            print("Keras推理 ...")
+            stages['keras'] = bench_keras(X, keras_model, args.repeat)
+        if 'tflite' not in args.skip:
+            print("TFLite推理 ...")
+            stages['tflite'] = bench_tflite(X, tflite_model, args.repeat)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n输入: {report['input']['size_mb']}MB")
+    for name, stats in stages.items():
+        print_stage(name, stats)
+    if 'treat' in stages:
+        substages = ', '.join(f"{k}={v}s" for k, v in stages['treat']['substages_s'].items())
+        print(f"  treat子阶段: {substages}")
+
+    exit_code = 0
+    if args.compare:
+        report['baseline'] = args.compare
+        report['regressions'] = compare(report, args.compare, args.threshold)
+        if report['regressions']:
+            print(f"\n{len(report['regressions'])}个阶段相对基线变慢超过 {args.threshold:.0%}")
+            exit_code = 1
+
+    output_path = args.output
+    if not output_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output_path}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+降采样+滤波阶段对比基准
+
+比较预处理中两种降采样+带通方式的耗时、峰值内存和输出差异：
+1. mne：原流程，MNE FFT重采样到500Hz后FIR滤波1-100Hz
+2. fused：signal_filters.resample_bandpass，多相重采样（同时完成低通）+ SOS高通
+
+差异指标（去掉两端各 --edge 秒后计算）：
+- rel_rms：整体相对均方根误差，主要来自1Hz以下高通过渡带的形状差异
+- band_psd_rel：2-100Hz通带内Welch功率谱的最大相对误差（1Hz处受高通过渡带影响，不计入）
+
+用法:
+    python benchmarks/resample_filter.py --edf ../data/1/xxx.edf
+    python benchmarks/resample_filter.py --sfreq 1000 --duration 600 --n-jobs 4
+    python benchmarks/resample_filter.py --tolerance 0.05   # 通带误差超过阈值时返回非0退出码
+
+结果以JSON格式写入 benchmarks/results/ 目录。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+from scipy import signal
+
+# fastapi_backend 目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+sys.path.insert(0, ROOT_DIR)
+
+import signal_filters  # noqa: E402
+
+TARGET_SFREQ = 500
+L_FREQ = 1
+H_FREQ = 100
+
+
+def load_raw(args):
+    """读取EDF，未指定时生成带alpha节律的1/f合成数据"""
+    import mne
+
+    if args.edf:
+        raw = mne.io.read_raw_edf(args.edf, preload=True, verbose=False)
+        return raw.pick('eeg')
+
+    rng = np.random.default_rng(args.seed)
+    n_times = int(args.sfreq * args.duration)
+    data = np.cumsum(rng.standard_normal((args.channels, n_times)), axis=1) * 1e-7
+    data += 1e-5 * np.sin(2 * np.pi * 10 * np.arange(n_times) / args.sfreq)
+    data += rng.standard_normal(data.shape) * 5e-6
+    info = mne.create_info([f'EEG{i:03d}' for i in range(args.channels)], args.sfreq, 'eeg')
+    return mne.io.RawArray(data, info, verbose=False)
+
+
+def measure(func):
+    """返回 (结果, 耗时秒, 峰值内存MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='降采样+滤波阶段对比基准')
+    parser.add_argument('--edf', default=None, help='EDF文件路径，不指定时使用合成数据')
+    parser.add_argument('--sfreq', type=float, default=1000.0, help='合成数据采样率')
+    parser.add_argument('--duration', type=float, default=600.0, help='合成数据时长（秒）')
+    parser.add_argument('--channels', type=int, default=59, help='合成数据通道数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--n-jobs', type=int, default=1, help='并行线程数')
+    parser.add_argument('--edge', type=float, default=5.0, help='计算误差时去掉两端的秒数')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='通带功率谱最大相对误差阈值')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径，默认写入 benchmarks/results/')
+    args = parser.parse_args()
+
+    raw = load_raw(args)
+    sfreq = raw.info['sfreq']
+    data = raw.get_data()
+    print(f"输入: {data.shape[0]}通道, {data.shape[1] / sfreq:.0f}秒, {sfreq:g}Hz")
+
+    reference, mne_s, mne_mb = measure(lambda: raw.copy().resample(
+        sfreq=TARGET_SFREQ, n_jobs=args.n_jobs, verbose=False
+    ).filter(l_freq=L_FREQ, h_freq=H_FREQ, n_jobs=args.n_jobs, verbose=False).get_data())
+    fused, fused_s, fused_mb = measure(lambda: signal_filters.resample_bandpass(
+        data, sfreq, TARGET_SFREQ, L_FREQ, H_FREQ, n_jobs=args.n_jobs
+    ))
+
+    n = min(reference.shape[1], fused.shape[1])
+    edge = int(args.edge * TARGET_SFREQ)
+    ref_part = reference[:, edge:n - edge]
+    fused_part = fused[:, edge:n - edge]
+    rel_rms = float(np.sqrt(np.mean((ref_part - fused_part) ** 2) / np.mean(ref_part ** 2)))
+
+    freqs, ref_psd = signal.welch(ref_part, fs=TARGET_SFREQ, nperseg=2 * TARGET_SFREQ, axis=-1)
+    _, fused_psd = signal.welch(fused_part, fs=TARGET_SFREQ, nperseg=2 * TARGET_SFREQ, axis=-1)
+    band = (freqs >= 2 * L_FREQ) & (freqs <= H_FREQ)
+    band_psd_rel = float(np.max(np.abs(fused_psd[:, band] - ref_psd[:, band]) / ref_psd[:, band]))
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'source': args.edf or 'synthetic',
+        'sfreq': sfreq,
+        'shape': list(data.shape),
+        'n_jobs': args.n_jobs,
+        'mne': {'seconds': mne_s, 'peak_mb': mne_mb},
+        'fused': {'seconds': fused_s, 'peak_mb': fused_mb},
+        'speedup': mne_s / fused_s if fused_s else None,
+        'rel_rms': rel_rms,
+        'band_psd_rel': band_psd_rel,
+        'tolerance': args.tolerance,
+        'passed': band_psd_rel <= args.tolerance,
+    }
+
+    print(f"mne:   {mne_s:.2f}s, 峰值内存 {mne_mb:.0f}MB")
+    print(f"fused: {fused_s:.2f}s, 峰值内存 {fused_mb:.0f}MB")
+    print(f"整体相对RMS误差: {rel_rms:.4f}")
+    print(f"{2 * L_FREQ}-{H_FREQ}Hz通带功率谱最大相对误差: {band_psd_rel:.4f} (阈值 {args.tolerance})")
+
+    output_path = args.output
+    if not output_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"resample_filter_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output_path}")
+
+    if not report['passed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,19 @@ load_dotenv(encoding='utf-8')
 # 获取项目根目录的绝对路径
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# 日志文件路径
-LOG_DIR = os.path.join(ROOT_DIR, 'log')
+# 日志文件路径（压测等场景可用LOG_DIR指向独立目录）
+LOG_DIR = os.getenv('LOG_DIR', os.path.join(ROOT_DIR, 'log'))
 LOG_FILE = os.path.join(LOG_DIR, 'app.log')
 
 # 数据目录
 DATA_DIR = os.path.join(ROOT_DIR, 'data')
 
+# 内容寻址存储目录：解压后的数据按上传文件MD5只保存一份，人员目录为指向它的链接
+CONTENT_STORE_DIR = os.path.join(DATA_DIR, 'objects')
+
+# MD5映射文件（md5,file_id,应激,抑郁,焦虑）所在目录
+MD5_DIR = os.getenv('MD5_DIR', os.path.join(ROOT_DIR, 'md5'))
+
 # 模型目录
 MODEL_DIR = os.path.join(ROOT_DIR, 'model')
 
@@ -24,6 +30,79 @@ TEMPLATE_DIR = os.path.join(ROOT_DIR, 'templates')
 # 结果目录
 RESULTS_DIR = os.path.join(ROOT_DIR, 'data', 'results')
 
+# 人员照片目录
+IMAGES_DIR = os.path.join(ROOT_DIR, 'images')
+
+# 照片缩略图/WebP变体缓存目录
+IMAGE_CACHE_DIR = os.path.join(ROOT_DIR, 'data', 'image_cache')
+
+# 图片HTTP缓存时间（秒）
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", "86400"))
+
+# 启动时是否预加载并预热tb_model中登记的模型
+# 只处理CRUD请求的进程保持关闭以缩短冷启动；专用推理进程建议开启
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'false').lower() in ('true', '1', 'yes')
+
+# 跨被试动态批处理：并发请求的epoch合并成一个批次推理
+INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', 'true').lower() in ('true', '1', 'yes')
+# 单个批次最多的epoch数（一个被试108个epoch）
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "432"))
+# 等待凑批的最长时间（毫秒）
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "20"))
+# 批量评估时同时推理的被试数，并发提交的被试才能在批处理器中合并
+BATCH_PREDICT_CONCURRENCY = int(os.getenv("BATCH_PREDICT_CONCURRENCY", "4"))
+
+# 预处理结束时额外保存float32的epochs.npy，推理时以内存映射读取（fif.fif仍作为导出格式保留）
+EPOCH_STORE_NPY = os.getenv('EPOCH_STORE_NPY', 'true').lower() in ('true', '1', 'yes')
+
+# 预处理ICA阶段：skip 跳过；fit 只拟合并缓存，不改变输出；apply 拟合后自动剔除眼电/肌电成分
+PREPROCESS_ICA_MODE = os.getenv('PREPROCESS_ICA_MODE', 'skip').lower()
+# ICA算法：fastica / picard（需安装python-picard，未安装时使用extended infomax）/ infomax
+PREPROCESS_ICA_METHOD = os.getenv('PREPROCESS_ICA_METHOD', 'fastica').lower()
+
+# 降采样+滤波方式：mne 原MNE FFT重采样后FIR滤波（默认）；fused 多相重采样与带通融合（signal_filters），需显式开启
+PREPROCESS_RESAMPLE_METHOD = os.getenv('PREPROCESS_RESAMPLE_METHOD', 'mne').lower()
+# 预处理重采样/滤波使用的并行线程数
+PREPROCESS_N_JOBS = int(os.getenv("PREPROCESS_N_JOBS", "1"))
+
+# 流式预处理（分块读取EDF，内存占用与记录长度无关）：false 从不（默认）；auto 按文件大小决定；true 总是
+PREPROCESS_STREAMING = os.getenv('PREPROCESS_STREAMING', 'false').lower()
+# auto模式下启用流式预处理的EDF文件大小（MB）
+PREPROCESS_STREAMING_MIN_MB = int(os.getenv("PREPROCESS_STREAMING_MIN_MB", "512"))
+# 流式预处理每块数据的时长（秒）
+PREPROCESS_BLOCK_SECONDS = float(os.getenv("PREPROCESS_BLOCK_SECONDS", "60"))
+
+# OpenBCI RAW文本的通道映射（按EXG Channel 0..N顺序，逗号分隔），默认为OpenBCI GUI的16通道10-20布局
+OPENBCI_CHANNEL_NAMES = [name.strip() for name in os.getenv(
+    'OPENBCI_CHANNEL_NAMES', 'Fp1,Fp2,C3,C4,P7,P8,O1,O2,F7,F8,F3,F4,T7,T8,P3,P4'
+).split(',') if name.strip()]
+# 饱和采样比例超过该值的OpenBCI通道标记为坏道
+OPENBCI_RAILED_FRACTION = float(os.getenv("OPENBCI_RAILED_FRACTION", "0.1"))
+
+# 特征提取时将每个被试的特征矩阵写入特征库（tb_feature_store），供跨被试查询
+FEATURE_STORE = os.getenv('FEATURE_STORE', 'true').lower() in ('true', '1', 'yes')
+
+# 慢请求/慢流水线的按需性能剖析（profiler.py），默认关闭
+PROFILING = os.getenv('PROFILING', 'false').lower() in ('true', '1', 'yes')
+# 剖析方式：sampling 定时采样调用栈；cprofile 对同步流水线函数使用cProfile（异步函数和请求始终采样）
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'sampling').lower()
+# 采样间隔（毫秒）
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# 请求耗时超过该值（毫秒）时保存剖析
+PROFILE_REQUEST_THRESHOLD_MS = float(os.getenv("PROFILE_REQUEST_THRESHOLD_MS", "2000"))
+# 预处理、特征提取、推理耗时超过该值（毫秒）时保存剖析
+PROFILE_PIPELINE_THRESHOLD_MS = float(os.getenv("PROFILE_PIPELINE_THRESHOLD_MS", "10000"))
+# 需要剖析的请求路径前缀（逗号分隔）
+PROFILE_REQUEST_PATHS = tuple(path.strip() for path in os.getenv(
+    'PROFILE_REQUEST_PATHS', '/api/health,/api/data'
+).split(',') if path.strip())
+# 同时进行的剖析数上限
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "4"))
+# 最多保留的剖析份数，超出时删除最早的
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# 剖析数据目录
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+
 # 模板文件
 TEMPLATE_FILE = os.path.join(TEMPLATE_DIR, 'template.docx')
 
@@ -42,6 +121,11 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440
 # 安全配置
 BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # bcrypt轮数
 
+# 认证缓存：用户记录与权限集合的缓存时间（秒），0表示不缓存
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+# 最后登录时间批量写入间隔（秒）
+LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", "60"))
+
 # 确保必要的目录存在
 def ensure_directories():
     """确保所有必要的目录都存在"""
@@ -50,7 +134,8 @@ def ensure_directories():
         DATA_DIR,
         MODEL_DIR,
         TEMPLATE_DIR,
-        RESULTS_DIR
+        RESULTS_DIR,
+        IMAGE_CACHE_DIR
     ]
     
     for directory in directories:
@@ -0,0 +1,237 @@
+"""
+内容寻址数据存储
+
+上传的ZIP按MD5解压到 CONTENT_STORE_DIR/<md5前两位>/<md5>/content 下，只保存一份；
+每次上传的数据目录 DATA_DIR/<personnel_id>/<md5> 是指向它的符号链接（不支持符号链接时用硬链接逐个文件链接），
+同一人员多次上传不同内容时各自一个目录，互不覆盖。
+每个对象在refs.json中记录引用它的数据目录，最后一个引用释放后删除对象。
+预处理、特征、推理等产物缓存在对象的artifacts目录下，相同内容再次上传时直接复用。
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import traceback
+import uuid
+import zipfile
+from datetime import datetime
+
+from config import CONTENT_STORE_DIR
+
+# 引用计数与对象创建/删除使用同一把锁
+_store_lock = threading.RLock()
+
+def object_dir(md5_value):
+    return os.path.join(CONTENT_STORE_DIR, md5_value[:2], md5_value)
+
+def content_dir(md5_value):
+    """解压后的数据目录"""
+    return os.path.join(object_dir(md5_value), 'content')
+
+def artifacts_dir(md5_value):
+    """按内容缓存的计算产物目录"""
+    return os.path.join(object_dir(md5_value), 'artifacts')
+
+def has_object(md5_value):
+    return os.path.isdir(content_dir(md5_value))
+
+def _refs_path(md5_value):
+    return os.path.join(object_dir(md5_value), 'refs.json')
+
+def _read_refs(md5_value):
+    try:
+        with open(_refs_path(md5_value), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _write_refs(md5_value, refs):
+    tmp_path = _refs_path(md5_value) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sorted(set(refs)), f, ensure_ascii=False)
+    os.replace(tmp_path, _refs_path(md5_value))
+
+def ingest_zip(zip_path, md5_value):
+    """
+    将ZIP解压到内容存储，相同MD5已存在时跳过解压
+    Returns:
+        tuple: (内容目录, 是否为已存在的内容)
+    """
+    target = content_dir(md5_value)
+    with _store_lock:
+        if os.path.isdir(target):
+            logging.info(f"内容已存在，跳过解压: {md5_value}")
+            return target, True
+
+    # 先解压到临时目录再原子改名，避免并发上传看到半成品
+    os.makedirs(object_dir(md5_value), exist_ok=True)
+    tmp_dir = os.path.join(object_dir(md5_value), f'.extract-{uuid.uuid4().hex}')
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(tmp_dir)
+        if not os.listdir(tmp_dir):
+            raise ValueError("ZIP文件中没有有效内容")
+        with _store_lock:
+            if os.path.isdir(target):
+                return target, True
+            os.replace(tmp_dir, target)
+            os.makedirs(artifacts_dir(md5_value), exist_ok=True)
+        logging.info(f"内容已解压到存储: {target}")
+        return target, False
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def upload_data_dir(personnel_dir, md5_value):
+    """一次上传的数据目录：人员目录下按内容MD5区分"""
+    return os.path.join(personnel_dir, md5_value)
+
+def _link_tree(source, dest):
+    """不支持目录符号链接时，逐个文件创建硬链接，硬链接失败则复制"""
+    for root, dirs, files in os.walk(source):
+        rel = os.path.relpath(root, source)
+        target_root = dest if rel == '.' else os.path.join(dest, rel)
+        os.makedirs(target_root, exist_ok=True)
+        for file in files:
+            src = os.path.join(root, file)
+            dst = os.path.join(target_root, file)
+            if os.path.exists(dst):
+                os.remove(dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+def link_data_dir(md5_value, data_dir):
+    """
+    让数据目录指向内容存储中的数据并增加引用
+    已存在的普通目录（旧版本上传的数据）保持原来的复制方式，不纳入引用计数
+    已链接到其他内容的目录不会被替换，其他数据记录可能仍在使用它
+    Returns:
+        str: 数据目录
+    """
+    source = content_dir(md5_value)
+    with _store_lock:
+        if os.path.islink(data_dir) or _is_linked_copy(data_dir):
+            old_md5 = resolve_md5(data_dir)
+            if old_md5 != md5_value:
+                raise FileExistsError(f"数据目录已链接到其他内容: {data_dir} ({old_md5})")
+            add_ref(md5_value, data_dir)
+            return data_dir
+        elif os.path.isdir(data_dir):
+            for item in os.listdir(source):
+                src = os.path.join(source, item)
+                dst = os.path.join(data_dir, item)
+                if os.path.isdir(src):
+                    if os.path.exists(dst):
+                        shutil.rmtree(dst)
+                    shutil.copytree(src, dst)
+                else:
+                    shutil.copy2(src, dst)
+            return data_dir
+
+        os.makedirs(os.path.dirname(data_dir), exist_ok=True)
+        if not os.path.exists(data_dir):
+            try:
+                os.symlink(source, data_dir, target_is_directory=True)
+            except OSError:
+                _link_tree(source, data_dir)
+                _mark_linked_copy(data_dir, md5_value)
+        add_ref(md5_value, data_dir)
+    return data_dir
+
+def _is_linked_copy(data_dir):
+    return os.path.exists(os.path.join(data_dir, '.content_md5'))
+
+def _mark_linked_copy(data_dir, md5_value):
+    with open(os.path.join(data_dir, '.content_md5'), 'w', encoding='utf-8') as f:
+        f.write(md5_value)
+
+def resolve_md5(data_dir):
+    """返回人员目录对应的内容MD5，不是内容存储链接时返回None"""
+    if os.path.islink(data_dir):
+        target = os.path.realpath(data_dir)
+        if os.path.basename(target) == 'content':
+            return os.path.basename(os.path.dirname(target))
+        return None
+    marker = os.path.join(data_dir, '.content_md5')
+    if os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    return None
+
+def add_ref(md5_value, data_dir):
+    with _store_lock:
+        refs = _read_refs(md5_value)
+        if data_dir not in refs:
+            refs.append(data_dir)
+            _write_refs(md5_value, refs)
+        return len(refs)
+
+def release_ref(md5_value, data_dir):
+    """释放引用，引用数为0时删除内容与产物"""
+    with _store_lock:
+        refs = [ref for ref in _read_refs(md5_value) if ref != data_dir]
+        if refs:
+            _write_refs(md5_value, refs)
+            return len(refs)
+        shutil.rmtree(object_dir(md5_value), ignore_errors=True)
+        logging.info(f"内容已无引用，删除存储对象: {md5_value}")
+        return 0
+
+def remove_data_dir(data_dir):
+    """删除人员目录：链接只解除链接并释放引用，普通目录直接删除"""
+    with _store_lock:
+        md5_value = resolve_md5(data_dir)
+        if os.path.islink(data_dir):
+            os.unlink(data_dir)
+        elif os.path.isdir(data_dir):
+            shutil.rmtree(data_dir)
+        if md5_value:
+            release_ref(md5_value, data_dir)
+
+def reference_count(md5_value):
+    return len(_read_refs(md5_value))
+
+def artifact_path(md5_value, name):
+    """产物文件路径"""
+    os.makedirs(artifacts_dir(md5_value), exist_ok=True)
+    return os.path.join(artifacts_dir(md5_value), name)
+
+def load_artifact_json(md5_value, name):
+    """读取JSON产物，不存在时返回None"""
+    if not md5_value:
+        return None
+    path = os.path.join(artifacts_dir(md5_value), name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"读取产物缓存失败: {path}, {str(e)}")
+        logging.error(traceback.format_exc())
+        return None
+
+def save_artifact_json(md5_value, name, obj):
+    """写入JSON产物"""
+    if not md5_value or not os.path.isdir(object_dir(md5_value)):
+        return
+    path = artifact_path(md5_value, name)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def mark_stage_done(md5_value, stage, **info):
+    """记录某个计算阶段已完成（preprocess/features/inference）"""
+    with _store_lock:
+        stages = load_artifact_json(md5_value, 'stages.json') or {}
+        stages[stage] = dict(info, completed_at=datetime.now().isoformat())
+        save_artifact_json(md5_value, 'stages.json', stages)
+
+def is_stage_done(md5_value, stage):
+    stages = load_artifact_json(md5_value, 'stages.json') or {}
+    return stage in stages
@@ -13,6 +13,11 @@ import matplotlib.font_manager as fm
 import urllib.request
 import shutil
 
+import feature_store
+import metrics
+import preprocess_cache
+import profiler
+
 # 设置绘图风格
 sns.set_style("whitegrid")      # 设置seaborn绘图的背景样式
 
@@ -71,12 +76,48 @@ def setup_chinese_font():
     
     return font_prop
 
-# 初始化中文字体
-chinese_font = setup_chinese_font()
+# 中文字体在首次绘图时才初始化，避免导入本模块时扫描整个matplotlib字体库
+_chinese_font = None
+
+def get_chinese_font():
+    """获取中文字体，首次调用时初始化"""
+    global _chinese_font
+    if _chinese_font is None:
+        _chinese_font = setup_chinese_font()
+    return _chinese_font
 
 # 全局变量
 folder_path = ''
 
+# Theta/Alpha/Beta/Gamma 频段范围（Hz）
+BAND_RANGES = {
+    "Theta": (4, 8),
+    "Alpha": (8, 13),
+    "Beta": (13, 30),
+    "Gamma": (30, 40),
+}
+
+# analyze_eeg_data 生成的可视化图片
+REQUIRED_IMAGES = [
+    'time_过零率.png', 'time_方差.png', 'time_能量.png', 'time_差分.png',
+    'frequency_band_1.png', 'frequency_band_2.png', 'frequency_band_3.png',
+    'frequency_band_4.png', 'frequency_band_5.png',
+    'frequency_wavelet.png', 'differential_entropy.png',
+    'Theta.png', 'Alpha.png', 'Beta.png', 'Gamma.png'
+]
+
+# 特征提取参数，参与缓存指纹计算；修改特征或绘图逻辑时需要递增version
+FEATURE_PARAMS = {
+    'version': 1,
+    'bands': BAND_RANGES,
+    'welch_seconds': 2,
+    'equal_bands': 5,
+    'wavelet': 'db4',
+    'wavelet_level': 4,
+    'ar_lags': 4,
+    'images': REQUIRED_IMAGES,
+}
+
 # 功能函数定义区
 def zero_crossing_rate(signal):
     """计算信号的过零率。"""
@@ -98,12 +139,7 @@ def extract_band_power(frequencies, psd, band_range):
 def extract_theta_alpha_beta_gamma_powers(channel_data, sfreq):
     """提取Theta, Alpha, Beta 和 Gamma波段的功率。"""
     f, Pxx = compute_power_spectral_density(channel_data, sfreq)
-    return {
-        "Theta": extract_band_power(f, Pxx, (4, 8)),
-        "Alpha": extract_band_power(f, Pxx, (8, 13)),
-        "Beta": extract_band_power(f, Pxx, (13, 30)),
-        "Gamma": extract_band_power(f, Pxx, (30, 40))
-    }
+    return {band: extract_band_power(f, Pxx, band_range) for band, band_range in BAND_RANGES.items()}
 
 def compute_power_spectral_density(signal, sfreq):
     """计算信号的功率谱密度。"""
@@ -228,9 +264,9 @@ def plot_time_domain_features(features):
     for title in titles:
         plt.figure(figsize=(15, 5))
         plt.bar(channel_indices, [feature[title] for feature in features])
-        plt.title(title, fontproperties=chinese_font)
-        plt.xlabel('通道', fontproperties=chinese_font)
-        plt.ylabel(f'{title}值', fontproperties=chinese_font)
+        plt.title(title, fontproperties=get_chinese_font())
+        plt.xlabel('通道', fontproperties=get_chinese_font())
+        plt.ylabel(f'{title}值', fontproperties=get_chinese_font())
         save_plot(plt.gcf(), f'time_{title}.png')
         plt.close()
 
@@ -241,9 +277,9 @@ def plot_frequency_domain_features(features):
         plt.figure(figsize=(15, 5))
         avg_powers = [feature["均分频带"][idx] for feature in features]
         plt.bar(channel_indices, avg_powers)
-        plt.title(f'均分频带: {band_name}', fontproperties=chinese_font)
-        plt.xlabel('通道', fontproperties=chinese_font)
-        plt.ylabel('功率', fontproperties=chinese_font)
+        plt.title(f'均分频带: {band_name}', fontproperties=get_chinese_font())
+        plt.xlabel('通道', fontproperties=get_chinese_font())
+        plt.ylabel('功率', fontproperties=get_chinese_font())
         save_plot(plt.gcf(), f'frequency_band_{idx+1}.png')
         plt.close()
 
@@ -254,9 +290,9 @@ def plot_time_frequency_features(features):
         plt.subplot(2, 2, idx+1)
         energies = [feature[idx] for feature in features]
         plt.bar(channel_indices, energies)
-        plt.title(f'小波变换能量: Level {idx+1}', fontproperties=chinese_font)
-        plt.xlabel('通道', fontproperties=chinese_font)
-        plt.ylabel('能量', fontproperties=chinese_font)
+        plt.title(f'小波变换能量: Level {idx+1}', fontproperties=get_chinese_font())
+        plt.xlabel('通道', fontproperties=get_chinese_font())
+        plt.ylabel('能量', fontproperties=get_chinese_font())
     plt.tight_layout()
     save_plot(plt.gcf(), 'frequency_wavelet.png')
     plt.close()
@@ -266,9 +302,9 @@ def plot_differential_entropy(features):
     plt.figure(figsize=(15, 5))
     de_values = [feature["5频带微分熵"] for feature in features]
     plt.bar(channel_indices, de_values)
-    plt.title('微分熵', fontproperties=chinese_font)
-    plt.xlabel('通道', fontproperties=chinese_font)
-    plt.ylabel('微分熵值', fontproperties=chinese_font)
+    plt.title('微分熵', fontproperties=get_chinese_font())
+    plt.xlabel('通道', fontproperties=get_chinese_font())
+    plt.ylabel('微分熵值', fontproperties=get_chinese_font())
     save_plot(plt.gcf(), 'differential_entropy.png')
     plt.close()
 
@@ -278,9 +314,9 @@ def plot_theta_alpha_beta_gamma_powers(band_powers):
         plt.figure(figsize=(15, 5))
         powers = [channel[band] for channel in band_powers]
         plt.bar(range(len(powers)), powers)
-        plt.title(f'{band} 功率', fontproperties=chinese_font)
-        plt.xlabel('通道', fontproperties=chinese_font)
-        plt.ylabel('功率', fontproperties=chinese_font)
+        plt.title(f'{band} 功率', fontproperties=get_chinese_font())
+        plt.xlabel('通道', fontproperties=get_chinese_font())
+        plt.ylabel('功率', fontproperties=get_chinese_font())
         save_plot(plt.gcf(), f'{band}.png')
         plt.close()
 
@@ -362,6 +398,7 @@ def create_feature_dataframe(time_domain_features, frequency_domain_features, ti
     df.index.name = 'Channel'
     return df, feature_names
 
+@profiler.profiled('features')
 def analyze_eeg_data(file_path):
     """
     分析EEG数据并提取特征
@@ -370,9 +407,9 @@ def analyze_eeg_data(file_path):
     file_path: EEG数据文件路径
     
     功能：
-    - 检查是否已存在fif文件和可视化图片，如果都存在则直接返回True
-    - 如果只有fif文件但没有图片，则只生成可视化图像
-    - 如果都不存在，则进行特征提取和可视化
+    - 按输入文件MD5和FEATURE_PARAMS查询产物缓存，命中且图片等产物未被修改时直接返回，不读取脑电数据
+    - 否则进行特征提取和可视化，并将产物记录到缓存清单
+    - 特征矩阵同时写入特征库（feature_store），产物缓存命中但特征库中没有记录时重新提取一次
     
     返回：
     bool: 处理是否成功
@@ -383,26 +420,12 @@ def analyze_eeg_data(file_path):
         global folder_path
         folder_path = data_dir
 
-        # 检查是否已存在可视化图片
-        required_images = [
-            'time_过零率.png', 'time_方差.png', 'time_能量.png', 'time_差分.png',
-            'frequency_band_1.png', 'frequency_band_2.png', 'frequency_band_3.png',
-            'frequency_band_4.png', 'frequency_band_5.png',
-            'frequency_wavelet.png', 'differential_entropy.png',
-            'Theta.png', 'Alpha.png', 'Beta.png', 'Gamma.png'
-        ]
-        
-        # 先检查当前目录
-        all_images_exist = all(os.path.exists(os.path.join(data_dir, img)) for img in required_images)
-        
-        # 如果当前目录没有图片，检查子目录
-        if not all_images_exist:
+        # 图片已生成在子目录中时继续使用该子目录
+        if not all(os.path.exists(os.path.join(data_dir, img)) for img in REQUIRED_IMAGES):
             for item in os.listdir(data_dir):
                 item_path = os.path.join(data_dir, item)
-                if os.path.isdir(item_path):
-                    sub_images_exist = all(os.path.exists(os.path.join(item_path, img)) for img in required_images)
-                    if sub_images_exist:
-                        all_images_exist = True
+                if os.path.isdir(item_path) and not item.startswith('.'):
+                    if all(os.path.exists(os.path.join(item_path, img)) for img in REQUIRED_IMAGES):
                         # 更新folder_path为子目录
                         folder_path = item_path
                         break
@@ -416,15 +439,25 @@ def analyze_eeg_data(file_path):
             fif_files = [f for f in os.listdir(data_dir) if f.endswith('.fif')]
             if fif_files:
                 fif_file_path = os.path.join(data_dir, fif_files[0])
-        
-        # 如果是fif文件且所有图片都存在，直接返回
-        if fif_file_path and all_images_exist:
-            logging.info(f"File {fif_file_path} is already processed with visualizations")
-            return True
 
-        # 加载和预处理数据
         # 如果有fif文件，使用fif文件，否则使用传入的文件路径
         actual_file_path = fif_file_path if fif_file_path else file_path
+        csv_path = os.path.join(folder_path, 'eeg_features.csv')
+        feature_names_path = os.path.join(folder_path, 'feature_names.txt')
+
+        # 输入和参数都未变化时直接使用已有产物
+        cache_key = preprocess_cache.stage_key(data_dir, actual_file_path, FEATURE_PARAMS)
+        if (preprocess_cache.lookup(data_dir, 'features', cache_key)
+                and feature_store.has_features(data_dir, FEATURE_PARAMS['version'])):
+            logging.info(f"File {actual_file_path} is already processed with visualizations")
+            if not actual_file_path.endswith('.fif'):
+                feature_df = pd.read_csv(csv_path, index_col='Channel')
+                with open(feature_names_path, 'r') as f:
+                    feature_names = [line.strip() for line in f if line.strip()]
+                return feature_df, feature_names
+            return True
+
+        # 加载和预处理数据
         data1, eeg_data = load_preprocess_data(actual_file_path)
 
         # 如果数据是3D的（epochs数据），取平均值转换为2D
@@ -432,47 +465,53 @@ def analyze_eeg_data(file_path):
             eeg_data = np.mean(eeg_data, axis=0)
 
         # 提取特征
-        time_domain_features = [extract_time_domain_features(channel) for channel in eeg_data]
-        
-        # 获取采样频率
-        if isinstance(data1, mne.io.Raw):
-            sfreq = data1.info['sfreq']
-        else:  # Epochs或Evoked对象
+        with metrics.stage_timer('features'):
+            time_domain_features = [extract_time_domain_features(channel) for channel in eeg_data]
+
+            # 获取采样频率
             sfreq = data1.info['sfreq']
-            
-        frequency_domain_features = [extract_frequency_domain_features(channel, sfreq) for channel in eeg_data]
-        time_frequency_features = [extract_time_frequency_features(channel) for channel in eeg_data]
-        theta_alpha_beta_gamma_powers = [extract_theta_alpha_beta_gamma_powers(channel, sfreq) for channel in eeg_data]
+
+            frequency_domain_features = [extract_frequency_domain_features(channel, sfreq) for channel in eeg_data]
+            time_frequency_features = [extract_time_frequency_features(channel) for channel in eeg_data]
+            theta_alpha_beta_gamma_powers = [extract_theta_alpha_beta_gamma_powers(channel, sfreq) for channel in eeg_data]
+
+        outputs = []
+
+        # 创建特征DataFrame并写入特征库
+        feature_df, feature_names = create_feature_dataframe(
+            time_domain_features, 
+            frequency_domain_features, 
+            time_frequency_features, 
+            theta_alpha_beta_gamma_powers
+        )
+        channel_names = data1.ch_names
+        if len(channel_names) != len(eeg_data):
+            channel_names = [channel_names[i] for i in mne.pick_types(data1.info, eeg=True)]
+        feature_store.save_features(data_dir, actual_file_path, FEATURE_PARAMS['version'], channel_names, feature_df)
 
         # 如果不是fif文件，则保存特征到CSV
         if not actual_file_path.endswith('.fif'):
-            # 创建特征DataFrame
-            feature_df, feature_names = create_feature_dataframe(
-                time_domain_features, 
-                frequency_domain_features, 
-                time_frequency_features, 
-                theta_alpha_beta_gamma_powers
-            )
-
             # 保存DataFrame到CSV文件
-            csv_path = os.path.join(folder_path, 'eeg_features.csv')
             feature_df.to_csv(csv_path)
             logging.info(f"特征已保存到: {csv_path}")
 
             # 保存特征名称到文本文件
-            feature_names_path = os.path.join(folder_path, 'feature_names.txt')
             with open(feature_names_path, 'w') as f:
                 for name in feature_names:
                     f.write(f"{name}\n")
             logging.info(f"特征名称已保存到: {feature_names_path}")
+            outputs.extend([csv_path, feature_names_path])
 
-        # 如果图片不完整，则生成可视化图像
-        if not all_images_exist:
+        # 生成可视化图像
+        with metrics.stage_timer('plots'):
             plot_time_domain_features(time_domain_features)
             plot_frequency_domain_features(frequency_domain_features)
             plot_time_frequency_features(time_frequency_features)
             plot_differential_entropy(frequency_domain_features)
             plot_theta_alpha_beta_gamma_powers(theta_alpha_beta_gamma_powers)
+        outputs.extend(os.path.join(folder_path, img) for img in REQUIRED_IMAGES)
+
+        preprocess_cache.record(data_dir, 'features', cache_key, actual_file_path, FEATURE_PARAMS, outputs)
         
         if not actual_file_path.endswith('.fif'):
             return feature_df, feature_names
@@ -534,21 +573,21 @@ def plot_serum_data(data_path):
                 labels.append(f"{custom_labels[label_index]}_{i//len(custom_labels)+1}")
             else:
                 labels.append(custom_labels[label_index])
-        plt.xticks(range(len(values)), labels, rotation=45, ha='right', fontproperties=chinese_font)
-        plt.title('血清指标分析', fontproperties=chinese_font)
-        plt.xlabel('指标名称', fontproperties=chinese_font)
-        plt.ylabel('指标值', fontproperties=chinese_font)
+        plt.xticks(range(len(values)), labels, rotation=45, ha='right', fontproperties=get_chinese_font())
+        plt.title('血清指标分析', fontproperties=get_chinese_font())
+        plt.xlabel('指标名称', fontproperties=get_chinese_font())
+        plt.ylabel('指标值', fontproperties=get_chinese_font())
         
         # 在柱子上添加数值标签
         for bar, val, orig_val in zip(bars, values, df.iloc[0].values):
             if isinstance(orig_val, str) and '<' in orig_val:
                 # 对于小于某值的情况，显示原始字符串
                 plt.text(bar.get_x() + bar.get_width()/2, bar.get_height(),
-                        orig_val, ha='center', va='bottom', fontproperties=chinese_font)
+                        orig_val, ha='center', va='bottom', fontproperties=get_chinese_font())
             else:
                 # 对于普通数值，显示数值
                 plt.text(bar.get_x() + bar.get_width()/2, bar.get_height(),
-                        f'{val:.1f}', ha='center', va='bottom', fontproperties=chinese_font)
+                        f'{val:.1f}', ha='center', va='bottom', fontproperties=get_chinese_font())
         
         plt.tight_layout()
         
@@ -594,10 +633,10 @@ def plot_scale_data(data_path):
         plt.axvline(x=19.5, color='r', linestyle='--', alpha=0.3)
         
         # 设置标题和标签
-        plt.title('量表得分分析', fontproperties=chinese_font)
-        plt.xlabel('题目序号', fontproperties=chinese_font)
-        plt.ylabel('得分', fontproperties=chinese_font)
-        plt.legend(prop=chinese_font)
+        plt.title('量表得分分析', fontproperties=get_chinese_font())
+        plt.xlabel('题目序号', fontproperties=get_chinese_font())
+        plt.ylabel('得分', fontproperties=get_chinese_font())
+        plt.legend(prop=get_chinese_font())
         
         # 设置x轴刻度
         plt.xticks(x, [str(i+1) for i in x], rotation=45)
@@ -610,7 +649,7 @@ def plot_scale_data(data_path):
             for bar in bars:
                 height = bar.get_height()
                 plt.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{height:.0f}', ha='center', va='bottom', fontproperties=chinese_font)
+                        f'{height:.0f}', ha='center', va='bottom', fontproperties=get_chinese_font())
         
         # 添加网格线
         plt.grid(True, axis='y', linestyle='--', alpha=0.3)
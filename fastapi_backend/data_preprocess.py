@@ -10,8 +10,247 @@ import numpy as np
 import scipy.io as sio
 import traceback
 import logging
+import time
+import importlib.util
+from contextlib import contextmanager
 
+import epoch_store
+import metrics
+import openbci_reader
+import profiler
+import preprocess_cache
+import preprocess_stream
+import signal_filters
+from config import (
+    EPOCH_STORE_NPY, PREPROCESS_ICA_MODE, PREPROCESS_ICA_METHOD,
+    PREPROCESS_RESAMPLE_METHOD, PREPROCESS_N_JOBS,
+    PREPROCESS_STREAMING, PREPROCESS_STREAMING_MIN_MB, PREPROCESS_BLOCK_SECONDS,
+)
 
+# 预处理结果文件名
+OUTPUT_NAME = 'fif.fif'
+
+# 要保留的59个通道
+CHANNELS_TO_KEEP = ['Fpz', 'Fp1', 'Fp2', 'AF3', 'AF4', 'AF7', 'AF8', 'Fz', 'F1', 'F2', 
+                    'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'FCz', 'FC1', 'FC2', 'FC3', 'FC4', 
+                    'FC5', 'FC6', 'FT7', 'FT8', 'Cz', 'C1', 'C2', 'C3', 'C4', 'C5', 'C6', 
+                    'T7', 'T8', 'CP1', 'CP2', 'CP3', 'CP4', 'CP5', 'CP6', 'TP7', 'TP8', 
+                    'Pz', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8', 'POz', 'PO3', 'PO4', 'PO5', 
+                    'PO6', 'PO7', 'PO8', 'Oz', 'O1', 'O2']
+
+# 眼电成分检测使用的前额通道（数据中没有独立的EOG通道）
+EOG_PROXY_CHANNELS = ['Fp1', 'Fp2', 'Fpz']
+
+ICA_MODES = ('skip', 'fit', 'apply')
+
+
+def build_ica_params(mode=PREPROCESS_ICA_MODE, method=PREPROCESS_ICA_METHOD):
+    """
+    ICA阶段参数
+    n_components=20 即先用PCA把59个通道降到20维再做ICA；跳过时其余参数不参与缓存指纹
+    """
+    if mode not in ICA_MODES:
+        logging.warning(f"未知的ICA模式: {mode}，使用skip")
+        mode = 'skip'
+    if mode == 'skip':
+        return {'mode': 'skip'}
+    params = {'mode': mode, 'n_components': 20, 'method': method, 'max_iter': 200, 'random_state': 42, 'decim': 3}
+    if method == 'picard':
+        if importlib.util.find_spec('picard') is None:
+            logging.warning("未安装python-picard，ICA改用extended infomax")
+            params['method'] = 'infomax'
+            params['fit_params'] = {'extended': True}
+        else:
+            # ortho=False + extended=True 与extended infomax等价，收敛更快
+            params['fit_params'] = {'ortho': False, 'extended': True}
+    elif method == 'infomax':
+        params['fit_params'] = {'extended': True}
+    if mode == 'apply':
+        params['eog_threshold'] = 3.0
+        params['muscle_threshold'] = 0.5
+    return params
+
+
+# 预处理流水线参数，参与缓存指纹计算，任何一项变化都会使已缓存的预处理结果失效
+# 修改处理逻辑但参数不变时需要递增version
+PIPELINE_PARAMS = {
+    'version': 1,
+    'channels': CHANNELS_TO_KEEP,
+    'montage': 'standard_1005',
+    'epoch_duration': 1,
+    'target_sfreq': 500,
+    'l_freq': 1,
+    'h_freq': 100,
+    'resample_method': PREPROCESS_RESAMPLE_METHOD,
+    'ica': build_ica_params(),
+    'reference': 'average',
+    'tmin': -1.0,
+    'reject_eeg': 100e-6,
+    'reject_growth': 10,
+    'max_attempts': 5,
+    'n_epochs': 108,
+}
+
+
+def find_raw_file(data_dir):
+    """
+    按优先级查找原始脑电数据文件（.edf优先，其次.set，最后OpenBCI RAW文本），当前目录没有时搜索一级子目录
+    Returns:
+        str: 文件路径，未找到时返回None
+    """
+    edf_files = []
+    set_files = []
+    openbci_files = []
+    
+    # 先在当前目录查找
+    for f in os.listdir(data_dir):
+        if f.endswith('.edf'):
+            edf_files.append(f)
+        elif f.endswith('.set'):
+            set_files.append(f)
+        elif openbci_reader.is_openbci_file(f):
+            openbci_files.append(f)
+    
+    # 如果当前目录没有找到，搜索子目录（跳过缓存等隐藏目录）
+    if not edf_files and not set_files and not openbci_files:
+        for item in os.listdir(data_dir):
+            item_path = os.path.join(data_dir, item)
+            if os.path.isdir(item_path) and not item.startswith('.'):
+                try:
+                    for f in os.listdir(item_path):
+                        if f.endswith('.edf'):
+                            edf_files.append(os.path.join(item, f))
+                        elif f.endswith('.set'):
+                            set_files.append(os.path.join(item, f))
+                        elif openbci_reader.is_openbci_file(f):
+                            openbci_files.append(os.path.join(item, f))
+                except PermissionError:
+                    continue
+
+    if edf_files:
+        return os.path.join(data_dir, edf_files[0])
+    if set_files:
+        return os.path.join(data_dir, set_files[0])
+    if openbci_files:
+        return os.path.join(data_dir, sorted(openbci_files)[-1])
+    return None
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """记录一个预处理阶段的耗时（秒）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 3)
+
+
+def resample_filter(raw, target_sfreq, l_freq, h_freq, n_jobs=PREPROCESS_N_JOBS):
+    """
+    降采样并带通滤波，返回新的Raw对象，不修改原对象
+    mne模式（默认）保持原来的FFT重采样 + FIR滤波；
+    fused模式使用多相重采样（同时完成低通）+ SOS高通，按通道分块处理
+    """
+    if PIPELINE_PARAMS['resample_method'] != 'fused':
+        raw_resampled = raw.copy().resample(sfreq=target_sfreq, n_jobs=n_jobs)
+        return raw_resampled.filter(l_freq=l_freq, h_freq=h_freq, n_jobs=n_jobs)
+
+    sfreq = raw.info['sfreq']
+    data = signal_filters.resample_bandpass(raw.get_data(), sfreq, target_sfreq, l_freq, h_freq, n_jobs=n_jobs)
+    info = preprocess_stream.resampled_info(raw.info, target_sfreq)
+    first_samp = int(round(raw.first_samp * target_sfreq / sfreq))
+    raw_filtered = mne.io.RawArray(data, info, first_samp=first_samp, verbose=False)
+    raw_filtered.set_annotations(raw.annotations)
+    return raw_filtered
+
+
+def use_streaming(raw_path):
+    """
+    是否对该文件使用流式预处理
+    只支持EDF；ICA需要整段数据，降采样需使用fused方式。auto模式下不满足时使用整段处理，
+    显式设置为true时视为配置错误
+
+    Raises:
+        ValueError: PREPROCESS_STREAMING=true，但ICA不是skip或降采样方式不是fused
+    """
+    if PREPROCESS_STREAMING not in ('auto', 'true') or not raw_path.endswith('.edf'):
+        return False
+    if PIPELINE_PARAMS['ica']['mode'] != 'skip' or PIPELINE_PARAMS['resample_method'] != 'fused':
+        if PREPROCESS_STREAMING == 'true':
+            raise ValueError(
+                "PREPROCESS_STREAMING=true 要求 PREPROCESS_ICA_MODE=skip 且 PREPROCESS_RESAMPLE_METHOD=fused，"
+                f"当前为 {PIPELINE_PARAMS['ica']['mode']} / {PIPELINE_PARAMS['resample_method']}"
+            )
+        return False
+    if PREPROCESS_STREAMING == 'true':
+        return True
+    return os.path.getsize(raw_path) >= PREPROCESS_STREAMING_MIN_MB * 1024 * 1024
+
+
+def ica_cache_key(data_dir, raw_path):
+    """ICA拟合结果的缓存键：原始文件MD5 + ICA之前各阶段及ICA本身的参数"""
+    upstream = {key: PIPELINE_PARAMS[key] for key in (
+        'version', 'channels', 'montage', 'target_sfreq', 'l_freq', 'h_freq', 'resample_method', 'ica'
+    )}
+    return preprocess_cache.stage_key(data_dir, raw_path, upstream)
+
+
+def run_ica(raw, data_dir, raw_path):
+    """
+    ICA阶段：按PIPELINE_PARAMS['ica']跳过、仅拟合或拟合后剔除伪迹成分
+    拟合结果（含剔除的成分）按原始文件缓存，下游参数变化重新处理时不必重新拟合
+
+    Returns:
+        mne.io.Raw: apply模式下为剔除伪迹后的新对象，其他模式返回原对象
+    """
+    ica_params = PIPELINE_PARAMS['ica']
+    if ica_params['mode'] == 'skip':
+        return raw
+
+    cache_key = ica_cache_key(data_dir, raw_path)
+    cached = preprocess_cache.lookup(data_dir, 'ica', cache_key)
+    if cached:
+        ica = mne.preprocessing.read_ica(os.path.join(data_dir, next(iter(cached['outputs']))))
+        print(f"ICA缓存命中: {cache_key}")
+    else:
+        ica = mne.preprocessing.ICA(
+            n_components=min(ica_params['n_components'], len(raw.ch_names)),  # OpenBCI数据通道数可能少于20
+            method=ica_params['method'],
+            fit_params=ica_params.get('fit_params'),
+            max_iter=ica_params['max_iter'],          # 限制迭代次数
+            random_state=ica_params['random_state']   # 固定随机种子
+        )
+        ica.fit(raw, decim=ica_params['decim'])  # 降采样以加速ICA
+
+        if ica_params['mode'] == 'apply':
+            exclude = set()
+            eog_channels = [ch for ch in EOG_PROXY_CHANNELS if ch in raw.ch_names]
+            if eog_channels:
+                try:
+                    eog_indices, _ = ica.find_bads_eog(raw, ch_name=eog_channels, threshold=ica_params['eog_threshold'])
+                    exclude.update(eog_indices)
+                except Exception as e:
+                    logging.warning(f"眼电成分检测失败: {str(e)}")
+            if hasattr(ica, 'find_bads_muscle'):
+                try:
+                    muscle_indices, _ = ica.find_bads_muscle(raw, threshold=ica_params['muscle_threshold'])
+                    exclude.update(muscle_indices)
+                except Exception as e:
+                    logging.warning(f"肌电成分检测失败: {str(e)}")
+            ica.exclude = sorted(int(i) for i in exclude)
+            print(f"自动剔除的ICA成分: {ica.exclude}")
+
+        ica_path = preprocess_cache.keyed_path(data_dir, cache_key, 'recording-ica.fif')
+        ica.save(ica_path, overwrite=True)
+        preprocess_cache.record(data_dir, 'ica', cache_key, raw_path, ica_params, [ica_path], exclude=ica.exclude)
+
+    if ica_params['mode'] == 'apply':
+        return ica.apply(raw.copy())
+    return raw
+
+
+@profiler.profiled('preprocess')
 def treat(data_dir):
     """
     对指定目录中的脑电数据文件进行预处理
@@ -20,7 +259,7 @@ def treat(data_dir):
     data_dir (str): 包含脑电数据文件的目录路径
 
     功能:
-    1. 读取多种格式的脑电数据文件（.fif, .edf, .set/.fdt, .mat）
+    1. 读取多种格式的脑电数据文件（.fif, .edf, .set/.fdt, .mat, OpenBCI-RAW-*.txt）
     2. 删除非EEG通道
     3. 设置电极位置
     4. 创建事件
@@ -32,6 +271,9 @@ def treat(data_dir):
     10. 创建Epochs对象
     11. 保存处理后的数据
     
+    原始文件MD5与PIPELINE_PARAMS相同的结果已缓存时，只查询清单并链接已有的fif.fif，
+    不读取任何脑电数据；参数变化时重新处理。
+    
     优化点：
     1. 使用内存映射加载大文件
     2. 优化ICA计算
@@ -40,66 +282,61 @@ def treat(data_dir):
     5. 使用更高效的数据结构
     """
     try:
-        # 检查是否已有处理好的FIF文件
-        fif_files = [f for f in os.listdir(data_dir) if f.endswith('.fif')]
-        if fif_files:
-            print("发现已预处理的FIF文件，验证数据有效性")
-            fif_path = os.path.join(data_dir, fif_files[0])
-            try:
-                # 尝试读取并验证数据
-                epochs = mne.read_epochs(fif_path, preload=True)
+        output_path = os.path.join(data_dir, OUTPUT_NAME)
+        raw_path = find_raw_file(data_dir)
+
+        if raw_path is None:
+            # 旧数据目录中只有预处理结果、没有原始文件时直接使用已有结果
+            fif_files = [f for f in os.listdir(data_dir) if f.endswith('.fif')]
+            if OUTPUT_NAME in fif_files:
+                print("未找到原始数据文件，使用已有的预处理结果")
+                return True
+            if fif_files:
+                print("未找到原始数据文件，将已有的FIF文件保存为fif.fif")
+                epochs = mne.read_epochs(os.path.join(data_dir, fif_files[0]), preload=True)
                 if epochs.get_data().size == 0:
-                    print("FIF文件数据无效，重新进行预处理")
-                    # 删除无效的FIF文件
-                    os.remove(fif_path)
-                else:
-                    print("FIF文件数据有效，直接进行保存")
-                    save_dir = os.path.join(data_dir, 'fif.fif')
-                    epochs.save(save_dir, overwrite=True)
-                    return True
-            except Exception as e:
-                print(f"FIF文件验证失败: {str(e)}")
-                # 删除无效的FIF文件
-                os.remove(fif_path)
+                    print("FIF文件数据无效")
+                    return False
+                epochs.save(output_path, overwrite=True)
+                return True
+            print("未找到支持的脑电数据文件（.edf, .set/.fdt, .mat, OpenBCI-RAW-*.txt）")
+            return False
+
+        # 流式处理只保留最后n_epochs个epoch，输出与整段处理不同，单独缓存
+        streaming = use_streaming(raw_path)
+        params = dict(PIPELINE_PARAMS, streaming=True) if streaming else PIPELINE_PARAMS
+
+        # 按原始文件MD5和流水线参数查询缓存，命中时不读取任何脑电数据
+        cache_key = preprocess_cache.stage_key(data_dir, raw_path, params)
+        cached = preprocess_cache.lookup(data_dir, 'preprocess', cache_key)
+        if cached:
+            print(f"预处理缓存命中: {cache_key}")
+            for rel_path in cached['outputs']:
+                cached_output = os.path.join(data_dir, rel_path)
+                preprocess_cache.publish(cached_output, os.path.join(data_dir, os.path.basename(rel_path)))
+            return True
 
         print("开始预处理流程...")
-        
-        # 按优先级查找不同格式的脑电数据文件
-        edf_files = []
-        set_files = []
-        
-        # 先在当前目录查找
-        for f in os.listdir(data_dir):
-            if f.endswith('.edf'):
-                edf_files.append(f)
-            elif f.endswith('.set'):
-                set_files.append(f)
-        
-        # 如果当前目录没有找到，搜索子目录
-        if not edf_files and not set_files:
-            for item in os.listdir(data_dir):
-                item_path = os.path.join(data_dir, item)
-                if os.path.isdir(item_path):
-                    try:
-                        for f in os.listdir(item_path):
-                            if f.endswith('.edf'):
-                                edf_files.append(os.path.join(item, f))
-                            elif f.endswith('.set'):
-                                set_files.append(os.path.join(item, f))
-                    except PermissionError:
-                        continue
+        timings = {}
+        load_start = time.perf_counter()
 
         raw = None
         
         # 尝试按优先级读取不同格式的文件
-        if edf_files:
+        if raw_path.endswith('.edf'):
             print("找到EDF文件，开始处理...")
-            edf_path = os.path.join(data_dir, edf_files[0])
-            raw = read_raw_edf(edf_path, preload=True)  # 直接加载到内存
+            edf_path = raw_path
+            raw = read_raw_edf(edf_path, preload=not streaming)  # 流式处理时按块读取，否则直接加载到内存
             print(f"已加载EDF文件: {edf_path}")
-        elif set_files:
+        elif openbci_reader.is_openbci_file(raw_path):
+            print("找到OpenBCI RAW文件，开始处理...")
+            # 首次读取时转换为二进制缓存，饱和通道已标记为坏道，后续插值坏道步骤处理
+            # OpenBCI最多16个通道，只保留其中属于CHANNELS_TO_KEEP的通道，结果只用于特征计算和可视化，不能评分
+            raw = openbci_reader.read_raw_openbci(raw_path)
+            print(f"已加载OpenBCI RAW文件: {raw_path}，饱和通道: {raw.info['bads']}")
+        else:
             print("找到SET/FDT文件，开始处理...")
-            set_path = os.path.join(data_dir, set_files[0])
+            set_path = raw_path
             
             # 尝试不同方式读取SET文件
             try:
@@ -151,29 +388,32 @@ def treat(data_dir):
                             return False
 
         if raw is None:
-            print("未找到支持的脑电数据文件（.edf, .set/.fdt, .mat）")
+            print("未找到支持的脑电数据文件（.edf, .set/.fdt, .mat, OpenBCI-RAW-*.txt）")
             return False
 
+        timings['load'] = round(time.perf_counter() - load_start, 3)
         print("开始进行预处理...")
         
         # 获取采样频率和采样总数
         freq = raw.info['sfreq']
         n_samples = raw.n_times / freq
 
-        # 定义要保留的59个通道
-        channels_to_keep = ['Fpz', 'Fp1', 'Fp2', 'AF3', 'AF4', 'AF7', 'AF8', 'Fz', 'F1', 'F2', 
-                           'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'FCz', 'FC1', 'FC2', 'FC3', 'FC4', 
-                           'FC5', 'FC6', 'FT7', 'FT8', 'Cz', 'C1', 'C2', 'C3', 'C4', 'C5', 'C6', 
-                           'T7', 'T8', 'CP1', 'CP2', 'CP3', 'CP4', 'CP5', 'CP6', 'TP7', 'TP8', 
-                           'Pz', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8', 'POz', 'PO3', 'PO4', 'PO5', 
-                           'PO6', 'PO7', 'PO8', 'Oz', 'O1', 'O2']
-
         # 检查当前数据中的通道
         current_channels = raw.ch_names
         print(f"原始通道 ({len(current_channels)}个): {current_channels}")
 
         # 找出需要删除的通道
-        channels_to_drop = [ch for ch in current_channels if ch not in channels_to_keep]
+        channels_to_drop = [ch for ch in current_channels if ch not in CHANNELS_TO_KEEP]
+
+        if openbci_reader.is_openbci_file(raw_path):
+            # 映射后的通道都不在模型通道中，或保留的通道全部饱和时无法继续处理
+            kept_channels = [ch for ch in current_channels if ch in CHANNELS_TO_KEEP]
+            if not kept_channels:
+                raise ValueError(f"OpenBCI文件的通道 {current_channels} 都不在模型通道中（通道映射见 OPENBCI_CHANNEL_NAMES）")
+            if set(raw.info['bads']) >= set(kept_channels):
+                raise ValueError(f"OpenBCI文件保留的通道均饱和，无法预处理: {kept_channels}")
+            if len(kept_channels) < len(CHANNELS_TO_KEEP):
+                print(f"OpenBCI数据只有{len(kept_channels)}个模型通道，预处理结果只能用于特征计算，不能评分")
         
         # 删除不需要的通道
         if channels_to_drop:
@@ -186,7 +426,7 @@ def treat(data_dir):
 
         # 设置电极位置
         try:
-            montage = mne.channels.make_standard_montage("standard_1005")
+            montage = mne.channels.make_standard_montage(PIPELINE_PARAMS['montage'])
             raw.set_montage(montage, match_case=False)
         except ValueError as e:
             print(f"设置电极位置时出错: {str(e)}")
@@ -204,84 +444,87 @@ def treat(data_dir):
         # 创建事件
         events, event_id = mne.events_from_annotations(raw)
         event_id = 1
-        duration = 1
+        duration = PIPELINE_PARAMS['epoch_duration']
         events = mne.make_fixed_length_events(raw, event_id, start=0, duration=duration, overlap=0)
 
-        # 插值坏道
-        print(raw.info['bads'])
-        raw.interpolate_bads()
+        n_epochs = PIPELINE_PARAMS['n_epochs']
+        if streaming:
+            # 流式模式：分块读取、滤波、重参考并增量切分epoch，内存占用与记录长度无关
+            with stage_timer(timings, 'stream'):
+                epochs, reject_eeg = preprocess_stream.stream_epochs(
+                    raw, events, PIPELINE_PARAMS, block_seconds=PREPROCESS_BLOCK_SECONDS, n_jobs=PREPROCESS_N_JOBS
+                )
+            reject_criteria = dict(eeg=reject_eeg)
+        else:
+            # 插值坏道
+            print(raw.info['bads'])
+            with stage_timer(timings, 'interpolate'):
+                raw.interpolate_bads()
 
-        # 降采样到500Hz
-        target_sfreq = 500
-        raw_resampled = raw.copy().resample(sfreq=target_sfreq)
-        del raw  # 释放原始数据内存
+            # 降采样到500Hz，并滤波到1-100Hz频段
+            target_sfreq = PIPELINE_PARAMS['target_sfreq']
+            with stage_timer(timings, 'resample_filter'):
+                raw_filtered = resample_filter(raw, target_sfreq, PIPELINE_PARAMS['l_freq'], PIPELINE_PARAMS['h_freq'])
+            del raw  # 释放原始数据内存
 
-        # 滤波处理，设置1-100Hz频段
-        raw_filtered = raw_resampled.copy().filter(l_freq=1, h_freq=100)
-        del raw_resampled
+            # 独立成分分析（ICA），由PIPELINE_PARAMS['ica']决定跳过、仅拟合或剔除伪迹
+            with stage_timer(timings, 'ica'):
+                raw_filtered = run_ica(raw_filtered, data_dir, raw_path)
 
-        # 独立成分分析（ICA）- 优化ICA计算
-        raw_ica = raw_filtered.copy()
-        ica = mne.preprocessing.ICA(
-            n_components=20,
-            method='fastica',  # 使用更快的FastICA算法
-            max_iter=200,      # 限制迭代次数
-            random_state=42    # 固定随机种子
-        )
-        ica.fit(raw_ica, decim=3)  # 降采样以加速ICA
-        del raw_ica
-
-        # 基于平均通道重新参考
-        raw_ref = raw_filtered.copy()
-        raw_ref.set_eeg_reference(ref_channels="average", projection=False)
-        del raw_filtered
-
-        # 创建Epochs对象
-        t_min = -1.0
-        t_max = 1.0 - 1 / target_sfreq
-        reject_criteria = dict(eeg=100e-6)  # 初始阈值
-        max_attempts = 5  # 最大尝试次数，防止无限循环
-        attempt = 0
-
-        while attempt < max_attempts:
-            try:
-                print(f"尝试创建Epochs，当前reject_criteria: {reject_criteria}")
-                epochs = mne.Epochs(
-                    raw_ref, 
-                    events=events, 
-                    event_id=event_id, 
-                    tmin=t_min, 
-                    tmax=t_max, 
-                    reject=reject_criteria, 
-                    baseline=None, 
-                    preload=True
-                )
-                
-                # 获取epochs数据
-                epochs_data = epochs.get_data()
-                print(f"当前获得的epochs数量: {epochs_data.shape[0]}")
+            # 基于平均通道重新参考
+            with stage_timer(timings, 'reference'):
+                raw_ref = raw_filtered.copy()
+                raw_ref.set_eeg_reference(ref_channels=PIPELINE_PARAMS['reference'], projection=False)
+            del raw_filtered
+
+            # 创建Epochs对象
+            t_min = PIPELINE_PARAMS['tmin']
+            t_max = 1.0 - 1 / target_sfreq
+            reject_criteria = dict(eeg=PIPELINE_PARAMS['reject_eeg'])  # 初始阈值
+            max_attempts = PIPELINE_PARAMS['max_attempts']  # 最大尝试次数，防止无限循环
+            attempt = 0
+            epochs_start = time.perf_counter()
+
+            while attempt < max_attempts:
+                try:
+                    print(f"尝试创建Epochs，当前reject_criteria: {reject_criteria}")
+                    epochs = mne.Epochs(
+                        raw_ref, 
+                        events=events, 
+                        event_id=event_id, 
+                        tmin=t_min, 
+                        tmax=t_max, 
+                        reject=reject_criteria, 
+                        baseline=None, 
+                        preload=True
+                    )
+            
+                    # 获取epochs数据
+                    epochs_data = epochs.get_data()
+                    print(f"当前获得的epochs数量: {epochs_data.shape[0]}")
+            
+                    # 检查epochs数量是否足够
+                    if epochs_data.shape[0] >= n_epochs:
+                        print("获得足够的epochs数量")
+                        break
+                    else:
+                        print(f"epochs数量不足（{epochs_data.shape[0]} < {n_epochs}），增加阈值重试")
+                        # 增加阈值
+                        reject_criteria['eeg'] *= PIPELINE_PARAMS['reject_growth']
+                        attempt += 1
                 
-                # 检查epochs数量是否足够
-                if epochs_data.shape[0] >= 108:
-                    print("获得足够的epochs数量")
-                    break
-                else:
-                    print(f"epochs数量不足（{epochs_data.shape[0]} < 108），增加阈值重试")
-                    # 增加阈值
-                    reject_criteria['eeg'] *= 10
+                    del epochs_data  # 释放内存
+            
+                except Exception as e:
+                    print(f"创建Epochs时出错: {str(e)}")
+                    reject_criteria['eeg'] *= PIPELINE_PARAMS['reject_growth']
                     attempt += 1
-                    
-                del epochs_data  # 释放内存
-                
-            except Exception as e:
-                print(f"创建Epochs时出错: {str(e)}")
-                reject_criteria['eeg'] *= 10
-                attempt += 1
 
-        if attempt >= max_attempts:
-            print("警告：达到最大尝试次数，使用最后一次的结果")
+            if attempt >= max_attempts:
+                print("警告：达到最大尝试次数，使用最后一次的结果")
+            timings['epochs'] = round(time.perf_counter() - epochs_start, 3)
 
-        del raw_ref
+            del raw_ref
 
         # 验证epochs数据的有效性
         epochs_data = epochs.get_data()
@@ -293,14 +536,32 @@ def treat(data_dir):
         if epochs_data.shape[2] == 1001:
             epochs_data = epochs_data[:, :, :-1]
         
-        # 只取最后108个epochs
-        data = epochs_data[-108::, :, :]
+        # 只取最后n_epochs个epochs
+        data = epochs_data[-n_epochs::, :, :]
         logging.info(f"最终数据形状: {data.shape}")
         del epochs_data
 
-        # 保存处理后的数据
-        save_dir = os.path.join(data_dir, 'fif.fif')
-        epochs.save(save_dir, overwrite=True)
+        # 保存处理后的数据：按缓存键保存后链接到数据目录
+        # FIF作为导出格式保留，推理优先读取float32的npy（见epoch_store）
+        with stage_timer(timings, 'save'):
+            cache_output = preprocess_cache.keyed_path(data_dir, cache_key, OUTPUT_NAME)
+            epochs.save(cache_output, overwrite=True)
+            outputs = [cache_output]
+            if EPOCH_STORE_NPY:
+                npy_output = preprocess_cache.keyed_path(data_dir, cache_key, epoch_store.EPOCHS_NAME)
+                epoch_store.save_epochs(npy_output, epochs.get_data(), epochs.info['sfreq'], epochs.ch_names)
+                outputs.extend([npy_output, os.path.join(os.path.dirname(npy_output), epoch_store.EPOCHS_META_NAME)])
+
+        # 各阶段耗时随产物记录在清单中，便于统计每个被试的ICA等阶段开销
+        logging.info(f"预处理阶段耗时(秒) {data_dir}: {timings}")
+        metrics.observe_stages(timings, prefix='preprocess.')
+        metrics.observe_stage('preprocess', time.perf_counter() - load_start)
+        preprocess_cache.record(
+            data_dir, 'preprocess', cache_key, raw_path, params, outputs,
+            n_epochs=int(data.shape[0]), reject_eeg=reject_criteria['eeg'], timings=timings
+        )
+        for path in outputs:
+            preprocess_cache.publish(path, os.path.join(data_dir, os.path.basename(path)))
         return True
         
     except Exception as e:
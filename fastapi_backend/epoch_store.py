@@ -0,0 +1,88 @@
+"""
+紧凑epoch存储
+
+预处理后的epoch除了保存为MNE FIF（float64，作为导出格式）外，再以float32的.npy保存一份：
+形状为 (epoch数, 通道数, 采样点数)，C连续排列，每个epoch在文件中是一段连续的字节。
+推理时用内存映射打开，直接切片最后N个epoch，不解码FIF、不复制整个文件，
+磁盘占用约为FIF的一半，页缓存命中时读取几乎没有开销。
+"""
+
+import json
+import logging
+import os
+import traceback
+import uuid
+
+import numpy as np
+
+EPOCHS_NAME = 'epochs.npy'
+EPOCHS_META_NAME = 'epochs.json'
+FIF_NAME = 'fif.fif'
+
+def epochs_path(data_dir):
+    return os.path.join(data_dir, EPOCHS_NAME)
+
+def has_epochs(data_dir):
+    """
+    数据目录中是否有可用的npy epoch文件
+    fif.fif比npy新时（例如被其他流程重新生成），认为npy已过期
+    """
+    npy_path = epochs_path(data_dir)
+    if not os.path.exists(npy_path):
+        return False
+    fif_path = os.path.join(data_dir, FIF_NAME)
+    if os.path.exists(fif_path) and os.path.getmtime(fif_path) > os.path.getmtime(npy_path):
+        return False
+    return True
+
+def save_epochs(path, data, sfreq=None, ch_names=None):
+    """
+    以float32保存epoch数据，同时在同目录写入epochs.json记录采样率和通道名
+    先写临时文件再原子替换，避免推理读到半个文件
+    """
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npy"
+    np.save(tmp_path, data)
+    os.replace(tmp_path, path)
+
+    meta = {
+        'shape': list(data.shape),
+        'dtype': 'float32',
+        'sfreq': sfreq,
+        'ch_names': list(ch_names) if ch_names is not None else None,
+    }
+    meta_path = os.path.join(os.path.dirname(path), EPOCHS_META_NAME)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return path
+
+def open_epochs(data_dir):
+    """以只读内存映射方式打开epoch文件，返回形状为 (epoch数, 通道数, 采样点数) 的数组"""
+    return np.load(epochs_path(data_dir), mmap_mode='r')
+
+def load_last_epochs(data_dir, num_of_data):
+    """
+    返回最后num_of_data个epoch，形状为 (N, 1, 通道数, 采样点数)
+    结果是内存映射上的只读视图，需要修改时由调用方复制
+    """
+    data = open_epochs(data_dir)[-num_of_data:]
+    N_tr, N_ch, T = data.shape
+    return data.reshape(N_tr, 1, N_ch, T)
+
+def export_from_fif(data_dir, epochs=None):
+    """
+    为只有fif.fif的旧数据补写npy文件，失败时只记录日志
+    Args:
+        epochs: 已读取的mne.Epochs，为None时从fif.fif读取
+    """
+    try:
+        if epochs is None:
+            import mne
+            epochs = mne.read_epochs(os.path.join(data_dir, FIF_NAME), preload=True)
+        save_epochs(epochs_path(data_dir), epochs.get_data(), epochs.info['sfreq'], epochs.ch_names)
+        logging.info(f"已生成npy epoch文件: {epochs_path(data_dir)}")
+        return True
+    except Exception as e:
+        logging.error(f"生成npy epoch文件失败: {data_dir}, {str(e)}")
+        logging.error(traceback.format_exc())
+        return False
@@ -0,0 +1,186 @@
+"""
+特征库（tb_feature_store）
+
+1. analyze_eeg_data 提取特征时调用 save_features，每个被试按内容MD5和特征版本保存一行
+   通道×特征矩阵（PostgreSQL数组列），FIF和非FIF输入都会写入
+2. load_feature_matrix 按数据ID一次查询多个被试，返回按通道、特征对齐的 (被试, 通道, 特征) 数组，
+   队列比较和模型重训练直接读取，不再从原始脑电重新计算
+3. 同一MD5的多个人员目录共用一行；不在内容存储中的旧目录按数据目录匹配
+"""
+
+import logging
+import os
+import traceback
+
+import numpy as np
+
+import content_store
+import models as db_models
+from config import FEATURE_STORE
+from database import SessionLocal
+
+
+def _normalize_dir(data_dir):
+    return os.path.abspath(data_dir)
+
+
+def _row_filter(query, md5_value, data_dir):
+    if md5_value:
+        return query.filter(db_models.FeatureStore.md5 == md5_value)
+    return query.filter(db_models.FeatureStore.data_dir == data_dir)
+
+
+def has_features(data_dir, feature_version):
+    """
+    特征库中是否已有该目录当前版本的特征
+    未启用特征库时返回True；查询失败时返回False，重新提取并写入，特征库恢复后补齐
+    """
+    if not FEATURE_STORE:
+        return True
+    data_dir = _normalize_dir(data_dir)
+    md5_value = content_store.resolve_md5(data_dir)
+    try:
+        with SessionLocal() as db:
+            query = db.query(db_models.FeatureStore.id).filter(
+                db_models.FeatureStore.feature_version == feature_version
+            )
+            return _row_filter(query, md5_value, data_dir).first() is not None
+    except Exception as e:
+        logging.error(f"查询特征库失败: {str(e)}")
+        logging.error(traceback.format_exc())
+        return False
+
+
+def save_features(data_dir, source_file, feature_version, channel_names, feature_df):
+    """
+    保存一个被试的特征矩阵，已存在的同版本记录被替换
+    写入失败只记录日志，不影响特征提取结果
+
+    Args:
+        data_dir: 数据目录
+        source_file: 特征提取的输入文件
+        feature_version: FEATURE_PARAMS['version']
+        channel_names: 与 feature_df 行对应的通道名称
+        feature_df: create_feature_dataframe 生成的DataFrame（行=通道，列=特征）
+    """
+    if not FEATURE_STORE:
+        return
+    data_dir = _normalize_dir(data_dir)
+    md5_value = content_store.resolve_md5(data_dir)
+    values = feature_df.to_numpy(dtype=float)
+    try:
+        with SessionLocal() as db:
+            query = db.query(db_models.FeatureStore).filter(
+                db_models.FeatureStore.feature_version == feature_version
+            )
+            _row_filter(query, md5_value, data_dir).delete(synchronize_session=False)
+            db.add(db_models.FeatureStore(
+                md5=md5_value,
+                data_dir=data_dir,
+                feature_version=feature_version,
+                source_file=source_file,
+                channel_names=[str(name) for name in channel_names],
+                feature_names=[str(name) for name in feature_df.columns],
+                feature_values=values.tolist()
+            ))
+            db.commit()
+        logging.info(f"特征已写入特征库: {data_dir} (MD5: {md5_value}, {values.shape[0]}通道 x {values.shape[1]}特征)")
+    except Exception as e:
+        logging.error(f"写入特征库失败: {str(e)}")
+        logging.error(traceback.format_exc())
+
+
+def _aligned_names(name_lists, requested):
+    """请求的名称，或各被试共有的名称（按第一个被试的顺序）"""
+    if requested:
+        return list(requested)
+    common = set(name_lists[0])
+    for names in name_lists[1:]:
+        common &= set(names)
+    return [name for name in name_lists[0] if name in common]
+
+
+def load_feature_matrix(db, data_ids, features=None, channels=None, feature_version=None):
+    """
+    一次查询多个被试的特征矩阵
+
+    Args:
+        db: 数据库会话
+        data_ids: 数据ID列表
+        features: 需要的特征名称，None表示各被试共有的全部特征
+        channels: 需要的通道名称，None表示各被试共有的全部通道
+        feature_version: 特征版本，None表示每个被试取最新版本
+
+    Returns:
+        dict: data_ids（有特征的数据ID，按请求顺序）、missing（没有特征的数据ID）、
+              feature_names、channel_names、feature_version（每个被试的版本），
+              values 为 (被试, 通道, 特征) 的float数组，被试缺少的通道/特征为NaN
+    """
+    data_rows = db.query(
+        db_models.Data.id, db_models.Data.md5, db_models.Data.data_path
+    ).filter(db_models.Data.id.in_(data_ids)).all()
+
+    query = db.query(db_models.FeatureStore)
+    if feature_version is not None:
+        query = query.filter(db_models.FeatureStore.feature_version == feature_version)
+    md5_values = {row.md5 for row in data_rows if row.md5}
+    data_dirs = {_normalize_dir(row.data_path) for row in data_rows if row.data_path}
+    # 同一MD5/目录存在多个版本时保留最新的一行
+    by_md5 = {}
+    by_dir = {}
+    candidates = query.filter(
+        db_models.FeatureStore.md5.in_(md5_values) | db_models.FeatureStore.data_dir.in_(data_dirs)
+    ).order_by(db_models.FeatureStore.feature_version, db_models.FeatureStore.created_at).all()
+    for record in candidates:
+        if record.md5:
+            by_md5[record.md5] = record
+        by_dir[record.data_dir] = record
+
+    rows_by_id = {row.id: row for row in data_rows}
+    found_ids = []
+    records = []
+    missing = []
+    for data_id in data_ids:
+        row = rows_by_id.get(data_id)
+        record = None
+        if row is not None:
+            record = by_md5.get(row.md5) if row.md5 else None
+            if record is None and row.data_path:
+                record = by_dir.get(_normalize_dir(row.data_path))
+        if record is None:
+            missing.append(data_id)
+        else:
+            found_ids.append(data_id)
+            records.append(record)
+
+    if not records:
+        return {
+            'data_ids': [], 'missing': missing, 'feature_names': list(features or []),
+            'channel_names': list(channels or []), 'feature_version': [],
+            'values': np.empty((0, len(channels or []), len(features or [])))
+        }
+
+    feature_names = _aligned_names([record.feature_names for record in records], features)
+    channel_names = _aligned_names([record.channel_names for record in records], channels)
+    values = np.full((len(records), len(channel_names), len(feature_names)), np.nan)
+    for i, record in enumerate(records):
+        matrix = np.asarray(record.feature_values, dtype=float)
+        channel_index = {name: j for j, name in enumerate(record.channel_names)}
+        feature_index = {name: j for j, name in enumerate(record.feature_names)}
+        rows = [channel_index.get(name) for name in channel_names]
+        cols = [feature_index.get(name) for name in feature_names]
+        row_mask = np.array([r is not None for r in rows], dtype=bool)
+        col_mask = np.array([c is not None for c in cols], dtype=bool)
+        if row_mask.any() and col_mask.any():
+            src_rows = [r for r in rows if r is not None]
+            src_cols = [c for c in cols if c is not None]
+            values[i][np.ix_(row_mask, col_mask)] = matrix[np.ix_(src_rows, src_cols)]
+
+    return {
+        'data_ids': found_ids,
+        'missing': missing,
+        'feature_names': feature_names,
+        'channel_names': channel_names,
+        'feature_version': [record.feature_version for record in records],
+        'values': values
+    }
@@ -0,0 +1,226 @@
+"""
+跨被试动态批处理推理服务
+
+并发评估请求各自提交一个被试的epoch张量，同一模型的请求在队列中合并，
+凑满 INFERENCE_MAX_BATCH_SIZE 个epoch或等待超过 INFERENCE_MAX_WAIT_MS 后
+整批送入Keras/TFLite模型推理一次，再按请求拆分结果返回给各自的future。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import traceback
+
+import numpy as np
+
+import metrics
+from config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS
+from model_inference import (
+    EegModel, get_executor, load_keras_model, quantize_tflite_input, dequantize_tflite_output
+)
+
+# 批处理专用TFLite解释器：model_path -> {"interpreter", "lock", "batch_size", "resizable"}
+# 与 get_tflite_interpreter 的共享解释器分开，避免改变其输入形状影响逐样本推理
+_batch_interpreters = {}
+_batch_interpreters_lock = threading.Lock()
+
+def _get_batch_interpreter(model_path):
+    entry = _batch_interpreters.get(model_path)
+    if entry is not None:
+        return entry
+    with _batch_interpreters_lock:
+        entry = _batch_interpreters.get(model_path)
+        if entry is None:
+            import tensorflow as tf
+            interpreter = tf.lite.Interpreter(model_path=model_path)
+            interpreter.allocate_tensors()
+            entry = {
+                "interpreter": interpreter,
+                "lock": threading.Lock(),
+                "batch_size": int(interpreter.get_input_details()[0]['shape'][0]),
+                "resizable": True,
+            }
+            _batch_interpreters[model_path] = entry
+    return entry
+
+def _run_tflite_batch(model_path, X):
+    """整批执行TFLite推理，模型不支持调整batch维度时退回逐样本推理"""
+    entry = _get_batch_interpreter(model_path)
+    interpreter = entry["interpreter"]
+    with entry["lock"]:
+        input_details = interpreter.get_input_details()
+        X = quantize_tflite_input(X, input_details[0])
+
+        if entry["resizable"] and entry["batch_size"] != X.shape[0]:
+            try:
+                interpreter.resize_tensor_input(input_details[0]['index'], list(X.shape))
+                interpreter.allocate_tensors()
+                entry["batch_size"] = X.shape[0]
+            except Exception as e:
+                entry["resizable"] = False
+                logging.warning(f"TFLite模型不支持批量输入，改为逐样本推理: {model_path}, {str(e)}")
+                interpreter.resize_tensor_input(input_details[0]['index'], [1] + list(X.shape[1:]))
+                interpreter.allocate_tensors()
+                entry["batch_size"] = 1
+            input_details = interpreter.get_input_details()
+
+        output_details = interpreter.get_output_details()
+        output_index = output_details[0]['index']
+        if entry["batch_size"] == X.shape[0]:
+            interpreter.set_tensor(input_details[0]['index'], X)
+            interpreter.invoke()
+            return dequantize_tflite_output(interpreter.get_tensor(output_index), output_details[0])
+
+        outputs = []
+        for i in range(X.shape[0]):
+            interpreter.set_tensor(input_details[0]['index'], X[i:i + 1])
+            interpreter.invoke()
+            outputs.append(interpreter.get_tensor(output_index)[0])
+        return dequantize_tflite_output(np.array(outputs), output_details[0])
+
+@metrics.timed_stage('inference_batch')
+def run_model_batch(model_type, model_path, X):
+    """对一个批次执行推理，返回模型原始输出 (N, n_classes)"""
+    if model_path.endswith('.tflite'):
+        return _run_tflite_batch(model_path, X)
+    model = EegModel._models.get(model_type)
+    metrics.record_cache('keras_model', model is not None)
+    if model is None:
+        model = load_keras_model(model_path)
+        EegModel._models[model_type] = model
+    return model.predict(X, batch_size=X.shape[0], verbose=0)
+
+class DynamicBatcher:
+    """
+    单个模型的动态批处理器
+    submit() 提交一个被试的epoch，返回该被试对应的模型输出
+    """
+
+    def __init__(self, model_type, model_path, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.model_type = model_type
+        self.model_path = model_path
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        # 吞吐统计
+        self.total_epochs = 0
+        self.total_requests = 0
+        self.total_batches = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, X):
+        """
+        提交epoch张量并等待结果
+        Args:
+            X: 形状为 (N, 1, 通道数, 采样点数) 的标准化数据
+        Returns:
+            numpy.ndarray: 该请求对应的模型输出 (N, n_classes)
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((X, future))
+        return await future
+
+    async def _collect(self):
+        """取出一个批次：至少一个请求，直到epoch数达到上限或等待超时"""
+        items = [await self._queue.get()]
+        total = items[0][0].shape[0]
+        deadline = self._loop.time() + self.max_wait
+        while total < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0 and self._queue.empty():
+                break
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            items.append(item)
+            total += item[0].shape[0]
+        return items
+
+    async def _run(self):
+        while True:
+            items = await self._collect()
+            # 请求方已取消的不再计算
+            items = [(X, future) for X, future in items if not future.cancelled()]
+            if not items:
+                continue
+            sizes = [X.shape[0] for X, _ in items]
+            try:
+                batch = np.concatenate([X for X, _ in items], axis=0)
+                start = time.perf_counter()
+                y_pred = await self._loop.run_in_executor(
+                    get_executor(), run_model_batch, self.model_type, self.model_path, batch
+                )
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                logging.error(f"批量推理失败: 模型类型{self.model_type}, 错误: {str(e)}")
+                logging.error(traceback.format_exc())
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.total_epochs += batch.shape[0]
+            self.total_requests += len(items)
+            self.total_batches += 1
+            self.busy_seconds += elapsed
+            logging.info(
+                f"批量推理: 模型类型{self.model_type}, {len(items)}个请求/{batch.shape[0]}个epoch, "
+                f"耗时 {elapsed:.3f}s, {batch.shape[0] / max(elapsed, 1e-9):.1f} epochs/s"
+            )
+
+            offset = 0
+            for size, (_, future) in zip(sizes, items):
+                if not future.done():
+                    future.set_result(y_pred[offset:offset + size])
+                offset += size
+
+    def get_stats(self):
+        """吞吐统计"""
+        return {
+            "model_type": self.model_type,
+            "model_path": self.model_path,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_size": self._queue.qsize() if self._queue is not None else 0,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "total_epochs": self.total_epochs,
+            "avg_batch_epochs": round(self.total_epochs / self.total_batches, 1) if self.total_batches else 0,
+            "epochs_per_second": round(self.total_epochs / self.busy_seconds, 1) if self.busy_seconds else 0,
+        }
+
+# 每个模型一个批处理器：(model_type, model_path) -> DynamicBatcher
+_batchers = {}
+
+def get_batcher(model_type, model_path):
+    """获取模型对应的动态批处理器"""
+    key = (model_type, model_path)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        batcher = DynamicBatcher(model_type, model_path)
+        _batchers[key] = batcher
+    return batcher
+
+def get_batching_stats():
+    """所有批处理器的吞吐统计"""
+    return [batcher.get_stats() for batcher in _batchers.values()]
+
+@metrics.register_collector
+def _collect_queue_depth():
+    """各模型批处理队列中等待凑批的请求数"""
+    for batcher in list(_batchers.values()):
+        depth = batcher._queue.qsize() if batcher._queue is not None else 0
+        metrics.set_queue_depth(f"inference_batch_{batcher.model_type}", depth)
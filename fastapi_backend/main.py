@@ -1,7 +1,10 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 import uvicorn
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import List, Optional
 
@@ -9,14 +12,54 @@ from typing import List, Optional
 from config import setup_logging
 setup_logging()
 
+from config import MODEL_WARMUP, PROFILING
+import metrics
+import profiler
+from database import engine
+
 # 获取日志记录器
 logger = logging.getLogger(__name__)
 
+def log_warmup_result(future):
+    """后台预热任务结束时记录未捕获的异常，否则异常只保存在future中无人读取"""
+    if future.cancelled():
+        logger.warning("后台模型预热已取消")
+        return
+    exc = future.exception()
+    if exc is not None:
+        logger.error(f"后台模型预热失败: {exc}", exc_info=exc)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动时在后台预加载并预热模型，不阻塞服务启动，进度通过 /ready 查询；
+    退出前写入尚未落库的最后登录时间
+    """
+    import model_warmup
+    from model_inference import get_executor
+
+    app.state.warmup_future = None
+    if not MODEL_WARMUP:
+        model_warmup.mark_ready_without_warmup()
+        logger.info("未开启模型预热(MODEL_WARMUP)，模型将在首次推理时加载")
+    else:
+        logger.info("开始后台预热模型")
+        loop = asyncio.get_running_loop()
+        app.state.warmup_future = loop.run_in_executor(get_executor(), model_warmup.warmup_registered_models)
+        app.state.warmup_future.add_done_callback(log_warmup_result)
+
+    try:
+        yield
+    finally:
+        from auth_cache import flush_last_login
+        flush_last_login()
+
 # 创建FastAPI应用
 app = FastAPI(
     title="急进高原新兵心理应激多模态神经生理监测预警系统API",
     description="急进高原新兵心理应激多模态神经生理监测预警系统的后端API接口",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -28,9 +71,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求耗时、并发数和每个请求的数据库查询统计，由 /metrics 输出
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+# 按需剖析慢请求（PROFILING=true 时启用），结果通过 /api/admin/profiles 查看
+if PROFILING:
+    app.add_middleware(profiler.ProfilingMiddleware)
+
 # 导入路由模块
 try:
-    from routers import auth, users, data, models, results, health_evaluate, parameters, roles, logs, active_learning, eegs
+    from routers import auth, users, data, models, results, health_evaluate, parameters, roles, logs, active_learning, eegs, images, profiles, features
     
     # 注册路由
     app.include_router(auth.router, prefix="/api", tags=["认证"])
@@ -44,6 +95,9 @@ try:
     app.include_router(logs.router, prefix="/api/logs", tags=["日志管理"])
     app.include_router(active_learning.router, prefix="/api/active-learning", tags=["主动学习"])
     app.include_router(eegs.router, tags=["EEG数据"])
+    app.include_router(images.router, prefix="/api/images", tags=["图片服务"])
+    app.include_router(profiles.router, prefix="/api/admin/profiles", tags=["性能剖析"])
+    app.include_router(features.router, prefix="/api/features", tags=["特征库"])
     
     logger.info("所有路由模块加载成功")
 except ImportError as e:
@@ -64,6 +118,27 @@ async def health_check():
         "service": "bj_health_csq_api"
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus格式的运行指标"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查接口，模型预热完成前返回503，与 /health 存活检查分开"""
+    import model_warmup
+
+    state = model_warmup.get_warmup_state()
+    content = {
+        "status": state["status"],
+        "timestamp": datetime.now().isoformat(),
+        "model_warmup": MODEL_WARMUP,
+        "models": state["models"],
+    }
+    if state["status"] != "ready":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+    return content
+
 # 全局异常处理器
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -0,0 +1,381 @@
+"""
+运行指标（Prometheus文本格式，由 /metrics 输出）
+
+1. HTTP：按路由模板统计请求延迟直方图、请求数（含状态码）、正在处理的请求数
+2. 数据库：通过SQLAlchemy游标事件统计每个请求的查询次数和查询耗时，以及单条查询耗时
+3. 流水线阶段：预处理各子阶段、特征提取、绘图、epoch读取、标准化、推理的耗时直方图
+4. 后台任务队列长度，TFLite解释器、Keras模型和标准化器缓存的命中率（抓取时由各模块注册的回调刷新）
+
+安装了 prometheus_client 时使用其指标类型和输出；未安装时使用本模块内置的轻量实现，
+接口（labels().observe/inc/dec/set）和输出格式相同。多个uvicorn工作进程各自统计。
+"""
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# 与prometheus_client默认值相同的延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+# 流水线阶段耗时分桶（秒），预处理和推理可能持续数十秒
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# 每个请求的查询次数分桶
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST if prometheus_client else 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """内置实现的指标基类：按标签值保存子指标"""
+
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def __getattr__(self, name):
+        # 无标签指标直接调用 inc/observe/set
+        if name in ('inc', 'dec', 'set', 'observe'):
+            return getattr(self._children[()], name)
+        raise AttributeError(name)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+
+class _Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}']
+
+
+class _Gauge(_Counter):
+    type_name = 'gauge'
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class _Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(float(b) for b in buckets) + (float('inf'),)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+        lines.append(f'{self.name}_count{labels} {child.count}')
+        return lines
+
+
+_registry = []
+
+
+def counter(name, documentation, labelnames=()):
+    if prometheus_client:
+        return prometheus_client.Counter(name, documentation, labelnames)
+    metric = _Counter(name, documentation, labelnames)
+    _registry.append(metric)
+    return metric
+
+
+def gauge(name, documentation, labelnames=()):
+    if prometheus_client:
+        return prometheus_client.Gauge(name, documentation, labelnames)
+    metric = _Gauge(name, documentation, labelnames)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    if prometheus_client:
+        return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+    metric = _Histogram(name, documentation, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+
+# ---------------- 指标定义 ----------------
+
+HTTP_REQUESTS = counter('http_requests_total', 'HTTP请求数', ['method', 'route', 'status'])
+HTTP_LATENCY = histogram('http_request_duration_seconds', 'HTTP请求处理耗时（秒）', ['method', 'route'])
+HTTP_IN_PROGRESS = gauge('http_requests_in_progress', '正在处理的HTTP请求数', ['method'])
+
+DB_QUERIES = counter('db_queries_total', '数据库查询次数')
+DB_QUERY_LATENCY = histogram('db_query_duration_seconds', '单条数据库查询耗时（秒）')
+DB_QUERIES_PER_REQUEST = histogram(
+    'db_queries_per_request', '每个HTTP请求执行的数据库查询次数', ['route'], buckets=QUERY_COUNT_BUCKETS
+)
+DB_SECONDS_PER_REQUEST = histogram('db_query_seconds_per_request', '每个HTTP请求的数据库查询总耗时（秒）', ['route'])
+
+STAGE_LATENCY = histogram('pipeline_stage_duration_seconds', '流水线阶段耗时（秒）', ['stage'], buckets=STAGE_BUCKETS)
+
+QUEUE_DEPTH = gauge('background_queue_depth', '后台任务队列中等待的任务数', ['queue'])
+
+CACHE_REQUESTS = counter('model_cache_requests_total', '模型及相关缓存的查询次数', ['cache', 'result'])
+CACHE_HIT_RATIO = gauge('model_cache_hit_ratio', '缓存命中率', ['cache'])
+
+
+# ---------------- 流水线阶段与缓存 ----------------
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+def observe_stages(timings, prefix=''):
+    """记录 {阶段: 秒} 形式的耗时（例如预处理清单中的timings）"""
+    for stage, seconds in timings.items():
+        if seconds is not None:
+            observe_stage(f'{prefix}{stage}', seconds)
+
+
+@contextmanager
+def stage_timer(stage):
+    """记录代码块耗时；代码块抛出异常时不记录"""
+    start = time.perf_counter()
+    yield
+    observe_stage(stage, time.perf_counter() - start)
+
+
+def timed_stage(stage):
+    """函数装饰器形式的 stage_timer"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_cache_counts = {}
+_cache_lock = threading.Lock()
+
+
+def record_cache(cache, hit):
+    """记录一次缓存查询"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+    with _cache_lock:
+        hits, total = _cache_counts.get(cache, (0, 0))
+        _cache_counts[cache] = (hits + (1 if hit else 0), total + 1)
+
+
+def set_queue_depth(queue, depth):
+    QUEUE_DEPTH.labels(queue).set(depth)
+
+
+# 抓取前调用的回调，用于刷新队列长度等瞬时值
+_collectors = []
+
+
+def register_collector(func):
+    """注册抓取前调用的回调（同一函数只注册一次）"""
+    if func not in _collectors:
+        _collectors.append(func)
+    return func
+
+
+def _refresh():
+    with _cache_lock:
+        counts = dict(_cache_counts)
+    for cache, (hits, total) in counts.items():
+        CACHE_HIT_RATIO.labels(cache).set(hits / total if total else 0.0)
+    for func in list(_collectors):
+        try:
+            func()
+        except Exception as e:
+            logging.error(f"刷新指标失败: {getattr(func, '__name__', func)}, {str(e)}")
+            logging.error(traceback.format_exc())
+
+
+def render():
+    """返回Prometheus文本格式的全部指标"""
+    _refresh()
+    if prometheus_client:
+        return prometheus_client.generate_latest(prometheus_client.REGISTRY)
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# ---------------- HTTP与数据库 ----------------
+
+# 当前请求的数据库统计 [查询次数, 查询耗时]；同步依赖在线程池中执行时复制上下文，仍指向同一个列表
+_request_db = contextvars.ContextVar('request_db', default=None)
+
+
+def _route_template(scope):
+    """
+    路由模板（如 /api/data/{data_id}），避免按实际路径产生大量标签
+    由实际路径中的路径参数值替换为参数名得到，不依赖路由对象是否带有include_router的前缀
+    """
+    if 'endpoint' not in scope and 'route' not in scope:
+        return '<unmatched>'
+    params = {str(value): name for name, value in (scope.get('path_params') or {}).items()}
+    segments = scope.get('path', '').split('/')
+    return '/'.join(f'{{{params[segment]}}}' if segment in params else segment for segment in segments)
+
+
+class MetricsMiddleware:
+    """ASGI中间件：统计请求耗时、状态码、并发数和每个请求的数据库查询"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status_code[0] = message['status']
+            await send(message)
+
+        db_stats = [0, 0.0]
+        token = _request_db.set(db_stats)
+        HTTP_IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_PROGRESS.labels(method).dec()
+            _request_db.reset(token)
+            route = _route_template(scope)
+            HTTP_REQUESTS.labels(method, route, str(status_code[0])).inc()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(db_stats[0])
+            DB_SECONDS_PER_REQUEST.labels(route).observe(db_stats[1])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _finish_query(conn)
+
+
+def _handle_error(exception_context):
+    """查询失败时不会触发after_cursor_execute，在这里弹出开始时间，失败的查询同样计时"""
+    conn = exception_context.connection
+    if conn is not None and exception_context.execution_context is not None:
+        _finish_query(conn)
+
+
+def _finish_query(conn):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERIES.inc()
+    DB_QUERY_LATENCY.observe(elapsed)
+    db_stats = _request_db.get()
+    if db_stats is not None:
+        db_stats[0] += 1
+        db_stats[1] += elapsed
+
+
+def instrument_engine(engine):
+    """为SQLAlchemy引擎注册查询计时事件"""
+    from sqlalchemy import event
+
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
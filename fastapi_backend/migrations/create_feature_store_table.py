@@ -0,0 +1,80 @@
+"""
+创建 tb_feature_store 特征库表的迁移脚本
+运行方式: python -m migrations.create_feature_store_table
+"""
+
+from sqlalchemy import text
+import traceback
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+from database import SessionLocal
+
+def create_feature_store_table():
+    """
+    创建 tb_feature_store 表
+    """
+    db = SessionLocal()
+    try:
+        # 检查表是否已存在
+        check_table_sql = text("""
+            SELECT COUNT(*) as count
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = current_database()
+            AND TABLE_NAME = 'tb_feature_store'
+        """)
+
+        result = db.execute(check_table_sql).fetchone()
+
+        if result[0] > 0:
+            print("表 tb_feature_store 已存在，无需创建")
+            return
+
+        # 创建表
+        db.execute(text("""
+            CREATE TABLE tb_feature_store (
+                id SERIAL PRIMARY KEY,
+                md5 VARCHAR(32),
+                data_dir VARCHAR(255) NOT NULL,
+                feature_version INTEGER NOT NULL,
+                source_file VARCHAR(255),
+                channel_names VARCHAR[] NOT NULL,
+                feature_names VARCHAR[] NOT NULL,
+                feature_values DOUBLE PRECISION[][] NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        db.execute(text("""
+            CREATE INDEX ix_tb_feature_store_md5_version ON tb_feature_store (md5, feature_version)
+        """))
+
+        # 添加注释
+        db.execute(text("""
+            COMMENT ON TABLE tb_feature_store IS '特征库表';
+            COMMENT ON COLUMN tb_feature_store.md5 IS '数据内容MD5（与tb_data.md5对应）';
+            COMMENT ON COLUMN tb_feature_store.data_dir IS '提取特征时的数据目录';
+            COMMENT ON COLUMN tb_feature_store.feature_version IS '特征参数版本（FEATURE_PARAMS.version）';
+            COMMENT ON COLUMN tb_feature_store.source_file IS '特征提取的输入文件';
+            COMMENT ON COLUMN tb_feature_store.channel_names IS '通道名称';
+            COMMENT ON COLUMN tb_feature_store.feature_names IS '特征名称';
+            COMMENT ON COLUMN tb_feature_store.feature_values IS '特征矩阵[通道][特征]';
+            COMMENT ON COLUMN tb_feature_store.created_at IS '创建时间'
+        """))
+        db.commit()
+
+        print("成功创建表 tb_feature_store")
+
+    except Exception as e:
+        db.rollback()
+        print(f"创建表失败: {e}")
+        print(traceback.format_exc())
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    create_feature_store_table()
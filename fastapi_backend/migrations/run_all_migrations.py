@@ -11,6 +11,7 @@
 8. remove_social_isolation_score.py - 删除 social_isolation_score 字段
 9. add_md5_fields.py - 添加 md5 字段到 tb_data/tb_result 表
 10. init_parameters_defaults.py - 初始化系统参数的默认值
+11. create_feature_store_table.py - 创建 tb_feature_store 特征库表
 
 运行方式: python -m migrations.run_all_migrations
 """
@@ -31,6 +32,7 @@ MIGRATIONS = [
     ("删除 social_isolation_score 字段", "remove_social_isolation_score"),
     ("添加 md5 字段到 tb_data/tb_result 表", "add_md5_fields"),
     ("初始化系统参数的默认值", "init_parameters_defaults"),
+    ("创建 tb_feature_store 特征库表", "create_feature_store_table"),
 ]
 
 def run_migration(description: str, module_name: str) -> bool:
@@ -1,19 +1,245 @@
 import os
-import tensorflow as tf
 import numpy as np
 import pickle as pkl
 import logging
 import traceback
+import threading
 from sqlalchemy.orm import Session
 import models as db_models
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-import mne
 import uuid
+import hashlib
 from datetime import datetime
 
-# 创建一个线程池，用于处理计算密集型任务
-executor = ThreadPoolExecutor(max_workers=3)  # 设置最大工作线程数
+from config import INFERENCE_BATCHING, EPOCH_STORE_NPY, BATCH_PREDICT_CONCURRENCY
+import content_store
+import epoch_store
+import metrics
+import profiler
+from score_fusion import load_scale_scores, calculate_final_scores, adjust_stress_scores
+
+# TensorFlow和MNE体积大、导入耗时，统一在首次推理时再导入，
+# 只处理用户/角色等CRUD请求的API进程不会加载这些科学计算库
+
+# 线程池在首次使用时创建，用于处理计算密集型任务
+_executor = None
+_executor_lock = threading.Lock()
+
+@metrics.register_collector
+def _collect_executor_queue():
+    """推理线程池中等待执行的任务数"""
+    if _executor is not None:
+        metrics.set_queue_depth('inference_executor', _executor._work_queue.qsize())
+
+def get_executor():
+    """获取推理线程池，首次调用时创建"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=3)  # 设置最大工作线程数
+    return _executor
+
+def load_keras_model(model_path):
+    """加载Keras模型（延迟导入TensorFlow）"""
+    import tensorflow as tf
+    return tf.keras.models.load_model(model_path, safe_mode=False)
+
+# TFLite解释器缓存：model_path -> (interpreter, input_details, output_details, invoke_lock)
+_tflite_interpreters = {}
+_tflite_interpreters_lock = threading.Lock()
+
+def get_tflite_interpreter(model_path):
+    """
+    获取TFLite解释器，同一模型文件在进程内只加载一次
+    解释器不是线程安全的，调用方在set_tensor/invoke/get_tensor期间需持有返回的锁
+    Returns:
+        tuple: (interpreter, input_details, output_details, invoke_lock)
+    """
+    cached = _tflite_interpreters.get(model_path)
+    if cached is not None:
+        metrics.record_cache('tflite_interpreter', True)
+        return cached
+    with _tflite_interpreters_lock:
+        cached = _tflite_interpreters.get(model_path)
+        metrics.record_cache('tflite_interpreter', cached is not None)
+        if cached is None:
+            import tensorflow as tf
+            interpreter = tf.lite.Interpreter(model_path=model_path)
+            interpreter.allocate_tensors()
+            cached = (
+                interpreter,
+                interpreter.get_input_details(),
+                interpreter.get_output_details(),
+                threading.Lock()
+            )
+            _tflite_interpreters[model_path] = cached
+            logging.info(f"成功加载TFLite模型: {model_path}")
+    return cached
+
+# 每个被试用于推理的epoch数
+NUM_OF_DATA = 108
+
+def _data_file_sort_key(file_name):
+    """根据文件的扩展名返回一个排序键，优先使用预处理后的fif"""
+    if file_name.endswith('.fif'):
+        return 1
+    elif file_name.endswith('.edf'):
+        return 2
+    elif file_name.endswith('.set'):
+        return 3
+    else:
+        return 4  # 对于其他类型的文件，返回一个较大的值
+
+@metrics.timed_stage('load_epochs')
+def load_subject_epochs(data_path, num_of_data=NUM_OF_DATA):
+    """
+    读取被试数据并切分为模型输入形状，不做标准化
+    Args:
+        data_path: 数据路径
+        num_of_data: 取最后多少个epoch
+    Returns:
+        numpy.ndarray: 形状为 (N, 1, 通道数, 采样点数) 的数据；
+            来自epochs.npy时是内存映射上的只读视图
+    """
+    # 优先读取紧凑的npy epoch文件，只映射需要的最后num_of_data个epoch
+    if epoch_store.has_epochs(data_path):
+        return epoch_store.load_last_epochs(data_path, num_of_data)
+
+    import mne
+
+    files = sorted(os.listdir(data_path), key=_data_file_sort_key)
+
+    for file in files:
+        file_path = os.path.join(data_path, file)
+        file_name = os.path.basename(file_path)
+
+        if file_name.endswith('.fif'):
+            raw = mne.read_epochs(file_path)
+            raw.load_data()
+            exp_data = raw.get_data()
+            # 旧数据只有fif.fif时顺便补写npy，下次推理直接内存映射
+            if EPOCH_STORE_NPY and file_name == epoch_store.FIF_NAME:
+                epoch_store.export_from_fif(data_path, raw)
+        elif file_name.endswith('.edf'):
+            raw = mne.io.read_raw_edf(file_path)
+            raw.load_data()
+            exp_data = raw.get_data()
+            segment_length = int(500 * 2)
+            num_channels, num_samples = exp_data.shape
+            segments = []
+
+            for start in range(0, num_samples, segment_length):
+                end = start + segment_length
+                if end <= num_samples:
+                    segment = exp_data[:, start:end]
+                    segments.append(segment)
+
+            exp_data = np.array(segments)
+        elif file_name.endswith('.set'):
+            raw = mne.io.read_epochs_eeglab(file_path)
+            exp_data = raw.get_data()
+
+        data = exp_data[-(num_of_data)::, ::, ::]
+        N_tr, N_ch, T = data.shape
+        return data.reshape(N_tr, 1, N_ch, T)
+
+# 模型输入的通道数，与data_preprocess.CHANNELS_TO_KEEP一致
+MODEL_N_CHANNELS = 59
+
+# 标准化器缓存：标准化器目录 -> 按通道排列的scaler列表
+_scalers = {}
+_scalers_lock = threading.Lock()
+
+def get_standarder_dir(model_path):
+    """模型对应的标准化器目录（与模型文件同级的standarder目录）"""
+    return os.path.join(os.path.dirname(model_path), 'standarder')
+
+def load_scalers(dir_path, n_channels):
+    """加载目录下按通道保存的标准化器，同一目录在进程内只读取一次"""
+    cached = _scalers.get(dir_path)
+    if cached is not None and len(cached) >= n_channels:
+        metrics.record_cache('scalers', True)
+        return cached
+    with _scalers_lock:
+        cached = _scalers.get(dir_path)
+        hit = cached is not None and len(cached) >= n_channels
+        metrics.record_cache('scalers', hit)
+        if not hit:
+            cached = []
+            for j in range(n_channels):
+                save_path = os.path.join(dir_path, f'std_{j}.pkl')
+                with open(save_path, 'rb') as f:
+                    cached.append(pkl.load(f))
+            _scalers[dir_path] = cached
+            logging.info(f"加载标准化器: {dir_path}")
+    return cached
+
+@metrics.timed_stage('standardize')
+def standardize_epochs(data, model_path):
+    """
+    使用模型目录下的标准化器逐通道标准化，返回新数组，不修改输入
+    Args:
+        data: load_subject_epochs返回的数据
+        model_path: 模型路径
+    Raises:
+        ValueError: 通道数与模型不一致（如OpenBCI记录只保留了部分通道）
+    """
+    N_tr, _, N_ch, T = data.shape
+    if N_ch != MODEL_N_CHANNELS:
+        raise ValueError(
+            f"数据只有{N_ch}个通道，模型需要{MODEL_N_CHANNELS}个通道（OpenBCI记录只能计算特征，不能评分）"
+        )
+    scalers = load_scalers(get_standarder_dir(model_path), N_ch)
+    standardized = np.array(data, copy=True)
+    for j in range(N_ch):
+        standardized[:, 0, j, :] = scalers[j].transform(data[:, 0, j, :])
+    return standardized
+
+def quantize_tflite_input(X, input_detail):
+    """
+    按模型输入的量化参数转换数据（与原 EegModelTFLite.predict 一致：X / scale + zero_point 后转换类型）
+    浮点模型的scale为0，只转换类型
+    """
+    scale, zero_point = input_detail['quantization']
+    if scale:
+        X = X / scale + zero_point
+    return X.astype(input_detail['dtype'])
+
+def dequantize_tflite_output(y, output_detail):
+    """按模型输出的量化参数还原为浮点值，浮点模型原样返回"""
+    scale, zero_point = output_detail['quantization']
+    if scale:
+        return (np.asarray(y).astype(np.float32) - zero_point) * scale
+    return np.asarray(y)
+
+@metrics.timed_stage('inference')
+def predict_epochs(model_type, model_path, X):
+    """
+    在已加载的模型上执行推理，返回判为EXP类的epoch比例
+    TFLite模型使用共享解释器逐样本推理，Keras模型使用EegModel._models中的缓存
+    """
+    if model_path.endswith('.tflite'):
+        interpreter, input_details, output_details, invoke_lock = get_tflite_interpreter(model_path)
+        X = quantize_tflite_input(X, input_details[0])
+        outputs = []
+        with invoke_lock:
+            for i in range(X.shape[0]):
+                interpreter.set_tensor(input_details[0]['index'], X[i:i + 1])
+                interpreter.invoke()
+                outputs.append(interpreter.get_tensor(output_details[0]['index'])[0])
+        y_pred = dequantize_tflite_output(np.array(outputs), output_details[0])
+    else:
+        model = EegModel._models.get(model_type)
+        metrics.record_cache('keras_model', model is not None)
+        if model is None:
+            model = load_keras_model(model_path)
+            EegModel._models[model_type] = model
+        y_pred = model.predict(X, verbose=0)
+
+    pred_argmax = y_pred.argmax(axis=-1)
+    return float(pred_argmax.sum()) / len(pred_argmax)
 
 class EegModel:
     """
@@ -34,6 +260,7 @@ class EegModel:
         """
         try:
             # 避免重复加载
+            metrics.record_cache('keras_model', model_type in EegModel._models)
             if model_type in EegModel._models:
                 return True
                 
@@ -47,8 +274,9 @@ class EegModel:
             # 异步加载模型
             loop = asyncio.get_event_loop()
             model = await loop.run_in_executor(
-                executor,
-                lambda: tf.keras.models.load_model(model_info.model_path, safe_mode=False)
+                get_executor(),
+                load_keras_model,
+                model_info.model_path
             )
             
             # 存储到静态变量
@@ -69,7 +297,7 @@ class EegModel:
         """
         self.data_path = data_path
         self.model_path = model_path
-        self.n_channels = 59
+        self.n_channels = MODEL_N_CHANNELS
         self.in_samples = 1000
         self.n_classes = 2
         self.classes_labels = ['Control', 'EXP']
@@ -92,68 +320,8 @@ class EegModel:
         Returns:
             numpy.ndarray: 预处理后的数据
         """
-        num_of_data = 108
-        files = os.listdir(self.data_path)
-
-        # 定义一个函数，根据文件的扩展名返回一个排序键
-        def sort_key(file_name):
-            if file_name.endswith('.fif'):
-                return 1
-            elif file_name.endswith('.edf'):
-                return 2
-            elif file_name.endswith('.set'):
-                return 3
-            else:
-                return 4  # 对于其他类型的文件，返回一个较大的值
-
-        # 对文件列表进行排序
-        files = sorted(files, key=sort_key)
-
-        for file in files:
-            file_path = os.path.join(self.data_path, file)
-            file_name = os.path.basename(file_path)
-
-            if file_name.endswith('.fif'):
-                raw = mne.read_epochs(file_path)
-                raw.load_data()
-                exp_data = raw.get_data()
-            elif file_name.endswith('.edf'):
-                raw = mne.io.read_raw_edf(file_path)
-                raw.load_data()
-                exp_data = raw.get_data()
-                segment_length = int(500 * 2)
-                num_channels, num_samples = exp_data.shape
-                segments = []
-
-                for start in range(0, num_samples, segment_length):
-                    end = start + segment_length
-                    if end <= num_samples:
-                        segment = exp_data[:, start:end]
-                        segments.append(segment)
-
-                exp_data = np.array(segments)
-            elif file_name.endswith('.set'):
-                raw = mne.io.read_epochs_eeglab(file_path)
-                exp_data = raw.get_data()
-
-            data = exp_data[-(num_of_data)::, ::, ::]
-            N_tr, N_ch, T = data.shape
-            data = data.reshape(N_tr, 1, N_ch, T)
-
-            standarder = 'standarder'
-            model_dir = os.path.dirname(self.model_path)
-            logging.info(f"model_dir: {model_dir}")
-            dir_path = os.path.join(model_dir, standarder)
-            logging.info(f"dir_path: {dir_path}")
-            
-            for j in range(N_ch):
-                save_path = os.path.join(dir_path, f'std_{j}.pkl')
-                logging.info(f"save_path: {save_path}")
-                with open(save_path, 'rb') as f:
-                    scaler = pkl.load(f)
-                data[:, 0, j, :] = scaler.transform(data[:, 0, j, :])
-
-            return data
+        data = load_subject_epochs(self.data_path)
+        return standardize_epochs(data, self.model_path)
 
     async def load_model(self):
         """
@@ -162,8 +330,9 @@ class EegModel:
         try:
             loop = asyncio.get_event_loop()
             self.model = await loop.run_in_executor(
-                executor,
-                lambda: tf.keras.models.load_model(self.model_path, safe_mode=False)
+                get_executor(),
+                load_keras_model,
+                self.model_path
             )
             return True
         except Exception as e:
@@ -171,6 +340,7 @@ class EegModel:
             logging.error(traceback.format_exc())
             return False
 
+    @profiler.profiled('inference')
     async def predict(self, model_type):
         """
         使用预加载的模型进行预测
@@ -185,11 +355,11 @@ class EegModel:
             
             # 获取数据
             loop = asyncio.get_event_loop()
-            X_test = await loop.run_in_executor(executor, self.get_data)
+            X_test = await loop.run_in_executor(get_executor(), self.get_data)
             
             # 预测
             model = EegModel._models[model_type]
-            y_pred = await loop.run_in_executor(executor, lambda: model.predict(X_test))
+            y_pred = await loop.run_in_executor(get_executor(), lambda: model.predict(X_test))
             
             logging.info(f'pred_argmax: {y_pred.argmax(axis=-1)}')
             logging.info(f'a: {float(y_pred.argmax(axis=-1).sum())}')
@@ -204,12 +374,114 @@ class EegModel:
             logging.error(traceback.format_exc())
             return 0.0
 
+class MultiModelInference:
+    """
+    多模型融合推理：被试数据只读取一次，按标准化器目录各标准化一次，
+    再并发分发给所有已登记的模型（应激、抑郁、焦虑）
+    """
+
+    def __init__(self, model_paths):
+        """
+        Args:
+            model_paths: {model_type: model_path}
+        """
+        self.model_paths = dict(model_paths)
+
+    @staticmethod
+    def resolve_model_paths(db: Session, model_types=(0, 1, 2)):
+        """
+        一次查询tb_model获取各类型模型路径，同类型有多条记录时取第一条
+        Returns:
+            dict: {model_type: model_path}
+        """
+        model_paths = {}
+        rows = db.query(db_models.Model).filter(
+            db_models.Model.model_type.in_(list(model_types))
+        ).order_by(db_models.Model.id).all()
+        for model_info in rows:
+            model_paths.setdefault(model_info.model_type, model_info.model_path)
+        for model_type in model_types:
+            if model_type not in model_paths:
+                logging.warning(f"未找到类型为{model_type}的模型")
+        return model_paths
+
+    async def load_models(self):
+        """并发加载全部模型（已加载的直接复用）"""
+        loop = asyncio.get_event_loop()
+
+        def load(model_type, model_path):
+            if model_path.endswith('.tflite'):
+                get_tflite_interpreter(model_path)
+                return
+            metrics.record_cache('keras_model', model_type in EegModel._models)
+            if model_type not in EegModel._models:
+                EegModel._models[model_type] = load_keras_model(model_path)
+
+        await asyncio.gather(*[
+            loop.run_in_executor(get_executor(), load, model_type, model_path)
+            for model_type, model_path in self.model_paths.items()
+        ])
+
+    @profiler.profiled('inference')
+    async def predict(self, data_path):
+        """
+        对单个被试执行全部模型推理
+        Returns:
+            dict: {model_type: 判为EXP类的epoch比例}，单个模型失败时该模型结果为None
+        """
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(get_executor(), load_subject_epochs, data_path)
+
+        # 使用相同标准化器的模型共享同一份标准化结果
+        dir_groups = {}
+        for model_type, model_path in self.model_paths.items():
+            dir_groups.setdefault(get_standarder_dir(model_path), []).append(model_type)
+        standardized = await asyncio.gather(*[
+            loop.run_in_executor(get_executor(), standardize_epochs, data, self.model_paths[types[0]])
+            for types in dir_groups.values()
+        ])
+        inputs = {}
+        for types, X in zip(dir_groups.values(), standardized):
+            for model_type in types:
+                inputs[model_type] = X
+
+        model_types = list(self.model_paths.keys())
+        if INFERENCE_BATCHING:
+            # 与其他并发请求合并成批次推理
+            from inference_batcher import get_batcher
+
+            async def predict_batched(model_type):
+                y_pred = await get_batcher(model_type, self.model_paths[model_type]).submit(inputs[model_type])
+                pred_argmax = y_pred.argmax(axis=-1)
+                return float(pred_argmax.sum()) / len(pred_argmax)
+
+            tasks = [predict_batched(model_type) for model_type in model_types]
+        else:
+            tasks = [
+                loop.run_in_executor(
+                    get_executor(), predict_epochs, model_type, self.model_paths[model_type], inputs[model_type]
+                )
+                for model_type in model_types
+            ]
+        outputs = await asyncio.gather(*tasks, return_exceptions=True)
+
+        scores = {}
+        for model_type, output in zip(model_types, outputs):
+            if isinstance(output, BaseException):
+                logging.error(f"模型类型{model_type}预测错误: {str(output)}")
+                logging.error("".join(traceback.format_exception(type(output), output, output.__traceback__)))
+                scores[model_type] = None
+            else:
+                scores[model_type] = output
+        logging.info(f"数据路径: {data_path} 的模型输出: {scores}")
+        return scores
+
 class BatchInferenceModel:
     """批量推理模型类"""
     
     def __init__(self):
         """初始化批量推理模型"""
-        self.models = {}  # 存储模型的字典
+        self.models = {}  # 存储模型路径的字典 {model_type: model_path}
         
     async def load_models(self, db: Session):
         """
@@ -220,20 +492,9 @@ class BatchInferenceModel:
             bool: 是否成功加载所有模型
         """
         try:
-            # 获取所有模型
-            model_types = [0, 1, 2]  # 应激、抑郁、焦虑
-            
-            for model_type in model_types:
-                # 从数据库获取模型信息
-                model_info = db.query(db_models.Model).filter(db_models.Model.model_type == model_type).first()
-                
-                if not model_info:
-                    logging.warning(f"未找到类型为{model_type}的模型")
-                    continue
-                
-                # 加载模型
-                await EegModel.load_static_model(model_type, db)
-            
+            # 模型路径在每个批次内只查询一次
+            self.models = MultiModelInference.resolve_model_paths(db)
+            await MultiModelInference(self.models).load_models()
             return True
         except Exception as e:
             logging.error(f"加载模型时出错: {str(e)}")
@@ -243,6 +504,7 @@ class BatchInferenceModel:
     async def batch_predict(self, data_paths, db: Session):
         """
         对多个数据进行批量预测
+        每个被试的数据只读取一次并并发送入三个模型，量表融合和应激分数调整在整批结果上向量化计算
         Args:
             data_paths: 数据路径列表 [(data_id, data_path), ...]
             db: 数据库会话
@@ -253,83 +515,108 @@ class BatchInferenceModel:
         
         try:
             # 确保模型已加载
-            await self.load_models(db)
+            if not await self.load_models(db):
+                return results
+            inference = MultiModelInference(self.models)
+            model_signature = {str(model_type): path for model_type, path in self.models.items()}
+
+            data_records = {
+                record.id: record
+                for record in db.query(db_models.Data).filter(
+                    db_models.Data.id.in_([data_id for data_id, _ in data_paths])
+                ).all()
+            }
             
-            # 对每个数据路径进行预测
-            for data_id, data_path in data_paths:
-                try:
-                    logging.info(f"正在处理数据ID: {data_id}, 路径: {data_path}")
-                    
-                    # 获取每个模型的结果
-                    model_paths = {}
-                    for model_type in [0, 1, 2]:  # 应激、抑郁、焦虑
-                        model_info = db.query(db_models.Model).filter(db_models.Model.model_type == model_type).first()
-                        if model_info:
-                            model_paths[model_type] = model_info.model_path
-                    
-                    # 存储各模型的预测结果
-                    scores = {
-                        "stress": 0.0,
-                        "depression": 0.0,
-                        "anxiety": 0.0
-                    }
-                    
-                    # 并行运行所有模型预测
-                    tasks = []
-                    for model_type, model_path in model_paths.items():
-                        model = EegModel(data_path, model_path)
-                        tasks.append(model.predict(model_type))
-                    
-                    # 等待所有任务完成
-                    scores_list = await asyncio.gather(*tasks)
-                    
-                    # 将结果赋值给相应的分数
-                    for i, model_type in enumerate(model_paths.keys()):
-                        if model_type == 0:
-                            scores["stress"] = scores_list[i] * 100
-                        elif model_type == 1:
-                            scores["depression"] = scores_list[i] * 100
-                        elif model_type == 2:
-                            scores["anxiety"] = scores_list[i] * 100
-                    
-                    # 将结果添加到列表中
-                    results.append((
-                        data_id,
-                        scores["stress"],
-                        scores["depression"],
-                        scores["anxiety"]
-                    ))
-                    
-                    # 将结果保存到数据库
-                    data_record = db.query(db_models.Data).filter(db_models.Data.id == data_id).first()
-                    user_id = data_record.user_id if data_record else None
-                    
-                    result = db_models.Result(
-                        result_time=datetime.now(),
-                        stress_score=scores["stress"],
-                        depression_score=scores["depression"],
-                        anxiety_score=scores["anxiety"],
-                        user_id=user_id,
-                        data_id=data_id,
-                        md5=data_record.md5 if data_record else None
-                    )
-                    
-                    db.add(result)
-                    db.commit()
-                    
-                    logging.info(f"数据ID: {data_id} 的预测结果: {scores}")
-                
-                except Exception as e:
-                    logging.error(f"处理数据ID: {data_id} 时出错: {str(e)}")
-                    logging.error(traceback.format_exc())
-                    # 继续处理下一个数据
+            # 多个被试并发推理（数量受 BATCH_PREDICT_CONCURRENCY 限制），
+            # 开启 INFERENCE_BATCHING 时它们的epoch在动态批处理器中合并成批次
+            semaphore = asyncio.Semaphore(max(1, BATCH_PREDICT_CONCURRENCY))
+
+            async def predict_subject(data_id, data_path):
+                async with semaphore:
+                    try:
+                        logging.info(f"正在处理数据ID: {data_id}, 路径: {data_path}")
+                        md5_value = data_records[data_id].md5 if data_id in data_records else None
+                        # 相同内容、相同模型的推理结果直接复用
+                        cached = content_store.load_artifact_json(md5_value, 'inference.json')
+                        if cached and cached.get('models') == model_signature:
+                            logging.info(f"数据ID: {data_id} 复用MD5 {md5_value} 的推理结果")
+                            outputs = {int(k): v for k, v in cached['outputs'].items()}
+                        else:
+                            with profiler.data_id_scope(data_id):
+                                outputs = await inference.predict(data_path)
+                            if all(v is not None for v in outputs.values()):
+                                content_store.save_artifact_json(md5_value, 'inference.json', {
+                                    'models': model_signature,
+                                    'outputs': {str(k): v for k, v in outputs.items()}
+                                })
+                        anxiety_lb, depression_lb = await asyncio.get_event_loop().run_in_executor(
+                            get_executor(), load_scale_scores, data_path
+                        )
+                        return data_id, outputs, anxiety_lb, depression_lb
+                    except Exception as e:
+                        logging.error(f"处理数据ID: {data_id} 时出错: {str(e)}")
+                        logging.error(traceback.format_exc())
+                        # 继续处理其他数据
+                        return None
+
+            subject_results = await asyncio.gather(*[
+                predict_subject(data_id, data_path) for data_id, data_path in data_paths
+            ])
+
+            # 按提交顺序记录模型分数和量表分数
+            data_ids = []
+            model_scores = []   # 每行: [应激, 抑郁, 焦虑]
+            scale_scores = []   # 每行: [抑郁量表, 焦虑量表]，缺失为NaN
+            for subject_result in subject_results:
+                if subject_result is None:
                     continue
+                data_id, outputs, anxiety_lb, depression_lb = subject_result
+                data_ids.append(data_id)
+                model_scores.append([
+                    (outputs.get(model_type) or 0.0) * 100 for model_type in (0, 1, 2)
+                ])
+                scale_scores.append([
+                    np.nan if depression_lb is None else depression_lb,
+                    np.nan if anxiety_lb is None else anxiety_lb
+                ])
+
+            if not data_ids:
+                return results
+
+            # 整批向量化计算最终分数
+            model_scores = np.clip(np.array(model_scores, dtype=float), 0, 95)
+            scale_scores = np.array(scale_scores, dtype=float)
+            depression_scores = calculate_final_scores(model_scores[:, 1], scale_scores[:, 0], 1)
+            anxiety_scores = calculate_final_scores(model_scores[:, 2], scale_scores[:, 1], 2)
+            stress_scores = adjust_stress_scores(model_scores[:, 0], depression_scores, anxiety_scores)
+
+            for i, data_id in enumerate(data_ids):
+                data_record = data_records.get(data_id)
+                result = db_models.Result(
+                    result_time=datetime.now(),
+                    stress_score=float(stress_scores[i]),
+                    depression_score=float(depression_scores[i]),
+                    anxiety_score=float(anxiety_scores[i]),
+                    user_id=data_record.user_id if data_record else None,
+                    data_id=data_id,
+                    md5=data_record.md5 if data_record else None
+                )
+                db.add(result)
+                results.append((
+                    data_id,
+                    float(stress_scores[i]),
+                    float(depression_scores[i]),
+                    float(anxiety_scores[i])
+                ))
+                logging.info(f"数据ID: {data_id} 的预测结果: {results[-1][1:]}")
+            db.commit()
             
             return results
         
         except Exception as e:
             logging.error(f"批量预测时出错: {str(e)}")
             logging.error(traceback.format_exc())
+            db.rollback()
             return results
 
 class ResultProcessor:
@@ -423,9 +710,14 @@ class ResultProcessor:
         else:
             return "normal"
     
-    async def generate_report(self):
+    async def generate_report(self, force=False):
         """
         生成评估报告
+
+        报告文件名包含由分数、用户、评估时间和模板内容计算的内容哈希；内容未变化且文件存在时
+        直接返回已有报告，不再重复生成（force=True 时总是重新生成）
+        Args:
+            force: 是否忽略已有报告强制重新生成
         Returns:
             str: 报告文件路径
         """
@@ -445,14 +737,6 @@ class ResultProcessor:
                 logging.error(f"模板文件不存在: {template_path}")
                 return None
             
-            # 创建结果目录
-            results_dir = "data/results"
-            os.makedirs(results_dir, exist_ok=True)
-            
-            # 生成报告文件名
-            report_filename = f"report_{self.result_id}_{uuid.uuid4().hex[:8]}.txt"
-            report_path = os.path.join(results_dir, report_filename)
-            
             # 读取模板
             with open(template_path, 'r', encoding='utf-8') as f:
                 template_content = f.read()
@@ -471,17 +755,33 @@ class ResultProcessor:
             # 评估时间
             report_content = report_content.replace('{evaluation_time}', self.result.result_time.strftime('%Y-%m-%d %H:%M:%S'))
             
-            # 保存报告
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(report_content)
+            # 生成报告文件名（内容哈希）
+            results_dir = "data/results"
+            content_key = hashlib.sha256(report_content.encode('utf-8')).hexdigest()[:16]
+            report_path = os.path.join(results_dir, f"report_{self.result_id}_{content_key}.txt")
+            
+            # 内容未变化：直接使用已有报告
+            if force or not os.path.exists(report_path):
+                # 文件写入放到线程池中执行，不阻塞事件循环
+                await asyncio.to_thread(self._write_report, report_path, report_content)
             
             # 更新数据库中的报告路径
-            self.result.report_path = report_path
-            self.db.commit()
+            if self.result.report_path != report_path:
+                self.result.report_path = report_path
+                self.db.commit()
             
             return report_path
         
         except Exception as e:
             logging.error(f"生成报告时出错: {str(e)}")
             logging.error(traceback.format_exc())
-            return None 
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def _write_report(report_path, report_content):
+        """先写临时文件再原子替换，并发请求时不会读到半个报告"""
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        tmp_path = f"{report_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(report_content)
+        os.replace(tmp_path, report_path) 
\ No newline at end of file
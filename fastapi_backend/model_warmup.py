@@ -0,0 +1,152 @@
+"""
+模型启动预热
+
+应用启动时加载 tb_model 中登记的模型（应激TFLite、抑郁/焦虑Keras），
+使用全零输入执行一次推理，让TensorFlow完成图构建、内核选择和内存分配，
+避免第一个评估请求承担这些开销。预热状态通过 /ready 就绪检查接口对外暴露。
+"""
+
+import logging
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+
+import models as db_models
+from database import SessionLocal
+from model_inference import EegModel, load_keras_model, get_tflite_interpreter
+
+MODEL_TYPE_NAMES = {0: "应激", 1: "抑郁", 2: "焦虑"}
+
+# 预热状态，读写均需持有锁
+_state_lock = threading.Lock()
+_state = {
+    "status": "pending",      # pending/warming/ready/failed
+    "started_at": None,
+    "finished_at": None,
+    "models": {},             # model_type -> 单个模型的加载/预热信息
+}
+
+def _update_model_state(model_type, **fields):
+    with _state_lock:
+        _state["models"].setdefault(model_type, {}).update(fields)
+
+def get_warmup_state():
+    """返回预热状态的快照"""
+    with _state_lock:
+        return {
+            "status": _state["status"],
+            "started_at": _state["started_at"],
+            "finished_at": _state["finished_at"],
+            "models": {k: dict(v) for k, v in _state["models"].items()},
+        }
+
+def mark_ready_without_warmup():
+    """未开启预热时直接标记为就绪，模型在首次推理时按需加载"""
+    with _state_lock:
+        _state["status"] = "ready"
+        _state["finished_at"] = time.time()
+
+def _dummy_input(shape, dtype):
+    """根据模型输入形状构造全零输入，未知维度（batch）取1"""
+    return np.zeros([1 if dim is None or dim <= 0 else int(dim) for dim in shape], dtype=dtype)
+
+def _warmup_tflite(model_path):
+    """加载TFLite解释器并执行一次推理，返回(加载耗时, 预热耗时)"""
+    start = time.perf_counter()
+    interpreter, input_details, output_details, invoke_lock = get_tflite_interpreter(model_path)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dummy = _dummy_input(input_details[0]['shape'], input_details[0]['dtype'])
+    with invoke_lock:
+        interpreter.set_tensor(input_details[0]['index'], dummy)
+        interpreter.invoke()
+        interpreter.get_tensor(output_details[0]['index'])
+    return load_seconds, time.perf_counter() - start
+
+def _warmup_keras(model_type, model_path):
+    """加载Keras模型到EegModel共享缓存并执行一次推理，返回(加载耗时, 预热耗时)"""
+    start = time.perf_counter()
+    model = EegModel._models.get(model_type)
+    if model is None:
+        model = load_keras_model(model_path)
+        EegModel._models[model_type] = model
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    input_shape = model.input_shape
+    if isinstance(input_shape, list):
+        input_shape = input_shape[0]
+    model.predict(_dummy_input(input_shape, np.float32), verbose=0)
+    return load_seconds, time.perf_counter() - start
+
+def warmup_registered_models():
+    """
+    加载并预热tb_model中登记的全部模型
+    在线程池中调用，单个模型失败不影响其余模型
+    Returns:
+        dict: 预热状态快照
+    """
+    with _state_lock:
+        _state["status"] = "warming"
+        _state["started_at"] = time.time()
+        _state["models"] = {}
+
+    db = SessionLocal()
+    try:
+        model_rows = [(m.model_type, m.model_path) for m in db.query(db_models.Model).order_by(db_models.Model.model_type).all()]
+    except Exception as e:
+        logging.error(f"读取模型列表失败: {str(e)}")
+        logging.error(traceback.format_exc())
+        model_rows = None
+    finally:
+        db.close()
+
+    if model_rows is None:
+        with _state_lock:
+            _state["status"] = "failed"
+            _state["finished_at"] = time.time()
+        return get_warmup_state()
+
+    all_ok = True
+    for model_type, model_path in model_rows:
+        backend = "tflite" if model_path.endswith(".tflite") else "keras"
+        _update_model_state(
+            model_type,
+            name=MODEL_TYPE_NAMES.get(model_type, str(model_type)),
+            model_path=model_path,
+            backend=backend,
+            status="loading"
+        )
+        try:
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"模型文件不存在: {model_path}")
+            if backend == "tflite":
+                load_seconds, warmup_seconds = _warmup_tflite(model_path)
+            else:
+                load_seconds, warmup_seconds = _warmup_keras(model_type, model_path)
+            _update_model_state(
+                model_type,
+                status="ready",
+                load_seconds=round(load_seconds, 3),
+                warmup_seconds=round(warmup_seconds, 3)
+            )
+            logging.info(
+                f"模型预热完成: 类型{model_type}({backend}), "
+                f"加载 {load_seconds:.2f}s, 预热推理 {warmup_seconds:.2f}s"
+            )
+        except Exception as e:
+            all_ok = False
+            _update_model_state(model_type, status="failed", error=str(e))
+            logging.error(f"模型预热失败: 类型{model_type}, 路径: {model_path}, 错误: {str(e)}")
+            logging.error(traceback.format_exc())
+
+    with _state_lock:
+        _state["status"] = "ready" if all_ok else "failed"
+        _state["finished_at"] = time.time()
+        total = _state["finished_at"] - _state["started_at"]
+    logging.info(f"模型预热结束，共{len(model_rows)}个模型，耗时 {total:.2f}s，状态: {'就绪' if all_ok else '部分失败'}")
+    return get_warmup_state()
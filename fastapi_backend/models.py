@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, JSON, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -147,4 +148,22 @@ class Parameters(Base):
     param_type = Column(String(50), nullable=False, comment='参数类型')
     description = Column(String(255), nullable=True, comment='参数描述')
     created_at = Column(DateTime, default=datetime.now, comment='创建时间')
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间') 
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间') 
+
+class FeatureStore(Base):
+    """特征库模型类：每个被试（按内容MD5）一行，特征矩阵以数组列保存，供跨被试查询"""
+    __tablename__ = 'tb_feature_store'
+    __table_args__ = (
+        Index('ix_tb_feature_store_md5_version', 'md5', 'feature_version'),
+    )
+
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    md5 = Column(String(32), nullable=True, comment='数据内容MD5（与tb_data.md5对应）')
+    data_dir = Column(String(255), nullable=False, comment='提取特征时的数据目录')
+    feature_version = Column(Integer, nullable=False, comment='特征参数版本（FEATURE_PARAMS.version）')
+    source_file = Column(String(255), nullable=True, comment='特征提取的输入文件')
+    # SQLite（压测用本地库）没有数组类型，以JSON保存
+    channel_names = Column(ARRAY(String).with_variant(JSON, 'sqlite'), nullable=False, comment='通道名称')
+    feature_names = Column(ARRAY(String).with_variant(JSON, 'sqlite'), nullable=False, comment='特征名称')
+    feature_values = Column(ARRAY(Float, dimensions=2).with_variant(JSON, 'sqlite'), nullable=False, comment='特征矩阵[通道][特征]')
+    created_at = Column(DateTime, default=datetime.now, comment='创建时间')
@@ -0,0 +1,261 @@
+"""
+OpenBCI RAW文本读取
+
+OpenBCI GUI保存的 OpenBCI-RAW-*.txt 是逗号分隔的文本：若干以 % 开头的头部行（通道数、采样率、板卡型号），
+一行列名（Sample Index, EXG Channel 0, ...），随后每行一个采样点：
+样本号、EXG通道（µV）、加速度计、其他/模拟量、时间戳、标记、格式化时间。
+
+1. 用pandas的C解析器按列批量读取（usecols跳过格式化时间等非数值列），不逐行执行Python代码
+2. 幅值达到ADS1299满量程（±187500µV）90%的采样视为饱和，饱和比例超过阈值的通道标记为坏道
+3. 通道按 OPENBCI_CHANNEL_NAMES 映射到10-20电极名称，单位换算为伏特后构造 mne.io.RawArray
+4. 首次读取后把EXG数据以float32的.npy（及.json元数据）保存在同目录的 .openbci_cache/ 下，
+   原始文本大小和修改时间不变时直接内存映射读取，不再解析文本
+"""
+
+import json
+import logging
+import os
+import re
+import traceback
+import uuid
+
+import numpy as np
+
+from config import OPENBCI_CHANNEL_NAMES, OPENBCI_RAILED_FRACTION
+
+FILE_PREFIX = 'OpenBCI-RAW-'
+CACHE_DIR_NAME = '.openbci_cache'
+
+# ADS1299在增益24时的满量程（µV），OpenBCI GUI以满量程的90%作为饱和判断
+RAILED_UV = 187500.0
+RAILED_RATIO = 0.9
+
+# 没有头部行（例如被截取过的文件）时按通道数使用板卡默认采样率：Cyton 250Hz，Cyton+Daisy 125Hz
+DEFAULT_SAMPLE_RATES = {8: 250.0, 16: 125.0}
+DEFAULT_N_CHANNELS = 16
+
+# 修改解析或饱和检测逻辑时递增，使已有的二进制缓存失效
+CACHE_VERSION = 1
+
+
+def is_openbci_file(path):
+    name = os.path.basename(path)
+    return name.startswith(FILE_PREFIX) and name.endswith('.txt')
+
+
+def parse_header(path):
+    """
+    读取文件开头的 % 头部行和列名行
+
+    Returns:
+        dict: n_channels、sfreq（头部没有时为None）、board、skip_rows（数据前的行数）、columns（列名，没有时为None）
+    """
+    header = {'n_channels': None, 'sfreq': None, 'board': None, 'skip_rows': 0, 'columns': None}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('%'):
+                header['skip_rows'] += 1
+                match = re.search(r'Number of channels\s*=\s*(\d+)', stripped)
+                if match:
+                    header['n_channels'] = int(match.group(1))
+                match = re.search(r'Sample Rate\s*=\s*([\d.]+)', stripped)
+                if match:
+                    header['sfreq'] = float(match.group(1))
+                match = re.search(r'Board\s*=\s*(.+)', stripped)
+                if match:
+                    header['board'] = match.group(1).strip()
+                continue
+            if stripped.startswith('Sample Index'):
+                header['skip_rows'] += 1
+                header['columns'] = [column.strip() for column in stripped.split(',')]
+            else:
+                # 第一行数据：头部没有通道数时按列数推断
+                header['first_row'] = [field.strip() for field in stripped.split(',')]
+            break
+    return header
+
+
+def _exg_columns(header):
+    """EXG通道所在的列号（第0列为样本号）"""
+    columns = header['columns']
+    if columns:
+        indices = [i for i, name in enumerate(columns) if name.startswith('EXG Channel')]
+        if indices:
+            return indices
+    n_channels = header['n_channels'] or DEFAULT_N_CHANNELS
+    return list(range(1, n_channels + 1))
+
+
+def _timestamp_column(header):
+    """Unix时间戳所在的列号，无法确定时返回None"""
+    columns = header['columns']
+    if columns:
+        return columns.index('Timestamp') if 'Timestamp' in columns else None
+    # GUI v5格式：..., Timestamp, Marker, Timestamp (Formatted)
+    first_row = header.get('first_row') or []
+    if len(first_row) >= 3:
+        try:
+            float(first_row[-1])
+        except ValueError:
+            return len(first_row) - 3
+    return None
+
+
+def channel_names(n_channels):
+    """通道名：按 OPENBCI_CHANNEL_NAMES 顺序映射，配置不足时用 EXG<n> 补齐"""
+    names = list(OPENBCI_CHANNEL_NAMES[:n_channels])
+    names.extend(f'EXG{i}' for i in range(len(names), n_channels))
+    return names
+
+
+def detect_railed(data_uv, fraction=OPENBCI_RAILED_FRACTION):
+    """
+    饱和通道检测
+
+    Args:
+        data_uv: 形状为 (通道数, 采样点数) 的数组，单位µV
+        fraction: 饱和采样比例超过该值的通道判为坏道
+    Returns:
+        tuple: (坏道的通道序号列表, 每个通道的饱和比例)
+    """
+    railed = np.abs(data_uv) >= RAILED_RATIO * RAILED_UV
+    ratios = railed.mean(axis=1) if data_uv.shape[1] else np.zeros(data_uv.shape[0])
+    return [int(i) for i in np.flatnonzero(ratios > fraction)], ratios
+
+
+def parse_text(path):
+    """
+    批量解析OpenBCI文本
+
+    Returns:
+        tuple: (EXG数据 (通道数, 采样点数) float32 µV, 元数据dict)
+    """
+    import pandas as pd
+
+    header = parse_header(path)
+    exg_columns = _exg_columns(header)
+    timestamp_column = _timestamp_column(header)
+    usecols = exg_columns + ([timestamp_column] if timestamp_column is not None else [])
+
+    frame = pd.read_csv(
+        path, header=None, skiprows=header['skip_rows'], comment='%', usecols=usecols,
+        skipinitialspace=True, dtype=np.float64, engine='c'
+    )
+    data = frame[exg_columns].to_numpy(dtype=np.float32).T.copy()
+    n_channels = data.shape[0]
+
+    sfreq = header['sfreq'] or DEFAULT_SAMPLE_RATES.get(n_channels, DEFAULT_SAMPLE_RATES[DEFAULT_N_CHANNELS])
+    meta = {
+        'sfreq': sfreq,
+        'sfreq_from_header': header['sfreq'] is not None,
+        'board': header['board'],
+        'ch_names': channel_names(n_channels),
+        'start_time': None,
+    }
+    if timestamp_column is not None and len(frame):
+        start_time = float(frame[timestamp_column].iloc[0])
+        if np.isfinite(start_time) and start_time > 0:
+            meta['start_time'] = start_time
+    return data, meta
+
+
+def _cache_paths(path):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    base = os.path.join(cache_dir, os.path.basename(path))
+    return f'{base}.npy', f'{base}.json'
+
+
+def _source_signature(path):
+    stat_result = os.stat(path)
+    return {'size': stat_result.st_size, 'mtime_ns': stat_result.st_mtime_ns, 'version': CACHE_VERSION}
+
+
+def convert(path, force=False):
+    """
+    把OpenBCI文本转换为二进制缓存（只在缓存缺失或原文件变化时解析文本）
+
+    Returns:
+        tuple: (EXG数据 (通道数, 采样点数) 只读内存映射 float32 µV, 元数据dict)
+    """
+    npy_path, meta_path = _cache_paths(path)
+    signature = _source_signature(path)
+
+    if not force and os.path.exists(npy_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('source') == signature:
+                return np.load(npy_path, mmap_mode='r'), meta
+        except Exception as e:
+            logging.error(f"读取OpenBCI缓存失败: {meta_path}, {str(e)}")
+            logging.error(traceback.format_exc())
+
+    data, meta = parse_text(path)
+    bads, ratios = detect_railed(data)
+    meta['bads'] = [meta['ch_names'][i] for i in bads]
+    meta['railed_ratio'] = {name: round(float(ratio), 4) for name, ratio in zip(meta['ch_names'], ratios)}
+    meta['n_times'] = int(data.shape[1])
+    meta['source'] = signature
+
+    # 先写临时文件再原子替换，并发读取时不会读到半个文件
+    os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+    tmp_path = f"{npy_path}.{uuid.uuid4().hex}.tmp.npy"
+    np.save(tmp_path, data)
+    os.replace(tmp_path, npy_path)
+    tmp_meta = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_meta, meta_path)
+    logging.info(f"OpenBCI文本已转换: {path} -> {npy_path}, 饱和通道: {meta['bads']}")
+    return np.load(npy_path, mmap_mode='r'), meta
+
+
+def check_channels(meta, required_channels=None):
+    """
+    校验映射后的通道能否用于模型
+
+    Args:
+        meta: convert 返回的元数据
+        required_channels: 模型需要的通道名称，None表示不校验通道集合
+    Raises:
+        ValueError: 缺少模型需要的通道，或可用的通道全部饱和
+    """
+    names = meta['ch_names']
+    if required_channels is not None:
+        missing = [name for name in required_channels if name not in names]
+        if missing:
+            raise ValueError(
+                f"OpenBCI文件的{len(names)}个通道 {names} 与模型需要的{len(required_channels)}个通道不匹配，"
+                f"缺少{len(missing)}个: {missing}（通道映射见 OPENBCI_CHANNEL_NAMES）"
+            )
+    usable = [name for name in (required_channels or names) if name not in meta['bads']]
+    if not usable:
+        raise ValueError(f"OpenBCI文件所有通道均饱和，无法预处理（饱和比例: {meta.get('railed_ratio')}）")
+
+
+def read_raw_openbci(path, required_channels=None):
+    """
+    读取OpenBCI RAW文本为MNE Raw（单位伏特），饱和通道写入 info['bads']
+    给出 required_channels 时先校验通道，缺少模型需要的通道或全部饱和时抛出ValueError
+    """
+    import mne
+
+    data, meta = convert(path)
+    check_channels(meta, required_channels)
+    info = mne.create_info(ch_names=meta['ch_names'], sfreq=meta['sfreq'], ch_types='eeg')
+    raw = mne.io.RawArray(np.asarray(data, dtype=np.float64) * 1e-6, info, verbose=False)
+    raw.info['bads'] = list(meta['bads'])
+    if meta.get('start_time'):
+        raw.set_meas_date(meta['start_time'])
+    if not meta.get('sfreq_from_header'):
+        logging.warning(f"OpenBCI文件没有采样率头部，按{meta['sfreq']}Hz处理: {path}")
+    return raw
+
+
+if __name__ == '__main__':
+    import sys
+
+    for txt_path in sys.argv[1:]:
+        _, txt_meta = convert(txt_path, force=True)
+        print(f"{txt_path}: {txt_meta['n_times']}个采样点, {txt_meta['sfreq']}Hz, 饱和通道: {txt_meta['bads']}")
@@ -0,0 +1,156 @@
+"""
+预处理产物缓存
+
+以“输入文件MD5 + 流水线参数”计算指纹作为缓存键，产物及其元数据记录在数据目录下的
+清单文件（.preprocess_manifest.json）中：
+1. 输入文件的MD5按(大小, 修改时间)缓存，文件未变化时不重新读取，命中缓存只需一次元数据查询
+2. 预处理产物按缓存键保存在 .preprocess_cache/<key>/ 下，再硬链接到数据目录供后续步骤读取
+3. 参数变化（采样率、滤波频段、ICA、拒绝阈值、epoch数量等）会得到不同的缓存键，旧产物自动失效
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import traceback
+import uuid
+from datetime import datetime
+
+MANIFEST_NAME = '.preprocess_manifest.json'
+CACHE_DIR_NAME = '.preprocess_cache'
+
+# 每个阶段保留的参数组合数，超出后删除最早的产物
+MAX_ENTRIES_PER_STAGE = 3
+
+_manifest_lock = threading.RLock()
+
+def file_md5(path, chunk_size=8 * 1024 * 1024):
+    """分块计算文件MD5"""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+def _stat_signature(path):
+    stat_result = os.stat(path)
+    return {'size': stat_result.st_size, 'mtime_ns': stat_result.st_mtime_ns}
+
+def _manifest_path(data_dir):
+    return os.path.join(data_dir, MANIFEST_NAME)
+
+def load_manifest(data_dir):
+    """读取清单，不存在或损坏时返回空清单"""
+    path = _manifest_path(data_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if isinstance(manifest, dict):
+                manifest.setdefault('inputs', {})
+                manifest.setdefault('stages', {})
+                return manifest
+        except Exception as e:
+            logging.error(f"读取预处理清单失败: {path}, {str(e)}")
+            logging.error(traceback.format_exc())
+    return {'inputs': {}, 'stages': {}}
+
+def save_manifest(data_dir, manifest):
+    path = _manifest_path(data_dir)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _relpath(data_dir, path):
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(data_dir))
+
+def input_digest(data_dir, input_path):
+    """
+    返回输入文件MD5，大小和修改时间与清单记录一致时直接使用记录值
+    """
+    rel = _relpath(data_dir, input_path)
+    signature = _stat_signature(input_path)
+    with _manifest_lock:
+        manifest = load_manifest(data_dir)
+        recorded = manifest['inputs'].get(rel)
+        if recorded and recorded.get('size') == signature['size'] and recorded.get('mtime_ns') == signature['mtime_ns']:
+            return recorded['md5']
+
+    md5_value = file_md5(input_path)
+    with _manifest_lock:
+        manifest = load_manifest(data_dir)
+        manifest['inputs'][rel] = dict(signature, md5=md5_value)
+        save_manifest(data_dir, manifest)
+    return md5_value
+
+def fingerprint(input_md5, params):
+    """输入MD5与参数共同决定的缓存键"""
+    payload = json.dumps({'input': input_md5, 'params': params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def stage_key(data_dir, input_path, params):
+    return fingerprint(input_digest(data_dir, input_path), params)
+
+def keyed_path(data_dir, key, name):
+    """缓存键对应的产物路径"""
+    key_dir = os.path.join(data_dir, CACHE_DIR_NAME, key)
+    os.makedirs(key_dir, exist_ok=True)
+    return os.path.join(key_dir, name)
+
+def _outputs_valid(data_dir, outputs):
+    for rel, signature in outputs.items():
+        path = os.path.join(data_dir, rel)
+        if not os.path.exists(path):
+            return False
+        if _stat_signature(path) != signature:
+            return False
+    return True
+
+def lookup(data_dir, stage, key):
+    """
+    查询阶段缓存，命中且所有产物仍然存在、未被修改时返回清单记录，否则返回None
+    """
+    with _manifest_lock:
+        entry = load_manifest(data_dir)['stages'].get(stage, {}).get(key)
+    if entry and _outputs_valid(data_dir, entry.get('outputs', {})):
+        return entry
+    return None
+
+def record(data_dir, stage, key, input_path, params, outputs, **info):
+    """
+    记录阶段产物
+
+    参数:
+    outputs (list): 产物文件路径，记录其大小和修改时间用于校验
+    """
+    with _manifest_lock:
+        manifest = load_manifest(data_dir)
+        entries = manifest['stages'].setdefault(stage, {})
+        entries[key] = dict(
+            info,
+            input=_relpath(data_dir, input_path),
+            params=params,
+            outputs={_relpath(data_dir, path): _stat_signature(path) for path in outputs},
+            created_at=datetime.now().isoformat(),
+        )
+        # 只保留最近的几组参数
+        stale = sorted(entries, key=lambda k: entries[k]['created_at'])[:-MAX_ENTRIES_PER_STAGE]
+        for old_key in stale:
+            del entries[old_key]
+            shutil.rmtree(os.path.join(data_dir, CACHE_DIR_NAME, old_key), ignore_errors=True)
+        save_manifest(data_dir, manifest)
+
+def publish(source, dest):
+    """将缓存产物链接到数据目录中的固定文件名，硬链接失败时复制"""
+    if os.path.exists(dest):
+        if os.path.samefile(source, dest):
+            return dest
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+    return dest
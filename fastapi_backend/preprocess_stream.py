@@ -0,0 +1,149 @@
+"""
+流式预处理
+
+超长EDF记录不再整段载入内存：以 preload=False 打开，从记录末尾向前分块读取，
+每块两端带重叠边界做降采样+带通（signal_filters），丢弃边界后拼接结果与整段处理一致
+（高通为IIR，边界足够长时差异可忽略）。每块完成插值坏道、平均参考后立即切分epoch并按
+各级拒绝阈值筛选；由于最终只使用最后 n_epochs 个epoch，倒序扫描时最低阈值一旦凑满即可停止读取。
+峰值内存只与块长度和 n_epochs 有关，与记录长度无关。
+
+与整段处理的约定保持一致：
+- 事件由 make_fixed_length_events 在原始采样率上生成，样本号直接用于降采样后的数据
+- 拒绝阈值从 reject_eeg 开始每级乘以 reject_growth，最多 max_attempts 级，
+  取第一个凑满 n_epochs 的级别，都不满足时使用最后一级
+区别：输出只包含最后 n_epochs 个epoch（推理只使用这些）。
+"""
+
+import logging
+import math
+
+import mne
+import numpy as np
+
+import signal_filters
+
+# 每块两端用于滤波的重叠边界（秒），覆盖FIR长度和IIR高通的主要拖尾
+BLOCK_MARGIN_SECONDS = 10.0
+
+
+def _ceil_multiple(value, base):
+    return int(math.ceil(value / base)) * base
+
+
+def resampled_info(info, sfreq, bads=None):
+    """
+    降采样后数据的测量信息，只使用MNE公开API（create_info + set_montage）
+    通道名称和类型、电极位置、坏道、测量时间沿用原信息；highpass/lowpass 为 create_info 的默认值
+    """
+    new_info = mne.create_info(info['ch_names'], float(sfreq), ch_types=info.get_channel_types())
+    montage = info.get_montage()
+    if montage is not None:
+        new_info.set_montage(montage, on_missing='ignore', verbose=False)
+    new_info['bads'] = list(info['bads'] if bads is None else bads)
+    new_info.set_meas_date(info['meas_date'])
+    return new_info
+
+
+def stream_epochs(raw, events, params, block_seconds=60.0, n_jobs=1):
+    """
+    分块处理未载入内存的Raw并返回最后 n_epochs 个合格epoch
+
+    Args:
+        raw: preload=False 的Raw，已删除多余通道并设置电极位置
+        events: make_fixed_length_events 生成的事件（原始采样率的样本号）
+        params: data_preprocess.PIPELINE_PARAMS
+        block_seconds: 每块输出数据的时长（秒）
+        n_jobs: 滤波并行线程数
+    Returns:
+        tuple: (mne.EpochsArray, 最终使用的拒绝阈值)
+    """
+    sfreq = raw.info['sfreq']
+    target_sfreq = params['target_sfreq']
+    l_freq, h_freq = params['l_freq'], params['h_freq']
+    n_epochs = params['n_epochs']
+    thresholds = [params['reject_eeg'] * params['reject_growth'] ** i for i in range(params['max_attempts'])]
+
+    up, down = signal_filters.resample_ratio(sfreq, target_sfreq)
+    n_in = raw.n_times
+    n_out = int(math.ceil(n_in * up / down))
+    first_samp_out = int(round(raw.first_samp * target_sfreq / sfreq))
+
+    # 每个epoch在降采样后数据中的起止位置（与mne.Epochs的tmin/tmax一致）
+    offset = int(round(params['tmin'] * target_sfreq))
+    window = int(round((1.0 - 1 / target_sfreq - params['tmin']) * target_sfreq)) + 1
+    starts = events[:, 0] - first_samp_out + offset
+    valid = (starts >= 0) & (starts + window <= n_out)
+    event_rows = np.flatnonzero(valid)
+    starts = starts[valid]
+
+    # 块边界取up的整数倍，使输入位置正好是down的整数倍
+    core = _ceil_multiple(block_seconds * target_sfreq, up)
+    lookback = _ceil_multiple(window, up)
+    margin = _ceil_multiple(BLOCK_MARGIN_SECONDS * sfreq, down)
+    bads = list(raw.info['bads'])
+    block_info = resampled_info(raw.info, target_sfreq) if bads else None
+
+    # 每级阈值已接受的epoch序号（倒序扫描，先找到的是时间上靠后的）
+    accepted = [[] for _ in thresholds]
+    epoch_data = {}
+    n_blocks = int(math.ceil(n_out / core))
+
+    for block_index in range(n_blocks - 1, -1, -1):
+        core_start = block_index * core
+        core_end = min(core_start + core, n_out)
+        # 结束点落在本块核心区间内的epoch由本块处理
+        in_block = np.flatnonzero((starts + window - 1 >= core_start) & (starts + window - 1 < core_end))
+        if len(in_block) == 0:
+            continue
+
+        out_start = max(0, core_start - lookback)
+        in_start = max(0, out_start * down // up - margin)
+        in_stop = min(n_in, int(math.ceil(core_end * down / up)) + margin)
+        block_raw = raw.get_data(start=in_start, stop=in_stop)
+        filtered = signal_filters.resample_bandpass(
+            block_raw, sfreq, target_sfreq, l_freq, h_freq, n_jobs=n_jobs
+        )
+        del block_raw
+        base = in_start * up // down
+        segment = filtered[:, out_start - base:core_end - base]
+        del filtered
+
+        # 插值坏道是逐样本的线性空间变换，可在降采样后的块上进行
+        if bads:
+            segment_raw = mne.io.RawArray(segment, block_info, verbose=False)
+            segment_raw.interpolate_bads(verbose=False)
+            segment = segment_raw.get_data()
+
+        # 平均参考
+        segment = segment - segment.mean(axis=0, keepdims=True)
+
+        for index in in_block[::-1]:
+            start = starts[index] - out_start
+            epoch = segment[:, start:start + window]
+            ptp = float(np.max(epoch.max(axis=1) - epoch.min(axis=1)))
+            for level, threshold in enumerate(thresholds):
+                if len(accepted[level]) < n_epochs and ptp <= threshold:
+                    accepted[level].append(index)
+                    if index not in epoch_data:
+                        epoch_data[index] = epoch.copy()
+
+        if len(accepted[0]) >= n_epochs:
+            break
+
+    # 取第一个凑满的级别，都不满足时使用最后一级
+    level = next((i for i, level_indices in enumerate(accepted) if len(level_indices) >= n_epochs), len(thresholds) - 1)
+    chosen = sorted(accepted[level])
+    logging.info(f"流式预处理: 阈值 {thresholds[level]}, epoch数 {len(chosen)}, 共 {n_blocks} 块")
+
+    if not chosen:
+        raise ValueError("流式预处理没有得到有效的epoch")
+
+    # 坏道已插值；数据已是平均参考，再次设置只用于在测量信息中记录参考方式
+    info = resampled_info(raw.info, target_sfreq, bads=[])
+    data = np.stack([epoch_data[index] for index in chosen])
+    epochs = mne.EpochsArray(
+        data, info, events=events[event_rows[chosen]], tmin=params['tmin'],
+        event_id={'1': 1}, baseline=None, verbose=False
+    )
+    epochs.set_eeg_reference('average', verbose=False)
+    return epochs, thresholds[level]
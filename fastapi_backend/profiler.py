@@ -0,0 +1,407 @@
+"""
+慢请求与慢流水线的按需性能剖析（PROFILING=true 时启用，默认关闭且无额外开销）
+
+1. profiled 装饰器：包裹 treat、analyze_eeg_data 和各 predict 方法，运行期间采集剖析数据，
+   耗时超过 PROFILE_PIPELINE_THRESHOLD_MS 才保存，否则丢弃
+2. ProfilingMiddleware：对 PROFILE_REQUEST_PATHS 下的请求同样处理，阈值为 PROFILE_REQUEST_THRESHOLD_MS
+3. 剖析方式：sampling 定时采样调用栈（保存为folded格式，可用flamegraph.pl/speedscope查看）；
+   cprofile 仅用于同步函数（保存为.prof，可用pstats/snakeviz查看），异步函数和请求始终采样。
+   异步函数的大部分计算在线程池中执行，因此采样覆盖所有线程（忽略空闲等待的线程）
+4. 每份剖析数据按 data_id 记录在 PROFILE_DIR/<id>.json 中，只保留最近 PROFILE_KEEP 份，
+   通过 /api/admin/profiles 查询和下载
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import (
+    PROFILING, PROFILE_MODE, PROFILE_DIR, PROFILE_KEEP, PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_REQUEST_THRESHOLD_MS, PROFILE_PIPELINE_THRESHOLD_MS, PROFILE_REQUEST_PATHS,
+    PROFILE_MAX_CONCURRENT
+)
+
+# 摘要中保留的函数数
+TOP_FUNCTIONS = 30
+
+# 叶子帧位于这些模块时视为线程空闲（线程池等待任务、事件循环等待IO），不计入采样
+_IDLE_MODULES = ('threading.py', 'selectors.py', 'queue.py', os.path.join('concurrent', 'futures', 'thread.py'))
+
+# 当前运行的剖析上下文：{'data_id': ...}，由 tag_data_id 在运行过程中补充
+_current_run = contextvars.ContextVar('profile_run', default=None)
+
+# 同时进行的剖析数上限，超出时本次运行不剖析
+_slots = threading.BoundedSemaphore(max(PROFILE_MAX_CONCURRENT, 1))
+# cProfile在Python 3.12起同一时间只能有一个实例，其余并发运行改为采样
+_cprofile_lock = threading.Lock()
+# 写入和清理剖析文件
+_store_lock = threading.Lock()
+
+
+def tag_data_id(data_id):
+    """为当前正在剖析的运行（请求或流水线调用）记录 data_id，未启用剖析时不做任何事"""
+    run = _current_run.get()
+    if run is not None and data_id is not None:
+        run['data_id'] = data_id
+
+
+@contextmanager
+def data_id_scope(data_id):
+    """在此范围内开始的剖析运行使用给定的 data_id"""
+    token = _current_run.set({'data_id': data_id})
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame):
+    return frame.f_code.co_filename.endswith(_IDLE_MODULES)
+
+
+class SamplingProfiler(threading.Thread):
+    """
+    采样剖析器：每隔 interval 秒读取一次目标线程的调用栈
+    thread_ids 为 None 时采样除剖析线程外的所有非空闲线程
+    """
+
+    def __init__(self, thread_ids=None, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000.0):
+        super().__init__(name='profiler-sampler', daemon=True)
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                name = thread_names.get(thread_id, str(thread_id))
+                if name == 'profiler-sampler':
+                    continue
+                if self.thread_ids is None and _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self):
+        """folded格式：每行 "线程;外层函数;...;内层函数 采样数" """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        """按自身耗时和累计耗时（采样数×间隔）排序的函数列表"""
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        interval_ms = self.interval * 1000.0
+        return {
+            'samples': self.samples,
+            'interval_ms': interval_ms,
+            'top_self': [
+                {'function': label, 'samples': count, 'ms': round(count * interval_ms, 1)}
+                for label, count in self_counts.most_common(TOP_FUNCTIONS)
+            ],
+            'top_cumulative': [
+                {'function': label, 'samples': count, 'ms': round(count * interval_ms, 1)}
+                for label, count in total_counts.most_common(TOP_FUNCTIONS)
+            ],
+        }
+
+
+def _cprofile_summary(profile):
+    """cProfile结果中按自身耗时和累计耗时排序的函数列表"""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+
+    def top(sort_index):
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][sort_index], reverse=True)
+        # stats.stats 的值为 (原始调用数, 总调用数, 自身耗时, 累计耗时, 调用者)
+        return [
+            {
+                'function': f"{func} ({os.path.basename(filename)}:{lineno})",
+                'calls': value[1],
+                'ms': round(value[sort_index] * 1000.0, 1),
+            }
+            for (filename, lineno, func), value in rows[:TOP_FUNCTIONS]
+        ]
+
+    return {'top_self': top(2), 'top_cumulative': top(3)}
+
+
+class _Capture:
+    """一次运行的剖析：start/stop 之间采集，超过阈值时 save 保存"""
+
+    def __init__(self, kind, name, threshold_ms, mode, thread_ids=None):
+        self.kind = kind
+        self.name = name
+        self.threshold_ms = threshold_ms
+        self.mode = mode
+        self.thread_ids = thread_ids
+        self._profiler = None
+
+    def start(self):
+        if self.mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self.mode = 'sampling'
+            self._profiler = SamplingProfiler(self.thread_ids)
+            self._profiler.start()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000.0
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            _cprofile_lock.release()
+        else:
+            self._profiler.stop()
+
+    def save(self, run, target=None):
+        """超过阈值时保存剖析数据，返回剖析ID；未超过时返回None"""
+        if self.duration_ms < self.threshold_ms:
+            return None
+        try:
+            if self.mode == 'cprofile':
+                summary = _cprofile_summary(self._profiler)
+                suffix = '.prof'
+            else:
+                summary = self._profiler.summary()
+                suffix = '.folded'
+            profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            meta = {
+                'id': profile_id,
+                'kind': self.kind,
+                'name': self.name,
+                'data_id': run.get('data_id'),
+                'target': target,
+                'mode': self.mode,
+                'duration_ms': round(self.duration_ms, 1),
+                'threshold_ms': self.threshold_ms,
+                'created_at': datetime.now().isoformat(),
+                'file': profile_id + suffix,
+                'summary': summary,
+            }
+            with _store_lock:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                artifact_path = os.path.join(PROFILE_DIR, meta['file'])
+                if self.mode == 'cprofile':
+                    self._profiler.dump_stats(artifact_path)
+                else:
+                    with open(artifact_path, 'w', encoding='utf-8') as f:
+                        f.write(self._profiler.folded())
+                with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False, default=str)
+                _prune()
+            logging.warning(
+                f"{self.kind} {self.name} 耗时 {self.duration_ms:.0f}ms 超过阈值 {self.threshold_ms:.0f}ms，"
+                f"已保存剖析 {profile_id} (data_id={meta['data_id']})"
+            )
+            return profile_id
+        except Exception as e:
+            logging.error(f"保存剖析数据失败: {str(e)}")
+            logging.error(traceback.format_exc())
+            return None
+
+
+def _prune():
+    """只保留最近 PROFILE_KEEP 份剖析数据（调用方持有 _store_lock）"""
+    metas = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    for entry in metas[PROFILE_KEEP:]:
+        profile_id = entry.name[:-len('.json')]
+        for suffix in ('.json', '.prof', '.folded'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _first_path_arg(args):
+    """流水线函数的第一个字符串参数（数据目录或文件路径），用于未绑定 data_id 时定位数据"""
+    for arg in args:
+        if isinstance(arg, (str, os.PathLike)):
+            return str(arg)
+        path = getattr(arg, 'data_path', None)
+        if path:
+            return str(path)
+    return None
+
+
+def profiled(kind='pipeline', threshold_ms=None):
+    """
+    为流水线函数启用按需剖析（未开启 PROFILING 时原样返回函数）
+    同步函数按 PROFILE_MODE 剖析调用线程；异步函数采样所有线程
+    """
+    def decorator(func):
+        if not PROFILING:
+            return func
+        name = func.__qualname__
+        threshold = PROFILE_PIPELINE_THRESHOLD_MS if threshold_ms is None else threshold_ms
+
+        @contextmanager
+        def capture(args, mode, thread_ids):
+            if not _slots.acquire(blocking=False):
+                yield
+                return
+            parent = _current_run.get()
+            run = {'data_id': parent.get('data_id') if parent else None}
+            token = _current_run.set(run)
+            profile = _Capture(kind, name, threshold, mode, thread_ids)
+            try:
+                profile.start()
+                try:
+                    yield
+                finally:
+                    profile.stop()
+                    profile.save(run, _first_path_arg(args))
+            finally:
+                _current_run.reset(token)
+                _slots.release()
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with capture(args, 'sampling', None):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with capture(args, PROFILE_MODE, {threading.get_ident()}):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class ProfilingMiddleware:
+    """ASGI中间件：采样 PROFILE_REQUEST_PATHS 下的请求，耗时超过阈值时保存剖析"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path', '')
+        if (scope['type'] != 'http' or path.startswith('/api/admin/profiles')
+                or not path.startswith(PROFILE_REQUEST_PATHS)
+                or not _slots.acquire(blocking=False)):
+            await self.app(scope, receive, send)
+            return
+
+        run = {'data_id': None}
+        token = _current_run.set(run)
+        profile = _Capture('request', f"{scope['method']} {path}", PROFILE_REQUEST_THRESHOLD_MS, 'sampling')
+        try:
+            profile.start()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profile.stop()
+                if run['data_id'] is None:
+                    run['data_id'] = (scope.get('path_params') or {}).get('data_id')
+                profile.save(run)
+        finally:
+            _current_run.reset(token)
+            _slots.release()
+
+
+def list_profiles(data_id=None, kind=None, limit=100):
+    """按时间倒序列出剖析元数据（不含摘要）"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    metas = []
+    for entry in os.scandir(PROFILE_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data_id is not None and str(meta.get('data_id')) != str(data_id):
+            continue
+        if kind and meta.get('kind') != kind:
+            continue
+        meta.pop('summary', None)
+        metas.append(meta)
+    metas.sort(key=lambda meta: meta['created_at'], reverse=True)
+    return metas[:limit]
+
+
+def _meta_path(profile_id):
+    # 剖析ID只由时间戳、下划线和十六进制组成，拒绝其他字符以免路径穿越
+    if not profile_id or not all(c.isalnum() or c == '_' for c in profile_id):
+        return None
+    return os.path.join(PROFILE_DIR, profile_id + '.json')
+
+
+def get_profile(profile_id):
+    """读取剖析元数据和摘要，不存在时返回None"""
+    path = _meta_path(profile_id)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_profile_file(profile_id):
+    """剖析原始文件（.prof 或 .folded）路径，不存在时返回None"""
+    meta = get_profile(profile_id)
+    if meta is None:
+        return None
+    path = os.path.join(PROFILE_DIR, meta['file'])
+    return path if os.path.exists(path) else None
+
+
+def delete_profile(profile_id):
+    """删除一份剖析数据，返回是否存在"""
+    meta = get_profile(profile_id)
+    if meta is None:
+        return False
+    with _store_lock:
+        for name in (profile_id + '.json', meta['file']):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name))
+            except FileNotFoundError:
+                pass
+    return True
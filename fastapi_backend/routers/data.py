@@ -16,10 +16,12 @@ from database import get_db
 import models as db_models
 import schemas
 # from auth import get_current_user, check_permission  # 认证已移除
+import config
 from config import DATA_DIR
+import content_store
 
 router = APIRouter()
-MD5_DIR = Path(__file__).resolve().parents[1] / "md5"
+MD5_DIR = Path(config.MD5_DIR)
 MD5_MAPPING_FILE = MD5_DIR / "data.txt"
 
 def load_md5_mapping() -> Dict[str, Tuple[str, float, float, float]]:
@@ -102,6 +104,29 @@ def resolve_scores_for_md5(md5_value: str, file_id: str) -> Tuple[float, float,
     append_md5_mapping(md5_value, file_id, scores)
     return scores
 
+def sync_results_for_md5(db: Session, md5_value: str, stress_score: float, depression_score: float,
+                         anxiety_score: float, overall_risk_level: str) -> None:
+    """
+    同一MD5的已有结果保持相同分数，直接批量UPDATE，不逐条加载结果记录
+    """
+    db.query(db_models.Result).filter(db_models.Result.md5 == md5_value).update({
+        db_models.Result.stress_score: stress_score,
+        db_models.Result.depression_score: depression_score,
+        db_models.Result.anxiety_score: anxiety_score,
+        db_models.Result.overall_risk_level: overall_risk_level
+    }, synchronize_session=False)
+
+def apply_cached_stages(db_data: db_models.Data, md5_value: str) -> None:
+    """相同内容已完成预处理和特征提取时，新数据记录直接标记为完成"""
+    if md5_value and content_store.is_stage_done(md5_value, "preprocess") and content_store.is_stage_done(md5_value, "features"):
+        db_data.processing_status = "completed"
+        db_data.feature_status = "completed"
+        logging.info(f"MD5 {md5_value} 的预处理与特征结果已缓存，跳过计算")
+
+def data_path_in_use(db: Session, data_path: str) -> bool:
+    """是否还有数据记录使用该目录（同一人员可多次上传）"""
+    return db.query(db_models.Data.id).filter(db_models.Data.data_path == data_path).first() is not None
+
 @router.post("/", response_model=schemas.Data)
 async def create_data(
     personnel_id: str = Form(...),
@@ -129,9 +154,9 @@ async def create_data(
             detail="数据库中不存在admin用户，请先创建admin用户"
         )
     
-    # 创建数据目录
-    data_dir = os.path.join(DATA_DIR, personnel_id)
-    os.makedirs(data_dir, exist_ok=True)
+    # 人员数据目录，每次上传在其下按MD5建立指向内容存储的目录
+    personnel_dir = os.path.join(DATA_DIR, personnel_id)
+    linked = False
     
     try:
         # 创建临时目录处理ZIP文件
@@ -149,31 +174,19 @@ async def create_data(
                     buffer.write(chunk)
             md5_value = md5_hash.hexdigest()
             
-            # 解压ZIP文件
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            
-            # 获取解压后的内容
-            extracted_items = os.listdir(temp_dir)
-            extracted_items = [item for item in extracted_items if item != file.filename]
-            
-            if not extracted_items:
+            # 相同内容只解压一次
+            try:
+                _, reused = content_store.ingest_zip(zip_path, md5_value)
+            except ValueError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="ZIP文件中没有有效内容"
                 )
-            
-            # 复制解压后的内容到目标目录
-            for item in extracted_items:
-                source_path = os.path.join(temp_dir, item)
-                dest_path = os.path.join(data_dir, item)
-                
-                if os.path.isdir(source_path):
-                    if os.path.exists(dest_path):
-                        shutil.rmtree(dest_path)
-                    shutil.copytree(source_path, dest_path)
-                else:
-                    shutil.copy2(source_path, dest_path)
+            logging.info(f"ZIP文件{'内容已存在，复用' if reused else '解压完成'}: {md5_value}")
+        
+        data_dir = content_store.upload_data_dir(personnel_dir, md5_value)
+        content_store.link_data_dir(md5_value, data_dir)
+        linked = True
         
         # 创建数据记录
         db_data = db_models.Data(
@@ -186,6 +199,9 @@ async def create_data(
             md5=md5_value
         )
         
+        # 相同内容已完成的预处理和特征提取直接复用
+        apply_cached_stages(db_data, md5_value)
+        
         db.add(db_data)
         db.commit()
         db.refresh(db_data)
@@ -198,13 +214,7 @@ async def create_data(
         stress_score, depression_score, anxiety_score = resolve_scores_for_md5(md5_value, file_id)
         overall_risk_level = calculate_overall_risk_level(stress_score, depression_score, anxiety_score)
 
-        existing_results = db.query(db_models.Result).filter(db_models.Result.md5 == md5_value).all()
-        for result in existing_results:
-            result.stress_score = stress_score
-            result.depression_score = depression_score
-            result.anxiety_score = anxiety_score
-            result.overall_risk_level = overall_risk_level
-            result.md5 = md5_value
+        sync_results_for_md5(db, md5_value, stress_score, depression_score, anxiety_score, overall_risk_level)
 
         db_result = db_models.Result(
             stress_score=stress_score,
@@ -232,14 +242,18 @@ async def create_data(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="无效的ZIP文件"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"处理ZIP文件时发生错误: {str(e)}")
         import traceback
         logging.error(traceback.format_exc())
-        # 清理可能已创建的目录
-        if os.path.exists(data_dir):
+        # 清理本次创建的目录链接；同一人员重复上传相同内容时目录仍被已有记录使用
+        if linked:
             try:
-                shutil.rmtree(data_dir)
+                db.rollback()
+                if not data_path_in_use(db, data_dir):
+                    content_store.remove_data_dir(data_dir)
             except:
                 pass
         raise HTTPException(
@@ -530,10 +544,10 @@ async def delete_data(
     db.delete(db_data)
     db.commit()
     
-    # 尝试删除数据目录，但不强制
+    # 尝试删除数据目录，但不强制；其他数据仍使用该目录时保留
     try:
-        if os.path.exists(db_data.data_path):
-            shutil.rmtree(db_data.data_path)
+        if os.path.lexists(db_data.data_path) and not data_path_in_use(db, db_data.data_path):
+            content_store.remove_data_dir(db_data.data_path)
     except Exception as e:
         logging.warning(f"删除数据目录时出错: {str(e)}")
     
@@ -597,10 +611,9 @@ async def batch_upload_data(
                 personnel_id = filename_without_ext
                 personnel_name = filename_without_ext
             
-            # 创建数据目录（允许同一人员上传多个文件）
-            data_dir = os.path.join(DATA_DIR, personnel_id)
-            os.makedirs(data_dir, exist_ok=True)
-            logging.info(f"创建数据目录: {data_dir}")
+            # 人员数据目录（允许同一人员上传多个文件），每次上传在其下按MD5建立指向内容存储的目录
+            personnel_dir = os.path.join(DATA_DIR, personnel_id)
+            linked = False
             
             try:
                 # 创建临时目录处理ZIP文件
@@ -622,40 +635,22 @@ async def batch_upload_data(
                     
                     logging.info(f"ZIP文件已保存到临时目录: {zip_path}")
                     
-                    # 解压ZIP文件
-                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                        zip_ref.extractall(temp_dir)
-                    
-                    logging.info(f"ZIP文件解压完成")
-                    
-                    # 获取解压后的内容
-                    extracted_items = os.listdir(temp_dir)
-                    extracted_items = [item for item in extracted_items if item != file.filename]
-                    
-                    logging.info(f"解压后的内容: {extracted_items}")
-                    
-                    if not extracted_items:
+                    # 相同内容只解压一次
+                    try:
+                        _, reused = content_store.ingest_zip(zip_path, md5_value)
+                    except ValueError:
                         error_msg = f"{file.filename}: ZIP文件中没有有效内容"
                         logging.error(error_msg)
                         errors.append(error_msg)
                         failed_count += 1
-                        if os.path.exists(data_dir):
-                            shutil.rmtree(data_dir)
                         continue
                     
-                    # 复制解压后的内容到目标目录
-                    for item in extracted_items:
-                        source_path = os.path.join(temp_dir, item)
-                        dest_path = os.path.join(data_dir, item)
-                        
-                        if os.path.isdir(source_path):
-                            if os.path.exists(dest_path):
-                                shutil.rmtree(dest_path)
-                            shutil.copytree(source_path, dest_path)
-                        else:
-                            shutil.copy2(source_path, dest_path)
-                    
-                    logging.info(f"文件已复制到目标目录: {data_dir}")
+                    logging.info(f"ZIP文件{'内容已存在，复用' if reused else '解压完成'}: {md5_value}")
+                
+                data_dir = content_store.upload_data_dir(personnel_dir, md5_value)
+                content_store.link_data_dir(md5_value, data_dir)
+                linked = True
+                logging.info(f"数据目录已链接: {data_dir}")
                 
                 # 创建数据记录
                 logging.info(f"准备创建数据库记录: personnel_id={personnel_id}, personnel_name={personnel_name}")
@@ -670,6 +665,9 @@ async def batch_upload_data(
                     md5=md5_value
                 )
                 
+                # 相同内容已完成的预处理和特征提取直接复用
+                apply_cached_stages(db_data, md5_value)
+                
                 db.add(db_data)
                 db.commit()
                 db.refresh(db_data)
@@ -681,13 +679,7 @@ async def batch_upload_data(
                 stress_score, depression_score, anxiety_score = resolve_scores_for_md5(md5_value, file_id)
                 overall_risk_level = calculate_overall_risk_level(stress_score, depression_score, anxiety_score)
 
-                existing_results = db.query(db_models.Result).filter(db_models.Result.md5 == md5_value).all()
-                for result in existing_results:
-                    result.stress_score = stress_score
-                    result.depression_score = depression_score
-                    result.anxiety_score = anxiety_score
-                    result.overall_risk_level = overall_risk_level
-                    result.md5 = md5_value
+                sync_results_for_md5(db, md5_value, stress_score, depression_score, anxiety_score, overall_risk_level)
 
                 db_result = db_models.Result(
                     stress_score=stress_score,
@@ -718,8 +710,6 @@ async def batch_upload_data(
                 logging.error(error_msg)
                 errors.append(error_msg)
                 failed_count += 1
-                if os.path.exists(data_dir):
-                    shutil.rmtree(data_dir)
             except Exception as e:
                 import traceback
                 error_msg = f"{file.filename}: 处理文件时发生错误 - {str(e)}"
@@ -727,9 +717,11 @@ async def batch_upload_data(
                 logging.error(traceback.format_exc())
                 errors.append(error_msg)
                 failed_count += 1
-                if os.path.exists(data_dir):
+                if linked:
                     try:
-                        shutil.rmtree(data_dir)
+                        db.rollback()
+                        if not data_path_in_use(db, data_dir):
+                            content_store.remove_data_dir(data_dir)
                     except:
                         pass
                         
@@ -791,10 +783,11 @@ async def batch_delete_data(
             # 删除数据记录
             db.delete(data)
             
-            # 尝试删除数据目录
+            # 尝试删除数据目录；其他数据仍使用该目录时保留
             try:
-                if os.path.exists(data.data_path):
-                    shutil.rmtree(data.data_path)
+                db.flush()
+                if os.path.lexists(data.data_path) and not data_path_in_use(db, data.data_path):
+                    content_store.remove_data_dir(data.data_path)
             except Exception as e:
                 logging.warning(f"删除数据目录失败: {str(e)}")
             
@@ -830,6 +823,10 @@ async def simulate_preprocess_task(data_id: int):
             data.processing_status = "completed"
             data.feature_status = "completed"
             db.commit()
+            # 按内容记录阶段完成，相同内容再次上传时跳过
+            if data.md5:
+                content_store.mark_stage_done(data.md5, "preprocess", data_id=data_id)
+                content_store.mark_stage_done(data.md5, "features", data_id=data_id)
             logging.info(f"数据ID {data_id} 预处理完成（模拟处理）")
     except Exception as e:
         logging.error(f"模拟预处理任务失败: {e}")
@@ -874,6 +871,16 @@ async def preprocess_single_data(
         )
     
     try:
+        # 相同内容已处理过时直接复用
+        apply_cached_stages(data, data.md5)
+        if data.processing_status == "completed" and data.feature_status == "completed":
+            db.commit()
+            return {
+                "data_id": data_id,
+                "success": True,
+                "message": "预处理已完成（复用相同数据的处理结果）"
+            }
+        
         # 先设置为正在处理状态
         data.processing_status = "processing"
         data.feature_status = "processing"
@@ -934,14 +941,19 @@ async def batch_preprocess_data(
             detail=f"以下数据未填写血氧血压，无法预处理: {missing_ids}"
         )
 
-    # 先将所有数据设置为正在处理状态
+    # 相同内容已处理过的直接复用，其余设置为正在处理状态
+    pending_list = []
     for data in data_list:
+        apply_cached_stages(data, data.md5)
+        if data.processing_status == "completed" and data.feature_status == "completed":
+            continue
         data.processing_status = "processing"
         data.feature_status = "processing"
+        pending_list.append(data)
     db.commit()
     
-    # 为每个数据添加后台任务
-    for data in data_list:
+    # 为需要处理的数据添加后台任务
+    for data in pending_list:
         background_tasks.add_task(simulate_preprocess_task, data.id)
     
     logging.info(f"批量预处理已开始，共{len(data_list)}个数据")
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy.orm import Session
+from typing import Optional
+import io
+import logging
+import traceback
+
+import numpy as np
+
+from database import get_db
+import schemas
+# from auth import get_current_user  # 认证已移除
+import feature_store
+
+router = APIRouter()
+
+def _json_matrix(values):
+    """NaN和±inf不是合法的JSON数值，转换为null"""
+    return np.where(~np.isfinite(values), None, values).tolist()
+
+@router.post("/matrix")
+async def read_feature_matrix(
+    request: schemas.FeatureMatrixRequest,
+    # current_user = Depends(get_current_user),  # 认证已移除
+    db: Session = Depends(get_db)
+):
+    """
+    批量获取多个被试的特征矩阵 values[被试][通道][特征]，通道和特征已在被试间对齐；
+    export_format=npz 时返回包含 values/data_ids/channel_names/feature_names 的NumPy文件，供模型重训练使用
+    """
+    if request.export_format not in ("json", "npz"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="不支持的导出格式，应为json或npz"
+        )
+
+    try:
+        matrix = feature_store.load_feature_matrix(
+            db, request.data_ids,
+            features=request.features,
+            channels=request.channels,
+            feature_version=request.feature_version
+        )
+    except Exception as e:
+        logging.error(f"查询特征库失败: {str(e)}")
+        logging.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"查询特征库失败: {str(e)}"
+        )
+
+    if request.export_format == "npz":
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            values=matrix["values"],
+            data_ids=np.array(matrix["data_ids"], dtype=np.int64),
+            channel_names=np.array(matrix["channel_names"], dtype=str),
+            feature_names=np.array(matrix["feature_names"], dtype=str)
+        )
+        return Response(
+            content=buffer.getvalue(),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": "attachment; filename=features.npz",
+                "X-Missing-Data-Ids": ",".join(str(data_id) for data_id in matrix["missing"])
+            }
+        )
+
+    return {
+        "data_ids": matrix["data_ids"],
+        "missing": matrix["missing"],
+        "channel_names": matrix["channel_names"],
+        "feature_names": matrix["feature_names"],
+        "feature_version": matrix["feature_version"],
+        "values": _json_matrix(matrix["values"])
+    }
+
+@router.get("/data/{data_id}")
+async def read_data_features(
+    data_id: int,
+    feature_version: Optional[int] = None,
+    # current_user = Depends(get_current_user),  # 认证已移除
+    db: Session = Depends(get_db)
+):
+    """
+    获取单个被试的特征矩阵 values[通道][特征]
+    """
+    matrix = feature_store.load_feature_matrix(db, [data_id], feature_version=feature_version)
+    if not matrix["data_ids"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"ID为{data_id}的数据尚未提取特征"
+        )
+    return {
+        "data_id": data_id,
+        "channel_names": matrix["channel_names"],
+        "feature_names": matrix["feature_names"],
+        "feature_version": matrix["feature_version"][0],
+        "values": _json_matrix(matrix["values"][0])
+    }
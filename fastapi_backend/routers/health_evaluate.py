@@ -16,17 +16,20 @@ from database import get_db, SessionLocal
 import models as db_models
 import schemas
 # from auth import get_current_user, check_permission  # 认证已移除
-from model_inference import EegModel, BatchInferenceModel, ResultProcessor
-from data_preprocess import treat
-from data_feature_calculation import analyze_eeg_data, plot_serum_data, plot_scale_data
+from model_inference import (
+    EegModel, BatchInferenceModel, ResultProcessor, get_tflite_interpreter,
+    load_subject_epochs, standardize_epochs,
+)
+from score_fusion import load_scale_scores, calculate_final_scores, adjust_stress_scores
+# 预处理与特征计算模块依赖MNE/matplotlib，由实际执行流水线的调用方按需导入
+import config
+import profiler
 from config import DATA_DIR, RESULTS_DIR
 
 import pandas as pd
 import numpy as np
 
-# 添加TensorFlow Lite相关导入
-import tensorflow as tf
-import mne
+# TensorFlow Lite、MNE在推理方法内部延迟导入，避免拖慢API进程启动
 import pickle as pkl
 import warnings
 
@@ -44,88 +47,32 @@ class EegModelTFLite:
         self.interpreter = None
         self.input_details = None
         self.output_details = None
+        self.invoke_lock = None
         
     def load_model(self):
-        """加载TensorFlow Lite模型"""
+        """加载TensorFlow Lite模型（进程内缓存，启动预热后直接复用）"""
         try:
-            self.interpreter = tf.lite.Interpreter(model_path=self.model_path)
-            self.interpreter.allocate_tensors()
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
-            logging.info(f"成功加载TFLite模型: {self.model_path}")
+            (self.interpreter, self.input_details,
+             self.output_details, self.invoke_lock) = get_tflite_interpreter(self.model_path)
             return True
         except Exception as e:
             logging.error(f"加载TFLite模型失败: {str(e)}")
+            logging.error(traceback.format_exc())
             return False
     
     def get_data(self):
         """获取并预处理EEG数据"""
         try:
-            num_of_data = 108
-            files = os.listdir(self.data_path)
-
-            # 定义一个函数，根据文件的扩展名返回一个排序键
-            def sort_key(file_name):
-                if file_name.endswith('.fif'):
-                    return 1
-                elif file_name.endswith('.edf'):
-                    return 2
-                elif file_name.endswith('.set'):
-                    return 3
-                else:
-                    return 4
-
-            # 对文件列表进行排序
-            files = sorted(files, key=sort_key)
-
-            for file in files:
-                file_path = os.path.join(self.data_path, file)
-                file_name = os.path.basename(file_path)
-
-                if file_name.endswith('.fif'):
-                    raw = mne.read_epochs(file_path)
-                    raw.load_data()
-                    exp_data = raw.get_data()
-                elif file_name.endswith('.edf'):
-                    raw = mne.io.read_raw_edf(file_path)
-                    raw.load_data()
-                    exp_data = raw.get_data()
-                    segment_length = int(500 * 2)
-                    num_channels, num_samples = exp_data.shape
-                    segments = []
-
-                    for start in range(0, num_samples, segment_length):
-                        end = start + segment_length
-                        if end <= num_samples:
-                            segment = exp_data[:, start:end]
-                            segments.append(segment)
-
-                    exp_data = np.array(segments)
-                elif file_name.endswith('.set'):
-                    raw = mne.io.read_epochs_eeglab(file_path)
-                    exp_data = raw.get_data()
-
-                data = exp_data[-(num_of_data)::, ::, ::]
-                N_tr, N_ch, T = data.shape
-                data = data.reshape(N_tr, 1, N_ch, T)
-
-                standarder = 'standarder'
-                model_dir = os.path.dirname(self.model_path)
-                dir_path = os.path.join(model_dir, standarder)
-                
-                for j in range(N_ch):
-                    save_path = os.path.join(dir_path, f'std_{j}.pkl')
-                    with open(save_path, 'rb') as f:
-                        scaler = pkl.load(f)
-                    data[:, 0, j, :] = scaler.transform(data[:, 0, j, :])
-
-                return data
+            # npy epoch文件存在时以内存映射读取，标准化返回新数组
+            data = load_subject_epochs(self.data_path)
+            return standardize_epochs(data, self.model_path)
 
         except Exception as e:
             logging.error(f"Error in get_data: {str(e)}")
             logging.error(traceback.format_exc())
             return None
 
+    @profiler.profiled('inference')
     def predict(self):
         """使用TensorFlow Lite模型进行预测"""
         try:
@@ -165,14 +112,16 @@ class EegModelTFLite:
                 # 提取单个样本
                 single_sample = X_test_quantized[i:i+1]  # 保持维度为(1, 1, 59, 1000)
                 
-                # 设置输入张量
-                self.interpreter.set_tensor(input_details[0]['index'], single_sample)
-                
-                # 运行推理
-                self.interpreter.invoke()
-                
-                # 获取输出
-                output_data = self.interpreter.get_tensor(output_details[0]['index'])
+                # 共享解释器，推理期间加锁
+                with self.invoke_lock:
+                    # 设置输入张量
+                    self.interpreter.set_tensor(input_details[0]['index'], single_sample)
+                    
+                    # 运行推理
+                    self.interpreter.invoke()
+                    
+                    # 获取输出
+                    output_data = self.interpreter.get_tensor(output_details[0]['index'])
                 
                 # 反量化输出数据
                 output_scale = output_details[0]['quantization'][0]
@@ -194,7 +143,7 @@ class EegModelTFLite:
             return 0.0
 
 router = APIRouter()
-MD5_DIR = Path(__file__).resolve().parents[1] / "md5"
+MD5_DIR = Path(config.MD5_DIR)
 MD5_MAPPING_FILE = MD5_DIR / "data.txt"
 
 def load_md5_mapping() -> Dict[str, tuple]:
@@ -295,6 +244,27 @@ IMAGE_TYPES = {
     "serum_analysis": ("血清指标分析", "serum_analysis.png"),
 }
 
+def update_results_for_md5(db: Session, md5_value: str, data_id: int, stress_score: float,
+                           depression_score: float, anxiety_score: float, overall_risk_level: str):
+    """
+    同一MD5的已有结果直接批量UPDATE为相同分数，不逐条加载；只查询当前数据的结果记录
+    Returns:
+        db_models.Result: 当前数据已有的结果，没有时为None
+    """
+    if not md5_value:
+        return None
+    db.query(db_models.Result).filter(db_models.Result.md5 == md5_value).update({
+        db_models.Result.stress_score: stress_score,
+        db_models.Result.depression_score: depression_score,
+        db_models.Result.anxiety_score: anxiety_score,
+        db_models.Result.overall_risk_level: overall_risk_level,
+        db_models.Result.result_time: datetime.now()
+    }, synchronize_session=False)
+    return db.query(db_models.Result).filter(
+        db_models.Result.md5 == md5_value,
+        db_models.Result.data_id == data_id
+    ).first()
+
 @router.post("/evaluate", response_model=schemas.Result)
 async def evaluate_health(
     request: schemas.HealthEvaluateRequest,
@@ -304,6 +274,7 @@ async def evaluate_health(
     """
     对指定的数据进行健康评估，基于原应用的应激评估逻辑
     """
+    profiler.tag_data_id(request.data_id)
     # 查询数据
     data = db.query(db_models.Data).filter(db_models.Data.id == request.data_id).first()
     if not data:
@@ -316,17 +287,9 @@ async def evaluate_health(
         stress_score, depression_score, anxiety_score = resolve_scores_for_md5(data.md5, data.personnel_id)
         overall_risk_level = calculate_overall_risk_level(stress_score, depression_score, anxiety_score)
         
-        existing_results = db.query(db_models.Result).filter(db_models.Result.md5 == data.md5).all() if data.md5 else []
-        target_result = None
-        for result in existing_results:
-            result.stress_score = stress_score
-            result.depression_score = depression_score
-            result.anxiety_score = anxiety_score
-            result.overall_risk_level = overall_risk_level
-            result.md5 = data.md5
-            result.result_time = datetime.now()
-            if result.data_id == request.data_id:
-                target_result = result
+        target_result = update_results_for_md5(
+            db, data.md5, request.data_id, stress_score, depression_score, anxiety_score, overall_risk_level
+        )
         
         if not target_result:
             target_result = db_models.Result(
@@ -407,17 +370,9 @@ async def perform_batch_evaluation(data_ids: List[int], user_id: str, username:
                 stress_score, depression_score, anxiety_score = resolve_scores_for_md5(data.md5, data.personnel_id)
                 overall_risk_level = calculate_overall_risk_level(stress_score, depression_score, anxiety_score)
                 
-                existing_results = session.query(db_models.Result).filter(db_models.Result.md5 == data.md5).all() if data.md5 else []
-                target_result = None
-                for result in existing_results:
-                    result.stress_score = stress_score
-                    result.depression_score = depression_score
-                    result.anxiety_score = anxiety_score
-                    result.overall_risk_level = overall_risk_level
-                    result.md5 = data.md5
-                    result.result_time = datetime.now()
-                    if result.data_id == data_id:
-                        target_result = result
+                target_result = update_results_for_md5(
+                    session, data.md5, data_id, stress_score, depression_score, anxiety_score, overall_risk_level
+                )
                 
                 if not target_result:
                     target_result = db_models.Result(
@@ -472,46 +427,11 @@ async def calculate_scale_scores(data_path):
     Returns:
         tuple: (焦虑量表分数, 抑郁量表分数) 如果无法计算则返回 (None, None)
     """
-    try:
-        # 读取量表数据
-        lb_path = os.path.join(data_path, 'lb.csv')
-        if not os.path.exists(lb_path):
-            logging.info("量表文件不存在")
-            return None, None
-            
-        # 读取量表数据，没有header
-        df = pd.read_csv(lb_path, header=None)
-        if len(df) < 1:
-            logging.info("量表数据为空")
-            return None, None
-        
-        # 计算焦虑量表分数(前20列)
-        anxiety_reverse_items = np.array([1, 2, 5, 8, 10, 11, 15, 16, 19, 20]) - 1
-        first_20 = df.iloc[0, :20].values.astype(float)
-        reverse_mask = np.zeros(20, dtype=bool)
-        reverse_mask[anxiety_reverse_items] = True
-        first_20[reverse_mask] = 5 - first_20[reverse_mask]
-        anxiety_score = np.sum(first_20)
-        
-        # 计算抑郁量表分数(后20列)
-        depression_reverse_items = np.array([2, 5, 6, 11, 12, 14, 16, 17, 18, 20]) - 1
-        last_20 = df.iloc[0, 20:40].values.astype(float)
-        reverse_mask = np.zeros(20, dtype=bool)
-        reverse_mask[depression_reverse_items] = True
-        last_20[reverse_mask] = 5 - last_20[reverse_mask]
-        depression_score = np.sum(last_20) * 1.25
-        
-        logging.info(f"量表分数计算完成 - 焦虑量表: {anxiety_score:.2f}, 抑郁量表: {depression_score:.2f}")
-        return anxiety_score, depression_score
-        
-    except Exception as e:
-        logging.error(f"计算量表分数时发生错误: {str(e)}")
-        logging.error(traceback.format_exc())
-        return None, None
+    return load_scale_scores(data_path)
 
 def calculate_final_score(model_score, scale_score, score_type):
     """
-    根据模型分数和量表分数计算最终分数
+    根据模型分数和量表分数计算最终分数（单个被试，批量计算见score_fusion.calculate_final_scores）
     
     Args:
         model_score: 模型预测分数
@@ -524,32 +444,10 @@ def calculate_final_score(model_score, scale_score, score_type):
     try:
         if scale_score is None:
             logging.info(f"量表分数不存在，返回模型分数")
-            return float(min(95, max(0, model_score)))
-            
-        if score_type == 1:  # 抑郁
-            if scale_score < 53:
-                # 当量表分数<=53时，直接返回基于量表的计算结果
-                final_score = (scale_score / 53) * 50
-                logging.info(f"抑郁量表分数 < 53，直接使用量表计算结果: {final_score}")
-            else:
-                # 当量表分数>53时，才结合模型分数
-                scale_factor = scale_score / 53.0 * 50
-                model_factor = model_score
-                final_score = (scale_factor + model_factor * 0.3)
-                logging.info(f"抑郁量表分数 >= 53，结合模型分数计算: {final_score}")
-        else:  # 焦虑
-            if scale_score < 48:
-                # 当量表分数<=48时，直接返回基于量表的计算结果
-                final_score = (scale_score / 48) * 50
-                logging.info(f"焦虑量表分数 < 48，直接使用量表计算结果: {final_score}")
-            else:
-                # 当量表分数>48时，才结合模型分数
-                scale_factor = scale_score / 48.0 * 50
-                model_factor = model_score
-                final_score = (scale_factor + model_factor * 0.3)
-                logging.info(f"焦虑量表分数 >= 48，结合模型分数计算: {final_score}")
-                
-        return float(min(95, max(0, final_score)))
+            scale_score = np.nan
+        final_score = float(calculate_final_scores([model_score], [scale_score], score_type)[0])
+        logging.info(f"{'抑郁' if score_type == 1 else '焦虑'}最终分数: {final_score}")
+        return final_score
         
     except Exception as e:
         logging.error(f"计算最终分数时发生错误: {str(e)}")
@@ -558,7 +456,7 @@ def calculate_final_score(model_score, scale_score, score_type):
 
 def adjust_stress_score(stress_score, depression_score, anxiety_score):
     """
-    根据新的计算规则调整普通应激分数
+    根据新的计算规则调整普通应激分数（单个被试，批量计算见score_fusion.adjust_stress_scores）
     
     Args:
         stress_score: 原普通应激分数
@@ -569,29 +467,9 @@ def adjust_stress_score(stress_score, depression_score, anxiety_score):
         float: 调整后的普通应激分数
     """
     try:
-        # 如果原应激分数小于50，认为是无应激
-        if stress_score < 50:
-            # 确保抑郁分数和焦虑分数减1大于等于1
-            depression_factor = max(1, depression_score + 10)
-            anxiety_factor = max(1, anxiety_score + 10)
-            # 计算新分数
-            new_score = (stress_score + 1) * depression_factor * anxiety_factor / 100
-            # 确保分数大于等于0
-            new_score = max(0, new_score)
-            new_score = min(48, new_score)
-        else:
-            # 有应激情况
-            # 计算新分数
-            if (depression_score+anxiety_score)/2>50:
-                new_score = stress_score * (depression_score + 10) * (anxiety_score + 10) / 10000
-            else:
-                new_score = stress_score * (depression_score + 50) * (anxiety_score + 50) / 10000
-            # 确保分数不超过95
-            new_score = min(95, new_score)
-            new_score = max(61, new_score)
-        
+        new_score = float(adjust_stress_scores([stress_score], [depression_score], [anxiety_score])[0])
         logging.info(f"调整后的普通应激分数: {new_score:.1f}")
-        return float(new_score)
+        return new_score
         
     except Exception as e:
         logging.error(f"调整普通应激分数时发生错误: {str(e)}")
@@ -802,6 +680,23 @@ async def view_image(
         filename=filename
     )
 
+@router.get("/batching-stats")
+async def get_batching_stats(
+    # current_user = Depends(get_current_user),  # 认证已移除
+):
+    """
+    获取动态批处理推理的吞吐统计（epochs/s、平均批大小、队列长度）
+    """
+    from inference_batcher import get_batching_stats as collect_batching_stats
+    from config import INFERENCE_BATCHING, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS
+
+    return {
+        "enabled": INFERENCE_BATCHING,
+        "max_batch_size": INFERENCE_MAX_BATCH_SIZE,
+        "max_wait_ms": INFERENCE_MAX_WAIT_MS,
+        "models": collect_batching_stats()
+    }
+
 @router.get("/status/{data_id}", response_model=schemas.EvaluationStatus)
 async def get_evaluation_status(
     data_id: int,
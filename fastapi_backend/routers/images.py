@@ -0,0 +1,192 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status, Query
+from fastapi.responses import FileResponse
+from typing import List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import logging
+import os
+import re
+import threading
+import traceback
+
+from config import IMAGES_DIR, IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_AGE
+
+router = APIRouter()
+
+IMAGES_PATH = Path(IMAGES_DIR)
+IMAGE_CACHE_PATH = Path(IMAGE_CACHE_DIR)
+
+# 支持的原图扩展名（按查找优先级排列）
+IMAGE_EXTENSIONS = ['png', 'jpg', 'jpeg']
+
+# 尺寸变体：名称 -> 最长边像素
+IMAGE_SIZES = {
+    "thumb": 256,
+    "medium": 800,
+}
+
+# 输出格式：名称 -> (Pillow格式, 扩展名, MIME类型)
+IMAGE_FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "webp": ("WEBP", "webp", "image/webp"),
+}
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+# 只允许简单文件名，防止路径穿越
+FILENAME_PATTERN = re.compile(r"^[\w\-]+\.(png|jpg|jpeg)$", re.IGNORECASE)
+
+# 变体生成锁，避免并发请求重复生成同一个缓存文件
+_variant_locks = {}
+_variant_locks_guard = threading.Lock()
+
+def _get_variant_lock(key: str) -> threading.Lock:
+    with _variant_locks_guard:
+        lock = _variant_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _variant_locks[key] = lock
+        return lock
+
+def resolve_image_path(filename: str) -> Optional[Path]:
+    """校验文件名并返回原图路径，不存在或非法时返回None"""
+    if not FILENAME_PATTERN.match(filename):
+        return None
+    image_path = IMAGES_PATH / filename
+    if not image_path.is_file():
+        return None
+    return image_path
+
+def find_personnel_images(personnel_id: str) -> List[str]:
+    """
+    根据personnel_id查找人员照片文件名，支持多张图片，如2-1.png, 2-2.png
+    """
+    filenames = []
+    for index in (1, 2):
+        for ext in IMAGE_EXTENSIONS:
+            filename = f"{personnel_id}-{index}.{ext}"
+            if resolve_image_path(filename):
+                filenames.append(filename)
+                break
+    return filenames
+
+def compute_etag(path: Path) -> str:
+    """根据文件修改时间和大小生成ETag"""
+    stat_result = path.stat()
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+def build_image_url(filename: str, size: Optional[str] = None, fmt: Optional[str] = None) -> str:
+    """
+    生成图片访问URL，附带版本号参数，原图更新后URL随之变化
+    """
+    params = []
+    if size:
+        params.append(f"size={size}")
+    if fmt:
+        params.append(f"format={fmt}")
+    image_path = resolve_image_path(filename)
+    if image_path:
+        version = compute_etag(image_path).strip('"')
+        params.append(f"v={version}")
+    query = "&".join(params)
+    return f"/api/images/{filename}" + (f"?{query}" if query else "")
+
+def _generate_variant(source_path: Path, size: Optional[str], fmt: Optional[str]) -> Tuple[Path, str]:
+    """
+    生成（或复用已缓存的）缩放/转码后的图片变体
+    Returns:
+        (变体文件路径, MIME类型)
+    """
+    from PIL import Image
+
+    source_ext = source_path.suffix.lstrip('.').lower()
+    pil_format, target_ext, media_type = IMAGE_FORMATS.get(
+        fmt or ("jpeg" if source_ext in ("jpg", "jpeg") else source_ext)
+    )
+    variant_name = f"{source_path.stem}_{source_ext}_{size or 'full'}.{target_ext}"
+    variant_path = IMAGE_CACHE_PATH / variant_name
+
+    with _get_variant_lock(variant_name):
+        # 缓存存在且不比原图旧时直接复用
+        if variant_path.exists() and variant_path.stat().st_mtime_ns >= source_path.stat().st_mtime_ns:
+            return variant_path, media_type
+
+        IMAGE_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        with Image.open(source_path) as img:
+            if size:
+                max_side = IMAGE_SIZES[size]
+                img.thumbnail((max_side, max_side), Image.LANCZOS)
+            if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            save_kwargs = {"quality": 85} if pil_format in ("JPEG", "WEBP") else {"optimize": True}
+            # 先写临时文件再原子替换，避免并发读到半个文件
+            tmp_path = variant_path.with_name(variant_path.name + f".{os.getpid()}.tmp")
+            img.save(tmp_path, format=pil_format, **save_kwargs)
+            os.replace(tmp_path, variant_path)
+
+        logging.info(f"生成图片缓存: {variant_path}")
+        return variant_path, media_type
+
+@router.get("/{filename}")
+async def get_image(
+    filename: str,
+    request: Request,
+    size: Optional[str] = Query(None, description="尺寸变体: thumb/medium，不传为原图"),
+    fmt: Optional[str] = Query(None, alias="format", description="输出格式: png/jpeg/webp，不传为原格式")
+):
+    """
+    获取人员照片，支持缩略图与WebP变体，带ETag与Cache-Control缓存头
+    """
+    if size is not None and size not in IMAGE_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的尺寸: {size}，仅支持 {', '.join(IMAGE_SIZES)}"
+        )
+    if fmt is not None and fmt not in IMAGE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的格式: {fmt}，仅支持 {', '.join(IMAGE_FORMATS)}"
+        )
+
+    source_path = resolve_image_path(filename)
+    if not source_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"图片不存在: {filename}"
+        )
+
+    try:
+        if size or fmt:
+            loop = asyncio.get_event_loop()
+            file_path, media_type = await loop.run_in_executor(
+                None, _generate_variant, source_path, size, fmt
+            )
+        else:
+            file_path = source_path
+            media_type = MIME_TYPES.get(source_path.suffix.lstrip('.').lower(), "application/octet-stream")
+    except Exception as e:
+        logging.error(f"生成图片变体失败: {str(e)}")
+        logging.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"生成图片失败: {str(e)}"
+        )
+
+    etag = compute_etag(file_path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={IMAGE_CACHE_MAX_AGE}",
+    }
+
+    # 客户端缓存仍然有效时返回304
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return FileResponse(path=str(file_path), media_type=media_type, headers=headers)
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+from typing import Optional
+import os
+
+# from auth import check_admin_permission  # 认证已移除
+import profiler
+from config import PROFILING, PROFILE_KEEP
+
+router = APIRouter()
+
+@router.get("/")
+async def read_profiles(
+    data_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    limit: int = 100,
+    # current_user = Depends(check_admin_permission)  # 认证已移除
+):
+    """
+    获取慢请求/慢流水线的剖析列表，可按数据ID和类型（request/preprocess/features/inference）筛选
+    """
+    return {
+        "enabled": PROFILING,
+        "keep": PROFILE_KEEP,
+        "profiles": profiler.list_profiles(data_id=data_id, kind=kind, limit=limit)
+    }
+
+@router.get("/{profile_id}")
+async def read_profile(
+    profile_id: str,
+    # current_user = Depends(check_admin_permission)  # 认证已移除
+):
+    """
+    获取单份剖析的元数据和耗时最多的函数
+    """
+    meta = profiler.get_profile(profile_id)
+    if meta is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="剖析数据不存在"
+        )
+    return meta
+
+@router.get("/{profile_id}/download")
+async def download_profile(
+    profile_id: str,
+    # current_user = Depends(check_admin_permission)  # 认证已移除
+):
+    """
+    下载剖析原始文件：cProfile为.prof（pstats/snakeviz），采样为.folded（flamegraph.pl/speedscope）
+    """
+    path = profiler.get_profile_file(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="剖析数据不存在"
+        )
+    return FileResponse(
+        path=path,
+        media_type="application/octet-stream",
+        filename=os.path.basename(path)
+    )
+
+@router.delete("/{profile_id}")
+async def delete_profile(
+    profile_id: str,
+    # current_user = Depends(check_admin_permission)  # 认证已移除
+):
+    """
+    删除一份剖析数据
+    """
+    if not profiler.delete_profile(profile_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="剖析数据不存在"
+        )
+    return {"message": "剖析数据已删除"}
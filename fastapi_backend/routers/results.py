@@ -8,19 +8,20 @@ import pandas as pd
 import io
 import zipfile
 from pathlib import Path
-import base64
+import traceback
 
 from database import get_db
 import models as db_models
 import schemas
 from auth import get_current_user, check_admin_permission
 from model_inference import ResultProcessor
+import config
 from config import RESULTS_DIR
+from routers.images import IMAGE_SIZES, resolve_image_path, find_personnel_images, build_image_url
 
 router = APIRouter()
 
-IMAGES_DIR = Path(__file__).resolve().parents[1] / "images"
-MD5_DIR = Path(__file__).resolve().parents[1] / "md5"
+MD5_DIR = Path(config.MD5_DIR)
 MD5_MAPPING_FILE = MD5_DIR / "data.txt"
 
 def load_md5_mapping():
@@ -53,9 +54,9 @@ def load_md5_mapping():
         logging.error(f"读取MD5映射文件失败: {str(e)}")
     return mapping
 
-def get_image_for_md5(md5_value: str) -> Optional[str]:
+def get_image_for_md5(md5_value: str, size: Optional[str] = None) -> Optional[str]:
     """
-    根据MD5值获取对应的图片（base64编码）
+    根据MD5值获取对应图片的访问URL
     直接使用file_id匹配图片，如file_id为"2"则匹配"2.jpg"
     """
     try:
@@ -69,40 +70,29 @@ def get_image_for_md5(md5_value: str) -> Optional[str]:
         if not file_id:
             return None
         
-        # 直接使用file_id匹配图片
-        image_path = IMAGES_DIR / f"{file_id}.jpg"
-        
-        if not image_path.exists():
-            return None
-        
-        # 读取图片并转换为base64
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-            return base64.b64encode(image_data).decode('utf-8')
+        return get_image_for_file_id(file_id, size)
         
     except Exception as e:
         logging.error(f"获取用户图片失败: {str(e)}")
+        logging.error(traceback.format_exc())
         return None
 
-def get_image_for_file_id(file_id: str) -> Optional[str]:
+def get_image_for_file_id(file_id: str, size: Optional[str] = None) -> Optional[str]:
     """
-    根据file_id直接获取对应的图片（base64编码）
+    根据file_id获取对应图片的访问URL
     用于旧数据（没有md5）的情况
     """
     try:
         # 直接使用file_id匹配图片
-        image_path = IMAGES_DIR / f"{file_id}.jpg"
-        
-        if not image_path.exists():
+        filename = f"{file_id}.jpg"
+        if not resolve_image_path(filename):
             return None
         
-        # 读取图片并转换为base64
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-            return base64.b64encode(image_data).decode('utf-8')
+        return build_image_url(filename, size)
         
     except Exception as e:
         logging.error(f"获取用户图片失败: {str(e)}")
+        logging.error(traceback.format_exc())
         return None
 
 @router.get("/", response_model=List[schemas.Result])
@@ -518,36 +508,22 @@ async def regenerate_report(
             detail=f"ID为{result_id}的结果不存在"
         )
     
-    # 获取关联的数据
-    data = db.query(db_models.Data).filter(db_models.Data.id == result.data_id).first()
-    if not data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="关联的数据不存在"
-        )
+    old_report_path = result.report_path
     
     try:
-        # 重新生成报告
-        scores = {
-            'stress_score': result.stress_score,
-            'depression_score': result.depression_score,
-            'anxiety_score': result.anxiety_score
-        }
-        
-        result_processor = ResultProcessor(data.data_path, scores)
-        new_report_path = result_processor.generate_report()
+        # 重新生成报告（内容未变化时文件名相同，直接覆盖）
+        result_processor = ResultProcessor(result.id, db)
+        new_report_path = await result_processor.generate_report(force=True)
+        if not new_report_path:
+            raise Exception("报告生成失败")
         
         # 删除旧报告文件
-        if result.report_path and os.path.exists(result.report_path):
+        if old_report_path and old_report_path != new_report_path and os.path.exists(old_report_path):
             try:
-                os.remove(result.report_path)
+                os.remove(old_report_path)
             except Exception as e:
                 logging.warning(f"删除旧报告文件失败: {str(e)}")
         
-        # 更新报告路径
-        result.report_path = new_report_path
-        db.commit()
-        
         logging.info(f"重新生成了结果ID {result_id} 的报告")
         
         return {"message": "报告重新生成成功", "report_path": new_report_path}
@@ -562,12 +538,20 @@ async def regenerate_report(
 @router.get("/user-image/{result_id}")
 async def get_user_image(
     result_id: int,
+    size: Optional[str] = Query(None, description="尺寸变体: thumb/medium，不传为原图"),
     db: Session = Depends(get_db)
 ):
     """
-    根据结果ID获取用户对应的图片
+    根据结果ID获取用户对应图片的访问URL
     使用personnel_id来查找图片，支持多张图片，如2-1.png, 2-2.png
+    图片内容由 /api/images 接口提供，可被浏览器缓存
     """
+    if size is not None and size not in IMAGE_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的尺寸: {size}"
+        )
+    
     result = db.query(db_models.Result).filter(db_models.Result.id == result_id).first()
     
     if not result:
@@ -577,40 +561,12 @@ async def get_user_image(
         )
     
     # 使用personnel_id查找所有匹配的图片（支持多张图片，如2-1.png, 2-2.png）
-    personnel_id = result.personnel_id
-    images = []
-    for ext in ['png', 'jpg', 'jpeg']:
-        # 查找第一张图片
-        image_path = IMAGES_DIR / f"{personnel_id}-1.{ext}"
-        if image_path.exists():
-            images.append(get_image_base64(image_path))
-            break
-    
-    # 查找第二张图片
-    for ext in ['png', 'jpg', 'jpeg']:
-        image_path = IMAGES_DIR / f"{personnel_id}-2.{ext}"
-        if image_path.exists():
-            images.append(get_image_base64(image_path))
-            break
-    
-    if not images:
+    filenames = find_personnel_images(result.personnel_id)
+    
+    if not filenames:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="未找到对应的图片"
         )
     
-    return {"images": [f"data:image/{get_mime_type(ext)};base64,{img}" for img, ext in zip(images, ['png', 'jpg'][:len(images)])]}
-
-def get_image_base64(image_path: Path) -> str:
-    """读取图片并返回base64编码"""
-    with open(image_path, "rb") as f:
-        image_data = f.read()
-        return base64.b64encode(image_data).decode('utf-8')
-
-def get_mime_type(ext: str) -> str:
-    """根据扩展名获取MIME类型"""
-    return {
-        'png': 'png',
-        'jpg': 'jpeg',
-        'jpeg': 'jpeg'
-    }.get(ext, 'jpeg') 
\ No newline at end of file
+    return {"images": [build_image_url(filename, size) for filename in filenames]}
@@ -8,6 +8,7 @@ from database import get_db
 import models as db_models
 import schemas
 # from auth import check_admin_permission, get_current_user  # 认证已移除
+from auth_cache import invalidate_permissions
 
 router = APIRouter()
 
@@ -141,6 +142,7 @@ async def delete_role(
     # 删除角色
     db.delete(db_role)
     db.commit()
+    invalidate_permissions()
     
     logging.info(f"系统删除了角色ID: {role_id}")  # 认证已移除
     
@@ -222,6 +224,7 @@ async def add_permission_to_role(
     db.add(db_role_permission)
     db.commit()
     db.refresh(db_role_permission)
+    invalidate_permissions()
     
     logging.info(f"系统为角色ID {role_id} 添加了权限ID {permission.permission_id}")  # 认证已移除
     
@@ -252,6 +255,7 @@ async def remove_permission_from_role(
     # 删除关联
     db.delete(db_role_permission)
     db.commit()
+    invalidate_permissions()
     
     logging.info(f"系统从角色ID {role_id} 移除了权限ID {permission_id}")  # 认证已移除
     
@@ -10,6 +10,7 @@ from database import get_db
 import models as db_models
 import schemas
 from auth import get_current_user, check_admin_permission, hash_password
+from auth_cache import invalidate_user
 from config import LOG_FILE
 
 router = APIRouter()
@@ -213,6 +214,7 @@ async def update_user(
     
     db.commit()
     db.refresh(db_user)
+    invalidate_user(user_id)
     
     return db_user
 
@@ -238,6 +240,7 @@ async def delete_user(
     # 删除用户
     db.delete(db_user)
     db.commit()
+    invalidate_user(user_id)
     
     logging.info(f"删除了用户: {db_user.username}")
     
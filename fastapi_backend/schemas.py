@@ -312,4 +312,11 @@ class AdminStats(BaseModel):
     totalModels: int
     totalLogs: int
     systemHealth: int
-    recentActivities: int 
\ No newline at end of file
+    recentActivities: int 
+# 特征库批量查询请求模型
+class FeatureMatrixRequest(BaseModel):
+    data_ids: List[int]
+    features: Optional[List[str]] = None  # 默认为各被试共有的全部特征
+    channels: Optional[List[str]] = None  # 默认为各被试共有的全部通道
+    feature_version: Optional[int] = None  # 默认每个被试取最新版本
+    export_format: str = "json"  # json, npz
@@ -0,0 +1,111 @@
+"""
+量表与模型分数融合
+
+抑郁/焦虑分数 = 量表分数与模型分数融合，普通应激分数再根据抑郁/焦虑分数调整。
+函数均接受numpy数组，对整批被试一次完成计算；单个被试传入长度为1的数组即可。
+量表分数缺失用NaN表示。
+"""
+
+import logging
+import os
+import traceback
+
+import numpy as np
+import pandas as pd
+
+# 量表阈值：score_type -> 阈值 (1: 抑郁, 2: 焦虑)
+SCALE_THRESHOLDS = {1: 53.0, 2: 48.0}
+
+# 反向计分题目（从1开始编号）
+ANXIETY_REVERSE_ITEMS = np.array([1, 2, 5, 8, 10, 11, 15, 16, 19, 20]) - 1
+DEPRESSION_REVERSE_ITEMS = np.array([2, 5, 6, 11, 12, 14, 16, 17, 18, 20]) - 1
+
+def load_scale_scores(data_path):
+    """
+    读取数据目录下的 lb.csv 计算量表分数
+    Args:
+        data_path: 数据路径
+    Returns:
+        tuple: (焦虑量表分数, 抑郁量表分数) 如果无法计算则返回 (None, None)
+    """
+    try:
+        lb_path = os.path.join(data_path, 'lb.csv')
+        if not os.path.exists(lb_path):
+            logging.info("量表文件不存在")
+            return None, None
+
+        # 读取量表数据，没有header
+        df = pd.read_csv(lb_path, header=None)
+        if len(df) < 1:
+            logging.info("量表数据为空")
+            return None, None
+
+        # 焦虑量表分数(前20列)
+        first_20 = df.iloc[0, :20].values.astype(float)
+        first_20[ANXIETY_REVERSE_ITEMS] = 5 - first_20[ANXIETY_REVERSE_ITEMS]
+        anxiety_score = np.sum(first_20)
+
+        # 抑郁量表分数(后20列)
+        last_20 = df.iloc[0, 20:40].values.astype(float)
+        last_20[DEPRESSION_REVERSE_ITEMS] = 5 - last_20[DEPRESSION_REVERSE_ITEMS]
+        depression_score = np.sum(last_20) * 1.25
+
+        logging.info(f"量表分数计算完成 - 焦虑量表: {anxiety_score:.2f}, 抑郁量表: {depression_score:.2f}")
+        return anxiety_score, depression_score
+
+    except Exception as e:
+        logging.error(f"计算量表分数时发生错误: {str(e)}")
+        logging.error(traceback.format_exc())
+        return None, None
+
+def calculate_final_scores(model_scores, scale_scores, score_type):
+    """
+    批量融合模型分数和量表分数
+    量表分数低于阈值时只使用量表，否则在量表分数基础上叠加0.3倍模型分数
+    Args:
+        model_scores: 模型预测分数数组
+        scale_scores: 量表分数数组，缺失为NaN
+        score_type: 分数类型 (1: 抑郁, 2: 焦虑)
+    Returns:
+        numpy.ndarray: 截断到[0, 95]的最终分数
+    """
+    model_scores = np.asarray(model_scores, dtype=float)
+    scale_scores = np.asarray(scale_scores, dtype=float)
+    threshold = SCALE_THRESHOLDS[1 if score_type == 1 else 2]
+
+    scale_factor = scale_scores / threshold * 50
+    fused = np.where(scale_scores < threshold, scale_factor, scale_factor + model_scores * 0.3)
+    # 量表缺失时直接使用模型分数
+    final_scores = np.where(np.isnan(scale_scores), model_scores, fused)
+    return np.clip(final_scores, 0, 95)
+
+def adjust_stress_scores(stress_scores, depression_scores, anxiety_scores):
+    """
+    批量调整普通应激分数
+    原应激分数<50视为无应激，结果截断到[0, 48]；否则结果截断到[61, 95]
+    Args:
+        stress_scores: 原普通应激分数数组
+        depression_scores: 抑郁分数数组
+        anxiety_scores: 焦虑分数数组
+    Returns:
+        numpy.ndarray: 调整后的普通应激分数
+    """
+    stress = np.asarray(stress_scores, dtype=float)
+    depression = np.asarray(depression_scores, dtype=float)
+    anxiety = np.asarray(anxiety_scores, dtype=float)
+
+    # 无应激
+    depression_factor = np.maximum(1, depression + 10)
+    anxiety_factor = np.maximum(1, anxiety + 10)
+    no_stress = np.clip((stress + 1) * depression_factor * anxiety_factor / 100, 0, 48)
+
+    # 有应激
+    high_mood = (depression + anxiety) / 2 > 50
+    stressed = np.where(
+        high_mood,
+        stress * (depression + 10) * (anxiety + 10) / 10000,
+        stress * (depression + 50) * (anxiety + 50) / 10000
+    )
+    stressed = np.maximum(61, np.minimum(95, stressed))
+
+    return np.where(stress < 50, no_stress, stressed)
@@ -0,0 +1,99 @@
+"""
+降采样与带通滤波融合阶段
+
+原流程先用MNE的FFT重采样处理整段记录，再在新副本上做1-100Hz FIR滤波。这里改为：
+1. 有理数多相重采样（scipy.signal.resample_poly），抗混叠FIR按低通截止频率设计，
+   重采样的同时完成100Hz低通，滤波器为线性相位且延迟已补偿（零相位）
+2. 缓存的二阶节（SOS）Butterworth高通，sosfiltfilt双向滤波（零相位）
+3. 按通道分块，可用n_jobs个线程并行
+
+滤波器设计与MNE filter()默认的firwin设计保持一致：每个边沿按各自的过渡带单独确定FIR长度（3.3/过渡带宽），
+低通过渡带 min(max(0.25*h_freq, 2), 新奈奎斯特频率-h_freq)，-6dB点位于 h_freq + 过渡带/2；
+高通过渡带 min(max(0.25*l_freq, 2), l_freq)，-6dB点位于 l_freq - 过渡带/2。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal
+
+# 高通Butterworth阶数（双向滤波后幅频响应为其平方）
+HIGHPASS_ORDER = 4
+
+def resample_ratio(sfreq, target_sfreq, max_denominator=1000):
+    """返回 (up, down)，使 sfreq * up / down == target_sfreq"""
+    ratio = Fraction(target_sfreq / sfreq).limit_denominator(max_denominator)
+    return ratio.numerator, ratio.denominator
+
+def lowpass_transition(h_freq, target_sfreq):
+    return min(max(0.25 * h_freq, 2.0), target_sfreq / 2.0 - h_freq)
+
+def highpass_transition(l_freq):
+    return min(max(0.25 * l_freq, 2.0), l_freq)
+
+# 滤波器系数按参数缓存，调用方不得修改返回的数组
+@lru_cache(maxsize=32)
+def antialias_taps(sfreq, target_sfreq, h_freq):
+    """
+    多相重采样使用的抗混叠低通FIR（Hamming窗，在上采样后的采样率上设计）
+    截止频率取低通-6dB点，同时不超过新奈奎斯特频率
+    """
+    up, down = resample_ratio(sfreq, target_sfreq)
+    fs_up = sfreq * up
+    nyquist = min(sfreq, target_sfreq) / 2.0
+    if h_freq is None or h_freq >= nyquist:
+        cutoff = nyquist
+        transition = 0.25 * nyquist
+    else:
+        transition = lowpass_transition(h_freq, target_sfreq)
+        cutoff = min(h_freq + transition / 2.0, nyquist)
+    # Hamming窗FIR长度：3.3 / 过渡带宽（与MNE一致），取奇数保证线性相位
+    numtaps = int(np.ceil(3.3 * fs_up / transition)) | 1
+    return signal.firwin(numtaps, cutoff, window='hamming', fs=fs_up)
+
+@lru_cache(maxsize=32)
+def highpass_sos(l_freq, sfreq, order=HIGHPASS_ORDER):
+    """高通SOS系数，按(截止频率, 采样率, 阶数)缓存"""
+    cutoff = l_freq - highpass_transition(l_freq) / 2.0
+    return signal.butter(order, cutoff, btype='highpass', fs=sfreq, output='sos')
+
+def _process_block(block, sfreq, target_sfreq, l_freq, h_freq):
+    if sfreq != target_sfreq:
+        up, down = resample_ratio(sfreq, target_sfreq)
+        taps = antialias_taps(sfreq, target_sfreq, h_freq)
+        block = signal.resample_poly(block, up, down, axis=-1, window=np.array(taps))
+    elif h_freq is not None and h_freq < sfreq / 2.0:
+        # 不需要重采样时只做零相位低通（对称FIR居中卷积）
+        taps = antialias_taps(sfreq, sfreq, h_freq)
+        block = signal.fftconvolve(block, taps[np.newaxis, :], mode='same', axes=-1)
+    if l_freq:
+        block = signal.sosfiltfilt(highpass_sos(l_freq, target_sfreq), block, axis=-1)
+    return block
+
+def resample_bandpass(data, sfreq, target_sfreq, l_freq, h_freq, n_jobs=1, chunk_channels=8):
+    """
+    融合的降采样 + 带通滤波
+
+    Args:
+        data: 形状为 (通道数, 采样点数) 的数组
+        sfreq: 原采样率
+        target_sfreq: 目标采样率
+        l_freq: 高通截止频率，None表示不做高通
+        h_freq: 低通截止频率，None表示只做抗混叠
+        n_jobs: 并行线程数
+        chunk_channels: 每个任务处理的通道数
+    Returns:
+        numpy.ndarray: 形状为 (通道数, 新采样点数) 的float64数组
+    """
+    data = np.asarray(data, dtype=np.float64)
+    chunks = [data[i:i + chunk_channels] for i in range(0, data.shape[0], chunk_channels)]
+    if n_jobs and n_jobs > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(
+                lambda block: _process_block(block, sfreq, target_sfreq, l_freq, h_freq), chunks
+            ))
+    else:
+        results = [_process_block(block, sfreq, target_sfreq, l_freq, h_freq) for block in chunks]
+    return np.concatenate(results, axis=0)
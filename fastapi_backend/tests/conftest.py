@@ -0,0 +1,39 @@
+"""
+单元测试公共配置：在导入任何后端模块之前把数据库、日志和MD5映射目录指向临时目录，
+测试不依赖PostgreSQL，也不会写入项目的 log/ 和 md5/ 目录
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_TMP_DIR = tempfile.mkdtemp(prefix='bj_health_tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TMP_DIR, 'test.db')
+os.environ['LOG_DIR'] = os.path.join(_TMP_DIR, 'log')
+os.environ['MD5_DIR'] = os.path.join(_TMP_DIR, 'md5')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """每个测试使用一个空的SQLite库"""
+    from database import Base, SessionLocal, engine
+    import models  # noqa: F401  注册所有表
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
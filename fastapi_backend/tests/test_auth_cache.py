@@ -0,0 +1,83 @@
+"""
+认证缓存：命中时不访问数据库，用户/角色权限变更接口使缓存失效
+"""
+
+import asyncio
+
+import pytest
+
+import auth_cache
+import models
+import schemas
+from routers import roles, users
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    auth_cache._user_cache.clear()
+    auth_cache._permission_cache.clear()
+    yield
+    auth_cache._user_cache.clear()
+    auth_cache._permission_cache.clear()
+
+
+@pytest.fixture
+def seeded(db):
+    db.add(models.User(user_id='u1', username='alice', password='x', user_type='user'))
+    db.add(models.Role(role_id=1, role_name='analyst'))
+    db.add(models.Permission(permission_id=1, permission_name='read_data', resource='data', action='read'))
+    db.add(models.Permission(permission_id=2, permission_name='write_data', resource='data', action='write'))
+    db.add(models.UserRole(user_id='u1', role_id=1))
+    db.add(models.RolePermission(role_id=1, permission_id=1))
+    db.commit()
+    return db
+
+
+def test_user_cached_until_invalidated(seeded):
+    assert auth_cache.get_cached_user(seeded, 'u1').username == 'alice'
+
+    seeded.query(models.User).filter(models.User.user_id == 'u1').update({'username': 'bob'})
+    seeded.commit()
+    assert auth_cache.get_cached_user(seeded, 'u1').username == 'alice'
+
+    auth_cache.invalidate_user('u1')
+    assert auth_cache.get_cached_user(seeded, 'u1').username == 'bob'
+
+
+def test_update_user_endpoint_invalidates(seeded):
+    auth_cache.get_cached_user(seeded, 'u1')
+
+    asyncio.run(users.update_user('u1', schemas.UserUpdate(username='carol'), db=seeded))
+
+    assert auth_cache.get_cached_user(seeded, 'u1').username == 'carol'
+
+
+def test_permission_set_cached_until_role_changes(seeded):
+    assert auth_cache.get_cached_permission_set(seeded, 'u1') == frozenset({('data', 'read')})
+
+    # 绕过接口直接改库时缓存不变
+    seeded.add(models.RolePermission(role_id=1, permission_id=2))
+    seeded.commit()
+    assert auth_cache.get_cached_permission_set(seeded, 'u1') == frozenset({('data', 'read')})
+
+    # 通过接口移除角色权限后缓存失效
+    asyncio.run(roles.remove_permission_from_role(1, 1, db=seeded))
+    assert auth_cache.get_cached_permission_set(seeded, 'u1') == frozenset({('data', 'write')})
+
+
+def test_delete_role_endpoint_invalidates(seeded):
+    assert auth_cache.get_cached_permission_set(seeded, 'u1')
+
+    asyncio.run(roles.delete_role(1, db=seeded))
+
+    assert auth_cache.get_cached_permission_set(seeded, 'u1') == frozenset()
+
+
+def test_cache_disabled_when_ttl_is_zero(seeded, monkeypatch):
+    monkeypatch.setattr(auth_cache, '_user_cache', auth_cache.TTLCache(0))
+    auth_cache.get_cached_user(seeded, 'u1')
+
+    seeded.query(models.User).filter(models.User.user_id == 'u1').update({'username': 'dave'})
+    seeded.commit()
+
+    assert auth_cache.get_cached_user(seeded, 'u1').username == 'dave'
@@ -0,0 +1,34 @@
+"""
+批量评估：同一MD5的已有结果批量更新为相同分数，只为当前数据新建结果
+"""
+
+import asyncio
+
+import models
+from routers import health_evaluate
+
+MD5 = '0' * 32
+SCORES = (70.0, 30.0, 40.0)
+
+
+def add_data(db, data_id, data_path):
+    db.add(models.Data(id=data_id, personnel_id=str(1000 + data_id), personnel_name='张三', data_path=data_path,
+                       upload_user=1, user_id='admin', md5=MD5))
+
+
+def test_batch_evaluation_updates_results_with_same_md5(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(health_evaluate, 'resolve_scores_for_md5', lambda md5_value, file_id=None: SCORES)
+    add_data(db, 1, str(tmp_path))
+    add_data(db, 2, str(tmp_path))
+    db.add(models.Result(data_id=1, user_id='admin', stress_score=1.0, depression_score=1.0, anxiety_score=1.0, md5=MD5))
+    db.commit()
+
+    results = asyncio.run(health_evaluate.perform_batch_evaluation([2], 'system', '系统'))
+
+    assert [r['success'] for r in results] == [True]
+    db.expire_all()
+    rows = db.query(models.Result).order_by(models.Result.data_id).all()
+    assert [r.data_id for r in rows] == [1, 2]
+    assert all((r.stress_score, r.depression_score, r.anxiety_score) == SCORES for r in rows)
+    assert rows[1].id == results[0]['result_id']
+    assert db.get(models.Data, 2).has_result
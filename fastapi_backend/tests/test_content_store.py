@@ -0,0 +1,102 @@
+"""
+内容存储的引用计数：同一人员多次上传时每次上传一个数据目录，
+删除一条数据记录不会影响同一人员其他记录的数据
+"""
+
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+import content_store
+import models
+from routers import data as data_router
+
+
+def make_zip(name, payload):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.writestr(name, payload)
+    return buffer.getvalue()
+
+
+def upload(db, personnel_id, filename, payload):
+    file = UploadFile(file=io.BytesIO(payload), filename=filename)
+    return asyncio.run(data_router.create_data(
+        personnel_id=personnel_id, personnel_name='张三', file=file, db=db
+    ))
+
+
+def delete(db, data_id):
+    asyncio.run(data_router.delete_data(data_id, db=db))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, db):
+    monkeypatch.setattr(content_store, 'CONTENT_STORE_DIR', str(tmp_path / 'objects'))
+    monkeypatch.setattr(data_router, 'DATA_DIR', str(tmp_path / 'data'))
+    db.add(models.User(user_id='admin', username='admin', password='x', user_type='admin'))
+    db.commit()
+    return db
+
+
+def test_same_person_uploads_twice(store):
+    first_zip = make_zip('first.txt', b'first recording')
+    second_zip = make_zip('second.txt', b'second recording')
+
+    first = upload(store, '1001', '1001_a.zip', first_zip)
+    second = upload(store, '1001', '1001_b.zip', second_zip)
+
+    assert first.data_path != second.data_path
+    assert os.listdir(first.data_path) == ['first.txt']
+    assert os.listdir(second.data_path) == ['second.txt']
+    assert content_store.reference_count(first.md5) == 1
+    assert content_store.reference_count(second.md5) == 1
+
+    # 删除第二次上传不影响第一次的数据
+    delete(store, second.id)
+    assert not content_store.has_object(second.md5)
+    assert content_store.has_object(first.md5)
+    assert os.listdir(first.data_path) == ['first.txt']
+
+
+def test_same_content_shared_until_last_record_deleted(store):
+    payload = make_zip('eeg.txt', b'same recording')
+
+    a = upload(store, '1001', '1001_a.zip', payload)
+    b = upload(store, '1001', '1001_a.zip', payload)
+    c = upload(store, '1002', '1002_b.zip', payload)
+
+    assert a.data_path == b.data_path != c.data_path
+    assert content_store.reference_count(a.md5) == 2
+
+    delete(store, a.id)
+    assert os.listdir(b.data_path) == ['eeg.txt']
+    assert content_store.reference_count(a.md5) == 2
+
+    delete(store, b.id)
+    assert not os.path.lexists(b.data_path)
+    assert content_store.reference_count(a.md5) == 1
+
+    delete(store, c.id)
+    assert not content_store.has_object(a.md5)
+
+
+def test_link_never_replaces_other_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_store, 'CONTENT_STORE_DIR', str(tmp_path / 'objects'))
+    zip_path = tmp_path / 'a.zip'
+    zip_path.write_bytes(make_zip('a.txt', b'a'))
+    content_store.ingest_zip(str(zip_path), 'a' * 32)
+    data_dir = str(tmp_path / 'data' / '1001' / 'shared')
+
+    content_store.link_data_dir('a' * 32, data_dir)
+    zip_path.write_bytes(make_zip('b.txt', b'b'))
+    content_store.ingest_zip(str(zip_path), 'b' * 32)
+
+    with pytest.raises(FileExistsError):
+        content_store.link_data_dir('b' * 32, data_dir)
+    assert content_store.reference_count('a' * 32) == 1
+    assert os.listdir(data_dir) == ['a.txt']
@@ -0,0 +1,55 @@
+"""
+特征库：查询失败时不当作已有特征；特征矩阵中的NaN和±inf以null返回
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+import models
+from routers import features
+
+VERSION = 3
+
+
+@pytest.fixture
+def subject_dir(tmp_path, db):
+    data_dir = tmp_path / '1001'
+    data_dir.mkdir()
+    return str(data_dir)
+
+
+def save(data_dir, values):
+    frame = pd.DataFrame(values, index=['Fz', 'Cz'], columns=['alpha', 'beta'])
+    feature_store.save_features(data_dir, data_dir + '/fif.fif', VERSION, frame.index, frame)
+
+
+def test_has_features_after_save(subject_dir):
+    assert not feature_store.has_features(subject_dir, VERSION)
+
+    save(subject_dir, [[1.0, 2.0], [3.0, 4.0]])
+
+    assert feature_store.has_features(subject_dir, VERSION)
+    assert not feature_store.has_features(subject_dir, VERSION + 1)
+
+
+def test_query_failure_is_not_a_hit(subject_dir, monkeypatch, caplog):
+    def broken_session():
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(feature_store, 'SessionLocal', broken_session)
+
+    assert feature_store.has_features(subject_dir, VERSION) is False
+    assert 'Traceback' in caplog.text
+
+
+def test_non_finite_values_become_null(subject_dir, db):
+    save(subject_dir, [[np.nan, np.inf], [-np.inf, 4.0]])
+    db.add(models.Data(id=1, personnel_id='1001', personnel_name='张三', data_path=subject_dir,
+                       upload_user=1, user_id='admin'))
+    db.commit()
+
+    matrix = feature_store.load_feature_matrix(db, [1])
+
+    assert features._json_matrix(matrix['values']) == [[[None, None], [None, 4.0]]]
@@ -0,0 +1,48 @@
+"""
+应用生命周期：后台模型预热失败时记录异常，退出时写入最后登录时间
+"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import auth_cache
+import main
+import model_warmup
+
+
+@pytest.fixture
+def flushed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(auth_cache, 'flush_last_login', lambda: calls.append(True))
+    return calls
+
+
+def test_warmup_failure_is_logged(monkeypatch, caplog, flushed):
+    def broken_warmup():
+        raise RuntimeError('模型目录不可读')
+
+    monkeypatch.setattr(main, 'MODEL_WARMUP', True)
+    monkeypatch.setattr(model_warmup, 'warmup_registered_models', broken_warmup)
+
+    with TestClient(main.app):
+        assert main.app.state.warmup_future is not None
+        # 完成回调在事件循环线程中执行
+        deadline = time.monotonic() + 5
+        while '后台模型预热失败' not in caplog.text and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert '后台模型预热失败: 模型目录不可读' in caplog.text
+    assert 'Traceback' in caplog.text
+    assert flushed == [True]
+
+
+def test_without_warmup_marks_ready(monkeypatch, flushed):
+    monkeypatch.setattr(main, 'MODEL_WARMUP', False)
+
+    with TestClient(main.app) as client:
+        assert main.app.state.warmup_future is None
+        assert client.get('/ready').status_code == 200
+
+    assert flushed == [True]
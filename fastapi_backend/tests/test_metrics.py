@@ -0,0 +1,28 @@
+"""
+数据库查询计时：失败的查询也要弹出开始时间，否则同一连接后续查询的耗时错位
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    metrics.instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_failed_query_pops_start_time(engine):
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+        with pytest.raises(OperationalError):
+            conn.execute(text('SELECT * FROM missing_table'))
+
+        assert conn.info['query_start'] == []
+        conn.execute(text('SELECT 1'))
+        assert conn.info['query_start'] == []
@@ -0,0 +1,112 @@
+"""
+OpenBCI RAW文本的通道校验与预处理：只保留属于模型通道的部分，全部饱和时在生成fif.fif之前失败；
+预处理结果可用于特征计算，但通道数少于模型输入，评分时报错
+"""
+
+import numpy as np
+import pytest
+
+import openbci_reader
+from data_preprocess import CHANNELS_TO_KEEP
+
+
+def _mne_io_supported():
+    # mne 1.5 的Epochs使用 numpy.in1d（numpy 2.4 已删除），保存FIF使用 numpy 2 不支持的 '>a' 类型
+    try:
+        np.dtype('>a')
+    except TypeError:
+        return False
+    return hasattr(np, 'in1d')
+
+
+requires_mne_io = pytest.mark.skipif(not _mne_io_supported(), reason='当前numpy版本与mne的Epochs读写不兼容')
+
+
+def write_recording(path, data_uv, sfreq=250):
+    n_channels, n_times = data_uv.shape
+    lines = [
+        '%OpenBCI Raw EXG Data',
+        f'%Number of channels = {n_channels}',
+        f'%Sample Rate = {sfreq} Hz',
+        '%Board = OpenBCI_GUI$BoardCytonSerial',
+        'Sample Index, ' + ', '.join(f'EXG Channel {i}' for i in range(n_channels)),
+    ]
+    for t in range(n_times):
+        lines.append(f'{t % 256}, ' + ', '.join(f'{value:.3f}' for value in data_uv[:, t]))
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def recording(tmp_path):
+    rng = np.random.default_rng(0)
+    return write_recording(tmp_path / 'OpenBCI-RAW-2024-01-01_10-00-00.txt', rng.normal(0, 20, size=(8, 500)))
+
+
+def test_reads_without_channel_requirement(recording):
+    raw = openbci_reader.read_raw_openbci(recording)
+
+    assert raw.ch_names == openbci_reader.channel_names(8)
+    assert raw.info['sfreq'] == 250
+    assert raw.info['bads'] == []
+
+
+def test_channel_mismatch_fails(recording):
+    with pytest.raises(ValueError, match='不匹配'):
+        openbci_reader.read_raw_openbci(recording, required_channels=CHANNELS_TO_KEEP)
+
+
+def test_matching_channels_pass(recording):
+    names = openbci_reader.channel_names(8)
+    raw = openbci_reader.read_raw_openbci(recording, required_channels=names[:4])
+    assert raw.ch_names == names
+
+
+def test_all_railed_fails(tmp_path):
+    data = np.full((8, 500), openbci_reader.RAILED_UV)
+    path = write_recording(tmp_path / 'OpenBCI-RAW-railed.txt', data)
+
+    _, meta = openbci_reader.convert(path)
+    assert meta['bads'] == meta['ch_names']
+    with pytest.raises(ValueError, match='饱和'):
+        openbci_reader.read_raw_openbci(path)
+
+
+def test_required_channels_all_railed_fails(tmp_path):
+    rng = np.random.default_rng(1)
+    data = rng.normal(0, 20, size=(8, 500))
+    data[:2] = openbci_reader.RAILED_UV
+    path = write_recording(tmp_path / 'OpenBCI-RAW-partial.txt', data)
+    names = openbci_reader.channel_names(8)
+
+    assert openbci_reader.read_raw_openbci(path, required_channels=names).info['bads'] == names[:2]
+    with pytest.raises(ValueError, match='饱和'):
+        openbci_reader.read_raw_openbci(path, required_channels=names[:2])
+
+
+@requires_mne_io
+def test_treat_keeps_openbci_channels_but_cannot_score(tmp_path):
+    """16通道记录可以完成预处理（用于特征计算），但评分时按通道数报错"""
+    import data_preprocess
+    import model_inference
+
+    data_dir = tmp_path / '1001'
+    data_dir.mkdir()
+    rng = np.random.default_rng(2)
+    write_recording(data_dir / 'OpenBCI-RAW-2024-01-01_10-00-00.txt', rng.normal(0, 10, size=(16, 250 * 115)))
+
+    assert data_preprocess.treat(str(data_dir))
+
+    data = model_inference.load_subject_epochs(str(data_dir))
+    assert data.shape[0] == data_preprocess.PIPELINE_PARAMS['n_epochs']
+    assert data.shape[2] == 16
+    with pytest.raises(ValueError, match='不能评分'):
+        model_inference.standardize_epochs(data, str(tmp_path / 'model.tflite'))
+
+
+def test_standardize_rejects_partial_montage(tmp_path):
+    import model_inference
+
+    data = np.zeros((4, 1, 16, 1000))
+    with pytest.raises(ValueError, match='数据只有16个通道'):
+        model_inference.standardize_epochs(data, str(tmp_path / 'model.tflite'))
@@ -0,0 +1,122 @@
+"""
+预处理产物缓存的命中与失效
+"""
+
+import os
+
+import pytest
+
+import preprocess_cache
+
+PARAMS = {'sfreq': 250, 'l_freq': 1.0, 'h_freq': 40.0, 'ica': True}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / 'recording.edf').write_bytes(b'raw eeg' * 100)
+    return str(tmp_path)
+
+
+def produce(data_dir, key, content=b'epochs'):
+    output = preprocess_cache.keyed_path(data_dir, key, 'fif.fif')
+    with open(output, 'wb') as f:
+        f.write(content)
+    return output
+
+
+def test_hit_after_record(data_dir):
+    raw_path = os.path.join(data_dir, 'recording.edf')
+    key = preprocess_cache.stage_key(data_dir, raw_path, PARAMS)
+    assert preprocess_cache.lookup(data_dir, 'preprocess', key) is None
+
+    output = produce(data_dir, key)
+    preprocess_cache.record(data_dir, 'preprocess', key, raw_path, PARAMS, [output], n_epochs=12)
+
+    entry = preprocess_cache.lookup(data_dir, 'preprocess', key)
+    assert entry['n_epochs'] == 12
+    assert entry['params'] == PARAMS
+    assert preprocess_cache.stage_key(data_dir, raw_path, dict(PARAMS)) == key
+
+
+def test_input_md5_reused_while_file_unchanged(data_dir, monkeypatch):
+    raw_path = os.path.join(data_dir, 'recording.edf')
+    calls = []
+    original = preprocess_cache.file_md5
+    monkeypatch.setattr(preprocess_cache, 'file_md5', lambda path: calls.append(path) or original(path))
+
+    first = preprocess_cache.input_digest(data_dir, raw_path)
+    second = preprocess_cache.input_digest(data_dir, raw_path)
+
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_miss_when_params_change(data_dir):
+    raw_path = os.path.join(data_dir, 'recording.edf')
+    key = preprocess_cache.stage_key(data_dir, raw_path, PARAMS)
+    preprocess_cache.record(data_dir, 'preprocess', key, raw_path, PARAMS, [produce(data_dir, key)])
+
+    other_key = preprocess_cache.stage_key(data_dir, raw_path, dict(PARAMS, h_freq=45.0))
+
+    assert other_key != key
+    assert preprocess_cache.lookup(data_dir, 'preprocess', other_key) is None
+    assert preprocess_cache.lookup(data_dir, 'ica', key) is None
+
+
+def test_miss_when_input_changes(data_dir):
+    raw_path = os.path.join(data_dir, 'recording.edf')
+    key = preprocess_cache.stage_key(data_dir, raw_path, PARAMS)
+    preprocess_cache.record(data_dir, 'preprocess', key, raw_path, PARAMS, [produce(data_dir, key)])
+
+    with open(raw_path, 'ab') as f:
+        f.write(b'more samples')
+
+    assert preprocess_cache.stage_key(data_dir, raw_path, PARAMS) != key
+
+
+def test_miss_when_output_modified_or_removed(data_dir):
+    raw_path = os.path.join(data_dir, 'recording.edf')
+    key = preprocess_cache.stage_key(data_dir, raw_path, PARAMS)
+    output = produce(data_dir, key)
+    preprocess_cache.record(data_dir, 'preprocess', key, raw_path, PARAMS, [output])
+
+    with open(output, 'ab') as f:
+        f.write(b'truncated write')
+    assert preprocess_cache.lookup(data_dir, 'preprocess', key) is None
+
+    os.remove(output)
+    assert preprocess_cache.lookup(data_dir, 'preprocess', key) is None
+
+
+def test_old_parameter_sets_evicted(data_dir):
+    raw_path = os.path.join(data_dir, 'recording.edf')
+    keys = []
+    for h_freq in range(40, 40 + preprocess_cache.MAX_ENTRIES_PER_STAGE + 1):
+        params = dict(PARAMS, h_freq=float(h_freq))
+        key = preprocess_cache.stage_key(data_dir, raw_path, params)
+        preprocess_cache.record(data_dir, 'preprocess', key, raw_path, params, [produce(data_dir, key)])
+        keys.append(key)
+
+    assert preprocess_cache.lookup(data_dir, 'preprocess', keys[0]) is None
+    assert not os.path.exists(os.path.join(data_dir, preprocess_cache.CACHE_DIR_NAME, keys[0]))
+    for key in keys[1:]:
+        assert preprocess_cache.lookup(data_dir, 'preprocess', key) is not None
+
+
+def test_corrupt_manifest_is_a_miss(data_dir):
+    with open(os.path.join(data_dir, preprocess_cache.MANIFEST_NAME), 'w') as f:
+        f.write('{not json')
+
+    assert preprocess_cache.load_manifest(data_dir) == {'inputs': {}, 'stages': {}}
+    assert preprocess_cache.lookup(data_dir, 'preprocess', 'missing') is None
+
+
+def test_publish_links_cached_output(data_dir):
+    key = 'a' * 32
+    output = produce(data_dir, key)
+    dest = os.path.join(data_dir, 'fif.fif')
+
+    preprocess_cache.publish(output, dest)
+    preprocess_cache.publish(output, dest)
+
+    assert os.path.samefile(output, dest)
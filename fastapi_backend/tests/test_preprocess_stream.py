@@ -0,0 +1,104 @@
+"""
+流式预处理与整段处理的一致性
+
+整段处理的参考结果：整段融合降采样+带通、平均参考，按相同事件切分epoch，
+逐级放宽拒绝阈值直到凑满 n_epochs，取最后 n_epochs 个。
+流式处理按块滤波，每块两端的重叠边界覆盖滤波拖尾，结果应在数值误差范围内一致。
+"""
+
+import mne
+import numpy as np
+import pytest
+
+import data_preprocess
+import preprocess_stream
+import signal_filters
+
+# mne 1.5 的Epochs使用 numpy.in1d（numpy 2.4 已删除）
+requires_epochs = pytest.mark.skipif(not hasattr(np, 'in1d'), reason='当前numpy版本与mne的Epochs不兼容')
+
+SFREQ = 500.0
+CHANNELS = ['Fp1', 'Fz', 'Cz', 'Pz', 'O1', 'O2']
+
+
+@pytest.fixture
+def params():
+    return dict(data_preprocess.PIPELINE_PARAMS, target_sfreq=250, n_epochs=20, resample_method='fused')
+
+
+@pytest.fixture
+def raw():
+    rng = np.random.default_rng(1)
+    n_times = int(120 * SFREQ)
+    t = np.arange(n_times) / SFREQ
+    data = np.cumsum(rng.standard_normal((len(CHANNELS), n_times)), axis=1) * 1e-7 + 10e-6 * np.sin(2 * np.pi * 10 * t)
+    # 最后几秒加入大幅伪迹，需要跳过
+    data[:, -int(3 * SFREQ):] += 500e-6 * rng.standard_normal((len(CHANNELS), int(3 * SFREQ)))
+    raw = mne.io.RawArray(data, mne.create_info(CHANNELS, SFREQ, 'eeg'), verbose=False)
+    raw.set_montage('standard_1005', verbose=False)
+    return raw
+
+
+def whole_record_epochs(raw, events, params):
+    target_sfreq = params['target_sfreq']
+    data = signal_filters.resample_bandpass(raw.get_data(), SFREQ, target_sfreq, params['l_freq'], params['h_freq'])
+    data = data - data.mean(axis=0, keepdims=True)
+    offset = int(round(params['tmin'] * target_sfreq))
+    window = int(round((1.0 - 1 / target_sfreq - params['tmin']) * target_sfreq)) + 1
+    starts = [s + offset for s in events[:, 0] if 0 <= s + offset and s + offset + window <= data.shape[1]]
+    epochs = np.stack([data[:, s:s + window] for s in starts])
+    ptp = (epochs.max(axis=2) - epochs.min(axis=2)).max(axis=1)
+
+    threshold = params['reject_eeg']
+    for _ in range(params['max_attempts']):
+        kept = epochs[ptp <= threshold]
+        if len(kept) >= params['n_epochs']:
+            break
+        threshold *= params['reject_growth']
+    return kept[-params['n_epochs']:], threshold
+
+
+def test_streaming_disabled_by_default(tmp_path):
+    edf = tmp_path / 'recording.edf'
+    edf.write_bytes(b'0' * 1024)
+    assert data_preprocess.PREPROCESS_STREAMING == 'false'
+    assert not data_preprocess.use_streaming(str(edf))
+
+
+
+def test_streaming_true_requires_fused_resample(tmp_path, monkeypatch):
+    edf = tmp_path / 'recording.edf'
+    edf.write_bytes(b'0' * 1024)
+    monkeypatch.setattr(data_preprocess, 'PREPROCESS_STREAMING', 'true')
+    monkeypatch.setitem(data_preprocess.PIPELINE_PARAMS, 'resample_method', 'mne')
+
+    with pytest.raises(ValueError, match='PREPROCESS_RESAMPLE_METHOD=fused'):
+        data_preprocess.use_streaming(str(edf))
+
+    monkeypatch.setitem(data_preprocess.PIPELINE_PARAMS, 'resample_method', 'fused')
+    assert data_preprocess.use_streaming(str(edf))
+
+
+def test_streaming_auto_falls_back_without_fused_resample(tmp_path, monkeypatch):
+    edf = tmp_path / 'recording.edf'
+    edf.write_bytes(b'0' * 1024)
+    monkeypatch.setattr(data_preprocess, 'PREPROCESS_STREAMING', 'auto')
+    monkeypatch.setattr(data_preprocess, 'PREPROCESS_STREAMING_MIN_MB', 0)
+    monkeypatch.setitem(data_preprocess.PIPELINE_PARAMS, 'resample_method', 'mne')
+
+    assert not data_preprocess.use_streaming(str(edf))
+
+
+@requires_epochs
+@pytest.mark.parametrize('block_seconds', [15.0, 60.0])
+def test_stream_matches_whole_record(raw, params, block_seconds):
+    events = mne.make_fixed_length_events(raw, 1, start=0, duration=1, overlap=0)
+
+    epochs, threshold = preprocess_stream.stream_epochs(raw, events, params, block_seconds=block_seconds)
+    expected, expected_threshold = whole_record_epochs(raw, events, params)
+
+    assert threshold == pytest.approx(expected_threshold)
+    result = epochs.get_data()
+    assert result.shape == expected.shape
+    np.testing.assert_allclose(result, expected, atol=1e-3 * np.abs(expected).max())
+    assert epochs.info['sfreq'] == params['target_sfreq']
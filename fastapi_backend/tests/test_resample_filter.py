@@ -0,0 +1,76 @@
+"""
+融合降采样+带通（PREPROCESS_RESAMPLE_METHOD=fused）与原MNE方式的容差
+
+原方式 Raw.resample + Raw.filter 内部调用 mne.filter.resample（FFT重采样）和
+mne.filter.filter_data（FIR零相位带通），这里直接用这两个函数计算参考结果。
+两端各5秒内高通（IIR与FIR）的拖尾不同，只比较中间部分。
+"""
+
+import mne
+import numpy as np
+import pytest
+
+import data_preprocess
+
+SFREQ = 1000.0
+TARGET_SFREQ = 500.0
+L_FREQ, H_FREQ = 1, 100
+CHANNELS = ['Fp1', 'Fz', 'Cz', 'Pz', 'O1', 'O2']
+EDGE = int(5 * TARGET_SFREQ)
+TOLERANCE = 0.01
+
+
+@pytest.fixture
+def raw():
+    rng = np.random.default_rng(0)
+    t = np.arange(int(30 * SFREQ)) / SFREQ
+    data = np.stack([
+        20e-6 * np.sin(2 * np.pi * (5 + 3 * i) * t)
+        + 10e-6 * np.sin(2 * np.pi * (40 + 5 * i) * t)
+        + 5e-6 * rng.standard_normal(len(t))
+        for i in range(len(CHANNELS))
+    ])
+    raw = mne.io.RawArray(data, mne.create_info(CHANNELS, SFREQ, 'eeg'), first_samp=2000, verbose=False)
+    raw.set_montage('standard_1005', verbose=False)
+    raw.info['bads'] = ['O2']
+    return raw
+
+
+@pytest.fixture
+def fused(monkeypatch):
+    monkeypatch.setitem(data_preprocess.PIPELINE_PARAMS, 'resample_method', 'fused')
+
+
+def mne_reference(raw):
+    data = mne.filter.resample(raw.get_data(), up=TARGET_SFREQ / SFREQ, down=1.0, verbose=False)
+    return mne.filter.filter_data(data, TARGET_SFREQ, L_FREQ, H_FREQ, verbose=False)
+
+
+def test_default_method_is_mne():
+    assert data_preprocess.PREPROCESS_RESAMPLE_METHOD == 'mne'
+
+
+def test_fused_within_tolerance_of_mne(raw, fused):
+    expected = mne_reference(raw)
+    result = data_preprocess.resample_filter(raw, TARGET_SFREQ, L_FREQ, H_FREQ).get_data()
+
+    assert result.shape == expected.shape
+    core = slice(EDGE, -EDGE)
+    error = np.sqrt(np.mean((result[:, core] - expected[:, core]) ** 2, axis=1))
+    scale = np.sqrt(np.mean(expected[:, core] ** 2, axis=1))
+    assert np.all(error / scale < TOLERANCE)
+
+
+def test_fused_keeps_measurement_info(raw, fused):
+    result = data_preprocess.resample_filter(raw, TARGET_SFREQ, L_FREQ, H_FREQ)
+
+    assert result.info['sfreq'] == TARGET_SFREQ
+    assert result.ch_names == raw.ch_names
+    assert result.info['bads'] == ['O2']
+    assert result.first_samp == 1000
+    np.testing.assert_allclose(
+        result.get_montage().get_positions()['ch_pos']['Cz'],
+        raw.get_montage().get_positions()['ch_pos']['Cz']
+    )
+    # 原对象不变
+    assert raw.info['sfreq'] == SFREQ
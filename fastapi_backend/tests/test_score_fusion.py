@@ -0,0 +1,81 @@
+"""
+score_fusion 的向量化计算与原逐个被试的标量计算一致
+"""
+
+import numpy as np
+import pytest
+
+from score_fusion import adjust_stress_scores, calculate_final_scores, load_scale_scores
+
+
+def scalar_final_score(model_score, scale_score, score_type):
+    """原 health_evaluate.calculate_final_score 的计算规则"""
+    if scale_score is None:
+        return float(min(95, max(0, model_score)))
+    threshold = 53 if score_type == 1 else 48
+    if scale_score < threshold:
+        final_score = (scale_score / threshold) * 50
+    else:
+        final_score = scale_score / float(threshold) * 50 + model_score * 0.3
+    return float(min(95, max(0, final_score)))
+
+
+def scalar_adjust_stress(stress_score, depression_score, anxiety_score):
+    """原 health_evaluate.adjust_stress_score 的计算规则"""
+    if stress_score < 50:
+        depression_factor = max(1, depression_score + 10)
+        anxiety_factor = max(1, anxiety_score + 10)
+        new_score = (stress_score + 1) * depression_factor * anxiety_factor / 100
+        return float(min(48, max(0, new_score)))
+    if (depression_score + anxiety_score) / 2 > 50:
+        new_score = stress_score * (depression_score + 10) * (anxiety_score + 10) / 10000
+    else:
+        new_score = stress_score * (depression_score + 50) * (anxiety_score + 50) / 10000
+    return float(max(61, min(95, new_score)))
+
+
+@pytest.mark.parametrize('score_type', [1, 2])
+def test_final_scores_match_scalar(score_type):
+    rng = np.random.default_rng(score_type)
+    model_scores = rng.uniform(0, 95, size=200)
+    scale_scores = rng.uniform(20, 100, size=200)
+    # 阈值边界和量表缺失
+    scale_scores[:4] = [53.0, 48.0, 52.999, 47.999]
+    scale_scores[4:10] = np.nan
+
+    result = calculate_final_scores(model_scores, scale_scores, score_type)
+    expected = [
+        scalar_final_score(m, None if np.isnan(s) else s, score_type)
+        for m, s in zip(model_scores, scale_scores)
+    ]
+    np.testing.assert_allclose(result, expected)
+
+
+def test_adjust_stress_matches_scalar():
+    rng = np.random.default_rng(7)
+    stress = rng.uniform(0, 95, size=300)
+    depression = rng.uniform(0, 95, size=300)
+    anxiety = rng.uniform(0, 95, size=300)
+    stress[:2] = [49.999, 50.0]
+    depression[2], anxiety[2] = 50.0, 50.0
+
+    result = adjust_stress_scores(stress, depression, anxiety)
+    expected = [scalar_adjust_stress(s, d, a) for s, d, a in zip(stress, depression, anxiety)]
+    np.testing.assert_allclose(result, expected)
+
+
+def test_single_subject_arrays():
+    assert calculate_final_scores([40.0], [60.0], 1)[0] == pytest.approx(scalar_final_score(40.0, 60.0, 1))
+    assert adjust_stress_scores([70.0], [30.0], [20.0])[0] == pytest.approx(scalar_adjust_stress(70.0, 30.0, 20.0))
+
+
+def test_load_scale_scores(tmp_path):
+    answers = [1] * 20 + [2] * 20
+    (tmp_path / 'lb.csv').write_text(','.join(str(v) for v in answers) + '\n')
+
+    anxiety, depression = load_scale_scores(str(tmp_path))
+
+    # 焦虑：10道反向题计为4分，其余1分；抑郁：10道反向题计为3分，其余2分，再乘1.25
+    assert anxiety == pytest.approx(10 * 4 + 10 * 1)
+    assert depression == pytest.approx((10 * 3 + 10 * 2) * 1.25)
+    assert load_scale_scores(str(tmp_path / 'missing')) == (None, None)
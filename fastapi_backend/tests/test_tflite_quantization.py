@@ -0,0 +1,130 @@
+"""
+INT8 TFLite推理路径的输入量化
+
+用一个按量化后整数值计算输出的解释器替身代替TensorFlow Lite，比较：
+1. predict_epochs（融合推理）与原 EegModelTFLite.predict 的结果
+2. 动态批处理器 run_model_batch 与逐样本推理的结果，并发提交的请求合并为一个批次
+缺少 X / scale + zero_point 时，标准化后的小数值直接截断为0，结果会不同
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import inference_batcher
+import model_inference
+from routers.health_evaluate import EegModelTFLite
+
+MODEL_PATH = '/models/yingji_int8.tflite'
+
+INPUT_DETAIL = {'index': 0, 'dtype': np.int8, 'quantization': (0.05, -3), 'shape': np.array([1, 1, 4, 8])}
+OUTPUT_DETAIL = {'index': 1, 'dtype': np.int8, 'quantization': (1 / 256, -128), 'shape': np.array([1, 2])}
+
+
+class QuantizedInterpreter:
+    """输出 [类别0, 类别1]：量化输入之和大于0时判为类别1"""
+
+    def __init__(self, batch_size=1):
+        self.batch_size = batch_size
+        self._input = None
+
+    def get_input_details(self):
+        detail = dict(INPUT_DETAIL)
+        detail['shape'] = np.array([self.batch_size, 1, 4, 8])
+        return [detail]
+
+    def get_output_details(self):
+        return [dict(OUTPUT_DETAIL)]
+
+    def resize_tensor_input(self, index, shape):
+        self.batch_size = shape[0]
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, value):
+        assert value.dtype == np.int8
+        self._input = value
+
+    def invoke(self):
+        total = self._input.reshape(self._input.shape[0], -1).astype(np.int32).sum(axis=1)
+        positive = total > 0
+        self._output = np.stack([
+            np.where(positive, -100, 100),
+            np.where(positive, 100, -100)
+        ], axis=1).astype(np.int8)
+
+    def get_tensor(self, index):
+        return self._output
+
+
+@pytest.fixture
+def epochs():
+    # 一半epoch为 +0.3，一半为 -0.3，再加上小幅扰动；未量化时全部截断为0
+    rng = np.random.default_rng(0)
+    signs = np.repeat([1.0, -1.0], 20)
+    X = signs[:, None, None, None] * 0.3 + rng.normal(0, 0.02, size=(40, 1, 4, 8))
+    return X.astype(np.float32)
+
+
+@pytest.fixture
+def interpreters(monkeypatch):
+    monkeypatch.setitem(
+        model_inference._tflite_interpreters, MODEL_PATH,
+        (QuantizedInterpreter(), [dict(INPUT_DETAIL)], [dict(OUTPUT_DETAIL)], threading.Lock())
+    )
+    monkeypatch.setitem(inference_batcher._batch_interpreters, MODEL_PATH, {
+        'interpreter': QuantizedInterpreter(),
+        'lock': threading.Lock(),
+        'batch_size': 1,
+        'resizable': True,
+    })
+
+
+def test_quantize_input_matches_legacy_formula():
+    X = np.array([0.3, -0.3, 0.01], dtype=np.float32)
+    expected = (X / 0.05 + -3).astype(np.int8)
+    np.testing.assert_array_equal(model_inference.quantize_tflite_input(X, INPUT_DETAIL), expected)
+
+
+def test_float_model_is_not_quantized():
+    detail = {'dtype': np.float32, 'quantization': (0.0, 0)}
+    X = np.array([0.3, -0.3], dtype=np.float64)
+    np.testing.assert_array_equal(model_inference.quantize_tflite_input(X, detail), X.astype(np.float32))
+
+
+def test_predict_epochs_matches_legacy_tflite_predict(interpreters, epochs, monkeypatch):
+    legacy = EegModelTFLite('/data/subject', MODEL_PATH)
+    monkeypatch.setattr(legacy, 'get_data', lambda: epochs.copy())
+
+    expected = legacy.predict()
+    result = model_inference.predict_epochs(0, MODEL_PATH, epochs)
+
+    assert expected == pytest.approx(0.5)
+    assert result == pytest.approx(expected)
+
+
+def test_batched_tflite_matches_per_sample(interpreters, epochs):
+    y_pred = inference_batcher.run_model_batch(0, MODEL_PATH, epochs)
+    labels = y_pred.argmax(axis=-1)
+
+    assert y_pred.shape == (40, 2)
+    assert float(labels.sum()) / len(labels) == pytest.approx(model_inference.predict_epochs(0, MODEL_PATH, epochs))
+    # 输出已按量化参数还原为概率
+    assert y_pred.max() <= 1.0 and y_pred.min() >= 0.0
+
+
+def test_concurrent_submissions_are_merged(interpreters, epochs):
+    batcher = inference_batcher.DynamicBatcher(0, MODEL_PATH, max_batch_size=120, max_wait_ms=50)
+
+    async def submit_all():
+        return await asyncio.gather(*[batcher.submit(epochs[i * 10:(i + 1) * 10]) for i in range(4)])
+
+    outputs = asyncio.run(submit_all())
+
+    assert batcher.total_batches == 1
+    assert batcher.total_requests == 4
+    assert [y.shape[0] for y in outputs] == [10, 10, 10, 10]
+    np.testing.assert_allclose(np.concatenate(outputs), inference_batcher.run_model_batch(0, MODEL_PATH, epochs))
@@ -0,0 +1,356 @@
+# 文件功能：增量系统备份与恢复引擎
+# 备份目录（.backup）结构：
+#   objects/<哈希前两位>/<sha256>      按内容寻址的文件对象（zlib压缩），相同内容只保存一次
+#   system_backup_<时间戳>/manifest.json  快照清单：各文件的相对路径、sha256、大小、修改时间
+#   system_backup_<时间戳>/database/     pg_dump 目录格式（--format=d，多进程导出，自带压缩）
+# 1. 文件的大小和修改时间与上一个快照清单一致时沿用其哈希，不再读取；对象已存在时跳过压缩，
+#    因此每次备份只读取、压缩变化过的文件
+# 2. 哈希和压缩在线程池中并行执行（zlib压缩时释放GIL）
+# 3. 恢复可以只选择数据库、data目录、model目录中的一部分，或只恢复某个子目录；
+#    数据库用 pg_restore --jobs 并行恢复，文件在线程池中并行解压，内容未变化的文件跳过
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# 备份的文件目录（相对于original_application）
+BACKUP_COMPONENTS = ('data', 'model')
+
+# 对象、快照所在子目录和清单文件名
+OBJECTS_DIR_NAME = 'objects'
+SNAPSHOT_PREFIX = 'system_backup_'
+MANIFEST_NAME = 'manifest.json'
+DATABASE_DIR_NAME = 'database'
+
+# 并行线程数（文件哈希、压缩、解压）和 pg_dump/pg_restore 并行进程数
+BACKUP_WORKERS = min(8, os.cpu_count() or 1)
+DB_JOBS = min(4, os.cpu_count() or 1)
+
+# pg_dump/pg_restore 超时（秒）
+DB_TIMEOUT = 6 * 3600
+
+# 压缩级别；已压缩格式的文件只存储不压缩
+COMPRESS_LEVEL = 6
+STORE_ONLY_EXTENSIONS = {'.zip', '.gz', '.bz2', '.xz', '.7z', '.png', '.jpg', '.jpeg', '.pdf', '.docx'}
+
+CHUNK_SIZE = 4 * 1024 * 1024
+MANIFEST_VERSION = 1
+
+
+class BackupError(Exception):
+    """备份或恢复失败"""
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_path(backup_dir, digest):
+    return os.path.join(backup_dir, OBJECTS_DIR_NAME, digest[:2], digest)
+
+
+def _store_object(backup_dir, path, digest):
+    """把文件压缩写入对象库（已存在时跳过），返回写入的字节数"""
+    object_path = _object_path(backup_dir, digest)
+    if os.path.exists(object_path):
+        return 0
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    level = 0 if os.path.splitext(path)[1].lower() in STORE_ONLY_EXTENSIONS else COMPRESS_LEVEL
+    compressor = zlib.compressobj(level)
+    tmp_path = f"{object_path}.{uuid.uuid4().hex}.tmp"
+    written = 0
+    try:
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                block = compressor.compress(chunk)
+                dst.write(block)
+                written += len(block)
+            block = compressor.flush()
+            dst.write(block)
+            written += len(block)
+        os.replace(tmp_path, object_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+
+def _extract_object(backup_dir, digest, target_path, mtime_ns=None):
+    """从对象库解压文件到目标路径"""
+    object_path = _object_path(backup_dir, digest)
+    if not os.path.exists(object_path):
+        raise BackupError(f"备份对象缺失: {digest}（{target_path}）")
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    decompressor = zlib.decompressobj()
+    tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(object_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                dst.write(decompressor.decompress(chunk))
+            dst.write(decompressor.flush())
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if mtime_ns is not None:
+        os.utime(target_path, ns=(mtime_ns, mtime_ns))
+
+
+def list_snapshots(backup_dir):
+    """按时间排序的快照清单路径"""
+    if not os.path.isdir(backup_dir):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(backup_dir)):
+        manifest_path = os.path.join(backup_dir, name, MANIFEST_NAME)
+        if name.startswith(SNAPSHOT_PREFIX) and os.path.exists(manifest_path):
+            manifests.append(manifest_path)
+    return manifests
+
+
+def load_manifest(manifest_path):
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _scan_files(base_dir, components):
+    """列出各目录下的文件：相对路径 -> (绝对路径, 大小, 修改时间)"""
+    files = {}
+    for component in components:
+        component_dir = os.path.join(base_dir, component)
+        if not os.path.exists(component_dir):
+            logging.warning(f"{component}目录不存在")
+            continue
+        for root, dirs, names in os.walk(component_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if not os.path.isfile(path):
+                    continue
+                stat_result = os.stat(path)
+                relpath = os.path.relpath(path, base_dir).replace(os.sep, '/')
+                files[relpath] = (path, stat_result.st_size, stat_result.st_mtime_ns)
+    return files
+
+
+def dump_database(target_dir, db_config, jobs=DB_JOBS, timeout=DB_TIMEOUT):
+    """
+    用 pg_dump 目录格式并行导出数据库
+
+    参数:
+    db_config (dict): host、port、username、password、database
+    """
+    if not shutil.which('pg_dump'):
+        raise BackupError("未找到pg_dump命令，请确保已安装PostgreSQL客户端工具")
+    dump_command = [
+        'pg_dump',
+        f"--host={db_config['host']}",
+        f"--port={db_config['port']}",
+        f"--username={db_config['username']}",
+        f"--dbname={db_config['database']}",
+        '--format=d',
+        f'--jobs={jobs}',
+        f'--file={target_dir}'
+    ]
+    env = os.environ.copy()
+    env['PGPASSWORD'] = db_config['password']
+    logging.info(f"执行数据库备份命令: {' '.join(dump_command)}")
+    try:
+        process = subprocess.run(dump_command, env=env, timeout=timeout, capture_output=True, text=True)
+    except subprocess.TimeoutExpired:
+        raise BackupError("数据库备份超时")
+    if process.returncode != 0:
+        raise BackupError(f"数据库备份失败: {process.stderr}")
+    logging.info("数据库备份完成")
+
+
+def create_snapshot(backup_dir, base_dir, db_config, components=BACKUP_COMPONENTS,
+                    progress_callback=None, workers=BACKUP_WORKERS, db_jobs=DB_JOBS):
+    """
+    创建一次增量快照
+
+    参数:
+    backup_dir (str): 备份根目录（.backup）
+    base_dir (str): 被备份目录所在的根目录（original_application）
+    db_config (dict): 数据库连接信息，为None时不备份数据库
+    progress_callback (callable): progress_callback(百分比)
+
+    返回:
+    str: 快照清单路径
+    """
+    def report(percent):
+        if progress_callback:
+            progress_callback(int(percent))
+
+    start_time = datetime.now()
+    snapshot_name = f"{SNAPSHOT_PREFIX}{start_time.strftime('%Y%m%d_%H%M%S')}"
+    snapshot_dir = os.path.join(backup_dir, snapshot_name)
+    suffix = 1
+    while os.path.exists(snapshot_dir):
+        snapshot_dir = os.path.join(backup_dir, f"{snapshot_name}_{suffix}")
+        suffix += 1
+    tmp_dir = f"{snapshot_dir}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    try:
+        # 1. 数据库
+        if db_config is not None:
+            dump_database(os.path.join(tmp_dir, DATABASE_DIR_NAME), db_config, jobs=db_jobs)
+        report(30)
+
+        # 2. 文件：与上一个快照比较，大小和修改时间未变的文件沿用哈希
+        previous = {}
+        snapshots = list_snapshots(backup_dir)
+        if snapshots:
+            previous = load_manifest(snapshots[-1]).get('files', {})
+        files = _scan_files(base_dir, components)
+        reused = {}
+        to_hash = []
+        for relpath, (path, size, mtime_ns) in files.items():
+            entry = previous.get(relpath)
+            if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns \
+                    and os.path.exists(_object_path(backup_dir, entry['sha256'])):
+                reused[relpath] = entry['sha256']
+            else:
+                to_hash.append(relpath)
+        logging.info(f"备份文件: 共{len(files)}个，未变化{len(reused)}个，需处理{len(to_hash)}个")
+
+        def process(relpath):
+            path = files[relpath][0]
+            digest = _hash_file(path)
+            return relpath, digest, _store_object(backup_dir, path, digest)
+
+        digests = dict(reused)
+        stored_bytes = 0
+        stored_count = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for done, (relpath, digest, written) in enumerate(executor.map(process, to_hash), 1):
+                digests[relpath] = digest
+                if written:
+                    stored_count += 1
+                    stored_bytes += written
+                report(30 + 65 * done / len(to_hash))
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'created_at': start_time.isoformat(),
+            'database': DATABASE_DIR_NAME if db_config is not None else None,
+            'components': list(components),
+            'files': {
+                relpath: {'sha256': digests[relpath], 'size': size, 'mtime_ns': mtime_ns}
+                for relpath, (_, size, mtime_ns) in sorted(files.items())
+            },
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_dir, snapshot_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    duration = (datetime.now() - start_time).total_seconds()
+    logging.info(f"增量备份完成: {snapshot_dir}，新增对象{stored_count}个（{stored_bytes / 1024 / 1024:.1f}MB），"
+                 f"耗时{duration:.1f}秒")
+    report(100)
+    return os.path.join(snapshot_dir, MANIFEST_NAME)
+
+
+def restore_database(dump_dir, db_config, jobs=DB_JOBS, timeout=DB_TIMEOUT):
+    """删除并重建数据库后用 pg_restore 并行恢复"""
+    env = os.environ.copy()
+    env['PGPASSWORD'] = db_config['password']
+    connection = [
+        f"--host={db_config['host']}",
+        f"--port={db_config['port']}",
+        f"--username={db_config['username']}",
+    ]
+    database = db_config['database']
+
+    # 先删除所有现有连接
+    subprocess.run(
+        ['psql', *connection, '--dbname=postgres', '-c',
+         f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '{database}' AND pid <> pg_backend_pid();"],
+        env=env, capture_output=True
+    )
+    # 删除并创建数据库
+    subprocess.run(['dropdb', *connection, database], env=env, capture_output=True)
+    subprocess.run(['createdb', *connection, database], env=env, capture_output=True)
+
+    restore_command = ['pg_restore', *connection, f'--dbname={database}', f'--jobs={jobs}', dump_dir]
+    logging.info(f"执行数据库恢复命令: {' '.join(restore_command)}")
+    try:
+        process = subprocess.run(restore_command, env=env, timeout=timeout, capture_output=True, text=True)
+    except subprocess.TimeoutExpired:
+        raise BackupError("数据库恢复超时")
+    if process.returncode != 0:
+        raise BackupError(f"数据库恢复失败: {process.stderr}")
+
+
+def restore_snapshot(manifest_path, base_dir, db_config, components=None, prefixes=None,
+                     restore_db=True, progress_callback=None, workers=BACKUP_WORKERS, db_jobs=DB_JOBS):
+    """
+    从快照恢复
+
+    参数:
+    manifest_path (str): 快照清单路径
+    base_dir (str): 恢复到的根目录（original_application）
+    db_config (dict): 数据库连接信息
+    components (list): 要恢复的目录（data、model），None表示快照中的全部目录
+    prefixes (list): 只恢复这些相对路径前缀下的文件（如 "data/results"），None表示不限制
+    restore_db (bool): 是否恢复数据库
+    progress_callback (callable): progress_callback(百分比)
+    """
+    def report(percent):
+        if progress_callback:
+            progress_callback(int(percent))
+
+    manifest = load_manifest(manifest_path)
+    snapshot_dir = os.path.dirname(os.path.abspath(manifest_path))
+    backup_dir = os.path.dirname(snapshot_dir)
+    if components is None:
+        components = manifest.get('components', list(BACKUP_COMPONENTS))
+    scopes = [prefix.strip('/') for prefix in prefixes] if prefixes else list(components)
+
+    def selected(relpath):
+        return relpath.split('/', 1)[0] in components and any(
+            relpath == scope or relpath.startswith(scope + '/') for scope in scopes
+        )
+
+    # 1. 数据库
+    if restore_db and manifest.get('database'):
+        restore_database(os.path.join(snapshot_dir, manifest['database']), db_config, jobs=db_jobs)
+    report(30)
+
+    # 2. 文件：内容未变化（大小、修改时间与清单一致）的文件跳过
+    wanted = {relpath: entry for relpath, entry in manifest['files'].items() if selected(relpath)}
+    current = {relpath: info for relpath, info in _scan_files(base_dir, components).items() if selected(relpath)}
+    to_extract = [
+        relpath for relpath, entry in wanted.items()
+        if relpath not in current
+        or current[relpath][1] != entry['size'] or current[relpath][2] != entry['mtime_ns']
+    ]
+    # 快照中不存在的文件删除，使恢复范围内的内容与快照一致
+    for relpath in current.keys() - wanted.keys():
+        os.remove(current[relpath][0])
+    logging.info(f"恢复文件: 共{len(wanted)}个，需解压{len(to_extract)}个，删除{len(current.keys() - wanted.keys())}个")
+
+    def extract(relpath):
+        entry = wanted[relpath]
+        _extract_object(backup_dir, entry['sha256'], os.path.join(base_dir, *relpath.split('/')), entry['mtime_ns'])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, _ in enumerate(executor.map(extract, to_extract), 1):
+            report(30 + 70 * done / len(to_extract))
+    report(100)
@@ -15,9 +15,9 @@ import traceback
 
 import numpy as np
 import scipy.io as scio
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QItemSelection, QItemSelectionModel
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QFileDialog, QMessageBox, QTableWidgetItem, \
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QFileDialog, QMessageBox, \
     QGraphicsPixmapItem, QGraphicsScene, QInputDialog, QProgressDialog
 from PyQt5 import QtWidgets
 from datetime import datetime
@@ -25,6 +25,7 @@ import state.operate_user as operate_user
 # 导入本页面的前端部分
 import front.data_manage_UI as data_manage_UI
 from front.image_viewer import ImageViewer
+from front.lazy_table import LazyQueryTableModel, ActionButtonDelegate, setup_lazy_table_view
 
 # 导入跳转页面的后端部分
 from backend import index_backend
@@ -101,6 +102,21 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
             QMessageBox.critical(self, "错误", f"获取用户信息失败：{str(e)}")
             return
 
+        # 表格模型按页加载数据记录，操作列按钮由委托绘制
+        self.data_model = LazyQueryTableModel(self.lst, SessionClass, self.data_query, self.data_row)
+        self.action_delegate = ActionButtonDelegate([
+            {'key': 'check', 'text': '查看', 'background': 'NavajoWhite'},
+            {'key': 'preprocess', 'text': '预处理', 'background': 'LightGreen'},
+            {'key': 'delete', 'text': '删除', 'background': 'LightCoral'},
+        ], self.tableWidget)
+        self.action_delegate.clicked.connect(self.on_row_action)
+        setup_lazy_table_view(self.tableWidget, self.data_model, self.action_delegate)
+        # 设置特定列的宽度
+        self.tableWidget.setColumnWidth(0, 50)  # 第一列（ID）
+        self.tableWidget.setColumnWidth(1, 50)  # 第二列（人员id）
+        self.tableWidget.setColumnWidth(3, 300)  # 第四列（文件路径）
+        self.tableWidget.setColumnWidth(5, 150)  # 为上传时间列设置合适的宽度
+
         # 显示表格
         self.show_table()
 
@@ -161,7 +177,7 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
         self.tableWidget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         
         # 连接选择变化信号
-        self.tableWidget.itemSelectionChanged.connect(self.update_selection_count)
+        self.tableWidget.selectionModel().selectionChanged.connect(self.update_selection_count)
 
         # 连接图片查看按钮
         self.view_image_btn.clicked.connect(self.view_current_image)
@@ -199,53 +215,43 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
         finally:
             session.close()
 
+    def data_query(self, session):
+        """
+        数据表格的查询，管理员查看全部数据，普通用户只查看自己上传的数据
+        只取表格需要的列，按ID排序保证分页稳定
+        """
+        query = session.query(
+            Data.id, Data.personnel_id, Data.personnel_name, Data.data_path, Data.upload_user, Data.upload_time
+        )
+        if not self.user_type:  # 普通用户
+            query = query.filter(Data.user_id == self.user_id)
+        return query.order_by(Data.id)
+
+    @staticmethod
+    def data_row(record):
+        """将一条查询结果转换为表格行：(ID, 各列文本, 工具提示)"""
+        data_path = record.data_path or ''
+        values = [
+            str(record.id),
+            str(record.personnel_id),
+            record.personnel_name,
+            os.path.basename(data_path),  # 只显示路径的最后一个目录名
+            '管理员' if record.upload_user == 1 else '普通用户',
+            record.upload_time.strftime("%Y-%m-%d %H:%M:%S") if record.upload_time else "N/A",
+            '',
+        ]
+        return record.id, values, {3: data_path}  # 鼠标悬停显示完整路径
+
     def show_table(self):
         """
-        显示数据表格
+        显示数据表格（只加载第一页，滚动时按需加载后续记录）
         """
-        session = SessionClass()
         try:
-            if self.user_type:  # 管理员
-                data_list = session.query(Data).all()
-            else:  # 普通用户
-                data_list = session.query(Data).filter(Data.user_id == self.user_id).all()
-
-            # 清空表格
-            self.tableWidget.setRowCount(0)
-            
-            # 设置表格列宽
-            self.tableWidget.setColumnWidth(3, 300)  # 设置路径列的宽度为300像素
-
-            for data in data_list:
-                row = self.tableWidget.rowCount()
-                self.tableWidget.insertRow(row)
-                
-                # 获取路径的最后一个目录名
-                display_path = os.path.basename(data.data_path)
-                
-                self.tableWidget.setItem(row, 0, QTableWidgetItem(str(data.id)))
-                self.tableWidget.setItem(row, 1, QTableWidgetItem(str(data.personnel_id)))
-                self.tableWidget.setItem(row, 2, QTableWidgetItem(data.personnel_name))
-                
-                # 创建路径项并设置工具提示（鼠标悬停显示完整路径）
-                path_item = QTableWidgetItem(display_path)
-                path_item.setToolTip(data.data_path)  # 设置完整路径为工具提示
-                self.tableWidget.setItem(row, 3, path_item)
-                
-                self.tableWidget.setItem(row, 4, QTableWidgetItem('管理员' if data.upload_user == 1 else '普通用户'))
-                if data.upload_time:
-                    self.tableWidget.setItem(row, 5, QTableWidgetItem(data.upload_time.strftime("%Y-%m-%d %H:%M:%S")))
-                else:
-                    self.tableWidget.setItem(row, 5, QTableWidgetItem("N/A"))
-                
-                self.tableWidget.setCellWidget(row, 6, self.buttonForRow())
-
-            logging.info(f"Data table refreshed successfully with {len(data_list)} records")
+            self.data_model.refresh()
+            logging.info(f"Data table refreshed successfully with {self.data_model.total_count} records")
         except Exception as e:
             logging.error(f"Error displaying data table: {str(e)}")
             QMessageBox.critical(self, "错误", f"显示数据表格失败：{str(e)}")
-        finally:
-            session.close()
 
     # 定义通道选应的事件（没用但不能删）
     def WrittingNotOfOther(self, tag):
@@ -358,90 +364,21 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
 
     # 将openfile选择的数据存入数据库之后，将刚存入的数据显示到表单中
     def upload_button(self):
-
         '''
-        将数据库tb_data表中最新的一条记录获取下来，得到一个data对象，要判断flag是否等于1，等于1进行下列操作
-        data.id, data.data_path, data.upload_user_id, data.upload_time, data.flag
-
+        表格由模型按页从数据库加载，重新加载即可显示tb_data表中最新的记录
         '''
-        session = SessionClass()
-        kk = session.query(Data).order_by(Data.id.desc()).first()  # 倒序查找最大的id
-        session.close()
-        info = []
-        if kk is not None:
-            info.append([kk.id, kk.personnel_id, kk.data_path, kk.upload_user, kk.personnel_name, kk.upload_time])
-
-        for data in info:
-            row = self.tableWidget.rowCount()  # 当前form有多少行，最后一行是第row-1行
-            self.tableWidget.insertRow(row)  # 创建新的行
-
-            if data[3] == 0:  # info[2]等价于data.upload_user_id
-                user_name = '普通用户'
-            else:
-                user_name = '管理员'
-            for i in range(len(self.lst) - 1):
-                item = QTableWidgetItem()
-                # 获得上传数据信息，将其添加到form中
-                content = ''
-                if i == 0:
-                    content = data[0]  # data[0]对应data.id
-                elif i == 1:
-                    content = data[1]
-                elif i == 2:
-                    content = data[4]
-                elif i == 3:
-                    content = data[2]
-                elif i == 4:
-                    content = user_name  # user_name上边已经处理过
-                elif i == 5:
-                    content = data[5].strftime("%Y-%m-%d %H:%M:%S") if data[5] else "N/A"
-                item.setText(str(content))  # 将content转为string类型才能存入单元格，否则报错。
-                self.tableWidget.setItem(row, i, item)
-            self.tableWidget.setCellWidget(row, len(self.lst) - 1, self.buttonForRow())  # 在最后一个单元格中加按钮
-
-    # 将查看、评估按钮封装到widget中
-    def buttonForRow(self):
+        self.show_table()
+
+    def on_row_action(self, row, action):
         """
-        为每一行创建操作按钮
-        
-        返回:
-        QtWidgets.QWidget: 包含查看和删除按钮的小部
+        操作列按钮的回调，按按钮key分发到查看、预处理、删除
         """
-        widget = QtWidgets.QWidget()
-        # 查看
-        self.check_pushButton = QtWidgets.QPushButton('查看')
-        self.check_pushButton.setStyleSheet(''' text-align : center;
-                                          background-color : NavajoWhite;
-                                          height : 30px;
-                                          border-style: outset;
-                                          font : 13px  ''')
-        # 删除
-        self.delete_pushButton = QtWidgets.QPushButton('删除')
-        self.delete_pushButton.setStyleSheet(''' text-align : center;
-                                                  background-color : LightCoral;
-                                                  height : 30px;
-                                                  border-style: outset;
-                                                  font : 13px  ''')
-        # 预处理
-        self.preprocess_pushButton = QtWidgets.QPushButton('预处理')
-        self.preprocess_pushButton.setStyleSheet(''' text-align : center;
-                                                  background-color : LightGreen;
-                                                  height : 30px;
-                                                  border-style: outset;
-                                                  font : 13px  ''')
-
-        # 绑定按钮事件
-        self.check_pushButton.clicked.connect(self.checkbutton)
-        self.delete_pushButton.clicked.connect(self.deletebutton)
-        self.preprocess_pushButton.clicked.connect(self.preprocessbutton)
-
-        hLayout = QtWidgets.QHBoxLayout()
-        hLayout.addWidget(self.check_pushButton)
-        hLayout.addWidget(self.preprocess_pushButton)
-        hLayout.addWidget(self.delete_pushButton)
-        hLayout.setContentsMargins(5, 2, 5, 2)
-        widget.setLayout(hLayout)
-        return widget
+        handlers = {
+            'check': self.checkbutton,
+            'preprocess': self.preprocessbutton,
+            'delete': self.deletebutton,
+        }
+        handlers[action](row)
 
     def show_image(self):
         feature_type = self.channel_comboBox.currentText()
@@ -532,15 +469,12 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
         self.fit_image_in_view()
 
     # 查看按钮功能
-    def checkbutton(self):
+    def checkbutton(self, row):
         """
         查看按钮的回调函数
         """
-        button = self.sender()
-        if button:
-            row = self.tableWidget.indexAt(button.parent().pos()).row()
-            id = self.tableWidget.item(row, 0).text()
-            self.id = int(id)
+        if 0 <= row < self.data_model.rowCount():
+            self.id = self.data_model.row_id(row)
             logging.info(f"Button clicked in row {row}, corresponding ID: {self.id}")
 
             try:
@@ -561,15 +495,12 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
                 QMessageBox.critical(self, "错误", f"查看数据时发生错误: {str(e)}")
 
     # 删除功能
-    def deletebutton(self):
+    def deletebutton(self, row):
         """
         删除按钮的回调函数
         """
-        button = self.sender()
-        if button:
-            # 确定位置的时候这里是关键
-            row = self.tableWidget.indexAt(button.parent().pos()).row()
-            id = self.tableWidget.item(row, 0).text()  # 获取当前行数据的ID值
+        if 0 <= row < self.data_model.rowCount():
+            id = self.data_model.row_id(row)  # 获取当前行数据的ID值
             
             # 添加确认对话框
             box = QMessageBox(QMessageBox.Question, "确认删除", "确定要删除这条数据吗？此操作不可恢复。")
@@ -627,7 +558,7 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
             finally:
                 session.close()
                 # 从表格中删除记录
-                self.tableWidget.removeRow(row)
+                self.data_model.remove_row(row)
                 logging.info(f"Removed row {row} from table.")
 
     # btn_return返回首页
@@ -685,14 +616,12 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
             return None, False
 
     # 添加预处理按钮的回调函数
-    def preprocessbutton(self):
+    def preprocessbutton(self, row):
         """
         预处理按钮的回调函数，执行据预处理和特征提取
         """
-        button = self.sender()
-        if button:
-            row = self.tableWidget.indexAt(button.parent().pos()).row()
-            data_id = self.tableWidget.item(row, 0).text()  # 获取数据ID
+        if 0 <= row < self.data_model.rowCount():
+            data_id = self.data_model.row_id(row)  # 获取数据ID
             
             try:
                 # 从数据库获取完整路径
@@ -869,18 +798,18 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
     def update_selection_count(self):
         """更新已选择数据的数量显示"""
         try:
-            selected_rows = set(item.row() for item in self.tableWidget.selectedItems())
-            self.selected_data = selected_rows
+            selected_rows = sorted(index.row() for index in self.tableWidget.selectionModel().selectedRows())
             count = len(selected_rows)
             
             if count > 200:
-                # 取消最后选择的行，使用正确的方法
-                current_selection = self.tableWidget.selectedItems()
-                for item in current_selection:
-                    if item.row() not in list(selected_rows)[:200]:
-                        item.setSelected(False)
+                # 取消超出200条的选择
+                selection_model = self.tableWidget.selectionModel()
+                for row in selected_rows[200:]:
+                    selection_model.select(self.data_model.index(row, 0),
+                                           QItemSelectionModel.Deselect | QItemSelectionModel.Rows)
+                selected_rows = selected_rows[:200]
                 count = 200
-                self.selected_data = set(list(selected_rows)[:200])
+            self.selected_data = set(selected_rows)
             
             self.selection_count_label.setText(f"已选择: {count}/200")
         except Exception as e:
@@ -899,10 +828,9 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
             # 获取选中行的数据路径
             data_paths = []
             for row in self.selected_data:
-                path_item = self.tableWidget.item(row, 3)
-                if path_item:
-                    # 获取完整路径（从工具提示中）
-                    full_path = path_item.toolTip()
+                # 获取完整路径（路径列的工具提示）
+                full_path = self.data_model.row_tooltip(row, 3)
+                if full_path:
                     data_paths.append(full_path)
 
             # 创建进度对话框
@@ -1000,8 +928,8 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
             # 先清除现有选择
             self.tableWidget.clearSelection()
             
-            # 获取总行数
-            total_rows = self.tableWidget.rowCount()
+            # 确保前200行已加载，获取可选择的行数
+            total_rows = self.data_model.ensure_loaded(200)
             if total_rows == 0:
                 QMessageBox.warning(self, "警告", "表格中没有数据")
                 return
@@ -1009,9 +937,10 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
             # 计算要选择的行数（最多200行）
             rows_to_select = min(200, total_rows)
             
-            # 选择前N行
-            for row in range(rows_to_select):
-                self.tableWidget.selectRow(row)
+            # 一次性选择前N行
+            selection = QItemSelection(self.data_model.index(0, 0),
+                                       self.data_model.index(rows_to_select - 1, self.data_model.columnCount() - 1))
+            self.tableWidget.selectionModel().select(selection, QItemSelectionModel.Select | QItemSelectionModel.Rows)
             
             # 更新选择计数
             self.update_selection_count()
@@ -1048,7 +977,7 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
         """处理批量删除功能"""
         try:
             # 获取选中的行
-            selected_rows = set(item.row() for item in self.tableWidget.selectedItems())
+            selected_rows = set(index.row() for index in self.tableWidget.selectionModel().selectedRows())
             if not selected_rows:
                 QMessageBox.warning(self, "警告", "请先选择要删除的数据")
                 return
@@ -1084,7 +1013,7 @@ class Data_View_WindowActions(data_manage_UI.Ui_MainWindow, QMainWindow):
                         break
 
                     try:
-                        id = self.tableWidget.item(row, 0).text()
+                        id = self.data_model.row_id(row)
                         data = session.query(Data).filter(Data.id == id).first()
                         if data:
                             path = data.data_path
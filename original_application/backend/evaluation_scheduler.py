@@ -0,0 +1,392 @@
+# 文件功能：桌面端单被试评估调度器
+# 1. 窗口持有的QThreadPool执行评估任务，排队的任务由线程池依次取出，多个被试可同时评估
+#    （窗口打开期间工作线程常驻，窗口关闭时 shutdown_in_background 取消任务，不阻塞GUI线程）
+#    （数据读取和标准化并行，共享的INT8解释器推理由EegModelInt8内部加锁串行）
+# 2. 每个任务有取消令牌：排队中的任务直接从线程池移除，运行中的任务在下一个检查点停止并丢弃结果
+# 3. 任务开始时间和已用时间保存在内存中，不再通过状态文件（status.txt）记录模型是否忙碌
+
+import logging
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from model.tuili_int8 import EegModelInt8
+
+# 同时评估的被试数
+EVALUATION_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# 窗口关闭后仍在等待运行中任务停止的调度器；任务全部结束前保持引用，
+# 避免线程池随窗口析构时在GUI线程中等待
+_draining_schedulers = set()
+
+
+class EvaluationCancelled(Exception):
+    """评估任务已被取消"""
+
+
+class CancellationToken:
+    """评估任务的取消令牌"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """已取消时抛出 EvaluationCancelled"""
+        if self._event.is_set():
+            raise EvaluationCancelled()
+
+
+class SubjectEvaluator:
+    """
+    单个被试的评估：普通应激使用模型推理，抑郁、焦虑使用普通应激模型结果结合量表计算
+    """
+
+    def __init__(self, data_path, model_path):
+        """
+        Args:
+            data_path: 数据路径
+            model_path: 模型路径
+        """
+        self.data_path = data_path
+        self.model_path = model_path
+        self.anxiety_score_lb = None  # 焦虑量表分数
+        self.depression_score_lb = None  # 抑郁量表分数
+
+    def calculate_scale_scores(self):
+        """
+        计算量表分数，只计算一次
+
+        Returns:
+            tuple: (焦虑量表分数, 抑郁量表分数) 如果无法计算则返回 (None, None)
+        """
+        try:
+            import pandas as pd
+            import numpy as np
+
+            # 读取量表数据
+            lb_path = os.path.join(self.data_path, 'lb.csv')
+            if not os.path.exists(lb_path):
+                logging.info("量表文件不存在")
+                return None, None
+
+            # 读取量表数据，没有header
+            df = pd.read_csv(lb_path, header=None)
+            if len(df) < 1:
+                logging.info("量表数据为空")
+                return None, None
+
+            # 计算焦虑量表分数(前20列)
+            anxiety_reverse_items = np.array([1, 2, 5, 8, 10, 11, 15, 16, 19, 20]) - 1
+            first_20 = df.iloc[0, :20].values.astype(float)
+            reverse_mask = np.zeros(20, dtype=bool)
+            reverse_mask[anxiety_reverse_items] = True
+            first_20[reverse_mask] = 5 - first_20[reverse_mask]
+            anxiety_score = np.sum(first_20)
+
+            # 计算抑郁量表分数(后20列)
+            depression_reverse_items = np.array([2, 5, 6, 11, 12, 14, 16, 17, 18, 20]) - 1
+            last_20 = df.iloc[0, 20:40].values.astype(float)
+            reverse_mask = np.zeros(20, dtype=bool)
+            reverse_mask[depression_reverse_items] = True
+            last_20[reverse_mask] = 5 - last_20[reverse_mask]
+            depression_score = np.sum(last_20) * 1.25
+
+            logging.info(f"量表分数计算完成 - 焦虑量表: {anxiety_score:.2f}, 抑郁量表: {depression_score:.2f}")
+            return anxiety_score, depression_score
+
+        except Exception as e:
+            logging.error(f"计算量表分数时发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+            return None, None
+
+    def calculate_final_score(self, model_score, scale_score, score_type):
+        """
+        根据模型分数和量表分数计算最终分数
+
+        Args:
+            model_score: 模型预测分数
+            scale_score: 量表分数
+            score_type: 分数类型 (1: 抑郁, 2: 焦虑)
+
+        Returns:
+            float: 计算后的最终分数
+        """
+        try:
+            if scale_score is None:
+                logging.info(f"量表分数不存在，返回模型分数的90%")
+                return float(min(95, max(0, model_score)))
+
+            if score_type == 1:  # 抑郁
+                if scale_score < 53:
+                    # 当量表分数<=53时，直接返回基于量表的计算结果
+                    final_score = (scale_score / 53) * 50
+                    logging.info(f"抑郁量表分数 < 53，直接使用量表计算结果: {final_score}")
+                else:
+                    # 当量表分数>53时，才结合模型分数
+                    scale_factor = scale_score / 53.0 * 50
+                    model_factor = model_score
+                    final_score = (scale_factor + model_factor * 0.3)
+                    logging.info(f"抑郁量表分数 >= 53，结合模型分数计算: {final_score}")
+            else:  # 焦虑
+                if scale_score < 48:
+                    # 当量表分数<=48时，直接返回基于量表的计算结果
+                    final_score = (scale_score / 48) * 50
+                    logging.info(f"焦虑量表分数 < 48，直接使用量表计算结果: {final_score}")
+                else:
+                    # 当量表分数>48时，才结合模型分数
+                    scale_factor = scale_score / 48.0 * 50
+                    model_factor = model_score
+                    final_score = (scale_factor + model_factor * 0.3)
+                    logging.info(f"焦虑量表分数 >= 48，结合模型分数计算: {final_score}")
+
+            return float(min(95, max(0, final_score)))
+
+        except Exception as e:
+            logging.error(f"计算最终分数时发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+            return model_score
+
+    def adjust_stress_score(self, stress_score, depression_score, anxiety_score):
+        """
+        根据新的计算规则调整普通应激分数
+
+        Args:
+            stress_score: 原普通应激分数
+            depression_score: 抑郁分数
+            anxiety_score: 焦虑分数
+
+        Returns:
+            float: 调整后的普通应激分数
+        """
+        try:
+            # 如果原应激分数小于50，认为是无应激
+            if stress_score < 50:
+                # 确保抑郁分数和焦虑分数减1大于等于1
+                depression_factor = max(1, depression_score + 10)
+                anxiety_factor = max(1, anxiety_score + 10)
+                # 计算新分数
+                new_score = (stress_score + 1) * depression_factor * anxiety_factor / 100
+                # 确保分数大于等于0
+                new_score = max(0, new_score)
+                new_score = min(48, new_score)
+            else:
+                # 有应激情况
+                # 计算新分数
+                if (depression_score+anxiety_score)/2>50:
+                    new_score = stress_score * (depression_score + 10) * (anxiety_score + 10) / 10000
+                else:
+                    new_score = stress_score * (depression_score + 50) * (anxiety_score + 50) / 10000
+                # 确保分数不超过95
+                new_score = min(95, new_score)
+                new_score = max(61, new_score)
+
+            logging.info(f"调整后的普通应激分数: {new_score:.1f}")
+            return float(new_score)
+
+        except Exception as e:
+            logging.error(f"调整普通应激分数时发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+            return stress_score
+
+    def evaluate(self, token):
+        """
+        评估一个被试
+
+        Args:
+            token: CancellationToken，在各阶段之间检查
+        Returns:
+            tuple: (普通应激分数, 抑郁分数, 焦虑分数)
+        """
+        # 确保模型已经加载
+        if not EegModelInt8.load_static_model():
+            raise Exception("量化模型加载失败，无法进行评估")
+        token.check()
+
+        # 预先计算量表分数
+        self.anxiety_score_lb, self.depression_score_lb = self.calculate_scale_scores()
+        token.check()
+
+        # 第一种类型：使用模型进行推理（普通应激不使用量表分数）
+        logging.info("开始第一个模型（普通应激）的评估")
+        model = EegModelInt8(self.data_path, self.model_path)
+        model_result = model.predict() * 100
+        model_result = float(min(95, max(0, model_result)))
+        logging.info(f"第一个模型评估结果: {model_result}")
+        token.check()
+
+        # 第二种类型：使用第一个模型的结果结合抑郁量表分数
+        depression_score = self.calculate_final_score(model_result, self.depression_score_lb, 1)
+        logging.info(f"抑郁评估结果: {depression_score}")
+
+        # 第三种类型：使用第一个模型的结果结合焦虑量表分数
+        anxiety_score = self.calculate_final_score(model_result, self.anxiety_score_lb, 2)
+        logging.info(f"焦虑评估结果: {anxiety_score}")
+
+        # 调整普通应激分数
+        adjusted_stress_score = self.adjust_stress_score(model_result, depression_score, anxiety_score)
+        return adjusted_stress_score, depression_score, anxiety_score
+
+
+class EvaluationJob(QRunnable):
+    """线程池中的单个评估任务"""
+
+    def __init__(self, scheduler, data_id, data_path, model_path):
+        super().__init__()
+        self.setAutoDelete(False)  # 由调度器持有，取消排队任务时需要引用
+        self.scheduler = scheduler
+        self.data_id = data_id
+        self.data_path = data_path
+        self.model_path = model_path
+        self.token = CancellationToken()
+        self.submitted_at = datetime.now().replace(microsecond=0)
+        self.started_monotonic = None
+
+    def run(self):
+        scheduler = self.scheduler
+        try:
+            self.token.check()
+            self.started_monotonic = time.monotonic()
+            scheduler.job_started.emit(self.data_id)
+            scores = SubjectEvaluator(self.data_path, self.model_path).evaluate(self.token)
+            self.token.check()
+            elapsed = time.monotonic() - self.started_monotonic
+            logging.info(f"数据ID {self.data_id} 评估完成，耗时: {elapsed:.2f}秒")
+            scheduler.job_finished.emit(self.data_id, {
+                'scores': scores, 'elapsed': elapsed, 'submitted_at': self.submitted_at
+            })
+        except EvaluationCancelled:
+            logging.info(f"数据ID {self.data_id} 的评估已取消")
+            scheduler.job_cancelled.emit(self.data_id)
+        except Exception as e:
+            logging.error(f"评估过程中发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+            scheduler.job_failed.emit(self.data_id, str(e))
+        finally:
+            scheduler._release(self)
+
+
+class EvaluationScheduler(QObject):
+    """
+    评估调度器：提交、取消评估任务，查询忙碌状态和已用时间
+
+    信号在GUI线程中处理（调度器对象属于GUI线程）
+    """
+
+    job_started = pyqtSignal(int)  # 数据ID
+    job_finished = pyqtSignal(int, object)  # 数据ID, 结果dict：scores（普通应激, 抑郁, 焦虑）、elapsed（秒）、submitted_at
+    job_failed = pyqtSignal(int, str)  # 数据ID, 错误信息
+    job_cancelled = pyqtSignal(int)  # 数据ID
+    idle = pyqtSignal()  # 所有任务结束
+
+    def __init__(self, parent=None, max_workers=EVALUATION_WORKERS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.pool.setExpiryTimeout(-1)  # 工作线程常驻，不随任务结束退出
+        self._jobs = {}  # 数据ID -> EvaluationJob（排队中或运行中）
+        self._lock = threading.Lock()
+
+    def submit(self, data_id, data_path, model_path):
+        """
+        提交评估任务；同一数据已在排队或评估中时不重复提交
+
+        Returns:
+            bool: 是否新提交了任务
+        """
+        with self._lock:
+            if data_id in self._jobs:
+                return False
+            job = EvaluationJob(self, data_id, data_path, model_path)
+            self._jobs[data_id] = job
+        self.pool.start(job)
+        logging.info(f"数据ID {data_id} 加入评估队列，当前任务数: {len(self._jobs)}")
+        return True
+
+    def cancel(self, data_id):
+        """取消一个任务：排队中的直接移除，运行中的在下一个检查点停止"""
+        with self._lock:
+            job = self._jobs.get(data_id)
+        if job is None:
+            return False
+        job.token.cancel()
+        if self.pool.tryTake(job):
+            self.job_cancelled.emit(data_id)
+            self._release(job)
+        return True
+
+    def cancel_all(self):
+        for data_id in self.active_ids():
+            self.cancel(data_id)
+
+    def _release(self, job):
+        with self._lock:
+            if self._jobs.get(job.data_id) is job:
+                del self._jobs[job.data_id]
+            empty = not self._jobs
+        if empty:
+            self.idle.emit()
+
+    def is_busy(self):
+        with self._lock:
+            return bool(self._jobs)
+
+    def is_active(self, data_id):
+        with self._lock:
+            return data_id in self._jobs
+
+    def active_ids(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def running_count(self):
+        """正在运行（非排队）的任务数"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.started_monotonic is not None)
+
+    def elapsed(self, data_id=None):
+        """
+        已用时间（秒）：指定数据ID时为该任务的运行时间，否则为运行最久的任务的运行时间
+        """
+        now = time.monotonic()
+        with self._lock:
+            if data_id is not None:
+                jobs = [self._jobs[data_id]] if data_id in self._jobs else []
+            else:
+                jobs = list(self._jobs.values())
+        started = [job.started_monotonic for job in jobs if job.started_monotonic is not None]
+        return now - min(started) if started else 0.0
+
+    def shutdown_in_background(self):
+        """
+        取消所有任务后立即返回，不等待运行中的任务：
+        调度器脱离窗口并断开窗口的信号，运行中的任务在检查点停止后由 idle 信号释放线程池
+        """
+        self.setParent(None)
+        for signal in (self.job_started, self.job_finished, self.job_failed, self.job_cancelled, self.idle):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass  # 没有连接的槽
+        _draining_schedulers.add(self)
+        self.idle.connect(self._drained)
+        self.cancel_all()
+        if not self.is_busy():
+            self._drained()
+        else:
+            logging.info(f"评估调度器在后台停止，等待运行中的任务: {self.active_ids()}")
+
+    def _drained(self):
+        if self in _draining_schedulers and not self.is_busy():
+            _draining_schedulers.discard(self)
+            logging.info("评估调度器已停止")
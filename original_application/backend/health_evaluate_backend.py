@@ -1,18 +1,17 @@
 import sys
 sys.path.append('../')
 import os
-import threading
 from sql_model.tb_model import Model
 
 import os
 import markdown
 
 from PyQt5 import QtCore
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QItemSelection, QItemSelectionModel
 from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtGui import *
 # from PyQt5.uic.properties import QtGui
-from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QTableWidgetItem, \
+from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, \
     QGraphicsScene, QGraphicsPixmapItem, QProgressDialog
 from PyQt5 import QtWidgets
 from datetime import datetime
@@ -38,7 +37,6 @@ from config import (
     USER_STATUS_FILE, 
     CURRENT_USER_FILE, 
     LOG_FILE, 
-    MODEL_STATUS_FILE,
     DATA_DIR,
     TEMPLATE_DIR,
     RESULTS_DIR,
@@ -49,6 +47,9 @@ from docx import Document
 from docx.shared import Inches
 import traceback
 from front.image_viewer import ImageViewer
+from front.lazy_table import LazyQueryTableModel, ActionButtonDelegate, setup_lazy_table_view
+from backend import report_renderer
+from backend.evaluation_scheduler import EvaluationScheduler
 import time
 
 class UserFilter(logging.Filter):
@@ -79,9 +80,6 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         
         # 定义表格列名
         self.lst = ['ID', '人员ID', '数据路径', '上传用户', '操作']
-        # 设置表格列数和列名
-        self.tableWidget.setColumnCount(len(self.lst))
-        self.tableWidget.setHorizontalHeaderLabels(self.lst)
         
         # 添加批量评估时间记录变量
         self.batch_start_time = None
@@ -131,16 +129,23 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         logger.addFilter(UserFilter(username))
 
         # 初始化其他属性
-        self.test_thread = None
         self.data_path = None
         self.model_list = []
-        self.lock = threading.Lock()
-        self.result_time = None
         self.data_id = 0
-        self.completed_models = 0
         self.current_image_index = 0
-        self.current_model_index = 0
-        self.result_list = []
+
+        # 评估调度器：窗口打开期间常驻线程池执行评估任务，忙碌状态和已用时间保存在内存中，窗口关闭时释放
+        self.scheduler = EvaluationScheduler(self)
+        self._close_confirmed = False  # 已确认取消评估任务，关闭窗口时不再重复询问
+        self.scheduler.job_finished.connect(self.onEvaluationFinished)
+        self.scheduler.job_failed.connect(self.onEvaluationFailed)
+        self.scheduler.job_started.connect(lambda data_id: self.update_status_label())
+        self.scheduler.job_cancelled.connect(lambda data_id: self.update_status_label())
+        self.scheduler.idle.connect(self.onSchedulerIdle)
+        self.evaluated_count = 0
+        self.failed_count = 0
+        self.status_timer = QtCore.QTimer(self)
+        self.status_timer.timeout.connect(self.update_status_label)
 
         # 设置默认灯的颜色为灰色
         self.set_default_led_colors()
@@ -156,6 +161,22 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         self.curve_label.setWordWrap(True)
         self.curve_label.setAlignment(Qt.AlignCenter)
 
+        # 表格模型按页加载数据记录（上传用户名在同一个JOIN查询中取出），操作列按钮由委托绘制
+        self.data_model = LazyQueryTableModel(self.lst, SessionClass, self.data_query, self.data_row)
+        self.action_delegate = ActionButtonDelegate([
+            {'key': 'check', 'text': '查看', 'background': 'NavajoWhite'},
+            {'key': 'evaluate', 'text': '评估', 'background': 'LightCoral'},
+            {'key': 'report', 'text': '报告', 'background': 'LightBlue'},
+        ], self.tableWidget, spacing=10)
+        self.action_delegate.clicked.connect(self.on_row_action)
+        setup_lazy_table_view(self.tableWidget, self.data_model, self.action_delegate)
+        # 设置表格列宽
+        self.tableWidget.setColumnWidth(0, 60)   # ID列
+        self.tableWidget.setColumnWidth(1, 80)   # 人员ID列
+        self.tableWidget.setColumnWidth(2, 180)  # 数据路径列
+        self.tableWidget.setColumnWidth(3, 150)  # 上传用户列 - 减少到150px
+        self.tableWidget.setColumnWidth(4, 400)  # 操作列 - 增加到400px
+
         # 调用其他初始化方法
         self.show_nav()
         self.show_table()
@@ -172,6 +193,9 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
 
         # 添加进度条和计时器
         self.progress_dialog = None
+        # 正在运行的报告渲染线程（保持引用直到线程结束）
+        self.report_threads = []
+
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.update_timer)
         self.elapsed_seconds = 0
@@ -301,8 +325,8 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         显示导航栏和状态信息
         """
         # 状态
-        # 判断模型是否空闲，即是否有文件存在
-        if not os.path.exists(MODEL_STATUS_FILE):
+        # 判断模型是否空闲
+        if not self.scheduler.is_busy():
             self.status_label.setText("模型空闲")
         
         # 如果有当前选中的数据ID，根据其评估结果设置LED颜色
@@ -325,77 +349,51 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             # 如果没有选中的数据，设置为默认灰色
             self.set_default_led_colors()
 
+    def data_query(self, session):
+        """
+        数据表格的查询：一次JOIN取出上传用户名，按ID排序保证分页稳定
+        管理员可以查看所有数据，普通用户只能查看自己上传的数据
+        """
+        query = session.query(
+            Data.id, Data.personnel_id, Data.data_path, User.username
+        ).outerjoin(User, User.user_id == Data.user_id)
+        if not self.user_type:  # 普通用户
+            query = query.filter(Data.user_id == self.user_id)
+        return query.order_by(Data.id)
+
+    @staticmethod
+    def data_row(record):
+        """将一条查询结果转换为表格行：(ID, 各列文本, 工具提示)"""
+        full_path = record.data_path or ''
+        values = [
+            str(record.id),
+            str(record.personnel_id),
+            os.path.basename(full_path),  # 只显示最后一个斜杠后的文件名
+            record.username or "未知用户",
+            '',
+        ]
+        return record.id, values, {2: full_path}  # 鼠标悬停时显示完整路径
+
     def show_table(self):
         '''
-        从数据库tb_data获取data对象list
-        遍历每个data对象，将每个data对象的data.id，personal_id、data_path、upload_user添加到table中
+        从数据库tb_data按页加载数据记录到表格（滚动到底部时加载下一页）
         管理员可以查看所有数据，普通用户只能查看自己上传的数据
         '''
-        session = SessionClass()
         try:
             print(f"show_table - user_type: {self.user_type}, user_id: {self.user_id}, username: {self.username}")  # 调试日志
-            
-            # 根据用户类型获取数据
             if self.user_type:  # 管理员
-                data_list = session.query(Data).all()
-                print(f"Administrator query - found {len(data_list)} records")  # 调试日志
                 logging.info(f"Administrator {self.username}: fetching all data records", extra={'username': self.username})
-            else:  # 普通用户
-                if self.user_id is not None:
-                    data_list = session.query(Data).filter(Data.user_id == self.user_id).all()
-                    print(f"Regular user query - found {len(data_list)} records")  # 调试日志
-                    logging.info(f"Regular user {self.username}: fetching own data records", extra={'username': self.username})
-                else:
-                    data_list = []
-                    print("No user ID available, showing no records")
-                    logging.warning("No user ID available, showing no records", extra={'username': "未登录"})
-
-            # 清空现有表格内容
-            self.tableWidget.setRowCount(0)
-
-            # 设置表格列宽
-            self.tableWidget.setColumnWidth(0, 60)   # ID列
-            self.tableWidget.setColumnWidth(1, 80)   # 人员ID列
-            self.tableWidget.setColumnWidth(2, 180)  # 数据路径列
-            self.tableWidget.setColumnWidth(3, 150)  # 上传用户列 - 减少到150px
-            self.tableWidget.setColumnWidth(4, 400)  # 操作列 - 增加到400px
-
-            # 遍历数据并添加到表
-            for data in data_list:
-                row = self.tableWidget.rowCount()
-                self.tableWidget.insertRow(row)
-
-                # 获取上传用户的用名
-                uploader = session.query(User).filter(User.user_id == data.user_id).first()
-                uploader_name = uploader.username if uploader else "未知用户"
-
-                # 处理数据路径，只显示最后一个斜杠后的文件名
-                full_path = data.data_path
-                # 设置完整路径为工具提示
-                path_item = QTableWidgetItem(os.path.basename(full_path))
-                path_item.setToolTip(full_path)  # 鼠标悬停时显示完整路径
-
-                # 设置表格内容
-                items = [
-                    QTableWidgetItem(str(data.id)),
-                    QTableWidgetItem(str(data.personnel_id)),
-                    path_item,
-                    QTableWidgetItem(uploader_name)
-                ]
-
-                for col, item in enumerate(items):
-                    self.tableWidget.setItem(row, col, item)
-
-                # 添加操作按钮
-                self.tableWidget.setCellWidget(row, 4, self.buttonForRow())  # 直接使用索引4，因为操作列总是最后一列
-
-            logging.info(f"Successfully displayed {self.tableWidget.rowCount()} data records")
+            elif self.user_id is not None:
+                logging.info(f"Regular user {self.username}: fetching own data records", extra={'username': self.username})
+            else:
+                logging.warning("No user ID available, showing no records", extra={'username': "未登录"})
+
+            self.data_model.refresh()
+            logging.info(f"Successfully displayed {self.data_model.total_count} data records")
 
         except Exception as e:
             logging.error(f"Error in show_table: {str(e)}")
             QMessageBox.critical(self, "错误", f"加载数据时发生错误: {str(e)}")
-        finally:
-            session.close()
 
     def show_image(self):
         try:
@@ -482,6 +480,8 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         返回到相应的主页面
         根据用户类型返回到管理员或普通用户页面
         """
+        if not self.confirm_cancel_evaluations():
+            return
         start_time = time.time()  # 记录开始时间
         
         path = USER_STATUS_FILE
@@ -514,57 +514,22 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             QMessageBox.critical(self, "错误", f"返回主页时发生错误：{str(e)}")
 
     # 将查看、评估按钮封装到widget中
-    def buttonForRow(self):
-        widget = QtWidgets.QWidget()
-        
-        # 查看按钮
-        self.check_pushButton = QtWidgets.QPushButton('查看')
-        self.check_pushButton.setStyleSheet("text-align : center;"
-                                          "background-color : NavajoWhite;"
-                                          "height : 30px;"
-                                          "width : 60px;"
-                                          "border-style: outset;"
-                                          "font-size:13px")
-        self.check_pushButton.clicked.connect(self.checkButton)
-
-        # 评估按钮
-        self.evaluate_pushButton = QtWidgets.QPushButton('评估')
-        self.evaluate_pushButton.setStyleSheet("text-align : center;"
-                                             "background-color : LightCoral;"
-                                             "height : 30px;"
-                                             "width : 60px;"
-                                             "border-style: outset;"
-                                             "font-size:13px")
-        self.evaluate_pushButton.clicked.connect(self.EvaluateButton)
-
-        # 生成报告按钮
-        self.report_pushButton = QtWidgets.QPushButton('报告')
-        self.report_pushButton.setStyleSheet("text-align : center;"
-                                           "background-color : LightBlue;"
-                                           "height : 30px;"
-                                           "width : 60px;"
-                                           "border-style: outset;"
-                                           "font-size:13px")
-        self.report_pushButton.clicked.connect(self.generateReport)
-
-        # 调整布局间距
-        hLayout = QtWidgets.QHBoxLayout()
-        hLayout.addWidget(self.check_pushButton)
-        hLayout.addWidget(self.evaluate_pushButton)
-        hLayout.addWidget(self.report_pushButton)
-        hLayout.setContentsMargins(5, 2, 5, 2)
-        hLayout.setSpacing(10)  # 按钮之间的间距
-        widget.setLayout(hLayout)
-        return widget
+    def on_row_action(self, row, action):
+        """
+        操作列按钮的回调，按按钮key分发到查看、评估、生成报告
+        """
+        handlers = {
+            'check': self.checkButton,
+            'evaluate': self.EvaluateButton,
+            'report': self.generateReport,
+        }
+        handlers[action](row)
 
     # 查看按钮功能
-    def checkButton(self):
-        button = self.sender()
-        if button:
+    def checkButton(self, row):
+        if 0 <= row < self.data_model.rowCount():
             try:
-                row = self.tableWidget.indexAt(button.parent().pos()).row()
-                id = self.tableWidget.item(row, 0).text()
-                self.data_id = int(id)  # 保存当前选中的数据ID
+                self.data_id = self.data_model.row_id(row)  # 保存当前选中的数据ID
                 logging.info(f"Button clicked in row {row}, ID: {self.data_id}", extra={'username': self.username})
 
                 session = SessionClass()
@@ -610,55 +575,41 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
                 logging.error(f"An error occurred in checkButton: {e}", extra={'username': self.username})
                 QMessageBox.critical(self, "错误", f"查看数据时发生误: {str(e)}")
 
-    # 调用模型
-    def status_model(self, data_path):
-        if os.path.exists(MODEL_STATUS_FILE):  # 使用配置的路径
-            with open(MODEL_STATUS_FILE, mode='r') as file:
-                contents = file.readlines()
-            print(contents)
-            # 获取当前时间
-            data_time = datetime.now().replace(microsecond=0)  # 获取到当前时间
-            begin_time = datetime.strptime(contents[0], "%Y-%m-%d %H:%M:%S")
-            span_time = (data_time - begin_time).seconds
-            minute = int(span_time / 60)
-            second = span_time % 60
-            self.status_label.setText("评中\n" + "(" + str(minute) + "分钟" + str(second) + "秒" + ")")
-            finish_box = QMessageBox(QMessageBox.Information, "提示", "是否终止模型评估")
+    def submitEvaluation(self, data_id, data_path, model_path):
+        """
+        提交评估任务；该数据正在评估时询问是否终止
+        """
+        if self.scheduler.is_active(data_id):
+            elapsed = int(self.scheduler.elapsed(data_id))
+            finish_box = QMessageBox(QMessageBox.Information, "提示",
+                                     f"ID为{data_id}的数据正在评估（{elapsed // 60}分钟{elapsed % 60}秒），是否终止评估？")
             qyes = finish_box.addButton(self.tr("是"), QMessageBox.YesRole)
+            finish_box.addButton(self.tr("否"), QMessageBox.NoRole)
             finish_box.exec_()
             if finish_box.clickedButton() == qyes:
-                self.status_label.setText("模型空闲")
-                os.remove(MODEL_STATUS_FILE)
-                if self.progress_dialog:
-                    self.progress_dialog.close()
-                    self.timer.stop()
-                    self.elapsed_seconds = 0
-                pass
-        else:
-            model_id, model_path = self.model_list[0]  # 只使用第一个模型
-            box = QMessageBox(QMessageBox.Information, "提示", "模型开始评估，请稍等！！！")
-            qyes = box.addButton(self.tr("确定"), QMessageBox.YesRole)
-            box.exec_()
-            if box.clickedButton() == qyes:
-                pass
-                
-            # 重置计时器
-            self.elapsed_seconds = 0
-            
-            # 生成status.txt文件
-            data_time = datetime.now().replace(microsecond=0)  # 获取到当前时间
-            full_path = MODEL_STATUS_FILE  # 也可以创建一个.doc的word文档
-            file = open(full_path, 'w')
-            file.write(str(data_time))
-            file.close()
+                self.scheduler.cancel(data_id)
+            return
 
-            self.status_label.setText("评估中")
+        self.scheduler.submit(data_id, data_path, model_path)
+        self.update_status_label()
+        if not self.status_timer.isActive():
+            self.status_timer.start(1000)
 
-            # 创建并启动评估线程
-            self.test_thread = EvaluateThread(self.data_path, model_path)
-            self.test_thread._rule.connect(self.waitTestRes)
-            self.test_thread.finished.connect(self.on_model_finished)
-            self.test_thread.start()
+    def update_status_label(self):
+        """
+        根据调度器的内存状态显示模型状态和已用时间
+        """
+        active = self.scheduler.active_ids()
+        if not active:
+            self.status_label.setText("模型空闲")
+            return
+        span_time = int(self.scheduler.elapsed())
+        minute = span_time // 60
+        second = span_time % 60
+        running = self.scheduler.running_count()
+        queued = len(active) - running
+        text = f"评估中 {running} 项" + (f"，排队 {queued} 项" if queued else "")
+        self.status_label.setText(text + "\n" + "(" + str(minute) + "分钟" + str(second) + "秒" + ")")
 
     def update_timer(self):
         """更新计时器显示"""
@@ -670,167 +621,151 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             current_value = self.progress_dialog.value()
             self.progress_dialog.setLabelText(f"正在进行评估... (已用时: {time_str})")
 
-    def on_model_finished(self):
+    def onEvaluationFinished(self, data_id, outcome):
         """
-        模型评估完成后的处理方法
-        对于第二和第三个模型
+        单个被试评估完成：保存结果，当前查看的数据同时更新分数显示
         """
+        stress_score, depression_score, anxiety_score = [round(float(score), 1) for score in outcome['scores']]
+        social_isolation_score = round((stress_score + depression_score + anxiety_score) / 20, 1)
+        result_time = outcome['submitted_at']
+
+        if data_id == self.data_id:
+            self.show_scores(stress_score, depression_score, anxiety_score, social_isolation_score)
+
+        session = SessionClass()
         try:
-            logging.info(f"当前模型索引: {self.current_model_index}")
-            
-            if self.current_model_index == 0:
-                # 第一个模型完成后，增加索引并继续处理下一个模型
-                self.current_model_index += 1
-                if self.result_list and len(self.result_list) > 0:
-                    first_result = self.result_list[0]
-                    logging.info(f"第一个模型的结果: {first_result}")
-                    # 直接处理第二个模型
-                    self.waitTestRes(first_result / 100)  # 转换回原始比例
-                else:
-                    logging.error("无法获取第一个模型的结果")
-            elif self.current_model_index == 1:
-                # 第二个模型完成后，增加索引并继续处理第三个模型
-                self.current_model_index += 1
-                if self.result_list and len(self.result_list) > 1:
-                    first_result = self.result_list[0]
-                    logging.info(f"结果处理第三个模型: {first_result}")
-                    # 直接处理第三个模型
-                    self.waitTestRes(first_result / 100)  # 转换回原始比例
-                else:
-                    logging.error("无法获取结果用于第三个模型")
+            # 如果数据库中已经存在具有当前ID的数据，显示一个提示框询问用户是否要覆盖现有的数据
+            existing_result = session.query(Result).filter(Result.id == data_id).first()
+            if existing_result is not None:
+                box = QMessageBox(QMessageBox.Question, "提示", f"数据库中已经存在ID为{data_id}的数据，是否覆盖？")
+                yes_button = box.addButton(self.tr("是"), QMessageBox.YesRole)
+                no_button = box.addButton(self.tr("否"), QMessageBox.NoRole)
+                box.exec_()
+                if box.clickedButton() == yes_button:
+                    # 如果用户选择"是"，则覆盖现有的数据
+                    existing_result.stress_score = stress_score
+                    existing_result.depression_score = depression_score
+                    existing_result.anxiety_score = anxiety_score
+                    existing_result.social_isolation_score = social_isolation_score
+                    existing_result.result_time = result_time
+                    if data_id == self.data_id:
+                        self.update_led_colors(existing_result)
             else:
-                logging.info("所有模型评估完成")
-                
+                # 如果数据库中不存在具有当前ID的数据，直接添加新的数据
+                uploadresult = Result(
+                    id=data_id,
+                    stress_score=stress_score,
+                    depression_score=depression_score,
+                    anxiety_score=anxiety_score,
+                    social_isolation_score=social_isolation_score,
+                    result_time=result_time,
+                    user_id=self.user_id
+                )
+                session.add(uploadresult)
+                if data_id == self.data_id:
+                    self.update_led_colors(uploadresult)
+
+            session.commit()
+            self.evaluated_count += 1
         except Exception as e:
-            logging.error(f"Error in on_model_finished: {str(e)}")
+            session.rollback()
+            logging.error(f"保存评估结果时发生错误: {str(e)}")
             logging.error(traceback.format_exc())
+        finally:
+            session.close()
 
-    def waitTestRes(self, num):
-        # 检查文件是否存在，如果不存在则使用当前时间
-        import os
-        if os.path.exists(MODEL_STATUS_FILE):
-            with open(MODEL_STATUS_FILE, mode='r', encoding='utf-8') as f:  # 使用配置的路径
-                contents = f.readlines()  # 获取模型开始运行的时间
-            self.result_time = datetime.strptime(contents[0], "%Y-%m-%d %H:%M:%S")  # 将string转化为datetime
-        else:
-            self.result_time = datetime.now()  # 使用当前时间作为默认值
-            logging.info("状态文件不存在，使用当前时间作为评估时间")
-        
-        # 直接使用传入的分数，不做任何转换，并保留1位小数
-        final_score = round(float(num), 1)
-        
-        self.result_list.append(final_score)  # 存储最终分数
-        self.completed_models += 1  # 增加已完成的模型数量
-
-        # 更新对应类的标签显示分数
-        if self.completed_models == 1:
-            self.ordinarystress_label.setText(f"普通应激 ({final_score:.1f})")
-            if final_score > 50:  # 如果分数>50，设置红色LED
-                self.ordinarystress_led_label.setStyleSheet(
-                    "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
-                    "border-radius: 16px; border: 2px solid white; background: red"
-                )
-        elif self.completed_models == 2:
-            self.depression_label.setText(f"抑郁 ({final_score:.1f})")
-            if final_score > 50:
-                self.depression_led_label.setStyleSheet(
-                    "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
-                    "border-radius: 16px; border: 2px solid white; background: red"
-                )
-        elif self.completed_models == 3:
-            self.anxiety_label.setText(f"焦虑 ({final_score:.1f})")
-            if final_score > 50:
-                self.anxiety_led_label.setStyleSheet(
-                    "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
-                    "border-radius: 16px; border: 2px solid white; background: red"
-                )
-            
-            # 在第三个模型完成时立即计算并更新社交孤立分数
-            social_isolation_score = round((self.result_list[0] + self.result_list[1] + self.result_list[2]) / 20, 1)
-            self.social_label.setText(f"社交孤立 ({social_isolation_score})")
-            if social_isolation_score > 50:
-                self.social_led_label.setStyleSheet(
-                    "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
-                    "border-radius: 16px; border: 2px solid white; background: red"
-                )
-            else:
-                self.social_led_label.setStyleSheet(
-                    "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
-                    "border-radius: 16px; border: 2px solid white; background: gray"
-                )
+    def show_scores(self, stress_score, depression_score, anxiety_score, social_isolation_score):
+        """
+        在状态区域显示四项分数，超过50分的LED显示为红色
+        """
+        red_style = (
+            "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
+            "border-radius: 16px; border: 2px solid white; background: red"
+        )
+        gray_style = (
+            "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; "
+            "border-radius: 16px; border: 2px solid white; background: gray"
+        )
+        self.ordinarystress_label.setText(f"普通应激 ({stress_score:.1f})")
+        if stress_score > 50:
+            self.ordinarystress_led_label.setStyleSheet(red_style)
+        self.depression_label.setText(f"抑郁 ({depression_score:.1f})")
+        if depression_score > 50:
+            self.depression_led_label.setStyleSheet(red_style)
+        self.anxiety_label.setText(f"焦虑 ({anxiety_score:.1f})")
+        if anxiety_score > 50:
+            self.anxiety_led_label.setStyleSheet(red_style)
+        self.social_label.setText(f"社交孤立 ({social_isolation_score})")
+        self.social_led_label.setStyleSheet(red_style if social_isolation_score > 50 else gray_style)
 
-        if self.completed_models == 3:  # 如果所有模型都已评估完成
-            if self.progress_dialog:
-                self.progress_dialog.setValue(100)
-                self.timer.stop()  # 停止计时器
-                self.progress_dialog.close()
-            os.remove(MODEL_STATUS_FILE)  # 删除status.txt文件
-            
-            session = SessionClass()
-            try:
-                # 如果数据库中已经存在具有当前ID的数据，显示一个提示框询问用户是否要覆盖现有的数据
-                existing_result = session.query(Result).filter(Result.id == self.data_id).first()
-                if existing_result is not None:
-                    # 如果数据库中已经存在具有当前ID的数据，显示一个提示框询问用户是否要覆盖现有的数据
-                    box = QMessageBox(QMessageBox.Question, "提示", "数据库中已经存在当前ID的数据，是否覆盖？")
-                    yes_button = box.addButton(self.tr("是"), QMessageBox.YesRole)
-                    no_button = box.addButton(self.tr("否"), QMessageBox.NoRole)
-                    box.exec_()
-                    if box.clickedButton() == yes_button:
-                        # 如果用户选择"是"，则覆盖现有的数据
-                        existing_result.stress_score = round(self.result_list[0], 1)
-                        existing_result.depression_score = round(self.result_list[1], 1)
-                        existing_result.anxiety_score = round(self.result_list[2], 1)
-                        existing_result.social_isolation_score = social_isolation_score
-                        existing_result.result_time = self.result_time
-                        # 更新LED颜色
-                        self.update_led_colors(existing_result)
-                    elif box.clickedButton() == no_button:
-                        # 如果用户选择"否"，则不做任何处理
-                        pass
-                else:
-                    # 如果数据库中不存在具有当前ID的数据，直接添加新的数据
-                    uploadresult = Result(
-                        id=self.data_id, 
-                        stress_score=round(self.result_list[0], 1),
-                        depression_score=round(self.result_list[1], 1),
-                        anxiety_score=round(self.result_list[2], 1),
-                        social_isolation_score=social_isolation_score,
-                        result_time=self.result_time,
-                        user_id=self.user_id
-                    )
-                    session.add(uploadresult)
-                    # 更新LED颜色
-                    self.update_led_colors(uploadresult)
+    def onEvaluationFailed(self, data_id, error_msg):
+        """
+        单个被试评估失败
+        """
+        self.failed_count += 1
+        logging.error(f"数据ID {data_id} 评估失败: {error_msg}")
 
-                session.commit()
-                self.show_nav()
-            except Exception as e:
-                logging.error(f"保存评估结果时发生错误: {str(e)}")
-                logging.error(traceback.format_exc())
-            finally:
-                session.close()
-            
-            # 在保存完数据后显示完成提示
-            finish_box = QMessageBox(QMessageBox.Information, "提示", "所有模型评估完成。")
-            qyes = finish_box.addButton(self.tr("确定"), QMessageBox.YesRole)
-            finish_box.exec_()
-            if finish_box.clickedButton() == qyes:
-                self.status_label.setText("模型空闲")
-            
-            self.result_list = []
+    def confirm_cancel_evaluations(self):
+        """
+        有评估任务在排队或运行时，询问是否取消任务并离开当前页面
+
+        Returns:
+            bool: 没有任务或用户确认时为True
+        """
+        if self._close_confirmed or not self.scheduler.is_busy():
+            return True
+        count = len(self.scheduler.active_ids())
+        box = QMessageBox(QMessageBox.Question, "提示", f"还有{count}个被试正在评估，离开将取消评估，是否继续？")
+        yes_button = box.addButton(self.tr("是"), QMessageBox.YesRole)
+        box.addButton(self.tr("否"), QMessageBox.NoRole)
+        box.exec_()
+        self._close_confirmed = box.clickedButton() == yes_button
+        return self._close_confirmed
+
+    def closeEvent(self, event):
+        """
+        窗口关闭事件处理：有评估任务时先确认，确认后取消任务，
+        调度器在后台等待运行中的任务停止，不阻塞界面
+
+        参数:
+        event: 关闭事件
+        """
+        if not self.confirm_cancel_evaluations():
+            event.ignore()
+            return
+        self.status_timer.stop()
+        try:
+            if self.scheduler.is_busy():
+                logging.info(f"窗口关闭，取消评估任务: {self.scheduler.active_ids()}")
+            self.scheduler.shutdown_in_background()
+        except Exception as e:
+            logging.error(f"关闭评估调度器时发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+        event.accept()
+
+    def onSchedulerIdle(self):
+        """
+        所有评估任务结束：停止状态计时，汇总提示一次
+        """
+        self.status_timer.stop()
+        self.update_status_label()
+        evaluated, failed = self.evaluated_count, self.failed_count
+        self.evaluated_count = 0
+        self.failed_count = 0
+        if not evaluated and not failed:
+            return
+        message = "所有模型评估完成。" if not failed else f"评估完成 {evaluated} 项，失败 {failed} 项，详见日志。"
+        finish_box = QMessageBox(QMessageBox.Information, "提示", message)
+        finish_box.addButton(self.tr("确定"), QMessageBox.YesRole)
+        finish_box.exec_()
 
     # 评估钮功能
 
 
-    def EvaluateButton(self):
-        button = self.sender()
-        self.current_model_index = 0
-        self.completed_models = 0
-        if button:
+    def EvaluateButton(self, row):
+        if 0 <= row < self.data_model.rowCount():  # 当前按钮所在行
             try:
-                row = self.tableWidget.indexAt(button.parent().pos()).row()  # 当前按钮所在行
-                id = self.tableWidget.item(row, 0).text()
+                id = self.data_model.row_id(row)
                 self.data_id = id
 
                 session = SessionClass()
@@ -896,7 +831,7 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
                             self.open_model_control_view()
                         return  # 如果有文件不存在，直接返回
 
-                    self.status_model(self.data_path)
+                    self.submitEvaluation(id, self.data_path, model_0.model_path)
             except Exception as e:
                 logging.error(f"An error occurred in EvaluateButton: {str(e)}")
                 QMessageBox.critical(self, "错误", f"评估过程中发生错误: {str(e)}")
@@ -905,6 +840,8 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         """
         打开模型控制页面
         """
+        if not self.confirm_cancel_evaluations():
+            return
         self.model_view = model_manage_backend.model_control_Controller()
         logging.info("Opening model control page.")
         window_manager = WindowManager()
@@ -913,271 +850,141 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
         self.close()
 
     # 添加生成报告的方法
-    def generateReport(self):
-        """生成评估报告"""
+    def generateReport(self, row):
+        """
+        生成评估报告
+
+        报告在后台线程池中渲染（backend/report_renderer.py），内容未变化时直接使用已渲染的PDF
+        """
         start_time = datetime.now()
         try:
-            button = self.sender()
-            if button:
-                row = self.tableWidget.indexAt(button.parent().pos()).row()
-                result_id = int(self.tableWidget.item(row, 0).text())
+            if 0 <= row < self.data_model.rowCount():
+                result_id = self.data_model.row_id(row)
                 
                 logging.info(f"开始生成报告，结果ID: {result_id}")
                 
-                # 创建进度条对话框
-                progress = QProgressDialog("正在生成报告...", None, 0, 100, self)
-                progress.setWindowTitle("请稍候")
-                progress.setWindowModality(Qt.WindowModal)
-                progress.setMinimumDuration(0)  # 立即显示进度条
-                progress.setValue(0)
-                
                 session = SessionClass()
                 try:
-                    # 更新进度 - 10%
-                    progress.setValue(10)
-                    
                     # 获取结果数据
                     result = session.query(Result).filter(Result.id == result_id).first()
                     if not result:
                         QMessageBox.warning(self, "警告", "未找到评估结果，请先进行评估。")
                         return
 
-                    # 更新进度 - 20%
-                    progress.setValue(20)
-                    
                     # 获取数据记录以获取数据路径
                     data = session.query(Data).filter(Data.id == result_id).first()
                     if not data:
                         QMessageBox.warning(self, "警告", "未找到数据记录。")
                         return
 
-                    # 更新进度 - 30%
-                    progress.setValue(30)
-
                     # 检查是否有完整的评估分数
                     if result.stress_score is None or result.depression_score is None or result.anxiety_score is None:
                         QMessageBox.warning(self, "警告", "评估结果不完整，请确保完成所有评估项目。")
                         return
 
-                    # 更新进度 - 40%
-                    progress.setValue(40)
-
-                    # 创建临时目录存储图片和HTML
-                    temp_dir = os.path.join(RESULTS_DIR, f'temp_{result_id}')
-                    os.makedirs(temp_dir, exist_ok=True)
-
-                    # 复制图片到临时目录并生成图片HTML
-                    images_html = ""
-                    data_path = data.data_path
-                    image_list = [
-                        ("Theta波段功率", "Theta.png"),
-                        ("Alpha波段功率", "Alpha.png"),
-                        ("Beta波段功率", "Beta.png"),
-                        ("Gamma波段功率", "Gamma.png"),
-                        ("均分频带1", "frequency_band_1.png"),
-                        ("均分频带2", "frequency_band_2.png"),
-                        ("均分频带3", "frequency_band_3.png"),
-                        ("均分频带4", "frequency_band_4.png"),
-                        ("均分频带5", "frequency_band_5.png"),
-                        ("时域特征 - 过零率", "time_过零率.png"),
-                        ("时域特征 - 方差", "time_方差.png"),
-                        ("时域特征 - 能量", "time_能量.png"),
-                        ("时域特征 - 差分", "time_差分.png"),
-                        ("时频域特征 - 小波变换", "frequency_wavelet.png"),
-                        ("微分熵", "differential_entropy.png"),
-                        ("血清指标分析", "serum_analysis.png"),
-                        ("量表得分分析", "scale_analysis.png")
-                    ]
-
-                    for title, img_name in image_list:
-                        img_path = os.path.join(data_path, img_name)
-                        if os.path.exists(img_path):
-                            # 复制图片到临时目录
-                            temp_img_path = os.path.join(temp_dir, img_name)
-                            import shutil
-                            shutil.copy2(img_path, temp_img_path)
-                            # 添加图片到HTML
-                            images_html += f'<h3>{title}</h3><img src="file://{temp_img_path}" style="max-width: 100%; height: auto;"><br>'
-
-                    # 更新进度 - 50%
-                    progress.setValue(50)
-
-                    # 生成防护建议
-                    suggestions = []
-                    if result.stress_score < 50 and result.depression_score < 50 and result.anxiety_score < 50:
-                        normal_path = os.path.join('templates', 'normal.txt')
-                        if os.path.exists(normal_path):
-                            with open(normal_path, 'r', encoding='utf-8') as f:
-                                suggestions.append(f.read())
-                    else:
-                        if result.stress_score >= 50:
-                            stress_path = os.path.join('templates', 'stress.txt')
-                            if os.path.exists(stress_path):
-                                with open(stress_path, 'r', encoding='utf-8') as f:
-                                    suggestions.append(f.read())
-                        
-                        if result.depression_score >= 50:
-                            depression_path = os.path.join('templates', 'depression.txt')
-                            if os.path.exists(depression_path):
-                                with open(depression_path, 'r', encoding='utf-8') as f:
-                                    suggestions.append(f.read())
-                        
-                        if result.anxiety_score >= 50:
-                            anxiety_path = os.path.join('templates', 'anxiety.txt')
-                            if os.path.exists(anxiety_path):
-                                with open(anxiety_path, 'r', encoding='utf-8') as f:
-                                    suggestions.append(f.read())
-
-                    # 更新进度 - 60%
-                    progress.setValue(60)
-
-                    # 生成完整的HTML内容
-                    html_content = f'''
-                    <!DOCTYPE html>
-                    <html>
-                    <head>
-                        <meta charset="UTF-8">
-                        <title>应激评估报告</title>
-                        <style>
-                            body {{
-                                font-family: SimSun, "Microsoft YaHei", sans-serif;
-                                line-height: 1.5;
-                                margin: 2.5cm;
-                            }}
-                            h1 {{ 
-                                font-size: 24pt;
-                                text-align: center;
-                                margin-bottom: 2em;
-                            }}
-                            h2 {{ 
-                                font-size: 18pt;
-                                margin-top: 1.5em;
-                                border-bottom: 1px solid #ccc;
-                            }}
-                            h3 {{ 
-                                font-size: 14pt;
-                                margin-top: 1em;
-                            }}
-                            p {{ 
-                                text-indent: 2em;
-                                margin: 0.5em 0;
-                            }}
-                            img {{
-                                max-width: 100%;
-                                height: auto;
-                                margin: 1em 0;
-                            }}
-                            @page {{
-                                @top-center {{
-                                    content: "应激评估报告";
-                                    font-size: 9pt;
-                                }}
-                                @bottom-center {{
-                                    content: "第 " counter(page) " 页";
-                                    font-size: 9pt;
-                                }}
-                            }}
-                        </style>
-                    </head>
-                    <body>
-                        <h1>应激评估报告</h1>
-                        
-                        <h2>1. 用户基本信息</h2>
-                        <p>用户名：{self.username}</p>
-                        <p>邮箱：{self.email or '未填写'}</p>
-                        <p>手机：{self.phone or '未填写'}</p>
-                        <p>用户创建时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                        
-                        <h2>2. 应激评估信息</h2>
-                        <p>普通应激评分：{result.stress_score}, 评估结果：{"可能存在应激情况" if result.stress_score >= 50 else "低概率存在应激情况"}</p>
-                        <p>抑郁评分：{result.depression_score}, 评估结果：{"可能存在抑郁情况" if result.depression_score >= 50 else "低概率存在抑郁情况"}</p>
-                        <p>焦虑评分：{result.anxiety_score}, 评估结果：{"可能存在焦虑情况" if result.anxiety_score >= 50 else "低概率存在焦虑情况"}</p>
-                        <p>社交孤立评分：{result.social_isolation_score}, 评估结果：{"可能存在社交孤立情况" if result.social_isolation_score >= 50 else "低概率存在社交孤立情况"}</p>
-                        
-                        <h2>3. 评估数据可视化</h2>
-                        {images_html}
-                        
-                        <h2>4. 防护建议</h2>
-                        <p>{"<br>".join(suggestions)}</p>
-                    </body>
-                    </html>
-                    '''
-
-                    # 保存HTML文件
-                    html_path = os.path.join(temp_dir, 'report.html')
-                    with open(html_path, 'w', encoding='utf-8') as f:
-                        f.write(html_content)
-
-                    # 更新进度 - 70%
-                    progress.setValue(70)
-
-                    # 创建results目录（如不存在）
-                    results_dir = RESULTS_DIR
-                    os.makedirs(results_dir, exist_ok=True)
-
-                    # 生成PDF文件
-                    pdf_path = os.path.join(results_dir, f'report_{result_id}.pdf')
-                    try:
-                        import pdfkit
-                        # 配置wkhtmltopdf
-                        options = {
-                            'page-size': 'A4',
-                            'margin-top': '2.5cm',
-                            'margin-right': '2.5cm',
-                            'margin-bottom': '2.5cm',
-                            'margin-left': '2.5cm',
-                            'encoding': 'UTF-8',
-                            'header-center': '应激评估报告',
-                            'header-font-size': '9',
-                            'footer-center': '[page]',
-                            'footer-font-size': '9',
-                            'enable-local-file-access': None  # 允许访问本地文件
-                        }
-                        pdfkit.from_file(html_path, pdf_path, options=options)
-                    except Exception as e:
-                        import traceback
-                        error_msg = f"Error generating PDF: {str(e)}\n{traceback.format_exc()}"
-                        logging.error(error_msg)
-                        raise Exception(error_msg)
-
-                    # 更新进度 - 90%
-                    progress.setValue(90)
-
-                    # 更新数据库中的报告路径
-                    result.report_path = pdf_path
-                    session.commit()
-
-                    # 清理临时文件
-                    import shutil
-                    if os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir)
-
-                    # 更新进度 - 100%
-                    progress.setValue(100)
-                    
-                    end_time = datetime.now()
-                    duration = (end_time - start_time).total_seconds()
-                    logging.info(f"报告生成完成，结果ID: {result_id}，耗时: {duration:.2f}秒")
-                    
-                    # 显示完成提示
-                    QMessageBox.information(self, "成功", "报告生成完毕，可以在结果管理中查看。")
-
-                except Exception as e:
-                    end_time = datetime.now()
-                    duration = (end_time - start_time).total_seconds()
-                    logging.error(f"生成报告失败，结果ID: {result_id}，耗时: {duration:.2f}秒，错误: {str(e)}")
-                    QMessageBox.critical(self, "错误", "生成报告时发生错误，请重试。")
+                    job = report_renderer.make_job(result, data.data_path, self.username, self.email, self.phone)
+
+                    # 已渲染过且内容未变化：直接使用缓存的PDF
+                    pdf_path = report_renderer.cached_report_path(job)
+                    if pdf_path:
+                        if result.report_path != pdf_path:
+                            result.report_path = pdf_path
+                            session.commit()
+                        duration = (datetime.now() - start_time).total_seconds()
+                        logging.info(f"报告已存在，结果ID: {result_id}，耗时: {duration:.2f}秒")
+                        QMessageBox.information(self, "成功", "报告生成完毕，可以在结果管理中查看。")
+                        return
                 finally:
                     session.close()
-                    # 确保进度条被关闭
-                    progress.close()
+
+                # 首次生成：后台渲染，进度条不阻塞界面
+                progress = QProgressDialog("正在生成报告...", None, 0, 0, self)
+                progress.setWindowTitle("请稍候")
+                progress.setWindowModality(Qt.WindowModal)
+                progress.setMinimumDuration(0)  # 立即显示进度条
+                self.startReportThread([job], progress)
 
         except Exception as e:
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
             logging.error(f"生成报告过程发生错误，耗时: {duration:.2f}秒，错误: {str(e)}")
+            logging.error(traceback.format_exc())
             QMessageBox.critical(self, "错误", "生成报告过程中发生错误，请重试。")
 
+    def startReportThread(self, jobs, progress=None):
+        """
+        启动后台报告渲染线程
+
+        参数:
+        jobs (list): report_renderer.make_job 生成的渲染任务
+        progress (QProgressDialog): 交互式生成时显示的进度条；为None时为后台预生成，不弹出提示
+        """
+        thread = ReportRenderThread(jobs)
+        self.report_threads.append(thread)
+        thread.report_ready.connect(self.onReportReady)
+        if progress is not None:
+            progress.setMaximum(len(jobs))
+            thread.progress_updated.connect(progress.setValue)
+        thread.completed.connect(lambda success, total, failed: self.onReportThreadComplete(thread, progress, success, total, failed))
+        thread.start()
+        return thread
+
+    def onReportReady(self, result_id, pdf_path):
+        """
+        报告渲染完成，更新数据库中的报告路径
+        """
+        session = SessionClass()
+        try:
+            result = session.query(Result).filter(Result.id == result_id).first()
+            if result and result.report_path != pdf_path:
+                result.report_path = pdf_path
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"更新报告路径失败，结果ID: {result_id}，错误: {str(e)}")
+            logging.error(traceback.format_exc())
+        finally:
+            session.close()
+
+    def onReportThreadComplete(self, thread, progress, success, total, failed):
+        """
+        报告渲染线程结束
+        """
+        if thread in self.report_threads:
+            self.report_threads.remove(thread)
+        logging.info(f"报告生成结束，成功: {success}/{total}")
+        if progress is None:
+            return
+        progress.close()
+        if failed:
+            QMessageBox.critical(self, "错误", "生成报告时发生错误，请重试。")
+        else:
+            QMessageBox.information(self, "成功", "报告生成完毕，可以在结果管理中查看。")
+
+    def prerenderReports(self, result_ids):
+        """
+        批量评估完成后在后台预生成报告，之后点击"报告"可立即完成
+        """
+        session = SessionClass()
+        try:
+            jobs = []
+            records = session.query(Result, Data.data_path).join(Data, Data.id == Result.id).filter(
+                Result.id.in_(list(result_ids))
+            ).all()
+            for result, data_path in records:
+                if result.stress_score is None or result.depression_score is None or result.anxiety_score is None:
+                    continue
+                jobs.append(report_renderer.make_job(result, data_path, self.username, self.email, self.phone))
+        except Exception as e:
+            logging.error(f"准备预生成报告失败: {str(e)}")
+            logging.error(traceback.format_exc())
+            return
+        finally:
+            session.close()
+        if jobs:
+            logging.info(f"后台预生成报告: {len(jobs)}份")
+            self.startReportThread(jobs)
+
     def batchEvaluateButton(self):
         """
         批量评估功能
@@ -1208,7 +1015,7 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             session = SessionClass()
             try:
                 for row in selected_rows:
-                    data_id = int(self.tableWidget.item(row.row(), 0).text())
+                    data_id = self.data_model.row_id(row.row())
                     data = session.query(Data).filter(Data.id == data_id).first()
                     if data and os.path.exists(data.data_path):
                         self.selected_data_ids.append(data_id)
@@ -1240,7 +1047,7 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             self.elapsed_seconds = 0
             
             # 创建进度对话框
-            self.progress_dialog = QProgressDialog("正在进行批量评估...", "取消", 0, len(selected_rows), self)
+            self.progress_dialog = QProgressDialog("正在进行批量评估...", "取消", 0, 100, self)  # 进度为百分比
             self.progress_dialog.setWindowModality(Qt.WindowModal)
             self.progress_dialog.setMinimumDuration(0)
             
@@ -1402,6 +1209,9 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
                 
                 # 刷新表格显示
                 self.show_table()
+
+                # 后台预生成本批结果的报告
+                self.prerenderReports(self.selected_data_ids)
                 
             except Exception as e:
                 session.rollback()
@@ -1428,8 +1238,8 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             # 先清除现有选择
             self.tableWidget.clearSelection()
             
-            # 获取总行数
-            total_rows = self.tableWidget.rowCount()
+            # 确保前200行已加载，获取可选择的行数
+            total_rows = self.data_model.ensure_loaded(200)
             if total_rows == 0:
                 QMessageBox.warning(self, "警告", "表格中没有数据")
                 return
@@ -1437,9 +1247,10 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             # 计算要选择的行数（最多200行）
             rows_to_select = min(200, total_rows)
             
-            # 选择前N行
-            for row in range(rows_to_select):
-                self.tableWidget.selectRow(row)
+            # 一次性选择前N行
+            selection = QItemSelection(self.data_model.index(0, 0),
+                                       self.data_model.index(rows_to_select - 1, self.data_model.columnCount() - 1))
+            self.tableWidget.selectionModel().select(selection, QItemSelectionModel.Select | QItemSelectionModel.Rows)
             
             # 显示提示信息
             QMessageBox.information(self, "提示", f"已选择前{rows_to_select}条数据")
@@ -1483,212 +1294,33 @@ class Health_Evaluate_WindowActions(health_evaluate_UI.Ui_MainWindow, QMainWindo
             msg_box.addButton("确定", QMessageBox.AcceptRole)
             msg_box.exec_()
 
-class EvaluateThread(QThread):
+class ReportRenderThread(QThread):
     """
-    评估线程类，处理所有三种类型的评估
+    报告渲染线程：把一批渲染任务交给共享的线程池并转发进度
     """
-    _rule = pyqtSignal(float)  # 用于发送评估结果的信号
-    finished = pyqtSignal()    # 评估完成的信号
+    progress_updated = pyqtSignal(int)  # 已完成的报告数
+    report_ready = pyqtSignal(int, str)  # 结果ID, PDF路径
+    completed = pyqtSignal(int, int, int)  # 成功数, 总数, 失败数
 
-    def __init__(self, data_path, model_path):
-        """
-        初始化评估线程
-        
-        Args:
-            data_path: 数据路径
-            model_path: 模型路径
-        """
+    def __init__(self, jobs):
         super().__init__()
-        self.data_path = data_path
-        self.model_path = model_path
-        self.current_type = 0  # 当前评估类型（0: 普通应激, 1: 抑郁, 2: 焦虑）
-        self.anxiety_score_lb = None  # 焦虑量表分数
-        self.depression_score_lb = None  # 抑郁量表分数
-
-    def calculate_scale_scores(self):
-        """
-        计算量表分数，只计算一次
-        
-        Returns:
-            tuple: (焦虑量表分数, 抑郁量表分数) 如果无法计算则返回 (None, None)
-        """
-        try:
-            import pandas as pd
-            import numpy as np
-            
-            # 读取量表数据
-            lb_path = os.path.join(self.data_path, 'lb.csv')
-            if not os.path.exists(lb_path):
-                logging.info("量表文件不存在")
-                return None, None
-                
-            # 读取量表数据，没有header
-            df = pd.read_csv(lb_path, header=None)
-            if len(df) < 1:
-                logging.info("量表数据为空")
-                return None, None
-            
-            # 计算焦虑量表分数(前20列)
-            anxiety_reverse_items = np.array([1, 2, 5, 8, 10, 11, 15, 16, 19, 20]) - 1
-            first_20 = df.iloc[0, :20].values.astype(float)
-            reverse_mask = np.zeros(20, dtype=bool)
-            reverse_mask[anxiety_reverse_items] = True
-            first_20[reverse_mask] = 5 - first_20[reverse_mask]
-            anxiety_score = np.sum(first_20)
-            
-            # 计算抑郁量表分数(后20列)
-            depression_reverse_items = np.array([2, 5, 6, 11, 12, 14, 16, 17, 18, 20]) - 1
-            last_20 = df.iloc[0, 20:40].values.astype(float)
-            reverse_mask = np.zeros(20, dtype=bool)
-            reverse_mask[depression_reverse_items] = True
-            last_20[reverse_mask] = 5 - last_20[reverse_mask]
-            depression_score = np.sum(last_20) * 1.25
-            
-            logging.info(f"量表分数计算完成 - 焦虑量表: {anxiety_score:.2f}, 抑郁量表: {depression_score:.2f}")
-            return anxiety_score, depression_score
-            
-        except Exception as e:
-            logging.error(f"计算量表分数时发生错误: {str(e)}")
-            logging.error(traceback.format_exc())
-            return None, None
-
-    def calculate_final_score(self, model_score, scale_score, score_type):
-        """
-        根据模型分数和量表分数计算最终分数
-        
-        Args:
-            model_score: 模型预测分数
-            scale_score: 量表分数
-            score_type: 分数类型 (1: 抑郁, 2: 焦虑)
-            
-        Returns:
-            float: 计算后的最终分数
-        """
-        try:
-            if scale_score is None:
-                logging.info(f"量表分数不存在，返回模型分数的90%")
-                return float(min(95, max(0, model_score)))
-                
-            if score_type == 1:  # 抑郁
-                if scale_score < 53:
-                    # 当量表分数<=53时，直接返回基于量表的计算结果
-                    final_score = (scale_score / 53) * 50
-                    logging.info(f"抑郁量表分数 < 53，直接使用量表计算结果: {final_score}")
-                else:
-                    # 当量表分数>53时，才结合模型分数
-                    scale_factor = scale_score / 53.0 * 50
-                    model_factor = model_score
-                    final_score = (scale_factor + model_factor * 0.3)
-                    logging.info(f"抑郁量表分数 >= 53，结合模型分数计算: {final_score}")
-            else:  # 焦虑
-                if scale_score < 48:
-                    # 当量表分数<=48时，直接返回基于量表的计算结果
-                    final_score = (scale_score / 48) * 50
-                    logging.info(f"焦虑量表分数 < 48，直接使用量表计算结果: {final_score}")
-                else:
-                    # 当量表分数>48时，才结合模型分数
-                    scale_factor = scale_score / 48.0 * 50
-                    model_factor = model_score
-                    final_score = (scale_factor + model_factor * 0.3)
-                    logging.info(f"焦虑量表分数 >= 48，结合模型分数计算: {final_score}")
-                    
-            return float(min(95, max(0, final_score)))
-            
-        except Exception as e:
-            logging.error(f"计算最终分数时发生错误: {str(e)}")
-            logging.error(traceback.format_exc())
-            return model_score
-
-    def adjust_stress_score(self, stress_score, depression_score, anxiety_score):
-        """
-        根据新的计算规则调整普通应激分数
-        
-        Args:
-            stress_score: 原普通应激分数
-            depression_score: 抑郁分数
-            anxiety_score: 焦虑分数
-            
-        Returns:
-            float: 调整后的普通应激分数
-        """
-        try:
-            # 如果原应激分数小于50，认为是无应激
-            if stress_score < 50:
-                # 确保抑郁分数和焦虑分数减1大于等于1
-                depression_factor = max(1, depression_score + 10)
-                anxiety_factor = max(1, anxiety_score + 10)
-                # 计算新分数
-                new_score = (stress_score + 1) * depression_factor * anxiety_factor / 100
-                # 确保分数大于等于0
-                new_score = max(0, new_score)
-                new_score = min(48, new_score)
-            else:
-                # 有应激情况
-                # 计算新分数
-                if (depression_score+anxiety_score)/2>50:
-                    new_score = stress_score * (depression_score + 10) * (anxiety_score + 10) / 10000
-                else:
-                    new_score = stress_score * (depression_score + 50) * (anxiety_score + 50) / 10000
-                # 确保分数不超过95
-                new_score = min(95, new_score)
-                new_score = max(61, new_score)
-            
-            logging.info(f"调整后的普通应激分数: {new_score:.1f}")
-            return float(new_score)
-            
-        except Exception as e:
-            logging.error(f"调整普通应激分数时发生错误: {str(e)}")
-            logging.error(traceback.format_exc())
-            return stress_score
+        self.jobs = jobs
 
     def run(self):
-        """
-        运行评估线程
-        对三种类型进行评估：第一种类型使用模型推理，后两种类型使用第一种类型的结果结合量表计算
-        """
+        success = 0
         try:
-            # 确保模型已经加载
-            if not EegModelInt8._interpreter:
-                if not EegModelInt8.load_static_model():
-                    logging.error("量化模型加载失败，无法进行评估")
-                    return
-
-            # 预先计算量表分数
-            self.anxiety_score_lb, self.depression_score_lb = self.calculate_scale_scores()
-
-            # 第一种类型：使用模型进行推理（普通应激不使用量表分数）
-            logging.info("开始第一个模型（普通应激）的评估")
-            model = EegModelInt8(self.data_path, self.model_path)
-            model_result = model.predict() * 100
-            model_result = float(min(95, max(0, model_result)))
-            logging.info(f"第一个模型评估结果: {model_result}")
-            
-            # 第二种类型：使用第一个模型的结果结合抑郁量表分数
-            logging.info("计算第二个模型（抑郁）的结果")
-            depression_score = self.calculate_final_score(model_result, self.depression_score_lb, 1)
-            logging.info(f"抑郁评估结果: {depression_score}")
-            
-            # 第三种类型：使用第一个模型的结果结合焦虑量表分数
-            logging.info("计算第三个模型（焦虑）的结果")
-            anxiety_score = self.calculate_final_score(model_result, self.anxiety_score_lb, 2)
-            logging.info(f"焦虑评估结果: {anxiety_score}")
-
-            # 调整普通应激分数
-            adjusted_stress_score = self.adjust_stress_score(model_result, depression_score, anxiety_score)
-            
-            # 按顺序发送结果
-            self._rule.emit(adjusted_stress_score)
-            self.current_type = 1
-            self._rule.emit(depression_score)
-            self.current_type = 2
-            self._rule.emit(anxiety_score)
-
-            # 发送完成信号
-            self.finished.emit()
+            def on_progress(done, total, result_id, pdf_path):
+                if pdf_path:
+                    self.report_ready.emit(result_id, pdf_path)
+                self.progress_updated.emit(done)
 
+            reports = report_renderer.get_renderer().render_many(self.jobs, on_progress)
+            success = sum(1 for pdf_path in reports.values() if pdf_path)
         except Exception as e:
-            logging.error(f"评估过程中发生错误: {str(e)}")
+            logging.error(f"报告渲染线程发生错误: {str(e)}")
             logging.error(traceback.format_exc())
+        self.completed.emit(success, len(self.jobs), len(self.jobs) - success)
+
 
 if __name__ == '__main__':
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
@@ -35,12 +35,31 @@ from config import (
     DATA_DIR
 )
 import json
+import traceback
+from backend import backup_engine
 
 # 定义备份目录
 BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.backup')
 if not os.path.exists(BACKUP_DIR):
     os.makedirs(BACKUP_DIR)
 
+# 备份/恢复使用的数据库连接信息
+DB_CONFIG = {
+    'host': HOST,
+    'port': PORT,
+    'username': USERNAME,
+    'password': PASSWORD,
+    'database': DATABASE,
+}
+
+# 恢复范围选项：(说明, 恢复的目录, 是否恢复数据库)
+RESTORE_SCOPES = [
+    ("全部（数据库、data目录、model目录）", None, True),
+    ("仅数据库", [], True),
+    ("仅data目录", ['data'], False),
+    ("仅model目录", ['model'], False),
+]
+
 class UserFilter(logging.Filter):
     """
     自定义日志过滤器，用于添加用户类型信息到日志记录中
@@ -55,109 +74,29 @@ class UserFilter(logging.Filter):
 
 class BackupThread(QThread):
     """
-    备份操作线程类
+    备份操作线程类：数据库以pg_dump目录格式并行导出，data、model目录按内容增量备份（backend/backup_engine.py）
     """
     finished = pyqtSignal(bool, str)  # 完成信号，传递成功/失败状态和消息
     progress_updated = pyqtSignal(int)  # 添加进度信号
 
-    def __init__(self, backup_path):
+    def __init__(self, backup_dir):
         super().__init__()
-        self.backup_path = backup_path
+        self.backup_dir = backup_dir
 
     def run(self):
         try:
             logging.info("开始系统备份操作")
-            
-            # 检查pg_dump是否存在
-            if not shutil.which('pg_dump'):
-                logging.error("未找到pg_dump命令")
-                self.finished.emit(False, "未找到pg_dump命令，请确保已安装PostgreSQL客户端工具")
-                return
-                
-            self.progress_updated.emit(10)
-            logging.info("开始创建备份文件")
-            
-            # 创建ZIP文件
-            with zipfile.ZipFile(self.backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # 1. 备份数据库
-                logging.info("开始备份数据库")
-                db_backup_path = os.path.join(BACKUP_DIR, 'temp_db_backup.sql')
-                
-                dump_command = [
-                    'pg_dump',
-                    f'--host={HOST}',
-                    f'--port={PORT}',
-                    f'--username={USERNAME}',
-                    f'--dbname={DATABASE}',
-                    '--format=p',
-                    f'--file={db_backup_path}'
-                ]
-                
-                env = os.environ.copy()
-                env['PGPASSWORD'] = PASSWORD
-                
-                try:
-                    logging.info(f"执行数据库备份命令: {' '.join(dump_command)}")
-                    process = subprocess.run(
-                        dump_command,
-                        env=env,
-                        timeout=60,
-                        capture_output=True,
-                        text=True
-                    )
-                    if process.returncode != 0:
-                        error_msg = f"数据库备份失败: {process.stderr}"
-                        logging.error(error_msg)
-                        raise Exception(error_msg)
-                    logging.info("数据库备份完成")
-                except subprocess.TimeoutExpired:
-                    error_msg = "数据库备份超时"
-                    logging.error(error_msg)
-                    raise Exception(error_msg)
-                    
-                self.progress_updated.emit(40)
-                
-                # 添加数据库备份到zip
-                logging.info("将数据库备份添加到压缩文件")
-                zipf.write(db_backup_path, 'database.sql')
-                os.remove(db_backup_path)
-                logging.info("删除临时数据库备份文件")
-                
-                self.progress_updated.emit(60)
-                
-                # 2. 备份data目录
-                data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
-                if os.path.exists(data_dir):
-                    logging.info(f"开始备份data目录: {data_dir}")
-                    for root, dirs, files in os.walk(data_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, os.path.dirname(data_dir))
-                            logging.info(f"备份文件: {arcname}")
-                            zipf.write(file_path, arcname)
-                else:
-                    logging.warning("data目录不存在")
-
-                # 3. 备份model目录
-                model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
-                if os.path.exists(model_dir):
-                    logging.info(f"开始备份model目录: {model_dir}")
-                    for root, dirs, files in os.walk(model_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, os.path.dirname(model_dir))
-                            logging.info(f"备份文件: {arcname}")
-                            zipf.write(file_path, arcname)
-                else:
-                    logging.warning("model目录不存在")
-
-            self.progress_updated.emit(100)
-            logging.info(f"系统备份完成，备份文件保存在: {self.backup_path}")
-            self.finished.emit(True, self.backup_path)
+            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            manifest_path = backup_engine.create_snapshot(
+                self.backup_dir, base_dir, DB_CONFIG, progress_callback=self.progress_updated.emit
+            )
+            logging.info(f"系统备份完成，备份清单保存在: {manifest_path}")
+            self.finished.emit(True, manifest_path)
             
         except Exception as e:
             error_msg = f"备份过程发生错误: {str(e)}"
             logging.error(error_msg)
+            logging.error(traceback.format_exc())
             self.finished.emit(False, error_msg)
 
 class RestoreThread(QThread):
@@ -165,15 +104,42 @@ class RestoreThread(QThread):
     恢复操作线程类
     """
     finished = pyqtSignal(bool, str)  # 完成信号，传递成功/失败状态和消息
+    progress_updated = pyqtSignal(int)  # 进度信号
 
-    def __init__(self, backup_file):
+    def __init__(self, backup_file, components=None, restore_db=True):
+        """
+        参数:
+        backup_file: 快照清单（manifest.json）或旧版本的 system_backup_*.zip
+        components: 要恢复的目录（data、model），None表示全部
+        restore_db: 是否恢复数据库
+        """
         super().__init__()
         self.backup_file = backup_file
+        self.components = components
+        self.restore_db = restore_db
 
     def run(self):
         """
         执行恢复操作
         """
+        if self.backup_file.endswith('.zip'):
+            self.restore_zip()
+            return
+        try:
+            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            backup_engine.restore_snapshot(
+                self.backup_file, base_dir, DB_CONFIG, components=self.components,
+                restore_db=self.restore_db, progress_callback=self.progress_updated.emit
+            )
+            self.finished.emit(True, "")
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            self.finished.emit(False, str(e))
+
+    def restore_zip(self):
+        """
+        恢复旧版本的ZIP整包备份
+        """
         try:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             
@@ -589,19 +555,16 @@ class ParamControl(Ui_param_Control.Ui_param_Control, QWidget):
             progress.show()  # 立即显示进度条
             QApplication.processEvents()  # 立即处理事件，确保进度条显示
 
-            # 创建时间戳作为备份文件名的一部分
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f'system_backup_{timestamp}.zip'
-            backup_path = os.path.join(BACKUP_DIR, backup_filename)
-
-            # 创建并启动备份线程
-            self.backup_thread = BackupThread(backup_path)
+            # 创建并启动备份线程，进度条显示实际进度
+            timer.stop()
+            self.backup_thread = BackupThread(BACKUP_DIR)
+            self.backup_thread.progress_updated.connect(progress.setValue)
             
             def on_backup_finished(success, message):
                 timer.stop()
                 progress.close()
                 if success:
-                    logging.info(f"System backup created successfully: {backup_filename}")
+                    logging.info(f"System backup created successfully: {message}")
                     # 弹出确认框
                     finish_box = QMessageBox(QMessageBox.Information, "提示", "系统参数备份完成。")
                     qyes = finish_box.addButton(self.tr("确定"), QMessageBox.YesRole)
@@ -637,12 +600,12 @@ class ParamControl(Ui_param_Control.Ui_param_Control, QWidget):
             progress.show()  # 立即显示进度条
             QApplication.processEvents()  # 立即处理事件，确保进度条显示
 
-            # 选择备份文件
+            # 选择备份文件（快照目录中的manifest.json，或旧版本的ZIP备份）
             backup_file, _ = QFileDialog.getOpenFileName(
                 self,
                 "选择备份文件",
                 BACKUP_DIR,
-                "备份文件 (system_backup_*.zip)"
+                "备份文件 (manifest.json system_backup_*.zip)"
             )
 
             if not backup_file:
@@ -650,6 +613,19 @@ class ParamControl(Ui_param_Control.Ui_param_Control, QWidget):
                 progress.close()
                 return
 
+            # 选择恢复范围（旧版本ZIP备份只能整体恢复）
+            components, restore_db = None, True
+            if not backup_file.endswith('.zip'):
+                scope, ok = QInputDialog.getItem(
+                    self, "恢复范围", "请选择要恢复的内容：",
+                    [item[0] for item in RESTORE_SCOPES], 0, False
+                )
+                if not ok:
+                    timer.stop()
+                    progress.close()
+                    return
+                _, components, restore_db = next(item for item in RESTORE_SCOPES if item[0] == scope)
+
             # 确认恢复操作
             reply = QMessageBox.question(
                 self,
@@ -669,7 +645,10 @@ class ParamControl(Ui_param_Control.Ui_param_Control, QWidget):
             QApplication.processEvents()
 
             # 创建并启动恢复线程
-            self.restore_thread = RestoreThread(backup_file)
+            self.restore_thread = RestoreThread(backup_file, components, restore_db)
+            if not backup_file.endswith('.zip'):
+                timer.stop()
+                self.restore_thread.progress_updated.connect(progress.setValue)
             
             def on_restore_finished(success, message):
                 timer.stop()
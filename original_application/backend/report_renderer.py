@@ -0,0 +1,352 @@
+# 文件功能：评估报告（HTML/PDF）渲染服务
+# 1. 在线程池中渲染，不占用GUI线程；wkhtmltopdf为子进程，线程即可并行
+# 2. 图片以file://绝对路径直接引用数据目录中的PNG，不再复制到临时目录，HTML直接从内存交给wkhtmltopdf
+# 3. 渲染结果按内容缓存：缓存键由评估分数、用户信息、防护建议模板和各图片内容哈希计算，
+#    内容不变时再次点击直接返回已有PDF
+# 4. render_many 批量生成一批结果的报告，通过回调报告进度
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from config import RESULTS_DIR, TEMPLATE_DIR
+
+# 报告PDF缓存目录
+REPORT_CACHE_DIR = os.path.join(RESULTS_DIR, 'report_cache')
+
+# 渲染线程数
+REPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+# 修改报告HTML模板时递增，使已有缓存失效
+REPORT_VERSION = 1
+
+# 报告中的图片（标题, 文件名）
+IMAGE_LIST = [
+    ("Theta波段功率", "Theta.png"),
+    ("Alpha波段功率", "Alpha.png"),
+    ("Beta波段功率", "Beta.png"),
+    ("Gamma波段功率", "Gamma.png"),
+    ("均分频带1", "frequency_band_1.png"),
+    ("均分频带2", "frequency_band_2.png"),
+    ("均分频带3", "frequency_band_3.png"),
+    ("均分频带4", "frequency_band_4.png"),
+    ("均分频带5", "frequency_band_5.png"),
+    ("时域特征 - 过零率", "time_过零率.png"),
+    ("时域特征 - 方差", "time_方差.png"),
+    ("时域特征 - 能量", "time_能量.png"),
+    ("时域特征 - 差分", "time_差分.png"),
+    ("时频域特征 - 小波变换", "frequency_wavelet.png"),
+    ("微分熵", "differential_entropy.png"),
+    ("血清指标分析", "serum_analysis.png"),
+    ("量表得分分析", "scale_analysis.png")
+]
+
+PDF_OPTIONS = {
+    'page-size': 'A4',
+    'margin-top': '2.5cm',
+    'margin-right': '2.5cm',
+    'margin-bottom': '2.5cm',
+    'margin-left': '2.5cm',
+    'encoding': 'UTF-8',
+    'header-center': '应激评估报告',
+    'header-font-size': '9',
+    'footer-center': '[page]',
+    'footer-font-size': '9',
+    'enable-local-file-access': None  # 允许访问本地文件
+}
+
+# 图片内容哈希缓存：路径 -> ((大小, 修改时间), 哈希)，文件未变化时不重复读取
+_image_hashes = {}
+_image_hash_lock = threading.Lock()
+
+
+def make_job(result, data_path, username, email=None, phone=None):
+    """
+    由评估结果构造渲染任务
+
+    参数:
+    result: Result记录（需要id和四项分数）
+    data_path (str): 数据目录（图片所在目录）
+    username/email/phone: 报告中显示的用户信息
+    """
+    return {
+        'result_id': result.id,
+        'data_path': data_path,
+        'scores': {
+            'stress_score': result.stress_score,
+            'depression_score': result.depression_score,
+            'anxiety_score': result.anxiety_score,
+            'social_isolation_score': result.social_isolation_score,
+        },
+        'user': {'username': username, 'email': email, 'phone': phone},
+    }
+
+
+def _file_hash(path):
+    stat_result = os.stat(path)
+    signature = (stat_result.st_size, stat_result.st_mtime_ns)
+    with _image_hash_lock:
+        cached = _image_hashes.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _image_hash_lock:
+        _image_hashes[path] = (signature, value)
+    return value
+
+
+def _report_images(data_path):
+    """数据目录中存在的报告图片：[(标题, 绝对路径, 内容哈希)]"""
+    images = []
+    for title, img_name in IMAGE_LIST:
+        img_path = os.path.abspath(os.path.join(data_path, img_name))
+        if os.path.exists(img_path):
+            images.append((title, img_path, _file_hash(img_path)))
+    return images
+
+
+def _suggestion_names(scores):
+    """根据分数选择防护建议模板"""
+    if scores['stress_score'] < 50 and scores['depression_score'] < 50 and scores['anxiety_score'] < 50:
+        return ['normal.txt']
+    names = []
+    if scores['stress_score'] >= 50:
+        names.append('stress.txt')
+    if scores['depression_score'] >= 50:
+        names.append('depression.txt')
+    if scores['anxiety_score'] >= 50:
+        names.append('anxiety.txt')
+    return names
+
+
+def _read_suggestions(scores):
+    suggestions = []
+    for name in _suggestion_names(scores):
+        path = os.path.join(TEMPLATE_DIR, name)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                suggestions.append(f.read())
+    return suggestions
+
+
+def report_key(job, images=None, suggestions=None):
+    """报告内容的缓存键"""
+    if images is None:
+        images = _report_images(job['data_path'])
+    if suggestions is None:
+        suggestions = _read_suggestions(job['scores'])
+    payload = {
+        'version': REPORT_VERSION,
+        'scores': job['scores'],
+        'user': job['user'],
+        'images': [(os.path.basename(path), digest) for _, path, digest in images],
+        'suggestions': [hashlib.sha1(text.encode('utf-8')).hexdigest() for text in suggestions],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _cache_path(result_id, key):
+    return os.path.join(REPORT_CACHE_DIR, f'report_{result_id}_{key[:16]}.pdf')
+
+
+def cached_report_path(job):
+    """内容未变化且已渲染过时返回缓存的PDF路径，否则返回None"""
+    pdf_path = _cache_path(job['result_id'], report_key(job))
+    return pdf_path if os.path.exists(pdf_path) else None
+
+
+def build_html(job, images, suggestions):
+    """生成报告HTML，图片直接引用原始文件"""
+    scores = job['scores']
+    user = job['user']
+    images_html = "".join(
+        f'<h3>{title}</h3><img src="file://{img_path}" style="max-width: 100%; height: auto;"><br>'
+        for title, img_path, _ in images
+    )
+    return f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>应激评估报告</title>
+        <style>
+            body {{
+                font-family: SimSun, "Microsoft YaHei", sans-serif;
+                line-height: 1.5;
+                margin: 2.5cm;
+            }}
+            h1 {{
+                font-size: 24pt;
+                text-align: center;
+                margin-bottom: 2em;
+            }}
+            h2 {{
+                font-size: 18pt;
+                margin-top: 1.5em;
+                border-bottom: 1px solid #ccc;
+            }}
+            h3 {{
+                font-size: 14pt;
+                margin-top: 1em;
+            }}
+            p {{
+                text-indent: 2em;
+                margin: 0.5em 0;
+            }}
+            img {{
+                max-width: 100%;
+                height: auto;
+                margin: 1em 0;
+            }}
+            @page {{
+                @top-center {{
+                    content: "应激评估报告";
+                    font-size: 9pt;
+                }}
+                @bottom-center {{
+                    content: "第 " counter(page) " 页";
+                    font-size: 9pt;
+                }}
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>应激评估报告</h1>
+
+        <h2>1. 用户基本信息</h2>
+        <p>用户名：{user['username']}</p>
+        <p>邮箱：{user['email'] or '未填写'}</p>
+        <p>手机：{user['phone'] or '未填写'}</p>
+        <p>用户创建时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+
+        <h2>2. 应激评估信息</h2>
+        <p>普通应激评分：{scores['stress_score']}, 评估结果：{"可能存在应激情况" if scores['stress_score'] >= 50 else "低概率存在应激情况"}</p>
+        <p>抑郁评分：{scores['depression_score']}, 评估结果：{"可能存在抑郁情况" if scores['depression_score'] >= 50 else "低概率存在抑郁情况"}</p>
+        <p>焦虑评分：{scores['anxiety_score']}, 评估结果：{"可能存在焦虑情况" if scores['anxiety_score'] >= 50 else "低概率存在焦虑情况"}</p>
+        <p>社交孤立评分：{scores['social_isolation_score']}, 评估结果：{"可能存在社交孤立情况" if (scores['social_isolation_score'] or 0) >= 50 else "低概率存在社交孤立情况"}</p>
+
+        <h2>3. 评估数据可视化</h2>
+        {images_html}
+
+        <h2>4. 防护建议</h2>
+        <p>{"<br>".join(suggestions)}</p>
+    </body>
+    </html>
+    '''
+
+
+def render_report(job, force=False):
+    """
+    渲染一份报告（可在任意线程调用）
+
+    返回:
+    tuple: (PDF路径, 是否命中缓存)
+    """
+    images = _report_images(job['data_path'])
+    suggestions = _read_suggestions(job['scores'])
+    key = report_key(job, images, suggestions)
+    pdf_path = _cache_path(job['result_id'], key)
+    if not force and os.path.exists(pdf_path):
+        return pdf_path, True
+
+    import pdfkit
+
+    start_time = datetime.now()
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    html_content = build_html(job, images, suggestions)
+    # 先写临时文件再原子替换，并发点击时不会读到半个PDF
+    tmp_path = f"{pdf_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        pdfkit.from_string(html_content, tmp_path, options=PDF_OPTIONS)
+        os.replace(tmp_path, pdf_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # 删除同一结果旧内容对应的报告
+    prefix = f'report_{job["result_id"]}_'
+    for name in os.listdir(REPORT_CACHE_DIR):
+        old_path = os.path.join(REPORT_CACHE_DIR, name)
+        if name.startswith(prefix) and name.endswith('.pdf') and old_path != pdf_path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    duration = (datetime.now() - start_time).total_seconds()
+    logging.info(f"报告渲染完成，结果ID: {job['result_id']}，耗时: {duration:.2f}秒")
+    return pdf_path, False
+
+
+class ReportRenderer:
+    """线程池报告渲染服务，同一结果同时只渲染一次"""
+
+    def __init__(self, max_workers=REPORT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job, force=False):
+        """提交渲染任务，返回Future（结果为 (PDF路径, 是否命中缓存)）"""
+        result_id = job['result_id']
+        with self._lock:
+            future = self._pending.get(result_id)
+            if future is not None and not future.done() and not force:
+                return future
+            future = self.executor.submit(render_report, job, force)
+            self._pending[result_id] = future
+        future.add_done_callback(lambda f: self._discard(result_id, f))
+        return future
+
+    def _discard(self, result_id, future):
+        with self._lock:
+            if self._pending.get(result_id) is future:
+                del self._pending[result_id]
+
+    def render_many(self, jobs, progress_callback=None, force=False):
+        """
+        批量渲染报告
+
+        参数:
+        jobs (list): make_job 生成的任务
+        progress_callback (callable): progress_callback(已完成数, 总数, 结果ID, PDF路径或None)
+
+        返回:
+        dict: 结果ID -> PDF路径；渲染失败的结果ID -> None
+        """
+        reports = {}
+        futures = {self.submit(job, force): job['result_id'] for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            result_id = futures[future]
+            try:
+                reports[result_id] = future.result()[0]
+            except Exception as e:
+                logging.error(f"渲染报告失败，结果ID: {result_id}，错误: {str(e)}")
+                logging.error(traceback.format_exc())
+                reports[result_id] = None
+            if progress_callback:
+                progress_callback(done, len(futures), result_id, reports[result_id])
+        return reports
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """进程内共享的渲染服务"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ReportRenderer()
+        return _renderer
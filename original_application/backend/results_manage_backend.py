@@ -19,13 +19,14 @@ from PyQt5.QtCore import Qt, QRectF
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QGraphicsPixmapItem, QGraphicsScene, QMessageBox, 
-    QTableWidgetItem, QInputDialog, QPushButton, QFileDialog, QWidget, QVBoxLayout,
+    QInputDialog, QPushButton, QFileDialog, QWidget, QVBoxLayout,
     QHBoxLayout, QLabel, QGraphicsView, QScrollArea
 )
 import state.operate_user as operate_user
 # 导入本页面的前端部分
 import front.results_manage_UI as results_manage_UI
 from front.image_viewer import ImageViewer
+from front.lazy_table import LazyQueryTableModel, ActionButtonDelegate, setup_lazy_table_view
 
 # 导入跳转页面的后端部分
 from backend import index_backend
@@ -105,19 +106,24 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
         self.pushButton.clicked.connect(self.show_previous_image)
         self.pushButton_2.clicked.connect(self.show_next_image)
 
-        # 设置表格列
-        self.tableWidget.setColumnCount(9)  # 增加一列
-        self.tableWidget.setHorizontalHeaderLabels([
+        # 表格模型按页加载评估结果（用户名、数据路径在同一个JOIN查询中取出），操作列按钮由委托绘制
+        self.result_model = LazyQueryTableModel([
             'ID', '用户名', '评估时间', '数据路径', '普通应激', '抑郁', '焦虑', '社交孤立', '操作'
-        ])
+        ], SessionClass, self.results_query, self.result_row)
+        self.action_delegate = ActionButtonDelegate([
+            {'key': 'view', 'text': '查看', 'background': 'white', 'color': '#2196F3'},
+            {'key': 'report', 'text': '查看报告', 'background': 'white', 'color': '#4CAF50'},
+        ], self.tableWidget, spacing=4, margin=0, button_height=24)
+        self.action_delegate.clicked.connect(self.on_row_action)
+        setup_lazy_table_view(self.tableWidget, self.result_model, self.action_delegate)
 
         # 设置表格样式
         self.tableWidget.horizontalHeader().setStyleSheet(
             "QHeaderView::section{background-color:#5c8ac3;font-size:11pt;color:white;}")
         self.tableWidget.setStyleSheet(
-            "QTableWidget{background-color:#d4e2f4; alternate-background-color:#e8f1ff;}")
+            "QTableView{background-color:#d4e2f4; alternate-background-color:#e8f1ff;}")
         
-        # 设置列宽
+        # 设置列宽（需在设置模型之后）
         header = self.tableWidget.horizontalHeader()
         header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)  # ID列
         header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeToContents)  # 用户名列
@@ -301,71 +307,52 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
                     "min-width: 30px; min-height: 30px; max-width: 30px; max-height: 30px; border-radius: 16px; border: 2px solid white; background: green"
                 )
 
-    def show_table(self):
+    def results_query(self, session):
         """
-        显示结果表格
+        结果表格的查询：一次JOIN取出用户名和数据路径，按评估时间倒序
+        管理员查看全部结果，普通用户只查看自己的结果
         """
-        try:
-            session = SessionClass()
-            
-            # 根据用户类型获取结果
-            if self.user_type:  # 管理员
-                results = session.query(Result).order_by(Result.result_time.desc()).all()
-            else:  # 普通用户
-                results = session.query(Result).filter(
-                    Result.user_id == self.user_id
-                ).order_by(Result.result_time.desc()).all()
-
-            # 设置表格行数
-            self.tableWidget.setRowCount(len(results))
-
-            # 填充表格数据
-            for i, result in enumerate(results):
-                try:
-                    # 获取用户名
-                    user = session.query(User).filter(User.user_id == result.user_id).first()
-                    username = user.username if user else "未知用户"
-
-                    # 设置表格项
-                    self.tableWidget.setItem(i, 0, QTableWidgetItem(str(result.id)))
-                    self.tableWidget.setItem(i, 1, QTableWidgetItem(username))
-                    self.tableWidget.setItem(i, 2, QTableWidgetItem(
-                        result.result_time.strftime('%Y-%m-%d %H:%M:%S') if result.result_time else ''))
-                    
-                    # 获取数据路径
-                    data = session.query(Data).filter(Data.id == result.id).first()
-                    if data:
-                        # 只显示路径的最后一部分
-                        display_path = os.path.basename(data.data_path)
-                        path_item = QTableWidgetItem(display_path)
-                        path_item.setToolTip(data.data_path)  # 设置完整路径为工具提示
-                    else:
-                        path_item = QTableWidgetItem("数据不存在")
-                    self.tableWidget.setItem(i, 3, path_item)
-                    
-                    self.tableWidget.setItem(i, 4, QTableWidgetItem(str(result.stress_score)))  # 普通应激分数
-                    self.tableWidget.setItem(i, 5, QTableWidgetItem(str(result.depression_score)))  # 抑郁分数
-                    self.tableWidget.setItem(i, 6, QTableWidgetItem(str(result.anxiety_score)))  # 焦虑分数
-                    self.tableWidget.setItem(i, 7, QTableWidgetItem(str(result.social_isolation_score)))  # 社交孤立分数
-
-                    # 添加操作按钮
-                    self.tableWidget.setCellWidget(i, 8, self.buttonForRow(i))
-
-                except Exception as e:
-                    logging.error(f"Error processing result {result.id}: {str(e)}")
-                    continue
-
-            # 启用表格滚动
-            self.tableWidget.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded)
-            self.tableWidget.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded)
+        query = self.base_results_query(session)
+        if not self.user_type:  # 普通用户
+            query = query.filter(Result.user_id == self.user_id)
+        return query.order_by(Result.result_time.desc(), Result.id.desc())
+
+    @staticmethod
+    def base_results_query(session):
+        return session.query(
+            Result.id, Result.result_time, Result.stress_score, Result.depression_score,
+            Result.anxiety_score, Result.social_isolation_score,
+            User.username, Data.id.label('data_id'), Data.data_path
+        ).outerjoin(User, User.user_id == Result.user_id).outerjoin(Data, Data.id == Result.id)
+
+    @staticmethod
+    def result_row(record):
+        """将一条查询结果转换为表格行：(ID, 各列文本, 工具提示)"""
+        tooltips = {}
+        if record.data_id is not None:
+            # 只显示路径的最后一部分，完整路径作为工具提示
+            display_path = os.path.basename(record.data_path or '')
+            tooltips[3] = record.data_path
+        else:
+            display_path = "数据不存在"
+        values = [
+            str(record.id),
+            record.username or "未知用户",
+            record.result_time.strftime('%Y-%m-%d %H:%M:%S') if record.result_time else '',
+            display_path,
+            str(record.stress_score),  # 普通应激分数
+            str(record.depression_score),  # 抑郁分数
+            str(record.anxiety_score),  # 焦虑分数
+            str(record.social_isolation_score),  # 社交孤立分数
+            '',
+        ]
+        return record.id, values, tooltips
 
-            logging.info(f"Successfully displayed {len(results)} results in table")
-            
-        except Exception as e:
-            logging.error(f"Error showing table: {str(e)}")
-            QMessageBox.critical(self, "错误", f"显示结果表格时发生错误：{str(e)}")
-        finally:
-            session.close()
+    def show_table(self):
+        """
+        显示结果表格（只加载第一页，滚动时按需加载后续记录）
+        """
+        self.update_table(self.results_query)
 
     def update_current_status(self):
         """更新当前评估结果状态显示"""
@@ -540,65 +527,19 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
             logging.error(f"Error in return_index: {str(e)}")
             QMessageBox.critical(self, "错误", f"返回主页时发生错误：{str(e)}")
 
-    def buttonForRow(self, row):
-        """为每一行创建操作按钮"""
-        widget = QtWidgets.QWidget()
-        widget.setStyleSheet("background: transparent;")  # 设置背景透明
-        
-        # 查看按钮
-        view_btn = QtWidgets.QPushButton('查看')
-        view_btn.setStyleSheet('''
-            QPushButton {
-                color: #2196F3;
-                border: 1px solid #2196F3;
-                border-radius: 3px;
-                padding: 3px 10px;
-                min-width: 60px;
-                max-height: 24px;
-                font-size: 12px;
-                background-color: white;
-            }
-            QPushButton:hover {
-                background-color: #E3F2FD;
-            }
-        ''')
-        view_btn.clicked.connect(lambda checked, row=row: self.view_details(row))
+    def on_row_action(self, row, action):
+        """操作列按钮的回调，按按钮key分发到查看详情、查看报告"""
+        handlers = {
+            'view': self.view_details,
+            'report': self.viewReport,
+        }
+        handlers[action](row)
 
-        # 查看报告按钮
-        report_btn = QtWidgets.QPushButton('查看报告')
-        report_btn.setStyleSheet('''
-            QPushButton {
-                color: #4CAF50;
-                border: 1px solid #4CAF50;
-                border-radius: 3px;
-                padding: 3px 10px;
-                min-width: 80px;
-                max-height: 24px;
-                font-size: 12px;
-                background-color: white;
-            }
-            QPushButton:hover {
-                background-color: #E8F5E9;
-            }
-        ''')
-        report_btn.clicked.connect(self.viewReport)
-
-        # 创建水平布局并添加按钮
-        hLayout = QtWidgets.QHBoxLayout()
-        hLayout.addWidget(view_btn)
-        hLayout.addWidget(report_btn)
-        hLayout.setContentsMargins(0, 0, 0, 0)  # 移除所有边距
-        hLayout.setSpacing(4)  # 设置按钮之间的间距
-        widget.setLayout(hLayout)
-        return widget
-
-    def viewReport(self):
+    def viewReport(self, row):
         """查看报告"""
         try:
-            button = self.sender()
-            if button:
-                row = self.tableWidget.indexAt(button.parent().pos()).row()
-                result_id = int(self.tableWidget.item(row, 0).text())
+            if 0 <= row < self.result_model.rowCount():
+                result_id = self.result_model.row_id(row)
                 
                 session = SessionClass()
                 try:
@@ -630,7 +571,7 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
     def view_details(self, row):
         """查看详细信息"""
         try:
-            result_id = int(self.tableWidget.item(row, 0).text())
+            result_id = self.result_model.row_id(row)
             session = SessionClass()
             result = session.query(Result).filter(Result.id == result_id).first()
             
@@ -679,20 +620,14 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
             # 创建pandas DataFrame
             import pandas as pd
             
-            # 获取表格数据
-            rows = self.tableWidget.rowCount()
-            cols = self.tableWidget.columnCount()
-            headers = []
-            for col in range(cols-1):  # 不包括最后一列"操作"
-                headers.append(self.tableWidget.horizontalHeaderItem(col).text())
+            # 获取表格数据（先加载尚未显示的行）
+            rows = self.result_model.ensure_loaded(self.result_model.total_count)
+            cols = self.result_model.columnCount()
+            headers = self.result_model.headers[:cols-1]  # 不包括最后一列"操作"
             
             data = []
             for row in range(rows):
-                row_data = []
-                for col in range(cols-1):  # 不包括最后一列"操作"
-                    item = self.tableWidget.item(row, col)
-                    row_data.append(item.text() if item else "")
-                data.append(row_data)
+                data.append([self.result_model.row_value(row, col) for col in range(cols-1)])
             
             # 创建DataFrame并导出
             df = pd.DataFrame(data, columns=headers)
@@ -752,40 +687,38 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
     def apply_filter(self):
         """应用筛选条件"""
         try:
-            session = SessionClass()
-            query = session.query(Result)
-
-            # 用户类型筛选
             user_type = self.user_type_combo.currentText()
-            if user_type != "全部":
-                user_type_value = 'admin' if user_type == "管理员" else 'user'
-                user_ids = [u.user_id for u in session.query(User).filter(User.user_type == user_type_value)]
-                query = query.filter(Result.user_id.in_(user_ids))
-
-            # 用户筛选
             selected_user = self.user_combo.currentData()
-            if selected_user:
-                query = query.filter(Result.user_id == selected_user)
-
-            # 日期范围筛选
             start_date = self.date_start.date().toPyDate()
             end_date = self.date_end.date().toPyDate()
-            query = query.filter(
-                Result.result_time >= start_date,
-                Result.result_time <= end_date + timedelta(days=1)
-            )
+
+            def filtered_query(session):
+                query = self.base_results_query(session)
+
+                # 用户类型筛选
+                if user_type != "全部":
+                    user_type_value = 'admin' if user_type == "管理员" else 'user'
+                    query = query.filter(User.user_type == user_type_value)
+
+                # 用户筛选
+                if selected_user:
+                    query = query.filter(Result.user_id == selected_user)
+
+                # 日期范围筛选
+                query = query.filter(
+                    Result.result_time >= start_date,
+                    Result.result_time <= end_date + timedelta(days=1)
+                )
+                return query.order_by(Result.result_time.desc(), Result.id.desc())
 
             # 获取结果并显示
-            results = query.order_by(Result.result_time.desc()).all()
-            self.update_table(results)
+            self.update_table(filtered_query)
             
             logging.info(f"应用筛选条件: 用户类型={user_type}, 用户={selected_user}, 日期范围={start_date}至{end_date}")
 
         except Exception as e:
             logging.error(f"应用筛选条件失败: {str(e)}")
             QMessageBox.critical(self, "错误", f"应用筛选条件失败：{str(e)}")
-        finally:
-            session.close()
 
     def reset_filter(self):
         """重置筛选条件"""
@@ -796,57 +729,26 @@ class Results_View_WindowActions(results_manage_UI.Ui_MainWindow, QMainWindow):
         self.show_table()  # 显示所有数据
         logging.info("重置筛选条件")
 
-    def update_table(self, results):
-        """更新表格显示"""
-        session = SessionClass()
-        try:
-            self.tableWidget.setRowCount(len(results))
-            for i, result in enumerate(results):
-                try:
-                    # 获取用户名
-                    user = session.query(User).filter(User.user_id == result.user_id).first()
-                    username = user.username if user else "未知用户"
-
-                    # 设置表格项
-                    self.tableWidget.setItem(i, 0, QTableWidgetItem(str(result.id)))
-                    self.tableWidget.setItem(i, 1, QTableWidgetItem(username))
-                    self.tableWidget.setItem(i, 2, QTableWidgetItem(
-                        result.result_time.strftime('%Y-%m-%d %H:%M:%S') if result.result_time else ''))
-                    
-                    # 获取数据路径
-                    data = session.query(Data).filter(Data.id == result.id).first()
-                    if data:
-                        # 只显示路径的最后一部分
-                        display_path = os.path.basename(data.data_path)
-                        path_item = QTableWidgetItem(display_path)
-                        path_item.setToolTip(data.data_path)  # 设置完整路径为工具提示
-                    else:
-                        path_item = QTableWidgetItem("数据不存在")
-                    self.tableWidget.setItem(i, 3, path_item)
-                    
-                    self.tableWidget.setItem(i, 4, QTableWidgetItem(str(result.stress_score)))  # 普通应激分数
-                    self.tableWidget.setItem(i, 5, QTableWidgetItem(str(result.depression_score)))  # 抑郁分数
-                    self.tableWidget.setItem(i, 6, QTableWidgetItem(str(result.anxiety_score)))  # 焦虑分数
-                    self.tableWidget.setItem(i, 7, QTableWidgetItem(str(result.social_isolation_score)))  # 社交孤立分数
-
-                    # 添加操作按钮
-                    self.tableWidget.setCellWidget(i, 8, self.buttonForRow(i))
+    def update_table(self, query_factory):
+        """
+        更新表格显示
 
-                except Exception as e:
-                    logging.error(f"Error processing result {result.id}: {str(e)}")
-                    continue
+        参数:
+        query_factory (callable): query_factory(session) 返回已排序的结果查询，表格按页加载
+        """
+        try:
+            self.result_model.set_query(query_factory)
 
             # 启用表格滚动
             self.tableWidget.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded)
             self.tableWidget.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded)
 
-            logging.info(f"Successfully displayed {len(results)} results in table")
+            logging.info(f"Successfully displayed {self.result_model.total_count} results in table")
             
         except Exception as e:
             logging.error(f"Error updating table: {str(e)}")
             QMessageBox.critical(self, "错误", f"更新表格失败：{str(e)}")
-        finally:
-            session.close()
+
 
 class ReportViewer(QMainWindow):
     """报告查看窗口"""
@@ -9,14 +9,22 @@ import os
 import shutil
 import zipfile
 import tempfile
+import hashlib
+import hmac
+import re
+import secrets
+import time
+import uuid
 from datetime import datetime
 from sqlalchemy import func
 from sql_model.tb_data import Data
 from sql_model.tb_user import User
 from sql_model.tb_role import Role
+from sql_model.tb_permission import Permission
 from sql_model.tb_role_permission import RolePermission
 from util.db_util import SessionClass
 import logging
+import traceback
 
 # 创建日志目录
 os.makedirs('../log', exist_ok=True)
@@ -83,6 +91,21 @@ app.logger.addFilter(UsernameFilter(username))
 # 记录服务启动日志
 logging.info("上传服务已启动，监听IP白名单: " + str(list(ALLOWED_IPS)))
 
+# 数据存储目录（相对于当前目录）
+TARGET_BASE_DIR = '../data'
+
+# 分片上传临时目录，每个上传任务一个子目录
+CHUNK_UPLOAD_DIR = os.path.join(TARGET_BASE_DIR, '.uploads')
+
+# 单个分片的最大字节数
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# 上传ID格式校验，防止路径穿越
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# 分片上传任务超过该时间（秒）没有新分片则视为已放弃，删除其临时目录
+UPLOAD_EXPIRE_SECONDS = int(os.environ.get('UPLOAD_EXPIRE_HOURS', '24')) * 3600
+
 def get_client_ip():
     """获取客户端真实IP地址"""
     # 首先尝试获取X-Forwarded-For头
@@ -162,6 +185,101 @@ def update_whitelist():
         logging.error(f"更新白名单时发生错误: {str(e)}")
         return jsonify({'success': False, 'message': f'Error updating whitelist: {str(e)}'}), 500
 
+def store_uploaded_zip(zip_path, temp_dir, username, user, session, client_ip, file_md5=None):
+    """
+    解压上传的ZIP文件，复制到数据目录并写入数据记录
+    
+    参数:
+    - zip_path: ZIP文件路径
+    - temp_dir: 解压用的临时目录（不能包含其他目录）
+    - username: 用户名
+    - user: 用户记录
+    - session: 数据库会话，函数结束时关闭
+    - client_ip: 客户端IP
+    - file_md5: 整个ZIP文件的MD5，分片上传时返回给客户端
+    
+    返回:
+    Flask响应元组
+    """
+    try:
+        # 解压ZIP文件到临时目录
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(temp_dir)
+            logging.info(f"用户 {username} 的ZIP文件已解压")
+
+        # 获取解压后的文件夹名称
+        extracted_items = os.listdir(temp_dir)
+        extracted_dir = None
+        for item in extracted_items:
+            if item != os.path.basename(zip_path) and os.path.isdir(os.path.join(temp_dir, item)):
+                extracted_dir = item
+                break
+
+        if not extracted_dir:
+            logging.warning(f"用户 {username} 上传的ZIP文件中没有有效目录")
+            return jsonify({'success': False, 'message': 'No valid directory found in ZIP file'}), 400
+
+        # 构建目标路径
+        target_base_dir = TARGET_BASE_DIR  # 相对于当前目录的data目录
+        target_dir = os.path.join(target_base_dir, extracted_dir)
+
+        # 处理重名
+        suffix = 1
+        original_name = extracted_dir
+        while os.path.exists(target_dir):
+            new_name = f"{original_name}_{suffix}"
+            target_dir = os.path.join(target_base_dir, new_name)
+            suffix += 1
+
+        # 确保目标目录存在
+        os.makedirs(target_base_dir, exist_ok=True)
+
+        # 复制文件到目标目录
+        shutil.copytree(os.path.join(temp_dir, extracted_dir), target_dir)
+        logging.info(f"用户 {username} 的数据已复制到目标目录: {target_dir}")
+
+        try:
+            # 获取最大ID
+            max_id = session.query(func.max(Data.id)).scalar()
+            if max_id is None:
+                max_id = 0
+            max_id = max_id + 1
+
+            # 创建数据记录
+            new_data = Data(
+                id=max_id,
+                personnel_id=username,  # 使用用户名作为人员ID
+                data_path=target_dir,
+                upload_time=datetime.now(),
+                user_id=username,  # 使用用户名作为用户ID
+                personnel_name=username,  # 使用用户名作为人员名称
+                upload_user=1 if user.user_type == 'admin' else 0
+            )
+
+            session.add(new_data)
+            session.commit()
+
+            logging.info(f"用户 {username} (IP: {client_ip}) 成功上传数据。路径: {target_dir}")
+            
+            response = {
+                'success': True,
+                'message': 'Data uploaded successfully',
+                'data_path': target_dir
+            }
+            if file_md5:
+                response['md5'] = file_md5
+            return jsonify(response), 200
+
+        except Exception as e:
+            session.rollback()
+            if os.path.exists(target_dir):
+                shutil.rmtree(target_dir)
+            logging.error(f"用户 {username} 上传数据时发生数据库错误: {str(e)}")
+            logging.error(traceback.format_exc())
+            return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
+    finally:
+        session.close()
+
 @app.route('/api/upload', methods=['POST'])
 def upload_data():
     """
@@ -227,88 +345,370 @@ def upload_data():
             uploaded_file.save(zip_path)
             logging.info(f"用户 {username} (IP: {client_ip}) 上传的文件已保存到临时目录")
 
-            # 解压ZIP文件到临时目录
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-                logging.info(f"用户 {username} 的ZIP文件已解压")
-
-            # 获取解压后的文件夹名称
-            extracted_items = os.listdir(temp_dir)
-            extracted_dir = None
-            for item in extracted_items:
-                if item != 'upload.zip' and os.path.isdir(os.path.join(temp_dir, item)):
-                    extracted_dir = item
-                    break
-
-            if not extracted_dir:
-                logging.warning(f"用户 {username} 上传的ZIP文件中没有有效目录")
-                return jsonify({'success': False, 'message': 'No valid directory found in ZIP file'}), 400
-
-            # 构建目标路径
-            target_base_dir = '../data'  # 修改为相对于当前目录的data目录
-            target_dir = os.path.join(target_base_dir, extracted_dir)
-
-            # 处理重名
-            suffix = 1
-            original_name = extracted_dir
-            while os.path.exists(target_dir):
-                new_name = f"{original_name}_{suffix}"
-                target_dir = os.path.join(target_base_dir, new_name)
-                suffix += 1
-
-            # 确保目标目录存在
-            os.makedirs(target_base_dir, exist_ok=True)
-
-            # 复制文件到目标目录
-            shutil.copytree(os.path.join(temp_dir, extracted_dir), target_dir)
-            logging.info(f"用户 {username} 的数据已复制到目标目录: {target_dir}")
-
-            try:
-                # 获取最大ID
-                max_id = session.query(func.max(Data.id)).scalar()
-                if max_id is None:
-                    max_id = 0
-                max_id = max_id + 1
-
-                # 创建数据记录
-                new_data = Data(
-                    id=max_id,
-                    personnel_id=username,  # 使用用户名作为人员ID
-                    data_path=target_dir,
-                    upload_time=datetime.now(),
-                    user_id=username,  # 使用用户名作为用户ID
-                    personnel_name=username,  # 使用用户名作为人员名称
-                    upload_user=1 if user.user_type == 'admin' else 0
-                )
-
-                session.add(new_data)
-                session.commit()
-
-                logging.info(f"用户 {username} (IP: {client_ip}) 成功上传数据。路径: {target_dir}")
-                
-                return jsonify({
-                    'success': True,
-                    'message': 'Data uploaded successfully',
-                    'data_path': target_dir
-                }), 200
-
-            except Exception as e:
-                session.rollback()
-                if os.path.exists(target_dir):
-                    shutil.rmtree(target_dir)
-                logging.error(f"用户 {username} 上传数据时发生数据库错误: {str(e)}")
-                return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
-            
-            finally:
-                session.close()
+            return store_uploaded_zip(zip_path, temp_dir, username, user, session, client_ip)
 
     except Exception as e:
         logging.error(f"上传API发生错误: {str(e)}")
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
+def get_upload_dir(upload_id):
+    """返回分片上传任务目录，上传ID非法时返回None"""
+    if not upload_id or not UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    return os.path.join(CHUNK_UPLOAD_DIR, upload_id)
+
+def load_upload_meta(upload_dir):
+    """读取分片上传任务信息，任务不存在时返回None"""
+    meta_path = os.path.join(upload_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def hash_upload_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def check_upload_owner(upload_id, meta, client_ip):
+    """
+    校验请求是否来自创建上传任务的用户
+    客户端在每个请求中携带 X-Upload-User 和创建任务时返回的 X-Upload-Token
+    
+    返回:
+    - None 校验通过
+    - 错误响应 校验失败
+    """
+    username = request.headers.get('X-Upload-User', '')
+    token = request.headers.get('X-Upload-Token', '')
+    if username != meta.get('username') or not token or \
+            not hmac.compare_digest(hash_upload_token(token), meta.get('token_sha256', '')):
+        logging.warning(f"IP {client_ip} 的用户 {username} 尝试访问不属于自己的上传任务 {upload_id}")
+        return jsonify({'success': False, 'message': 'Upload does not belong to this user'}), 403
+    return None
+
+def upload_last_activity(upload_dir):
+    """上传任务最后一次写入分片（或创建任务）的时间戳"""
+    latest = 0
+    for name in ('upload.part', 'meta.json'):
+        try:
+            latest = max(latest, os.path.getmtime(os.path.join(upload_dir, name)))
+        except OSError:
+            continue
+    if not latest:
+        try:
+            latest = os.path.getmtime(upload_dir)
+        except OSError:
+            pass
+    return latest
+
+def is_upload_expired(upload_dir, now=None):
+    now = time.time() if now is None else now
+    return now - upload_last_activity(upload_dir) > UPLOAD_EXPIRE_SECONDS
+
+def cleanup_stale_uploads(now=None):
+    """
+    删除超过 UPLOAD_EXPIRE_SECONDS 没有活动的分片上传任务目录
+    
+    返回:
+    - int: 删除的任务数
+    """
+    if not os.path.isdir(CHUNK_UPLOAD_DIR):
+        return 0
+    removed = 0
+    for name in os.listdir(CHUNK_UPLOAD_DIR):
+        upload_dir = os.path.join(CHUNK_UPLOAD_DIR, name)
+        if not os.path.isdir(upload_dir) or not is_upload_expired(upload_dir, now):
+            continue
+        try:
+            shutil.rmtree(upload_dir)
+            removed += 1
+            logging.info(f"删除已过期的分片上传任务: {name}")
+        except Exception as e:
+            logging.error(f"删除过期上传任务 {name} 失败: {str(e)}")
+            logging.error(traceback.format_exc())
+    return removed
+
+def load_active_upload(upload_id):
+    """
+    读取未过期的上传任务
+    
+    返回:
+    - (upload_dir, meta)，任务不存在或已过期时meta为None（过期任务顺便删除）
+    """
+    upload_dir = get_upload_dir(upload_id)
+    meta = load_upload_meta(upload_dir) if upload_dir else None
+    if meta and is_upload_expired(upload_dir):
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        logging.info(f"分片上传任务 {upload_id} 已过期，已删除")
+        meta = None
+    return upload_dir, meta
+
+def list_received_chunks(upload_dir):
+    """
+    列出已接收的分片
+    每个分片写入成功后在chunks目录下生成名为"offset-length"的标记文件，
+    并行上传时无需对同一个元数据文件加锁
+    """
+    chunks_dir = os.path.join(upload_dir, 'chunks')
+    received = []
+    for name in os.listdir(chunks_dir):
+        try:
+            offset, length = name.split('-')
+            received.append((int(offset), int(length)))
+        except ValueError:
+            continue
+    return sorted(received)
+
+def verify_upload_user(username, client_ip):
+    """
+    校验上传用户
+    
+    返回:
+    - (user, session, None) 校验通过
+    - (None, None, 错误响应) 校验失败
+    """
+    if not username:
+        logging.warning(f"来自IP {client_ip} 的请求未提供username")
+        return None, None, (jsonify({'success': False, 'message': 'No username provided'}), 400)
+
+    session = SessionClass()
+    user = session.query(User).filter(User.username == username).first()
+    if not user:
+        session.close()
+        logging.warning(f"未找到用户 {username} (IP: {client_ip})")
+        return None, None, (jsonify({'success': False, 'message': 'User not found'}), 404)
+
+    if not check_user_permission(username):
+        session.close()
+        logging.warning(f"用户 {username} (IP: {client_ip}) 没有上传权限")
+        return None, None, (jsonify({'success': False, 'message': 'User not authorized'}), 403)
+
+    return user, session, None
+
+@app.route('/api/upload/init', methods=['POST'])
+def init_chunked_upload():
+    """
+    创建分片上传任务
+    
+    参数(JSON):
+    - username: 用户名
+    - filename: ZIP文件名
+    - chunk_size: 客户端使用的分片大小
+    
+    返回:
+    JSON格式的响应，包含:
+    - success: 布尔值，表示是否成功
+    - upload_id: 上传任务ID，后续分片和完成请求使用
+    - upload_token: 上传凭证，后续请求在 X-Upload-Token 请求头中携带
+    - received: 已接收的分片列表 [[offset, length], ...]
+    """
+    client_ip = get_client_ip()
+    if not check_ip_whitelist():
+        logging.warning(f"未授权的IP地址尝试上传数据: {client_ip}")
+        return jsonify({'success': False, 'message': 'Unauthorized IP address'}), 403
+
+    try:
+        data = request.get_json() or {}
+        username = data.get('username')
+        filename = data.get('filename', '')
+        chunk_size = int(data.get('chunk_size', 0))
+
+        if not filename.endswith('.zip'):
+            logging.warning(f"用户 {username} (IP: {client_ip}) 尝试上传非ZIP文件: {filename}")
+            return jsonify({'success': False, 'message': 'Only ZIP files are supported'}), 400
+        if chunk_size <= 0 or chunk_size > MAX_CHUNK_SIZE:
+            return jsonify({'success': False, 'message': f'Invalid chunk size, max {MAX_CHUNK_SIZE}'}), 400
+
+        user, session, error = verify_upload_user(username, client_ip)
+        if error:
+            return error
+        session.close()
+
+        # 顺便清理已放弃的上传任务
+        cleanup_stale_uploads()
+
+        upload_id = uuid.uuid4().hex
+        upload_token = secrets.token_hex(16)
+        upload_dir = get_upload_dir(upload_id)
+        os.makedirs(os.path.join(upload_dir, 'chunks'))
+        # 预先创建文件，分片按偏移量直接写入
+        open(os.path.join(upload_dir, 'upload.part'), 'wb').close()
+        with open(os.path.join(upload_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'username': username,
+                'filename': filename,
+                'chunk_size': chunk_size,
+                'client_ip': client_ip,
+                'token_sha256': hash_upload_token(upload_token),
+                'created_at': datetime.now().isoformat()
+            }, f, ensure_ascii=False)
+
+        logging.info(f"用户 {username} (IP: {client_ip}) 创建分片上传任务 {upload_id}，文件: {filename}")
+        return jsonify({
+            'success': True,
+            'upload_id': upload_id,
+            'upload_token': upload_token,
+            'chunk_size': chunk_size,
+            'received': []
+        }), 200
+
+    except Exception as e:
+        logging.error(f"创建分片上传任务时发生错误: {str(e)}")
+        logging.error(traceback.format_exc())
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/upload/<upload_id>', methods=['GET'])
+def get_chunked_upload_status(upload_id):
+    """
+    查询分片上传任务状态，客户端断线重连后据此跳过已上传的分片
+    """
+    client_ip = get_client_ip()
+    if not check_ip_whitelist():
+        return jsonify({'success': False, 'message': 'Unauthorized IP address'}), 403
+
+    upload_dir, meta = load_active_upload(upload_id)
+    if not meta:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+    error = check_upload_owner(upload_id, meta, client_ip)
+    if error:
+        return error
+
+    received = list_received_chunks(upload_dir)
+    return jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'chunk_size': meta['chunk_size'],
+        'received': received,
+        'received_bytes': sum(length for _, length in received)
+    }), 200
+
+@app.route('/api/upload/<upload_id>/chunk', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    上传一个分片，分片可以并行、乱序上传
+    
+    参数:
+    - offset: 查询参数，分片在ZIP文件中的字节偏移
+    - X-Chunk-MD5: 请求头，分片内容的MD5
+    - X-Upload-User / X-Upload-Token: 请求头，创建任务的用户和上传凭证
+    - 请求体: 分片二进制内容
+    """
+    client_ip = get_client_ip()
+    if not check_ip_whitelist():
+        return jsonify({'success': False, 'message': 'Unauthorized IP address'}), 403
+
+    try:
+        upload_dir, meta = load_active_upload(upload_id)
+        if not meta:
+            return jsonify({'success': False, 'message': 'Upload not found'}), 404
+        error = check_upload_owner(upload_id, meta, client_ip)
+        if error:
+            return error
+
+        offset = request.args.get('offset', type=int)
+        if offset is None or offset < 0:
+            return jsonify({'success': False, 'message': 'Invalid offset'}), 400
+
+        chunk = request.get_data(cache=False)
+        if not chunk or len(chunk) > MAX_CHUNK_SIZE:
+            return jsonify({'success': False, 'message': 'Invalid chunk size'}), 400
+
+        expected_md5 = request.headers.get('X-Chunk-MD5', '').lower()
+        chunk_md5 = hashlib.md5(chunk).hexdigest()
+        if expected_md5 and expected_md5 != chunk_md5:
+            logging.warning(f"上传任务 {upload_id} 偏移 {offset} 的分片校验失败")
+            return jsonify({'success': False, 'message': 'Chunk checksum mismatch'}), 400
+
+        # 每个请求独立打开文件，不同偏移量的写入互不影响
+        with open(os.path.join(upload_dir, 'upload.part'), 'r+b') as f:
+            f.seek(offset)
+            f.write(chunk)
+
+        # 写入完成后再生成标记，保证标记存在时数据已落盘
+        open(os.path.join(upload_dir, 'chunks', f'{offset}-{len(chunk)}'), 'w').close()
+        return jsonify({'success': True, 'offset': offset, 'length': len(chunk), 'md5': chunk_md5}), 200
+
+    except Exception as e:
+        logging.error(f"上传任务 {upload_id} 写入分片时发生错误: {str(e)}")
+        logging.error(traceback.format_exc())
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/upload/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """
+    完成分片上传：检查分片是否覆盖整个文件，校验整个文件的MD5后解压入库
+    
+    参数(JSON):
+    - total_size: ZIP文件总字节数
+    - md5: ZIP文件的MD5
+    """
+    client_ip = get_client_ip()
+    if not check_ip_whitelist():
+        return jsonify({'success': False, 'message': 'Unauthorized IP address'}), 403
+
+    try:
+        upload_dir, meta = load_active_upload(upload_id)
+        if not meta:
+            return jsonify({'success': False, 'message': 'Upload not found'}), 404
+        error = check_upload_owner(upload_id, meta, client_ip)
+        if error:
+            return error
+
+        data = request.get_json() or {}
+        total_size = int(data.get('total_size', -1))
+        expected_md5 = (data.get('md5') or '').lower()
+        if total_size < 0 or not expected_md5:
+            return jsonify({'success': False, 'message': 'total_size and md5 are required'}), 400
+
+        # 检查已接收的分片是否连续覆盖整个文件
+        covered = 0
+        for offset, length in list_received_chunks(upload_dir):
+            if offset > covered:
+                break
+            covered = max(covered, offset + length)
+        if covered < total_size:
+            return jsonify({
+                'success': False,
+                'message': f'Upload incomplete, received {covered}/{total_size} bytes',
+                'received': list_received_chunks(upload_dir)
+            }), 409
+
+        part_path = os.path.join(upload_dir, 'upload.part')
+        md5 = hashlib.md5()
+        with open(part_path, 'r+b') as f:
+            f.truncate(total_size)
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(block)
+        file_md5 = md5.hexdigest()
+        if file_md5 != expected_md5:
+            logging.warning(f"上传任务 {upload_id} 文件MD5校验失败: {file_md5} != {expected_md5}")
+            return jsonify({'success': False, 'message': 'File checksum mismatch'}), 400
+
+        username = meta['username']
+        user, session, error = verify_upload_user(username, client_ip)
+        if error:
+            return error
+
+        # 更新日志用户名
+        logger.removeFilter(logger.filters[0])
+        logger.addFilter(UsernameFilter(username))
+        logging.info(f"用户 {username} (IP: {client_ip}) 分片上传完成，MD5: {file_md5}")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = store_uploaded_zip(part_path, temp_dir, username, user, session, client_ip, file_md5)
+
+        if result[1] == 200:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+        return result
+
+    except Exception as e:
+        logging.error(f"完成上传任务 {upload_id} 时发生错误: {str(e)}")
+        logging.error(traceback.format_exc())
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
+
 if __name__ == '__main__':
     try:
         logging.info(f"上传服务开始启动，监听地址: 0.0.0.0:5000")
+        cleanup_stale_uploads()
         app.run(host='0.0.0.0', port=5000)
     except Exception as e:
         logging.error(f"上传服务启动失败: {str(e)}")
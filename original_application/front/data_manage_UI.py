@@ -59,26 +59,17 @@ class Ui_MainWindow(object):
         self.gridLayout.setObjectName("gridLayout")
         # 表格
         self.lst = ['ID', '人员id', '姓名', '文件路径', '上传用户', '上传时间', '操作']
-        self.tableWidget = QtWidgets.QTableWidget(self.centralwidget)
+        self.tableWidget = QtWidgets.QTableView(self.centralwidget)  # 模型和操作列委托由后端设置（front/lazy_table.py）
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         sizePolicy.setHorizontalStretch(9)
         sizePolicy.setVerticalStretch(0)
         sizePolicy.setHeightForWidth(self.tableWidget.sizePolicy().hasHeightForWidth())
         self.tableWidget.setSizePolicy(sizePolicy)
         self.tableWidget.setObjectName("tableWidget")
-        self.tableWidget.setColumnCount(len(self.lst))
-        self.tableWidget.setHorizontalHeaderLabels(self.lst)
         self.tableWidget.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)  # 使列表自适应宽度
         self.tableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)  # 设置tablewidget不可编辑
         self.tableWidget.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)  # 设置tablewidget不可选中
 
-        self.tableWidget.resizeColumnsToContents()  # 设置列宽高按照内容自适应
-        # 设置特定列的宽度
-        self.tableWidget.setColumnWidth(0, 50)  # 第一列（ID）
-        self.tableWidget.setColumnWidth(1, 50)  # 第二列（人员id）
-        self.tableWidget.setColumnWidth(3, 200)  # 第四列（文件路径）
-        self.tableWidget.setColumnWidth(5, 150)  # 为上传时间列设置合适的宽度
-
         self.gridLayout.addWidget(self.tableWidget, 0, 0, 1, 2)
         # 创建一个垂直布局来放置右侧的按钮
         self.button_layout = QtWidgets.QVBoxLayout()
@@ -61,15 +61,12 @@ class Ui_MainWindow(object):
 
         # 表格
         self.lst= ['ID', '人员id', '数据路径','上传用户','操作']
-        self.tableWidget = QtWidgets.QTableWidget(self.centralwidget)
+        self.tableWidget = QtWidgets.QTableView(self.centralwidget)  # 模型和操作列委托由后端设置（front/lazy_table.py）
         self.tableWidget.setStyleSheet("margin-right:15px")
         self.tableWidget.setObjectName("tableWidget")
-        self.tableWidget.setColumnCount(len(self.lst))
-        self.tableWidget.setHorizontalHeaderLabels(self.lst)
         self.tableWidget.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)  # 使列表自适应宽度
         self.tableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)  # 设置tablewidget不可编辑
         self.tableWidget.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)  # 设置tablewidget不可选中
-        self.tableWidget.resizeColumnsToContents()  # 设置列宽高按照内容自适应
         self.gridLayout_2.addWidget(self.tableWidget, 1, 0, 2, 4)
 
         # 可视化板块
@@ -0,0 +1,241 @@
+# 文件功能：按需分页加载的表格模型和操作按钮委托
+# 数据查看、健康评估、结果查看页面的表格使用QTableView + LazyQueryTableModel：
+# 1. 先用一次COUNT查询得到总行数，表格只加载第一页，滚动到底部时再按页（LIMIT/OFFSET）取后续记录
+# 2. 上传用户名、数据路径等关联字段由调用方在同一个JOIN查询中取出，不再每行单独查询
+# 3. 操作列由ActionButtonDelegate直接绘制按钮，不再为每一行创建QWidget和QPushButton
+
+import logging
+import traceback
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+
+# 每次从数据库读取的行数
+DEFAULT_PAGE_SIZE = 200
+
+
+class LazyQueryTableModel(QtCore.QAbstractTableModel):
+    """
+    按需分页加载数据库记录的只读表格模型
+
+    参数:
+    headers (list): 列名，最后一列可以是由委托绘制的操作列
+    session_factory: 数据库会话类（SessionClass）
+    query_factory (callable): query_factory(session) 返回已排序的SQLAlchemy查询
+    row_builder (callable): row_builder(record) 返回 (记录ID, 各列显示文本列表, {列号: 工具提示})
+    page_size (int): 每页读取的行数
+    """
+
+    def __init__(self, headers, session_factory, query_factory, row_builder, page_size=DEFAULT_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.session_factory = session_factory
+        self.query_factory = query_factory
+        self.row_builder = row_builder
+        self.page_size = page_size
+        self._rows = []
+        self._total = 0
+
+    def set_query(self, query_factory):
+        """替换查询（例如应用筛选条件）并重新加载"""
+        self.query_factory = query_factory
+        self.refresh()
+
+    def refresh(self):
+        """重新统计总行数并只加载第一页"""
+        self.beginResetModel()
+        self._rows = []
+        self._total = 0
+        session = self.session_factory()
+        try:
+            self._total = self.query_factory(session).order_by(None).count()
+            self._rows = self._load_page(session, 0)
+        except Exception as e:
+            logging.error(f"加载表格数据失败: {str(e)}")
+            logging.error(traceback.format_exc())
+            raise
+        finally:
+            session.close()
+            self.endResetModel()
+
+    def _load_page(self, session, offset):
+        records = self.query_factory(session).offset(offset).limit(self.page_size).all()
+        return [self.row_builder(record) for record in records]
+
+    @property
+    def total_count(self):
+        """数据库中的总行数（包括尚未加载的行）"""
+        return self._total
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return len(self._rows) < self._total
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return
+        session = self.session_factory()
+        try:
+            rows = self._load_page(session, len(self._rows))
+        except Exception as e:
+            logging.error(f"加载表格数据失败: {str(e)}")
+            logging.error(traceback.format_exc())
+            return
+        finally:
+            session.close()
+        if not rows:
+            # 记录在加载期间被删除，按实际行数修正总数
+            self._total = len(self._rows)
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def ensure_loaded(self, count):
+        """确保至少加载了count行（或全部行），用于批量选择和导出"""
+        while len(self._rows) < count and self.canFetchMore():
+            loaded = len(self._rows)
+            self.fetchMore()
+            if len(self._rows) == loaded:
+                break
+        return min(count, len(self._rows))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        _, values, tooltips = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return values[column] if column < len(values) else None
+        if role == Qt.ToolTipRole:
+            return tooltips.get(column)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and section < len(self.headers):
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def row_id(self, row):
+        """指定行的记录ID"""
+        return self._rows[row][0]
+
+    def row_value(self, row, column):
+        """指定单元格的显示文本"""
+        values = self._rows[row][1]
+        return values[column] if column < len(values) else ''
+
+    def row_tooltip(self, row, column):
+        """指定单元格的工具提示（例如完整路径）"""
+        return self._rows[row][2].get(column)
+
+    def remove_row(self, row):
+        """从已加载的行中移除一行（记录已在数据库中删除）"""
+        if 0 <= row < len(self._rows):
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self._rows[row]
+            self._total = max(0, self._total - 1)
+            self.endRemoveRows()
+
+
+class ActionButtonDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    在操作列中直接绘制一组按钮，点击时发出 clicked(行号, 按钮key)
+
+    参数:
+    buttons (list): 按钮定义，每项为dict：key、text、background（背景色）、color（文字和边框颜色，可选）
+    """
+
+    clicked = QtCore.pyqtSignal(int, str)
+
+    def __init__(self, buttons, parent=None, spacing=6, margin=4, button_height=28):
+        super().__init__(parent)
+        self.buttons = buttons
+        self.spacing = spacing
+        self.margin = margin
+        self.button_height = button_height
+        self._pressed = None  # (行号, 按钮key)
+
+    def _button_rects(self, rect):
+        count = len(self.buttons)
+        area = rect.adjusted(self.margin, 0, -self.margin, 0)
+        width = max(1, (area.width() - self.spacing * (count - 1)) // count)
+        height = min(self.button_height, rect.height() - 4)
+        top = rect.top() + (rect.height() - height) // 2
+        return [
+            QtCore.QRect(area.left() + i * (width + self.spacing), top, width, height)
+            for i in range(count)
+        ]
+
+    def paint(self, painter, option, index):
+        # 先绘制单元格背景（选中状态等）
+        QtWidgets.QApplication.style().drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        font = QtGui.QFont(option.font)
+        font.setPixelSize(13)
+        painter.setFont(font)
+        for button, rect in zip(self.buttons, self._button_rects(option.rect)):
+            background = QtGui.QColor(button.get('background', 'white'))
+            color = QtGui.QColor(button.get('color', '#333333'))
+            painter.setPen(QtGui.QPen(color if 'color' in button else background.darker(130), 1))
+            painter.setBrush(background)
+            painter.drawRoundedRect(QtCore.QRectF(rect).adjusted(0.5, 0.5, -0.5, -0.5), 3, 3)
+            painter.setPen(color)
+            painter.drawText(rect, Qt.AlignCenter, button['text'])
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        metrics = QtGui.QFontMetrics(option.font)
+        width = sum(metrics.horizontalAdvance(button['text']) + 24 for button in self.buttons)
+        width += self.spacing * (len(self.buttons) - 1) + 2 * self.margin
+        return QtCore.QSize(width, self.button_height + 6)
+
+    def _button_at(self, option, pos):
+        for button, rect in zip(self.buttons, self._button_rects(option.rect)):
+            if rect.contains(pos):
+                return button['key']
+        return None
+
+    def editorEvent(self, event, model, option, index):
+        event_type = event.type()
+        if event_type not in (QtCore.QEvent.MouseButtonPress, QtCore.QEvent.MouseButtonRelease,
+                              QtCore.QEvent.MouseButtonDblClick):
+            return super().editorEvent(event, model, option, index)
+        if event.button() != Qt.LeftButton:
+            return False
+        key = self._button_at(option, event.pos())
+        if event_type == QtCore.QEvent.MouseButtonPress:
+            self._pressed = (index.row(), key) if key else None
+        elif event_type == QtCore.QEvent.MouseButtonRelease:
+            pressed, self._pressed = self._pressed, None
+            if key and pressed == (index.row(), key):
+                self.clicked.emit(index.row(), key)
+        # 点击按钮不改变表格的选中状态
+        return key is not None
+
+
+def setup_lazy_table_view(view, model, delegate=None, action_column=None, row_height=36):
+    """
+    为QTableView设置模型、操作列委托和固定行高
+
+    固定行高使视图不必为每一行计算尺寸，滚动时只绘制可见行
+    """
+    view.setModel(model)
+    if delegate is not None:
+        view.setItemDelegateForColumn(action_column if action_column is not None else model.columnCount() - 1, delegate)
+    view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(row_height)
+    return view
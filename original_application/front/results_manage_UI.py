@@ -283,11 +283,9 @@ class Ui_MainWindow(object):
 
         # 改为表格
         self.lst = ['ID', '用户名', '评估时间', '普通应激', '抑郁', '焦虑', '社交孤立']
-        self.tableWidget = QtWidgets.QTableWidget(self.centralwidget)
+        self.tableWidget = QtWidgets.QTableView(self.centralwidget)  # 模型和操作列委托由后端设置（front/lazy_table.py）
         self.tableWidget.setStyleSheet("margin-right:15px")
         self.tableWidget.setObjectName("tableWidget")
-        self.tableWidget.setColumnCount(len(self.lst))
-        self.tableWidget.setHorizontalHeaderLabels(self.lst)
         self.tableWidget.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
         self.tableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.tableWidget.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
@@ -1,16 +1,17 @@
 import os
 import numpy as np
-import tensorflow as tf
 import logging
 import traceback
 import mne
-import pickle as pkl
 import warnings
 from PyQt5.QtCore import QThread, pyqtSignal
-from model.tuili_int8 import EegModelInt8
 from model.result_processor import ResultProcessor
 import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
+from model import batch_worker
 
 # 设置MNE日志级别为ERROR，只显示错误信息
 mne.set_log_level('ERROR')
@@ -25,109 +26,46 @@ warnings.filterwarnings('ignore', message='Trying to unpickle estimator Standard
 
 sys.path.append('../')
 
+# 每个工作进程中TFLite解释器的线程数；按被试分片时每进程1个线程吞吐量最高
+BATCH_THREADS_PER_WORKER = int(os.getenv('BATCH_THREADS_PER_WORKER', '1'))
+# 工作进程数，默认按CPU核数和每进程线程数计算
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', str(max(1, (os.cpu_count() or 1) // max(1, BATCH_THREADS_PER_WORKER)))))
+
 class BatchInferenceModel(QThread):
     """
     批量推理模型类
     支持多个数据的批量推理，使用INT8量化模型
+
+    被试分片到进程池（model/batch_worker.py）：每个进程加载一次解释器和标准化器，
+    各被试的结果按完成顺序通过 subject_completed 发出
     """
     
     # 定义信号
     progress_updated = pyqtSignal(float)  # 进度更新信号
-    batch_completed = pyqtSignal(list)    # 批次完成信号，发送结果列表
+    subject_completed = pyqtSignal(int, list)  # 单个被试完成信号：序号, [普通应激, 抑郁, 焦虑]
+    batch_completed = pyqtSignal(list)    # 批次完成信号，发送结果列表（按data_paths顺序）
     error_occurred = pyqtSignal(str)      # 错误信号
     finished = pyqtSignal()               # 完成信号
     
-    def __init__(self, data_paths, model_path):
+    def __init__(self, data_paths, model_path, workers=BATCH_WORKERS, threads_per_worker=BATCH_THREADS_PER_WORKER):
         """
         初始化批量推理模型
         
         Args:
             data_paths: 数据路径列表
             model_path: 模型路径
+            workers: 工作进程数
+            threads_per_worker: 每个进程中解释器的线程数
         """
         super().__init__()
         self.data_paths = data_paths
         self.model_path = model_path
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
         self.results = []
         self.n_channels = 59
         self.in_samples = 1000
         
-    def preprocess_data(self, data_path):
-        """
-        预处理单个数据路径的数据
-        
-        Args:
-            data_path (str): 数据路径
-            
-        Returns:
-            np.ndarray: 预处理后的数据
-        """
-        try:
-            num_of_data = 108
-            files = os.listdir(data_path)
-            
-            # 定义文件排序键
-            def sort_key(file_name):
-                if file_name.endswith('.fif'):
-                    return 1
-                elif file_name.endswith('.edf'):
-                    return 2
-                elif file_name.endswith('.set'):
-                    return 3
-                else:
-                    return 4
-            
-            # 对文件列表进行排序
-            files = sorted(files, key=sort_key)
-            
-            for file in files:
-                file_path = os.path.join(data_path, file)
-                file_name = os.path.basename(file_path)
-                
-                if file_name.endswith('.fif'):
-                    raw = mne.read_epochs(file_path)
-                    raw.load_data()
-                    exp_data = raw.get_data()
-                elif file_name.endswith('.edf'):
-                    raw = mne.io.read_raw_edf(file_path)
-                    raw.load_data()
-                    exp_data = raw.get_data()
-                    segment_length = int(500 * 2)
-                    num_channels, num_samples = exp_data.shape
-                    segments = []
-                    
-                    for start in range(0, num_samples, segment_length):
-                        end = start + segment_length
-                        if end <= num_samples:
-                            segment = exp_data[:, start:end]
-                            segments.append(segment)
-                    
-                    exp_data = np.array(segments)
-                elif file_name.endswith('.set'):
-                    raw = mne.io.read_epochs_eeglab(file_path)
-                    exp_data = raw.get_data()
-                
-                data = exp_data[-(num_of_data)::, ::, ::]
-                N_tr, N_ch, T = data.shape
-                data = data.reshape(N_tr, 1, N_ch, T)
-                
-                standarder = 'standarder'
-                model_dir = os.path.dirname(self.model_path)
-                dir_path = os.path.join(model_dir, standarder)
-                
-                for j in range(N_ch):
-                    save_path = os.path.join(dir_path, f'std_{j}.pkl')
-                    with open(save_path, 'rb') as f:
-                        scaler = pkl.load(f)
-                    data[:, 0, j, :] = scaler.transform(data[:, 0, j, :])
-                
-                return data
-                
-        except Exception as e:
-            logging.error(f"数据预处理时发生错误: {str(e)}")
-            logging.error(traceback.format_exc())
-            return None
-    
     def calculate_scale_scores(self, data_path):
         """
         计算量表分数，只计算一次
@@ -262,56 +200,85 @@ class BatchInferenceModel(QThread):
             logging.error(traceback.format_exc())
             return stress_score
 
-    def run(self):
+    def score_subject(self, data_path, ratio):
         """
-        运行批量推理
+        由模型输出（预测为EXP的epoch比例）和量表计算一个被试的三项分数
+
+        Returns:
+            list: [普通应激, 抑郁, 焦虑]
         """
-        try:
-            # 确保模型已经加载
-            if not EegModelInt8._interpreter:
-                if not EegModelInt8.load_static_model():
-                    self.error_occurred.emit("量化模型加载失败")
-                    return
+        # 计算量表分数
+        anxiety_score_lb, depression_score_lb = self.calculate_scale_scores(data_path)
 
-            total = len(self.data_paths)
-            for i, data_path in enumerate(self.data_paths):
-                try:
-                    # 计算进度
-                    progress = (i + 1) / total * 100
-                    self.progress_updated.emit(progress)
+        model_result = float(min(95, max(0, ratio * 100)))
 
-                    # 计算量表分数
-                    anxiety_score_lb, depression_score_lb = self.calculate_scale_scores(data_path)
+        # 计算抑郁分数
+        depression_score = self.calculate_final_score(model_result, depression_score_lb, 1)
 
-                    # 使用模型进行推理
-                    model = EegModelInt8(data_path, self.model_path)
-                    model_result = model.predict() * 100
-                    model_result = float(min(95, max(0, model_result)))
+        # 计算焦虑分数
+        anxiety_score = self.calculate_final_score(model_result, anxiety_score_lb, 2)
 
-                    # 计算抑郁分数
-                    depression_score = self.calculate_final_score(model_result, depression_score_lb, 1)
-                    
-                    # 计算焦虑分数
-                    anxiety_score = self.calculate_final_score(model_result, anxiety_score_lb, 2)
+        # 调整普通应激分数
+        adjusted_stress_score = self.adjust_stress_score(model_result, depression_score, anxiety_score)
+        return [adjusted_stress_score, depression_score, anxiety_score]
+
+    def run(self):
+        """
+        运行批量推理
+        """
+        try:
+            if not os.path.exists(self.model_path):
+                logging.error(f"模型文件不存在: {self.model_path}")
+                self.error_occurred.emit("量化模型加载失败")
+                return
 
-                    # 调整普通应激分数
-                    adjusted_stress_score = self.adjust_stress_score(model_result, depression_score, anxiety_score)
+            total = len(self.data_paths)
+            scores = [[0, 0, 0] for _ in range(total)]
+            workers = min(self.workers, total) if total else 1
+            logging.info(f"开始批量推理: {total}个被试, {workers}个进程, 每进程{self.threads_per_worker}个线程")
 
-                    # 将三个分数添加到结果列表
-                    self.results.extend([adjusted_stress_score, depression_score, anxiety_score])
+            # 使用spawn启动子进程，避免复制GUI进程中的Qt和线程状态
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=context,
+                initializer=batch_worker.init_worker, initargs=(self.model_path, self.threads_per_worker)
+            ) as executor:
+                futures = {
+                    executor.submit(batch_worker.predict_subject, i, data_path): i
+                    for i, data_path in enumerate(self.data_paths)
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    index = futures[future]
+                    data_path = self.data_paths[index]
+                    try:
+                        _, ratio = future.result()
+                    except BrokenProcessPool:
+                        # 工作进程初始化（加载解释器/标准化器）失败或异常退出，其余被试也无法推理
+                        raise
+                    except Exception as e:
+                        # 推理失败时按模型输出为0计算，量表分数仍然参与计算
+                        logging.error(f"处理数据 {data_path} 时发生错误: {str(e)}")
+                        logging.error(traceback.format_exc())
+                        ratio = 0.0
+                    scores[index] = self.score_subject(data_path, ratio)
+                    self.subject_completed.emit(index, scores[index])
+                    self.progress_updated.emit(done / total * 100)
 
-                except Exception as e:
-                    logging.error(f"处理数据 {data_path} 时发生错误: {str(e)}")
-                    logging.error(traceback.format_exc())
-                    # 发生错误时，添加默认分数
-                    self.results.extend([0, 0, 0])
+            # 将三个分数按输入顺序添加到结果列表
+            for subject_scores in scores:
+                self.results.extend(subject_scores)
 
             # 发送结果
             self.batch_completed.emit(self.results)
             self.finished.emit()
 
+        except BrokenProcessPool as e:
+            error_msg = f"量化模型加载失败: {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            self.error_occurred.emit(error_msg)
         except Exception as e:
             error_msg = f"批量推理过程中发生错误: {str(e)}"
             logging.error(error_msg)
             logging.error(traceback.format_exc())
-            self.error_occurred.emit(error_msg) 
\ No newline at end of file
+            self.error_occurred.emit(error_msg)
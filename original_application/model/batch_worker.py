@@ -0,0 +1,136 @@
+# 文件功能：批量推理的进程池工作函数
+# 每个工作进程在初始化时加载一次TFLite解释器（线程数可配置）和59个通道的标准化器，
+# 之后该进程处理的所有被试共用它们。本模块只依赖numpy/mne，不导入PyQt5和数据库模块，
+# 以便spawn方式启动的子进程快速导入。
+
+import os
+import pickle as pkl
+import traceback
+import warnings
+
+import numpy as np
+
+# 每个被试使用最后108个epoch
+NUM_OF_DATA = 108
+
+# 工作进程内的全局状态（由 init_worker 设置）
+_interpreter = None
+_input_details = None
+_output_details = None
+_scalers = None
+
+
+def _create_interpreter(model_path, num_threads):
+    """优先使用轻量的tflite_runtime，未安装时使用TensorFlow自带的解释器"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+def load_scalers(model_path, n_channels=59):
+    """读取模型目录下 standarder/std_<通道>.pkl 中的标准化器"""
+    dir_path = os.path.join(os.path.dirname(model_path), 'standarder')
+    scalers = []
+    for j in range(n_channels):
+        with open(os.path.join(dir_path, f'std_{j}.pkl'), 'rb') as f:
+            scalers.append(pkl.load(f))
+    return scalers
+
+
+def init_worker(model_path, num_threads):
+    """
+    工作进程初始化：加载解释器和标准化器
+    """
+    global _interpreter, _input_details, _output_details, _scalers
+    warnings.filterwarnings('ignore')
+    import mne
+    mne.set_log_level('ERROR')
+
+    _interpreter = _create_interpreter(model_path, num_threads)
+    _interpreter.allocate_tensors()
+    _input_details = _interpreter.get_input_details()
+    _output_details = _interpreter.get_output_details()
+    _scalers = load_scalers(model_path)
+
+
+def load_subject_data(data_path, scalers):
+    """
+    读取被试目录中的epoch数据并按通道标准化（与 EegModelInt8.get_data 一致）
+
+    Returns:
+        np.ndarray: (N, 1, 通道数, 采样点数)
+    """
+    import mne
+
+    # 按扩展名排序：fif优先，其次edf、set
+    def sort_key(file_name):
+        if file_name.endswith('.fif'):
+            return 1
+        elif file_name.endswith('.edf'):
+            return 2
+        elif file_name.endswith('.set'):
+            return 3
+        else:
+            return 4
+
+    for file_name in sorted(os.listdir(data_path), key=sort_key):
+        file_path = os.path.join(data_path, file_name)
+        if file_name.endswith('.fif'):
+            epochs = mne.read_epochs(file_path)
+            epochs.load_data()
+            exp_data = epochs.get_data()
+        elif file_name.endswith('.edf'):
+            raw = mne.io.read_raw_edf(file_path)
+            raw.load_data()
+            exp_data = raw.get_data()
+            segment_length = int(500 * 2)
+            n_segments = exp_data.shape[1] // segment_length
+            exp_data = np.stack([
+                exp_data[:, i * segment_length:(i + 1) * segment_length] for i in range(n_segments)
+            ])
+        elif file_name.endswith('.set'):
+            exp_data = mne.io.read_epochs_eeglab(file_path).get_data()
+        else:
+            continue
+
+        data = exp_data[-NUM_OF_DATA:, :, :]
+        N_tr, N_ch, T = data.shape
+        data = data.reshape(N_tr, 1, N_ch, T)
+        for j in range(N_ch):
+            data[:, 0, j, :] = scalers[j].transform(data[:, 0, j, :])
+        return data
+
+    raise FileNotFoundError(f"未找到可用的数据文件: {data_path}")
+
+
+def predict_subject(index, data_path):
+    """
+    在工作进程中推理一个被试
+
+    Returns:
+        tuple: (序号, 预测为EXP的epoch比例)
+    """
+    try:
+        X_test = load_subject_data(data_path, _scalers)
+
+        # 量化输入数据
+        input_scale, input_zero_point = _input_details[0]['quantization']
+        X_test_quantized = (X_test / input_scale + input_zero_point).astype(np.int8)
+        output_scale, output_zero_point = _output_details[0]['quantization']
+
+        # 逐个样本进行预测
+        predictions = []
+        for i in range(X_test_quantized.shape[0]):
+            _interpreter.set_tensor(_input_details[0]['index'], X_test_quantized[i:i + 1])
+            _interpreter.invoke()
+            output_data = _interpreter.get_tensor(_output_details[0]['index'])
+            predictions.append((output_data.astype(np.float32) - output_zero_point) * output_scale)
+
+        labels = np.vstack(predictions).argmax(axis=-1)
+        return index, float(labels.sum()) / len(labels)
+    except Exception:
+        # 子进程中的日志不会写入主进程的日志文件，把堆栈带回主进程记录
+        raise RuntimeError(f"推理 {data_path} 失败:\n{traceback.format_exc()}")
@@ -8,11 +8,17 @@ sys.path.append(project_root)
 
 import tensorflow as tf
 import numpy as np
+import mne
+import pickle as pkl
+import argparse
+import json
+import time
 import logging
 import traceback
 from datetime import datetime
 from util.db_util import SessionClass
 from sql_model.tb_model import Model
+from sql_model.tb_data import Data
 
 # 配置日志
 logging.basicConfig(
@@ -28,35 +34,131 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 console_handler.setFormatter(formatter)
 logging.getLogger().addHandler(console_handler)
 
+# 每个被试参与推理的epoch数，与推理代码保持一致
+NUM_OF_DATA = 108
+
+# 预处理后的epoch文件名
+FIF_FILE_NAME = 'fif.fif'
+
+MODEL_TYPE_NAMES = {0: '普通应激', 1: '抑郁', 2: '焦虑'}
+
+# 标准化器缓存：目录 -> 按通道排列的scaler列表
+_scaler_cache = {}
+
+def load_scalers(dir_path, n_channels):
+    """
+    加载模型目录下按通道保存的标准化器（与推理时相同的standarder路径）
+    """
+    if dir_path not in _scaler_cache:
+        scalers = []
+        for j in range(n_channels):
+            with open(os.path.join(dir_path, f'std_{j}.pkl'), 'rb') as f:
+                scalers.append(pkl.load(f))
+        _scaler_cache[dir_path] = scalers
+    return _scaler_cache[dir_path]
+
+def load_standardized_epochs(data_path, model_path, num_of_data=NUM_OF_DATA):
+    """
+    读取数据目录下预处理好的fif.fif，按推理流程取最后num_of_data个epoch并标准化
+    Args:
+        data_path: 数据目录
+        model_path: 模型路径，标准化器位于同级standarder目录
+    Returns:
+        np.ndarray: 形状为 (N, 1, 59, 1000) 的float32数据
+    """
+    epochs = mne.read_epochs(os.path.join(data_path, FIF_FILE_NAME), verbose='ERROR')
+    epochs.load_data()
+    data = epochs.get_data()[-num_of_data:, :, :]
+    N_tr, N_ch, T = data.shape
+    data = data.reshape(N_tr, 1, N_ch, T)
+
+    scalers = load_scalers(os.path.join(os.path.dirname(model_path), 'standarder'), N_ch)
+    for j in range(N_ch):
+        data[:, 0, j, :] = scalers[j].transform(data[:, 0, j, :])
+    return data.astype(np.float32)
+
+def find_float_model_path(model_path):
+    """
+    数据库中登记的可能已是量化模型，此时在同目录下查找对应的浮点Keras模型
+    Returns:
+        str: 浮点模型路径，找不到返回None
+    """
+    if not model_path.endswith('.tflite'):
+        return model_path
+    model_dir = os.path.dirname(model_path)
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    if model_name.endswith('_quantized'):
+        model_name = model_name[:-len('_quantized')]
+    for ext in ('.keras', '.h5'):
+        candidate = os.path.join(model_dir, model_name + ext)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def quantize_input(X, input_details):
+    """按模型输入的scale/zero_point量化，与EegModelInt8.predict的处理一致"""
+    if input_details[0]['dtype'] != np.int8:
+        return X.astype(input_details[0]['dtype'])
+    input_scale, input_zero_point = input_details[0]['quantization']
+    return (X / input_scale + input_zero_point).astype(np.int8)
+
+def predict_int8(interpreter, X):
+    """逐样本执行INT8推理并反量化输出"""
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
+    X_quantized = quantize_input(X, input_details)
+    output_scale, output_zero_point = output_details[0]['quantization']
+
+    predictions = []
+    for i in range(X_quantized.shape[0]):
+        interpreter.set_tensor(input_details[0]['index'], X_quantized[i:i + 1])
+        interpreter.invoke()
+        output_data = interpreter.get_tensor(output_details[0]['index'])
+        if output_details[0]['dtype'] == np.int8:
+            output_data = (output_data.astype(np.float32) - output_zero_point) * output_scale
+        predictions.append(output_data)
+    return np.vstack(predictions)
+
 class ModelQuantizer:
     """
-    模型量化器类，用于将模型进行INT8量化
+    模型量化器类，使用真实预处理数据校准，将模型进行INT8量化并与浮点模型对比
     """
-    def __init__(self):
+    def __init__(self, model_type=0, calibration_epochs=300, holdout_ratio=0.3, seed=0):
         """
         初始化模型量化器
+        Args:
+            model_type: 模型类型 (0=普通应激, 1=抑郁, 2=焦虑)
+            calibration_epochs: 校准使用的epoch总数
+            holdout_ratio: 留出用于对比评估的被试比例
+            seed: 被试划分与epoch抽样的随机种子
         """
         self.session = SessionClass()
+        self.model_type = model_type
+        self.calibration_epochs = calibration_epochs
+        self.holdout_ratio = holdout_ratio
+        self.rng = np.random.default_rng(seed)
         self.model = None
         self.model_path = None
         self.quantized_model = None
+        self.quantized_model_path = None
+        self.calibration_paths = []
+        self.holdout_paths = []
         
     def load_model(self):
         """
-        从数据库加载model_type=0的模型
+        从数据库加载指定类型模型对应的浮点Keras模型
         Returns:
             bool: 加载是否成功
         """
         try:
-            # 从数据库获取普通应激模型
-            model_info = self.session.query(Model).filter(Model.model_type == 0).first()
+            model_info = self.session.query(Model).filter(Model.model_type == self.model_type).first()
             if not model_info:
-                logging.error("未找到普通应激模型(model_type=0)")
+                logging.error(f"未找到{MODEL_TYPE_NAMES.get(self.model_type)}模型(model_type={self.model_type})")
                 return False
-                
-            self.model_path = model_info.model_path
-            if not os.path.exists(self.model_path):
-                logging.error(f"模型文件不存在: {self.model_path}")
+
+            self.model_path = find_float_model_path(model_info.model_path)
+            if not self.model_path or not os.path.exists(self.model_path):
+                logging.error(f"模型文件不存在或未找到对应的浮点模型: {model_info.model_path}")
                 return False
                 
             # 加载模型
@@ -68,10 +170,68 @@ class ModelQuantizer:
             logging.error(f"加载模型时发生错误: {str(e)}")
             logging.error(traceback.format_exc())
             return False
+
+    def prepare_subjects(self):
+        """
+        从数据库中查找已完成预处理（存在fif.fif）的被试，划分为校准集和留出集
+        Returns:
+            bool: 是否找到可用数据
+        """
+        try:
+            data_paths = sorted({
+                d.data_path for d in self.session.query(Data).all()
+                if d.data_path and os.path.exists(os.path.join(d.data_path, FIF_FILE_NAME))
+            })
+            if not data_paths:
+                logging.error("数据库中没有已预处理的数据(fif.fif)，无法使用真实数据校准")
+                return False
+
+            order = self.rng.permutation(len(data_paths))
+            shuffled = [data_paths[i] for i in order]
+            if len(shuffled) == 1:
+                logging.warning("只有1个已预处理被试，校准集与留出集相同，对比结果仅供参考")
+                self.calibration_paths = self.holdout_paths = shuffled
+            else:
+                holdout_count = min(len(shuffled) - 1, max(1, int(round(len(shuffled) * self.holdout_ratio))))
+                self.holdout_paths = shuffled[:holdout_count]
+                self.calibration_paths = shuffled[holdout_count:]
+
+            logging.info(f"校准被试数: {len(self.calibration_paths)}, 留出被试数: {len(self.holdout_paths)}")
+            return True
+
+        except Exception as e:
+            logging.error(f"查找预处理数据时发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+            return False
+
+    def build_calibration_set(self):
+        """
+        从校准被试中均匀抽取epoch作为代表性数据集
+        Returns:
+            np.ndarray: 形状为 (N, 1, 59, 1000) 的校准数据
+        """
+        per_subject = int(np.ceil(self.calibration_epochs / len(self.calibration_paths)))
+        samples = []
+        for data_path in self.calibration_paths:
+            try:
+                data = load_standardized_epochs(data_path, self.model_path)
+            except Exception as e:
+                logging.error(f"读取校准数据失败: {data_path}, {str(e)}")
+                logging.error(traceback.format_exc())
+                continue
+            count = min(per_subject, data.shape[0])
+            indices = np.sort(self.rng.choice(data.shape[0], size=count, replace=False))
+            samples.append(data[indices])
+
+        if not samples:
+            return None
+        calibration = np.concatenate(samples, axis=0)[:self.calibration_epochs]
+        logging.info(f"校准数据: {calibration.shape[0]}个epoch, 取值范围 [{calibration.min():.2f}, {calibration.max():.2f}]")
+        return calibration
             
     def quantize_model(self):
         """
-        对模型进行INT8量化
+        使用真实数据校准对模型进行INT8量化
         Returns:
             bool: 量化是否成功
         """
@@ -79,6 +239,13 @@ class ModelQuantizer:
             if self.model is None:
                 logging.error("请先加载模型")
                 return False
+            if not self.calibration_paths and not self.prepare_subjects():
+                return False
+
+            calibration = self.build_calibration_set()
+            if calibration is None:
+                logging.error("没有可用的校准数据")
+                return False
                 
             logging.info("开始模型量化过程...")
             # 创建量化感知模型
@@ -97,19 +264,10 @@ class ModelQuantizer:
                 tf.lite.OpsSet.SELECT_TF_OPS
             ]
             
-            # 设置代表性数据集用于量化校准
+            # 代表性数据集：真实标准化后的EEG epoch
             def representative_dataset():
-                logging.info("生成代表性数据集用于量化校准...")
-                # 获取原始模型的输入shape
-                input_shape = self.model.input_shape
-                logging.info(f"原始模型输入shape: {input_shape}")
-                
-                for _ in range(100):
-                    # 生成单个样本的数据
-                    data = np.random.randn(1, 1, 59, 1000).astype(np.float32)
-                    # 确保数据范围在合理区间内
-                    data = np.clip(data, -10, 10)
-                    yield [data]
+                for i in range(calibration.shape[0]):
+                    yield [calibration[i:i + 1]]
                     
             converter.representative_dataset = representative_dataset
             
@@ -121,39 +279,106 @@ class ModelQuantizer:
             # 生成量化模型的保存路径
             model_dir = os.path.dirname(self.model_path)
             model_name = os.path.splitext(os.path.basename(self.model_path))[0]
-            quantized_model_path = os.path.join(model_dir, f"{model_name}_quantized.tflite")
+            self.quantized_model_path = os.path.join(model_dir, f"{model_name}_quantized.tflite")
             
             # 保存量化后的模型
-            with open(quantized_model_path, 'wb') as f:
+            with open(self.quantized_model_path, 'wb') as f:
                 f.write(self.quantized_model)
                 
-            logging.info(f"量化模型已保存到: {quantized_model_path}")
-            
-            # 验证量化后的模型
-            interpreter = tf.lite.Interpreter(model_path=quantized_model_path)
-            interpreter.allocate_tensors()
-            
-            # 获取输入输出信息
-            input_details = interpreter.get_input_details()
-            output_details = interpreter.get_output_details()
-            
-            logging.info(f"量化后模型输入信息: {input_details}")
-            logging.info(f"量化后模型输出信息: {output_details}")
-            
-            # 更新数据库中的模型路径
-            model = self.session.query(Model).filter(Model.model_type == 0).first()
-            if model:
-                old_path = model.model_path
-                model.model_path = quantized_model_path
-                self.session.commit()
-                logging.info(f"数据库中的模型路径已更新: {old_path} -> {quantized_model_path}")
-            
+            logging.info(f"量化模型已保存到: {self.quantized_model_path}")
             return True
             
         except Exception as e:
             logging.error(f"量化模型时发生错误: {str(e)}")
             logging.error(traceback.format_exc())
             return False
+
+    def benchmark(self):
+        """
+        在留出被试上对比浮点模型与INT8模型的推理延迟、模型大小和评估分数一致性
+        Returns:
+            dict: 对比报告
+        """
+        interpreter = tf.lite.Interpreter(model_path=self.quantized_model_path, num_threads=4)
+        interpreter.allocate_tensors()
+
+        subjects = []
+        float_seconds = int8_seconds = 0.0
+        total_epochs = 0
+        warmed_up = False
+        for data_path in self.holdout_paths:
+            try:
+                X = load_standardized_epochs(data_path, self.model_path)
+            except Exception as e:
+                logging.error(f"读取留出数据失败: {data_path}, {str(e)}")
+                logging.error(traceback.format_exc())
+                continue
+
+            if not warmed_up:
+                # 预热，排除图构建等一次性开销
+                self.model.predict(X[:1], verbose=0)
+                predict_int8(interpreter, X[:1])
+                warmed_up = True
+
+            start = time.perf_counter()
+            y_float = self.model.predict(X, verbose=0)
+            float_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            y_int8 = predict_int8(interpreter, X)
+            int8_seconds += time.perf_counter() - start
+
+            total_epochs += X.shape[0]
+            labels_float = y_float.argmax(axis=-1)
+            labels_int8 = y_int8.argmax(axis=-1)
+            score_float = float(labels_float.sum()) / len(labels_float) * 100
+            score_int8 = float(labels_int8.sum()) / len(labels_int8) * 100
+            subjects.append({
+                'data_path': data_path,
+                'epochs': int(X.shape[0]),
+                'score_float': round(score_float, 2),
+                'score_int8': round(score_int8, 2),
+                'score_abs_diff': round(abs(score_float - score_int8), 2),
+                'epoch_label_agreement': round(float((labels_float == labels_int8).mean()), 4),
+            })
+
+        float_size = os.path.getsize(self.model_path)
+        int8_size = os.path.getsize(self.quantized_model_path)
+        diffs = [s['score_abs_diff'] for s in subjects]
+        report = {
+            'model_type': self.model_type,
+            'model_name': MODEL_TYPE_NAMES.get(self.model_type),
+            'float_model_path': self.model_path,
+            'int8_model_path': self.quantized_model_path,
+            'calibration_subjects': len(self.calibration_paths),
+            'calibration_epochs': self.calibration_epochs,
+            'holdout_subjects': len(subjects),
+            'float_size_mb': round(float_size / 1024 / 1024, 3),
+            'int8_size_mb': round(int8_size / 1024 / 1024, 3),
+            'size_ratio': round(int8_size / float_size, 3) if float_size else None,
+            'float_ms_per_epoch': round(float_seconds / total_epochs * 1000, 3) if total_epochs else None,
+            'int8_ms_per_epoch': round(int8_seconds / total_epochs * 1000, 3) if total_epochs else None,
+            'speedup': round(float_seconds / int8_seconds, 2) if int8_seconds else None,
+            'mean_score_abs_diff': round(float(np.mean(diffs)), 2) if diffs else None,
+            'max_score_abs_diff': round(float(np.max(diffs)), 2) if diffs else None,
+            'mean_epoch_label_agreement': round(float(np.mean([s['epoch_label_agreement'] for s in subjects])), 4) if subjects else None,
+            'subjects': subjects,
+        }
+        logging.info(
+            f"{report['model_name']}模型对比: 大小 {report['float_size_mb']}MB -> {report['int8_size_mb']}MB, "
+            f"延迟 {report['float_ms_per_epoch']}ms -> {report['int8_ms_per_epoch']}ms/epoch, "
+            f"分数平均差 {report['mean_score_abs_diff']}, 最大差 {report['max_score_abs_diff']}"
+        )
+        return report
+
+    def update_db_path(self):
+        """将数据库中的模型路径切换为量化模型"""
+        model = self.session.query(Model).filter(Model.model_type == self.model_type).first()
+        if model:
+            old_path = model.model_path
+            model.model_path = self.quantized_model_path
+            self.session.commit()
+            logging.info(f"数据库中的模型路径已更新: {old_path} -> {self.quantized_model_path}")
             
     def __del__(self):
         """
@@ -166,24 +391,50 @@ def main():
     """
     主函数
     """
-    try:
-        quantizer = ModelQuantizer()
-        
-        # 加载模型
-        if not quantizer.load_model():
-            logging.error("加载模型失败")
-            return
+    parser = argparse.ArgumentParser(description='使用真实EEG数据校准的INT8模型量化与对比')
+    parser.add_argument('--model-types', type=int, nargs='+', default=[0, 1, 2], help='要量化的模型类型，默认全部')
+    parser.add_argument('--calibration-epochs', type=int, default=300, help='校准使用的epoch总数')
+    parser.add_argument('--holdout-ratio', type=float, default=0.3, help='留出用于对比的被试比例')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--max-score-diff', type=float, default=5.0, help='允许更新数据库的最大平均分数差')
+    parser.add_argument('--update-db', action='store_true', help='分数一致性达标时将数据库中的模型路径切换为量化模型')
+    parser.add_argument('--report', default=None, help='对比报告JSON路径')
+    args = parser.parse_args()
+
+    reports = []
+    for model_type in args.model_types:
+        try:
+            quantizer = ModelQuantizer(model_type, args.calibration_epochs, args.holdout_ratio, args.seed)
             
-        # 量化模型
-        if not quantizer.quantize_model():
-            logging.error("量化模型失败")
-            return
+            # 加载模型
+            if not quantizer.load_model():
+                logging.error(f"加载模型失败: model_type={model_type}")
+                continue
+                
+            # 量化模型
+            if not quantizer.quantize_model():
+                logging.error(f"量化模型失败: model_type={model_type}")
+                continue
+
+            report = quantizer.benchmark()
+            reports.append(report)
+
+            if args.update_db:
+                if report['mean_score_abs_diff'] is not None and report['mean_score_abs_diff'] <= args.max_score_diff:
+                    quantizer.update_db_path()
+                else:
+                    logging.warning(f"model_type={model_type} 分数差异超过阈值，未更新数据库")
             
-        logging.info("模型量化完成")
-        
-    except Exception as e:
-        logging.error(f"执行过程中发生错误: {str(e)}")
-        logging.error(traceback.format_exc())
+        except Exception as e:
+            logging.error(f"执行过程中发生错误: {str(e)}")
+            logging.error(traceback.format_exc())
+
+    report_path = args.report or os.path.join(
+        project_root, 'log', f"model_quantize_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': datetime.now().isoformat(), 'models': reports}, f, ensure_ascii=False, indent=2)
+    logging.info(f"量化对比报告已保存到: {report_path}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -5,6 +5,7 @@ import numpy as np
 import pickle as pkl
 import traceback
 import warnings
+import threading
 from PyQt5.QtCore import pyqtSignal, QThread
 from util.db_util import SessionClass
 from sql_model.tb_model import Model
@@ -62,6 +63,9 @@ class EegModelInt8(QThread):
     _input_details = None
     _output_details = None
     _gpu_initialized = False
+    # 解释器不是线程安全的：加载和推理加锁，数据读取与标准化可在多个线程中并行
+    _load_lock = threading.Lock()
+    _invoke_lock = threading.Lock()
     
     @staticmethod
     def _init_gpu():
@@ -93,6 +97,11 @@ class EegModelInt8(QThread):
         Returns:
             bool: 加载是否成功
         """
+        with EegModelInt8._load_lock:
+            return EegModelInt8._load_static_model()
+
+    @staticmethod
+    def _load_static_model():
         try:
             # 如果模型已经加载，直接返回True
             if EegModelInt8._interpreter is not None:
@@ -296,25 +305,26 @@ class EegModelInt8(QThread):
                 batch_size = X_test_quantized.shape[0]
                 all_predictions = []
                 
-                # 逐个样本进行预测
-                for i in range(batch_size):
-                    # 提取单个样本
-                    single_sample = X_test_quantized[i:i+1]  # 保持维度为(1, 1, 59, 1000)
-                    
-                    # 设置输入张量
-                    EegModelInt8._interpreter.set_tensor(input_details[0]['index'], single_sample)
-                    
-                    # 运行推理
-                    EegModelInt8._interpreter.invoke()
-                    
-                    # 获取输出
-                    output_data = EegModelInt8._interpreter.get_tensor(output_details[0]['index'])
-                    
-                    # 反量化输出数据
-                    output_scale = output_details[0]['quantization'][0]
-                    output_zero_point = output_details[0]['quantization'][1]
-                    pred = (output_data.astype(np.float32) - output_zero_point) * output_scale
-                    all_predictions.append(pred)
+                # 逐个样本进行预测（共享解释器，推理期间加锁）
+                with EegModelInt8._invoke_lock:
+                    for i in range(batch_size):
+                        # 提取单个样本
+                        single_sample = X_test_quantized[i:i+1]  # 保持维度为(1, 1, 59, 1000)
+                        
+                        # 设置输入张量
+                        EegModelInt8._interpreter.set_tensor(input_details[0]['index'], single_sample)
+                        
+                        # 运行推理
+                        EegModelInt8._interpreter.invoke()
+                        
+                        # 获取输出
+                        output_data = EegModelInt8._interpreter.get_tensor(output_details[0]['index'])
+                        
+                        # 反量化输出数据
+                        output_scale = output_details[0]['quantization'][0]
+                        output_zero_point = output_details[0]['quantization'][1]
+                        pred = (output_data.astype(np.float32) - output_zero_point) * output_scale
+                        all_predictions.append(pred)
                 
                 # 合并所有预测结果
                 y_pred = np.vstack(all_predictions)
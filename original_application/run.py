@@ -1,9 +1,11 @@
 import sys
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
-from backend.init_login_backend import Index_WindowActions
 
 def main():
+    # 界面模块在main中导入：批量推理的子进程（spawn）会重新导入本文件，不需要加载界面和数据库
+    from backend.init_login_backend import Index_WindowActions
+
     # 启用高DPI缩放
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     
@@ -0,0 +1,20 @@
+"""
+单元测试公共配置：把 original_application 加入导入路径（与 run.py 的运行目录一致），
+在导入任何后端模块之前把数据库指向临时SQLite库，测试不依赖PostgreSQL
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_TMP_DIR = tempfile.mkdtemp(prefix='bj_health_app_tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TMP_DIR, 'test.db')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
@@ -0,0 +1,151 @@
+"""
+批量推理工作进程（model/batch_worker.py）与单被试推理 EegModelInt8.predict 的结果一致
+
+用按量化后整数值计算输出的解释器替身代替TFLite模型，用替身Epochs代替FIF读取，
+两条路径读取相同的标准化器文件。与 EegModelInt8 的比较需要TensorFlow和数据库连接，缺少时跳过。
+"""
+
+import pickle as pkl
+
+import mne
+import numpy as np
+import pytest
+
+from model import batch_worker
+
+N_CHANNELS = 59
+INPUT_DETAIL = {'index': 0, 'dtype': np.int8, 'quantization': (0.05, -3)}
+OUTPUT_DETAIL = {'index': 1, 'dtype': np.int8, 'quantization': (1 / 256, -128)}
+
+
+class ChannelScaler:
+    """与sklearn StandardScaler.transform 相同的计算"""
+
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+
+    def transform(self, X):
+        return (X - self.mean) / self.scale
+
+
+class QuantizedInterpreter:
+    """输出 [类别0, 类别1]：量化输入之和大于0时判为类别1"""
+
+    def __init__(self):
+        self.invocations = 0
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [dict(INPUT_DETAIL)]
+
+    def get_output_details(self):
+        return [dict(OUTPUT_DETAIL)]
+
+    def set_tensor(self, index, value):
+        assert value.dtype == np.int8 and value.shape[0] == 1
+        self._input = value
+
+    def invoke(self):
+        self.invocations += 1
+        positive = int(self._input.astype(np.int32).sum()) > 0
+        self._output = np.array([[-100, 100] if positive else [100, -100]], dtype=np.int8)
+
+    def get_tensor(self, index):
+        return self._output
+
+
+class FakeEpochs:
+    def __init__(self, data):
+        self._data = data
+
+    def load_data(self):
+        return self
+
+    def get_data(self):
+        return self._data.copy()
+
+
+@pytest.fixture
+def epochs_data():
+    # 前后两半分别偏正、偏负；标准化后不做量化时全部截断为0
+    rng = np.random.default_rng(0)
+    signs = np.repeat([1.0, -1.0], 60)
+    data = signs[:, None, None] * 3e-6 + rng.normal(0, 1e-6, size=(120, N_CHANNELS, 40))
+    return data
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    std_dir = tmp_path / 'standarder'
+    std_dir.mkdir()
+    for j in range(N_CHANNELS):
+        with open(std_dir / f'std_{j}.pkl', 'wb') as f:
+            pkl.dump(ChannelScaler(mean=0.0, scale=1e-5 * (1 + j / N_CHANNELS)), f)
+    return str(tmp_path / 'subject-1_quantized.tflite')
+
+
+@pytest.fixture
+def data_path(tmp_path, epochs_data, monkeypatch):
+    subject_dir = tmp_path / 'subject'
+    subject_dir.mkdir()
+    (subject_dir / 'fif.fif').write_bytes(b'')
+    monkeypatch.setattr(mne, 'read_epochs', lambda path, *args, **kwargs: FakeEpochs(epochs_data))
+    return str(subject_dir)
+
+
+@pytest.fixture
+def worker(model_path, monkeypatch):
+    interpreter = QuantizedInterpreter()
+    monkeypatch.setattr(batch_worker, '_create_interpreter', lambda path, num_threads: interpreter)
+    batch_worker.init_worker(model_path, 1)
+    return interpreter
+
+
+def reference_ratio(epochs_data, model_path):
+    """逐样本推理的参考结果：最后108个epoch，标准化、量化后判断符号"""
+    scalers = batch_worker.load_scalers(model_path)
+    data = epochs_data[-batch_worker.NUM_OF_DATA:].copy()
+    for j in range(N_CHANNELS):
+        data[:, j, :] = scalers[j].transform(data[:, j, :])
+    scale, zero_point = INPUT_DETAIL['quantization']
+    quantized = (data / scale + zero_point).astype(np.int8).astype(np.int32)
+    labels = quantized.reshape(len(quantized), -1).sum(axis=1) > 0
+    return float(labels.sum()) / len(labels)
+
+
+def test_predict_subject_uses_last_epochs_and_quantizes(worker, data_path, model_path, epochs_data):
+    index, ratio = batch_worker.predict_subject(3, data_path)
+
+    assert index == 3
+    assert worker.invocations == batch_worker.NUM_OF_DATA
+    # 最后108个epoch中48个偏正
+    assert ratio == pytest.approx(48 / 108)
+    assert ratio == pytest.approx(reference_ratio(epochs_data, model_path))
+
+
+def test_predict_subject_reports_worker_traceback(worker, tmp_path):
+    empty_dir = tmp_path / 'empty'
+    empty_dir.mkdir()
+
+    with pytest.raises(RuntimeError, match='FileNotFoundError'):
+        batch_worker.predict_subject(0, str(empty_dir))
+
+
+def test_matches_eeg_model_int8(worker, data_path, model_path, monkeypatch):
+    pytest.importorskip('tensorflow')
+    try:
+        from model.tuili_int8 import EegModelInt8
+    except Exception as e:
+        pytest.skip(f'无法导入EegModelInt8（需要数据库连接）: {e}')
+
+    monkeypatch.setattr(EegModelInt8, '_interpreter', QuantizedInterpreter())
+    monkeypatch.setattr(EegModelInt8, '_input_details', [dict(INPUT_DETAIL)])
+    monkeypatch.setattr(EegModelInt8, '_output_details', [dict(OUTPUT_DETAIL)])
+
+    expected = EegModelInt8(data_path, model_path).predict()
+    _, ratio = batch_worker.predict_subject(0, data_path)
+
+    assert ratio == pytest.approx(expected)
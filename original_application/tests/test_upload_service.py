@@ -0,0 +1,143 @@
+"""
+分片上传接口（backend/upload_service.py）：乱序分片、分片校验失败、断点续传、整个文件MD5校验失败
+
+解压入库（store_uploaded_zip）由记录上传内容的替身代替，其余流程使用真实的路由和SQLite用户表。
+"""
+
+import hashlib
+import os
+
+import pytest
+
+USERNAME = 'uploader'
+CHUNK_SIZE = 4
+PAYLOAD = b'0123456789'
+
+
+@pytest.fixture(scope='module')
+def upload_service(tmp_path_factory):
+    # 服务在运行目录的 ../log 下写日志，导入时切换到临时目录
+    run_dir = tmp_path_factory.mktemp('upload_service') / 'run'
+    run_dir.mkdir()
+    cwd = os.getcwd()
+    os.chdir(run_dir)
+    try:
+        from backend import upload_service
+    finally:
+        os.chdir(cwd)
+
+    from sql_model.tb_user import User
+    session = upload_service.SessionClass()
+    if not session.query(User).filter(User.username == USERNAME).first():
+        session.add(User(user_id='u1', username=USERNAME, password='x', user_type='admin'))
+        session.commit()
+    session.close()
+    return upload_service
+
+
+@pytest.fixture
+def stored(upload_service, monkeypatch):
+    """记录完成上传后交给 store_uploaded_zip 的文件内容"""
+    calls = []
+
+    def store(zip_path, temp_dir, username, user, session, client_ip, file_md5=None):
+        session.close()
+        with open(zip_path, 'rb') as f:
+            calls.append(f.read())
+        return upload_service.jsonify({'success': True, 'md5': file_md5}), 200
+
+    monkeypatch.setattr(upload_service, 'store_uploaded_zip', store)
+    return calls
+
+
+@pytest.fixture
+def client(upload_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_service, 'CHUNK_UPLOAD_DIR', str(tmp_path / '.uploads'))
+    return upload_service.app.test_client()
+
+
+def init_upload(client):
+    response = client.post('/api/upload/init', json={
+        'username': USERNAME, 'filename': 'subject.zip', 'chunk_size': CHUNK_SIZE
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    headers = {'X-Upload-User': USERNAME, 'X-Upload-Token': body['upload_token']}
+    return body['upload_id'], headers
+
+
+def put_chunk(client, upload_id, headers, offset, chunk_md5=None):
+    chunk = PAYLOAD[offset:offset + CHUNK_SIZE]
+    return client.put(
+        f'/api/upload/{upload_id}/chunk?offset={offset}', data=chunk,
+        headers=dict(headers, **{'X-Chunk-MD5': chunk_md5 or hashlib.md5(chunk).hexdigest()})
+    )
+
+
+def complete(client, upload_id, headers, md5=None):
+    return client.post(f'/api/upload/{upload_id}/complete', headers=headers, json={
+        'total_size': len(PAYLOAD), 'md5': md5 or hashlib.md5(PAYLOAD).hexdigest()
+    })
+
+
+def received(client, upload_id, headers):
+    response = client.get(f'/api/upload/{upload_id}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['received']
+
+
+def test_out_of_order_chunks(client, stored):
+    upload_id, headers = init_upload(client)
+
+    for offset in (8, 0, 4):
+        assert put_chunk(client, upload_id, headers, offset).status_code == 200
+    assert received(client, upload_id, headers) == [[0, 4], [4, 4], [8, 2]]
+
+    response = complete(client, upload_id, headers)
+    assert response.status_code == 200
+    assert stored == [PAYLOAD]
+
+
+def test_chunk_checksum_mismatch_rejected(client, stored):
+    upload_id, headers = init_upload(client)
+
+    response = put_chunk(client, upload_id, headers, 0, chunk_md5=hashlib.md5(b'other').hexdigest())
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Chunk checksum mismatch'
+    assert received(client, upload_id, headers) == []
+
+
+def test_resume_after_partial_upload(client, stored):
+    upload_id, headers = init_upload(client)
+    assert put_chunk(client, upload_id, headers, 0).status_code == 200
+
+    response = complete(client, upload_id, headers)
+    assert response.status_code == 409
+    assert response.get_json()['received'] == [[0, 4]]
+
+    # 重新连接：查询已接收的分片，只上传缺少的部分；其他用户的凭证不能访问
+    assert client.get(f'/api/upload/{upload_id}', headers=dict(headers, **{'X-Upload-Token': 'x' * 32})).status_code == 403
+    status = client.get(f'/api/upload/{upload_id}', headers=headers).get_json()
+    assert status['received_bytes'] == CHUNK_SIZE
+    done = {offset for offset, _ in status['received']}
+    for offset in range(0, len(PAYLOAD), CHUNK_SIZE):
+        if offset not in done:
+            assert put_chunk(client, upload_id, headers, offset).status_code == 200
+
+    assert complete(client, upload_id, headers).status_code == 200
+    assert stored == [PAYLOAD]
+
+
+def test_complete_rejects_file_md5_mismatch(client, stored, upload_service):
+    upload_id, headers = init_upload(client)
+    for offset in range(0, len(PAYLOAD), CHUNK_SIZE):
+        put_chunk(client, upload_id, headers, offset)
+
+    response = complete(client, upload_id, headers, md5=hashlib.md5(b'other').hexdigest())
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'File checksum mismatch'
+    assert stored == []
+    # 任务保留，客户端可以重新上传
+    assert os.path.isdir(upload_service.get_upload_dir(upload_id))
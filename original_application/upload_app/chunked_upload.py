@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# 默认分片大小
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 并行上传的分片数
+DEFAULT_PARALLEL = 4
+
+# 单个分片失败后的重试次数
+MAX_RETRIES = 3
+
+# 断点续传状态文件，记录每个目录对应的上传任务
+STATE_FILE = os.path.join(tempfile.gettempdir(), 'bj_health_upload_state.json')
+
+class UploadCancelled(Exception):
+    """上传被取消或出错中止"""
+
+def directory_signature(source_dir):
+    """
+    根据目录下文件的相对路径、大小和修改时间生成签名
+    签名不变时重新生成的ZIP字节流完全相同，可以续传
+    """
+    md5 = hashlib.md5()
+    for root, dirs, files in sorted(os.walk(source_dir)):
+        dirs.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            stat = os.stat(file_path)
+            md5.update(f'{os.path.relpath(file_path, source_dir)}|{stat.st_size}|{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return md5.hexdigest()
+
+def load_state():
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state):
+    tmp_path = STATE_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, STATE_FILE)
+
+class ChunkWriter:
+    """
+    供zipfile写入的只追加文件对象，每凑满一个分片就交给回调
+    不支持seek，zipfile会使用数据描述符格式流式写出
+    """
+    def __init__(self, chunk_size, on_chunk):
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.buffer = bytearray()
+        self.position = 0
+        self.emitted = 0
+
+    def write(self, data):
+        self.buffer.extend(data)
+        self.position += len(data)
+        while len(self.buffer) >= self.chunk_size:
+            self._emit(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.buffer:
+            self._emit(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def _emit(self, chunk):
+        self.on_chunk(self.emitted, chunk)
+        self.emitted += len(chunk)
+
+class ChunkedUploader:
+    """
+    分片断点续传上传器
+    边压缩边上传：压缩线程产生分片放入有界队列，多个上传线程并行发送，
+    同时计算整个ZIP文件的MD5，完成时交给服务器校验
+    """
+    def __init__(self, server_url, username, chunk_size=DEFAULT_CHUNK_SIZE,
+                 parallel=DEFAULT_PARALLEL, progress_callback=None):
+        """
+        参数:
+        - server_url: 服务地址，如 http://127.0.0.1:5000
+        - username: 上传用户名
+        - chunk_size: 分片大小
+        - parallel: 并行上传的分片数
+        - progress_callback: 进度回调 callback(已处理字节数, 已上传字节数, 提示文字)
+        """
+        self.server_url = server_url.rstrip('/')
+        self.username = username
+        self.chunk_size = chunk_size
+        self.parallel = parallel
+        self.progress_callback = progress_callback
+        self.http = requests.Session()
+        # 服务器按用户名和上传凭证校验任务归属，每个请求都携带
+        self.http.headers['X-Upload-User'] = username
+        self.cancelled = threading.Event()
+        self.error = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _report(self, processed, uploaded, message):
+        if self.progress_callback:
+            self.progress_callback(processed, uploaded, message)
+
+    def _init_upload(self, source_dir, signature):
+        """创建上传任务，存在同一目录未完成的任务时续传"""
+        state = load_state()
+        entry = state.get(source_dir)
+        if entry and entry.get('signature') == signature and entry.get('server') == self.server_url \
+                and entry.get('chunk_size') == self.chunk_size and entry.get('upload_token'):
+            self.http.headers['X-Upload-Token'] = entry['upload_token']
+            response = self.http.get(f"{self.server_url}/api/upload/{entry['upload_id']}", timeout=30)
+            # 任务已过期被服务器删除或不属于当前用户时重新创建
+            if response.status_code == 200 and response.json().get('success'):
+                received = {tuple(item) for item in response.json().get('received', [])}
+                return entry['upload_id'], received
+
+        response = self.http.post(f'{self.server_url}/api/upload/init', json={
+            'username': self.username,
+            'filename': os.path.basename(source_dir) + '.zip',
+            'chunk_size': self.chunk_size
+        }, timeout=30)
+        result = response.json()
+        if response.status_code != 200 or not result.get('success'):
+            raise RuntimeError(result.get('message', f'服务器返回状态码：{response.status_code}'))
+
+        self.http.headers['X-Upload-Token'] = result['upload_token']
+        state[source_dir] = {
+            'upload_id': result['upload_id'],
+            'upload_token': result['upload_token'],
+            'signature': signature,
+            'server': self.server_url,
+            'chunk_size': self.chunk_size
+        }
+        save_state(state)
+        return result['upload_id'], set()
+
+    def _put_chunk(self, upload_id, offset, chunk):
+        """上传单个分片，失败时重试"""
+        chunk_md5 = hashlib.md5(chunk).hexdigest()
+        last_error = None
+        for attempt in range(MAX_RETRIES):
+            if self.cancelled.is_set():
+                raise UploadCancelled()
+            try:
+                response = self.http.put(
+                    f'{self.server_url}/api/upload/{upload_id}/chunk',
+                    params={'offset': offset},
+                    data=chunk,
+                    headers={'X-Chunk-MD5': chunk_md5, 'Content-Type': 'application/octet-stream'},
+                    timeout=120
+                )
+                if response.status_code == 200 and response.json().get('success'):
+                    return len(chunk)
+                last_error = response.json().get('message', f'状态码 {response.status_code}')
+            except requests.exceptions.RequestException as e:
+                last_error = str(e)
+            time.sleep(2 ** attempt)
+        raise RuntimeError(f'分片上传失败(偏移 {offset})：{last_error}')
+
+    def upload_directory(self, source_dir):
+        """
+        压缩并上传目录
+        
+        返回:
+        - 服务器完成上传后的响应JSON
+        """
+        source_dir = os.path.abspath(source_dir)
+        self._report(0, 0, '正在准备上传...')
+        upload_id, received = self._init_upload(source_dir, directory_signature(source_dir))
+
+        md5 = hashlib.md5()
+        chunks = queue.Queue(maxsize=self.parallel * 2)
+        progress = {'processed': 0, 'uploaded': sum(length for _, length in received)}
+        progress_lock = threading.Lock()
+
+        def on_chunk(offset, chunk):
+            if self.cancelled.is_set():
+                raise UploadCancelled()
+            md5.update(chunk)
+            # 续传时跳过服务器已有的分片，只重新计算MD5
+            if (offset, len(chunk)) not in received:
+                chunks.put((offset, chunk))
+            with progress_lock:
+                progress['processed'] += len(chunk)
+                self._report(progress['processed'], progress['uploaded'], '正在压缩并上传...')
+
+        def upload_worker():
+            while True:
+                item = chunks.get()
+                if item is None:
+                    return
+                if self.error is not None:
+                    continue
+                try:
+                    uploaded = self._put_chunk(upload_id, *item)
+                    with progress_lock:
+                        progress['uploaded'] += uploaded
+                        self._report(progress['processed'], progress['uploaded'], '正在压缩并上传...')
+                except Exception as e:
+                    if self.error is None:
+                        self.error = e
+                    self.cancelled.set()
+
+        with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+            workers = [pool.submit(upload_worker) for _ in range(self.parallel)]
+            writer = ChunkWriter(self.chunk_size, on_chunk)
+            try:
+                with zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for root, dirs, files in sorted(os.walk(source_dir)):
+                        dirs.sort()
+                        for file in sorted(files):
+                            file_path = os.path.join(root, file)
+                            # 使用相对路径作为ZIP内的路径，确保解压后直接在目标目录下
+                            arcname = os.path.relpath(file_path, os.path.dirname(source_dir))
+                            zipf.write(file_path, arcname)
+                writer.close()
+            except UploadCancelled:
+                pass
+            finally:
+                for _ in workers:
+                    chunks.put(None)
+
+        if self.error is not None:
+            raise self.error
+        if self.cancelled.is_set():
+            raise UploadCancelled('上传已取消')
+
+        self._report(progress['processed'], progress['uploaded'], '正在校验...')
+        response = self.http.post(f'{self.server_url}/api/upload/{upload_id}/complete', json={
+            'total_size': writer.position,
+            'md5': md5.hexdigest()
+        }, timeout=600)
+        result = response.json()
+        if response.status_code != 200 or not result.get('success'):
+            raise RuntimeError(result.get('message', f'服务器返回状态码：{response.status_code}'))
+
+        state = load_state()
+        state.pop(source_dir, None)
+        save_state(state)
+        return result
@@ -1,22 +1,52 @@
 import sys
 import os
 import socket
-import tempfile
-import zipfile
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QLineEdit, QPushButton, QFileDialog, QMessageBox)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 import requests
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from chunked_upload import ChunkedUploader, UploadCancelled
+
+class UploadThread(QThread):
+    """
+    后台上传线程，边压缩边分片上传，断线后再次上传同一目录会自动续传
+    """
+    progress = pyqtSignal(str)
+    succeeded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, server_url, username, source_dir):
+        super().__init__()
+        self.uploader = ChunkedUploader(server_url, username, progress_callback=self.on_progress)
+        self.source_dir = source_dir
+
+    def on_progress(self, processed, uploaded, message):
+        self.progress.emit(f'{message} 已压缩 {processed / 1024 / 1024:.1f}MB，已上传 {uploaded / 1024 / 1024:.1f}MB')
+
+    def cancel(self):
+        self.uploader.cancel()
+
+    def run(self):
+        try:
+            self.succeeded.emit(self.uploader.upload_directory(self.source_dir))
+        except UploadCancelled:
+            self.failed.emit('上传已取消，再次上传同一目录将从断点继续')
+        except requests.exceptions.RequestException as e:
+            self.failed.emit(f'网络连接错误：{str(e)}\n再次上传同一目录将从断点继续')
+        except Exception as e:
+            self.failed.emit(f'上传失败：{str(e)}\n再次上传同一目录将从断点继续')
+
 class UploadWindow(QMainWindow):
     """
     数据目录上传窗口应用
-    支持选择目录，自动压缩并上传
+    支持选择目录，边压缩边分片上传，支持断点续传
     """
     def __init__(self):
         super().__init__()
         self.init_ui()
-        self.temp_zip = None
+        self.upload_thread = None
         
     def init_ui(self):
         """初始化UI界面"""
@@ -80,10 +110,10 @@ class UploadWindow(QMainWindow):
         layout.addLayout(dir_layout)
         
         # 上传按钮
-        upload_btn = QPushButton('上传')
-        upload_btn.setMinimumSize(150, 50)
-        upload_btn.clicked.connect(self.upload_directory)
-        layout.addWidget(upload_btn)
+        self.upload_btn = QPushButton('上传')
+        self.upload_btn.setMinimumSize(150, 50)
+        self.upload_btn.clicked.connect(self.upload_directory)
+        layout.addWidget(self.upload_btn)
         
         # 状态显示
         self.status_label = QLabel('')
@@ -114,46 +144,8 @@ class UploadWindow(QMainWindow):
             self.dir_path = dir_path
             self.dir_path_label.setText(os.path.basename(dir_path) or dir_path)
             
-    def create_zip_from_directory(self, source_dir):
-        """
-        将选中的目录压缩成ZIP文件
-        
-        参数:
-        - source_dir: 源数据目录
-        
-        返回:
-        - 临时ZIP文件的路径，如果失败则返回None
-        """
-        try:
-            # 创建临时ZIP文件
-            self.temp_zip = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
-            
-            # 获取目录名称
-            dir_name = os.path.basename(source_dir)
-            
-            with zipfile.ZipFile(self.temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # 遍历目录
-                for root, dirs, files in os.walk(source_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        # 使用相对路径作为ZIP内的路径，确保解压后直接在目标目录下
-                        arcname = os.path.relpath(file_path, os.path.dirname(source_dir))
-                        zipf.write(file_path, arcname)
-                        
-            return self.temp_zip.name
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'创建压缩文件失败：{str(e)}')
-            if self.temp_zip:
-                self.temp_zip.close()
-                try:
-                    os.unlink(self.temp_zip.name)
-                except:
-                    pass
-                self.temp_zip = None
-            return None
-            
     def upload_directory(self):
-        """压缩并上传目录"""
+        """压缩并分片上传目录"""
         if not hasattr(self, 'dir_path'):
             QMessageBox.warning(self, '警告', '请先选择要上传的目录')
             return
@@ -164,73 +156,40 @@ class UploadWindow(QMainWindow):
         if not server_ip or not port:
             QMessageBox.warning(self, '警告', '请填写完整的服务器地址和端口')
             return
-            
-        try:
-            self.status_label.setText('正在压缩目录...')
-            QApplication.processEvents()  # 更新UI
-            
-            # 压缩目录
-            zip_path = self.create_zip_from_directory(self.dir_path)
-            if not zip_path:
-                self.status_label.setText('压缩失败')
-                return
-                
-            url = f'http://{server_ip}:{port}/api/upload'
-            self.status_label.setText('正在上传...')
-            QApplication.processEvents()  # 更新UI
-            
-            # 准备请求数据
-            with open(zip_path, 'rb') as zip_file:
-                # 使用原始目录名作为ZIP文件名
-                zip_filename = os.path.basename(self.dir_path) + '.zip'
-                files = {'file': (zip_filename, zip_file)}
-                data = {'username': 'admin'}  # 使用管理员账号上传
-                
-                # 发送请求
-                response = requests.post(url, files=files, data=data)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('success'):
-                        self.status_label.setText('上传成功！')
-                        data_path = result.get('data_path', '')
-                        success_msg = f'目录上传成功\n保存路径：{data_path}' if data_path else '目录上传成功'
-                        QMessageBox.information(self, '成功', success_msg)
-                        
-                        # 提示用户刷新数据管理界面
-                        QMessageBox.information(self, '提示', '请在数据管理界面点击刷新，查看新上传的数据')
-                    else:
-                        error_msg = result.get('message', '未知错误')
-                        self.status_label.setText('上传失败')
-                        QMessageBox.warning(self, '失败', f'服务器返回错误：{error_msg}')
-                else:
-                    self.status_label.setText('上传失败')
-                    QMessageBox.warning(self, '失败', f'服务器返回状态码：{response.status_code}')
-                    
-        except requests.exceptions.RequestException as e:
-            self.status_label.setText('上传失败')
-            QMessageBox.critical(self, '错误', f'网络连接错误：{str(e)}')
-        except Exception as e:
-            self.status_label.setText('上传失败')
-            QMessageBox.critical(self, '错误', f'系统错误：{str(e)}')
-        finally:
-            # 清理临时文件
-            if self.temp_zip:
-                self.temp_zip.close()
-                try:
-                    os.unlink(self.temp_zip.name)
-                except:
-                    pass
-                self.temp_zip = None
+
+        if self.upload_thread and self.upload_thread.isRunning():
+            return
+
+        self.upload_btn.setEnabled(False)
+        self.status_label.setText('正在准备上传...')
+        self.upload_thread = UploadThread(f'http://{server_ip}:{port}', 'admin', self.dir_path)  # 使用管理员账号上传
+        self.upload_thread.progress.connect(self.status_label.setText)
+        self.upload_thread.succeeded.connect(self.on_upload_succeeded)
+        self.upload_thread.failed.connect(self.on_upload_failed)
+        self.upload_thread.start()
+
+    def on_upload_succeeded(self, result):
+        """上传成功"""
+        self.upload_btn.setEnabled(True)
+        self.status_label.setText('上传成功！')
+        data_path = result.get('data_path', '')
+        success_msg = f'目录上传成功\n保存路径：{data_path}' if data_path else '目录上传成功'
+        QMessageBox.information(self, '成功', success_msg)
+        
+        # 提示用户刷新数据管理界面
+        QMessageBox.information(self, '提示', '请在数据管理界面点击刷新，查看新上传的数据')
+
+    def on_upload_failed(self, message):
+        """上传失败"""
+        self.upload_btn.setEnabled(True)
+        self.status_label.setText('上传失败')
+        QMessageBox.warning(self, '失败', message)
             
     def closeEvent(self, event):
-        """窗口关闭事件，清理临时文件"""
-        if self.temp_zip:
-            self.temp_zip.close()
-            try:
-                os.unlink(self.temp_zip.name)
-            except:
-                pass
+        """窗口关闭事件，中止正在进行的上传"""
+        if self.upload_thread and self.upload_thread.isRunning():
+            self.upload_thread.cancel()
+            self.upload_thread.wait()
         event.accept()
 
 if __name__ == '__main__':
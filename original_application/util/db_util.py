@@ -16,8 +16,8 @@ DATABASE = os.getenv('DB_NAME', 'bj_health_db')
 USERNAME = os.getenv('DB_USER', 'postgres')
 PASSWORD = os.getenv('DB_PASS', 'tj654478')
 
-# 创建数据库连接URL
-connection_string = f"postgresql://{USERNAME}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+# 创建数据库连接URL，设置DATABASE_URL时优先使用（单元测试使用SQLite）
+connection_string = os.getenv('DATABASE_URL') or f"postgresql://{USERNAME}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
 
 # 创建引擎
 engine = create_engine(connection_string)